@@ -9,12 +9,15 @@
 ##################################################################################################
 """
 from .inference import inference_model, init_model
+from .inference_session import InferenceSession, LatencyStats
 from .test import single_gpu_test, multi_gpu_test
 from .train import train_model
 __all__ = [
     'inference_model',
     'train_model',
     'init_model',
+    'InferenceSession',
+    'LatencyStats',
     'single_gpu_test',
     'multi_gpu_test'
 ]
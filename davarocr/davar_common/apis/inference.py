@@ -20,8 +20,11 @@ from mmdet.datasets.pipelines import Compose
 from mmdet.models import build_detector
 from mmdet.core import get_classes
 
+from ..utils import get_default_device, configure_cpu_threads
 
-def init_model(config, checkpoint=None, device='cuda:0', cfg_options=None):
+
+def init_model(config, checkpoint=None, device=None, cfg_options=None, num_threads=None, num_interop_threads=None,
+               channels_last=False):
     """Initialize a model from config file.
 
     Model types can be 'DETECTOR'(default), 'RECOGNIZOR', 'SPOTTER', 'INFO_EXTRACTOR'
@@ -31,8 +34,14 @@ def init_model(config, checkpoint=None, device='cuda:0', cfg_options=None):
             object.
         checkpoint (str, optional): Checkpoint path. If left as None, the model
             will not load any weights.
+        device (str | torch.device | None): device of the model, e.g. 'cuda:0' or 'cpu'. Default to 'cuda' if
+            available, else 'cpu'.
         cfg_options (dict): Options to override some settings in the used
             config.
+        num_threads (int | None): intra-op threads of torch CPU kernels, None to keep the torch default
+        num_interop_threads (int | None): inter-op threads of torch CPU kernels, None to keep the torch default
+        channels_last (bool): whether to store the model weights (and the 4-D inputs in `inference_model`) in the
+            channels-last memory format, which is usually faster for convolutions on CPU
 
     Returns:
         nn.Module: The constructed detector.
@@ -63,8 +72,11 @@ def init_model(config, checkpoint=None, device='cuda:0', cfg_options=None):
     else:
         raise NotImplementedError
 
+    device = torch.device(get_default_device() if device is None else device)
+    configure_cpu_threads(num_threads, num_interop_threads)
+
     if checkpoint is not None:
-        map_loc = 'cpu' if device == 'cpu' else None
+        map_loc = 'cpu' if device.type == 'cpu' else None
         checkpoint = load_checkpoint(model, checkpoint, map_location=map_loc)
         if 'CLASSES' in checkpoint.get('meta', {}):
             model.CLASSES = checkpoint['meta']['CLASSES']
@@ -77,11 +89,59 @@ def init_model(config, checkpoint=None, device='cuda:0', cfg_options=None):
     # Save the config in the model for convenience
     model.cfg = config
     model.to(device)
+    if channels_last:
+        model.to(memory_format=torch.channels_last)
+    model.channels_last = channels_last
     model.eval()
     return model
 
 
-def inference_model(model, imgs):
+def _scatter_to_device(data, device):
+    """ Move the collated data to the model device. DataContainers are unwrapped on both cuda and cpu.
+
+    Args:
+        data (dict): collated data
+        device (torch.device): model device
+
+    Returns:
+        dict: data on the device
+    """
+    if device.type == 'cuda':
+        target = device.index if device.index is not None else torch.cuda.current_device()
+    else:
+        target = -1
+    return scatter(data, [target])[0]
+
+
+def _to_channels_last(imgs):
+    """
+    Args:
+        imgs (Tensor | list(Tensor)): input images, or the images of each test-time augmentation
+
+    Returns:
+        Tensor | list(Tensor): 4-D images in channels-last memory format
+    """
+    if isinstance(imgs, (list, tuple)):
+        return type(imgs)(_to_channels_last(img) for img in imgs)
+    if isinstance(imgs, torch.Tensor) and imgs.dim() == 4:
+        return imgs.contiguous(memory_format=torch.channels_last)
+    return imgs
+
+
+def _inference_context(inference_mode=True):
+    """
+    Args:
+        inference_mode (bool): whether to use `torch.inference_mode` if supported by torch
+
+    Returns:
+        context manager: `torch.inference_mode()` or `torch.no_grad()`
+    """
+    if inference_mode and hasattr(torch, 'inference_mode'):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def inference_model(model, imgs, inference_mode=True):
     """ Inference image(s) with the models
         Model types can be 'DETECTOR'(default), 'RECOGNIZOR', 'SPOTTER', 'INFO_EXTRACTOR'
 
@@ -89,6 +149,8 @@ def inference_model(model, imgs):
         model (nn.Module): The loaded model
         imgs (str | nd.array | list(str|nd.array)): Image files. It can be a filename of np array (single img inference)
                                                     or a list of filenames | np.array (batch imgs inference.
+        inference_mode (bool): whether to run in `torch.inference_mode` (if supported by torch) instead of
+                               `torch.no_grad`, which also skips the version counting of tensors
 
     Returns:
         result (dict): results.
@@ -103,14 +165,12 @@ def inference_model(model, imgs):
     if isinstance(imgs, dict):
         data = imgs
         data = test_pipeline(data)
-        device = int(str(device).split(":")[-1])
-        data = scatter(collate([data], samples_per_gpu=1), [device])[0]
+        data = _scatter_to_device(collate([data], samples_per_gpu=1), device)
     elif isinstance(imgs, (str, np.ndarray)):
         # If the input is single image
         data = dict(img=imgs)
         data = test_pipeline(data)
-        device = int(str(device).split(":")[-1])
-        data = scatter(collate([data], samples_per_gpu=1), [device])[0]
+        data = _scatter_to_device(collate([data], samples_per_gpu=1), device)
     else:
         # If the input are batch of images
         batch_data = []
@@ -122,10 +182,12 @@ def inference_model(model, imgs):
             data = test_pipeline(data)
             batch_data.append(data)
         data_collate = collate(batch_data, samples_per_gpu=len(batch_data))
-        device = int(str(device).rsplit(':', maxsplit=1)[-1])
-        data = scatter(data_collate, [device])[0]
+        data = _scatter_to_device(data_collate, device)
+
+    if getattr(model, 'channels_last', False) and 'img' in data:
+        data['img'] = _to_channels_last(data['img'])
 
     # Forward inference
-    with torch.no_grad():
+    with _inference_context(inference_mode):
         result = model(return_loss=False, rescale=True, **data)
     return result
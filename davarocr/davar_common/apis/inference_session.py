@@ -0,0 +1,330 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    inference_session.py
+# Abstract       :    Persistent inference session, which gathers concurrent requests into micro-batches
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import bisect
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import torch
+from mmcv.parallel import collate, DataContainer
+from mmdet.datasets.pipelines import Compose
+
+from .inference import init_model, _scatter_to_device, _to_channels_last, _inference_context
+
+
+class LatencyStats:
+    """ Latencies of the recent requests, per stage """
+
+    STAGES = ('preprocess', 'queue', 'forward', 'total')
+
+    def __init__(self, window=10000):
+        """
+        Args:
+            window (int): number of recent requests kept for each stage
+        """
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self._batch_sizes = deque(maxlen=window)
+
+    def add(self, stage, seconds):
+        """
+        Args:
+            stage (str): stage name, in range of `STAGES`
+            seconds (float): latency of one request
+        """
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def add_batch(self, batch_size):
+        """
+        Args:
+            batch_size (int): size of a forwarded micro-batch
+        """
+        with self._lock:
+            self._batch_sizes.append(batch_size)
+
+    def summary(self):
+        """
+        Returns:
+            dict: latencies in ms of each stage, e.g. {'forward': {'mean': 5.1, 'p50': 5.0, 'p90': 6.2, 'p99': 8.3,
+                  'count': 120}, ...}, and the mean size of the forwarded micro-batches in 'batch_size'
+        """
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items()}
+            batch_sizes = np.array(self._batch_sizes)
+        summary = dict()
+        for stage, values in samples.items():
+            if len(values) == 0:
+                summary[stage] = dict(mean=0., p50=0., p90=0., p99=0., count=0)
+                continue
+            summary[stage] = dict(mean=float(values.mean()), p50=float(np.percentile(values, 50)),
+                                  p90=float(np.percentile(values, 90)), p99=float(np.percentile(values, 99)),
+                                  count=len(values))
+        summary['batch_size'] = float(batch_sizes.mean()) if len(batch_sizes) else 0.
+        return summary
+
+
+_STOP = object()
+
+
+class _Request:
+    """ A single-image request and its timestamps """
+
+    __slots__ = ('img', 'data', 'key', 'future', 'submit_time', 'ready_time')
+
+    def __init__(self, img):
+        self.img = img
+        self.data = None
+        self.key = None
+        self.future = Future()
+        self.submit_time = time.perf_counter()
+        self.ready_time = None
+
+
+class InferenceSession:
+    """ A persistent inference session of a model.
+
+    The test pipeline is built once. Each submitted image is preprocessed in a thread pool (image decoding, resizing
+    and normalization mostly release the GIL), and then queued. A dispatcher thread gathers the queued requests into
+    micro-batches of at most `max_batch_size` images, waiting at most `max_wait_ms` after the oldest request, and runs
+    the model forward on them, so that preprocessing overlaps with the forward passes.
+
+    Requests are only batched together if they fall in the same bucket. With `width_buckets`, an image is put into the
+    bucket of the smallest boundary not less than its width (and of its height), which limits the padding of
+    recognition crops of various widths.
+
+    Example:
+        >>> with InferenceSession('res32_bilstm_attn.py', 'model.pth', max_batch_size=32) as session:
+        >>>     futures = [session.submit(img) for img in imgs]
+        >>>     results = [future.result() for future in futures]
+        >>>     print(session.stats())
+    """
+
+    def __init__(self,
+                 model,
+                 checkpoint=None,
+                 device=None,
+                 max_batch_size=8,
+                 max_wait_ms=5.,
+                 num_preprocess_workers=2,
+                 width_buckets=None,
+                 inference_mode=True,
+                 **init_kwargs):
+        """
+        Args:
+            model (str | mmcv.Config | nn.Module): config of the model, or a model built by `init_model`
+            checkpoint (str | None): checkpoint path, used only if `model` is a config
+            device (str | torch.device | None): device of the model, used only if `model` is a config
+            max_batch_size (int): maximum number of images in a micro-batch
+            max_wait_ms (float): maximum time in ms a request waits for other requests to fill its micro-batch
+            num_preprocess_workers (int): number of preprocessing threads
+            width_buckets (list(int) | None): boundaries of the width buckets in ascending order, e.g.
+                                              [32, 64, 128, 256]. None means batching images of any size together
+            inference_mode (bool): whether to use `torch.inference_mode` if supported by torch
+            **init_kwargs (None): other arguments of `init_model`, e.g. `num_threads` and `channels_last`
+        """
+        if isinstance(model, torch.nn.Module):
+            self.model = model
+        else:
+            self.model = init_model(model, checkpoint, device=device, **init_kwargs)
+        self.device = next(self.model.parameters()).device
+        self.test_pipeline = Compose(self.model.cfg.data.test.pipeline)
+
+        assert max_batch_size >= 1, "max_batch_size should be positive !!!"
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.
+        self.width_buckets = sorted(width_buckets) if width_buckets else None
+        self.inference_mode = inference_mode
+
+        self._latency = LatencyStats()
+        self._ready = queue.Queue()
+        self._preprocess_pool = ThreadPoolExecutor(max_workers=max(num_preprocess_workers, 1))
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='InferenceSessionDispatcher',
+                                            daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, img):
+        """ Submit one image asynchronously
+
+        Args:
+            img (str | np.ndarray | dict): image file, image array, or the input data dict of the test pipeline
+
+        Returns:
+            Future: future of the result of the image
+        """
+        if self._closed:
+            raise RuntimeError('The inference session is closed !!!')
+        request = _Request(img)
+        self._preprocess_pool.submit(self._preprocess, request)
+        return request.future
+
+    def infer(self, imgs):
+        """ Inference image(s) synchronously. A list of images is submitted at once, so that it is batched.
+
+        Args:
+            imgs (str | np.ndarray | dict | list): an image, or a list of images
+
+        Returns:
+            dict | list: result of the image, or the list of results of the images
+        """
+        if isinstance(imgs, (list, tuple)):
+            futures = [self.submit(img) for img in imgs]
+            return [future.result() for future in futures]
+        return self.submit(imgs).result()
+
+    def stats(self):
+        """
+        Returns:
+            dict: per-stage latencies of the recent requests, see `LatencyStats.summary`
+        """
+        return self._latency.summary()
+
+    def close(self):
+        """ Finish the pending requests and stop the workers """
+        if self._closed:
+            return
+        self._closed = True
+        self._preprocess_pool.shutdown(wait=True)
+        self._ready.put(_STOP)
+        self._dispatcher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _preprocess(self, request):
+        """ Run the test pipeline of a request, and put it into the ready queue """
+        try:
+            data = dict(request.img) if isinstance(request.img, dict) else dict(img=request.img)
+            request.data = self.test_pipeline(data)
+            request.key = self._bucket_key(request.data)
+        except Exception as error:  # pylint: disable=broad-except
+            request.future.set_exception(error)
+            return
+        request.ready_time = time.perf_counter()
+        self._latency.add('preprocess', request.ready_time - request.submit_time)
+        self._ready.put(request)
+
+    def _bucket_key(self, data):
+        """
+        Args:
+            data (dict): preprocessed data of an image
+
+        Returns:
+            tuple | None: the bucket that the image belongs to
+        """
+        if self.width_buckets is None:
+            return None
+        img = data.get('img')
+        while isinstance(img, (list, tuple)):
+            img = img[0]
+        if isinstance(img, DataContainer):
+            img = img.data
+        if not hasattr(img, 'shape') or len(img.shape) < 2:
+            return None
+        height, width = img.shape[-2:]
+        index = bisect.bisect_left(self.width_buckets, width)
+        bucket_width = self.width_buckets[index] if index < len(self.width_buckets) else width
+        return height, bucket_width
+
+    def _dispatch_loop(self):
+        """ Gather the ready requests into micro-batches of each bucket, and run them """
+        buckets = dict()
+        stopping = False
+        while not stopping or buckets:
+            if not stopping:
+                timeout = None
+                if buckets:
+                    oldest = min(requests[0].ready_time for requests in buckets.values())
+                    timeout = max(oldest + self.max_wait - time.perf_counter(), 0.)
+                try:
+                    request = self._ready.get(timeout=timeout)
+                except queue.Empty:
+                    request = None
+                if request is _STOP:
+                    stopping = True
+                elif request is not None:
+                    bucket = buckets.setdefault(request.key, [])
+                    bucket.append(request)
+                    if len(bucket) >= self.max_batch_size:
+                        self._run_batch(buckets.pop(request.key))
+
+            # Run the buckets whose oldest request has waited long enough, or all the buckets when stopping
+            now = time.perf_counter()
+            for key in [key for key, requests in buckets.items()
+                        if stopping or now >= requests[0].ready_time + self.max_wait]:
+                self._run_batch(buckets.pop(key))
+
+    def _run_batch(self, requests):
+        """ Forward a micro-batch, and deliver the results to the futures of the requests """
+        start = time.perf_counter()
+        for request in requests:
+            self._latency.add('queue', start - request.ready_time)
+        try:
+            results = self._forward([request.data for request in requests])
+        except Exception as error:  # pylint: disable=broad-except
+            for request in requests:
+                request.future.set_exception(error)
+            return
+
+        end = time.perf_counter()
+        self._latency.add_batch(len(requests))
+        for request, result in zip(requests, results):
+            self._latency.add('forward', end - start)
+            self._latency.add('total', end - request.submit_time)
+            request.future.set_result(result)
+
+    def _forward(self, batch_data):
+        """
+        Args:
+            batch_data (list(dict)): preprocessed data of the images
+
+        Returns:
+            list: results of each image
+        """
+        data = _scatter_to_device(collate(batch_data, samples_per_gpu=len(batch_data)), self.device)
+        if getattr(self.model, 'channels_last', False) and 'img' in data:
+            data['img'] = _to_channels_last(data['img'])
+        with _inference_context(self.inference_mode):
+            result = self.model(return_loss=False, rescale=True, **data)
+
+        results = split_batch_results(result, len(batch_data))
+        if results is None:
+            # The model does not return the results of a batch per image, fall back to one image per forward
+            results = [self._forward([data_])[0] for data_ in batch_data] if len(batch_data) > 1 else [result]
+        return results
+
+
+def split_batch_results(result, batch_size):
+    """ Split the result of a batch into the results of each image. Supports a list of per-image results (detectors,
+    spotters), and a dict whose values are lists of per-image results (recognizors).
+
+    Args:
+        result (list | tuple | dict): result of a batch
+        batch_size (int): number of images in the batch
+
+    Returns:
+        list | None: results of each image, None if the result can not be split
+    """
+    if isinstance(result, (list, tuple)) and len(result) == batch_size:
+        return list(result)
+    if isinstance(result, dict) and result and \
+            all(isinstance(value, (list, tuple)) and len(value) == batch_size for value in result.values()):
+        return [{key: value[i:i + 1] for key, value in result.items()} for i in range(batch_size)]
+    if batch_size == 1:
+        return [result]
+    return None
@@ -31,7 +31,8 @@ def single_gpu_test(model,
                     out_dir=None,
                     show_score_thr=0.3,
                     model_type="DETECTOR",
-                    min_time_interval=1):
+                    min_time_interval=1,
+                    show_progress=True):
     """ Test model with single GPU, used for visualization.
 
     Args:
@@ -42,6 +43,7 @@ def single_gpu_test(model,
         show_score_thr (float): the threshold to show visualization.
         model_type(str): model type indicator, used to formalize final results.
         min_time_interval(int): progressbar minimal update unit
+        show_progress(boolean): whether to show the progressbar
     Returns:
         dict: test results
     """
@@ -49,7 +51,8 @@ def single_gpu_test(model,
     model.eval()
     results = []
     dataset = data_loader.dataset
-    prog_bar = DavarProgressBar(len(dataset), min_time_interval=min_time_interval)
+    if show_progress:
+        prog_bar = DavarProgressBar(len(dataset), min_time_interval=min_time_interval)
     for _, data in enumerate(data_loader):
         with torch.no_grad():
             result = model(return_loss=False, rescale=True, **data)
@@ -113,8 +116,9 @@ def single_gpu_test(model,
             #             del res[key]
         results.extend(result)
 
-        for _ in range(batch_size):
-            prog_bar.update()
+        if show_progress:
+            for _ in range(batch_size):
+                prog_bar.update()
     return results
 
 
@@ -123,7 +127,8 @@ def multi_gpu_test(model,
                    tmpdir=None,
                    gpu_collect=False,
                    model_type="DETECTOR",
-                   min_time_interval=1):
+                   min_time_interval=1,
+                   show_progress=True):
     """Test model with multiple gpus.
 
     This method tests model with multiple gpus and collects the results
@@ -140,6 +145,7 @@ def multi_gpu_test(model,
         gpu_collect (bool): Option to use either gpu or cpu to collect results.
         model_type(str): model type indicator, used to formalize final results.
         min_time_interval(int): progressbar minimal update unit
+        show_progress(boolean): whether to show the progressbar
 
     Returns:
         list(dict): The prediction results.
@@ -148,7 +154,7 @@ def multi_gpu_test(model,
     results = []
     dataset = data_loader.dataset
     rank, world_size = get_dist_info()
-    if rank == 0:
+    if rank == 0 and show_progress:
         prog_bar = DavarProgressBar(len(dataset), min_time_interval=min_time_interval)
     time.sleep(2)  # This line can prevent deadlock problem in some cases.
     for _, data in enumerate(data_loader):
@@ -190,7 +196,7 @@ def multi_gpu_test(model,
 
         results.extend(result)
 
-        if rank == 0:
+        if rank == 0 and show_progress:
             batch_size = len(result)
             for _ in range(batch_size * world_size):
                 prog_bar.update()
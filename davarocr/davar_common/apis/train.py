@@ -70,7 +70,8 @@ def train_model(model,
             cfg_sampler,       # Allow to customize sampler
             len(cfg.gpu_ids),  # cfg.gpus will be ignored if distributed
             dist=distributed,
-            seed=cfg.seed) for ds in dataset]
+            seed=cfg.seed,
+            cfg_collate=cfg.data.get('cfg_collate', None)) for ds in dataset]
 
     # put model on gpus
     if distributed:
@@ -153,7 +154,8 @@ def train_model(model,
             workers_per_gpu=cfg.data.workers_per_gpu,
             sampler_type=None,
             dist=distributed,
-            shuffle=False)
+            shuffle=False,
+            cfg_collate=cfg.data.get('cfg_collate', None))
         eval_cfg = cfg.get('evaluation', {})
         eval_cfg['by_epoch'] = cfg.runner['type'] != 'IterBasedRunner'
         eval_hook = DavarDistEvalHook if distributed else DavarEvalHook
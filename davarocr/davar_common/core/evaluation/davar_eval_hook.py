@@ -9,21 +9,32 @@
 ##################################################################################################
 """
 import os.path as osp
+import time
 from math import inf
 
 import torch
 import torch.distributed as dist
 from mmdet.core import EvalHook, DistEvalHook
+from mmcv.runner import get_dist_info
 from mmcv.utils import print_log
 
 from ...apis import single_gpu_test, multi_gpu_test
+from ...datasets import davar_build_dataloader
+from .eval_subset import build_eval_subset, build_eval_pool, submit_evaluation
 
 
 class DavarEvalHook(EvalHook):
-    """ Customized evaluation hook, support for evaluate by iterations."""
+    """ Customized evaluation hook, support for evaluate by iterations.
+
+    For frequent iteration-level checks, a fixed stratified subset of the validation set can be evaluated instead of the
+    full set (`subset_size`), with the full evaluation only at milestones (`full_iter_interval` and the last
+    iteration). Subset metrics are reported with the prefix `subset_` and never decide the best checkpoint, so their
+    metric computation can be moved to a CPU worker pool that overlaps with the resumed training (`async_eval`).
+    """
     greater_keys = ['mAP', 'AR', 'accuracy', 'hmean']
     init_value_map = {'greater': -inf, 'less': inf}
     less_keys = ['loss', 'NED']
+    distributed = False
 
     def __init__(self,
                  dataloader,
@@ -37,6 +48,12 @@ class DavarEvalHook(EvalHook):
                  by_iter=False,
                  save_best=None,
                  rule=None,
+                 subset_size=None,
+                 subset_seed=0,
+                 full_iter_interval=-1,
+                 async_eval=False,
+                 eval_workers=1,
+                 show_progress=False,
                  **eval_kwargs):
         """
         Args:
@@ -50,6 +67,14 @@ class DavarEvalHook(EvalHook):
             by_iter (bool): Saving checkpoints by iteration
             save_best (str): If a metric is specified, it would measure the best checkpoint during evaluation.
             rule (str): Comparison rule for best score. 'greater' or 'less'
+            subset_size (int | float): Number (or ratio if <= 1.0) of validation samples used in iteration-level
+                                       evaluation. None means always evaluating the full validation set.
+            subset_seed (int): Random seed to choose the fixed subset.
+            full_iter_interval (int): The iteration period of the full evaluation when `subset_size` is set. -1 means
+                                      the full evaluation only happens at the last iteration.
+            async_eval (bool): Whether to compute the subset metrics in background CPU workers.
+            eval_workers (int): Number of the background CPU workers.
+            show_progress (bool): Whether to show the progressbar during evaluation.
             **eval_kwargs (None): backup parameter
         """
 
@@ -73,6 +98,154 @@ class DavarEvalHook(EvalHook):
         if self.save_best is not None:
             self._init_rule(rule, self.save_best)
 
+        self.full_iter_interval = full_iter_interval
+        self.async_eval = async_eval
+        self.eval_workers = eval_workers
+        self.show_progress = show_progress
+        self.eval_pool = None
+        self.pending_evals = []
+        self.subset_dataloader = None
+        if subset_size is not None:
+            subset = build_eval_subset(dataloader.dataset, subset_size, subset_seed)
+            self.subset_dataloader = davar_build_dataloader(
+                subset,
+                samples_per_gpu=dataloader.batch_size or 1,
+                workers_per_gpu=dataloader.num_workers,
+                dist=self.distributed,
+                shuffle=False)
+
+    def before_run(self, runner):
+        """
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        super().before_run(runner)
+        rank, _ = get_dist_info()
+        if self.async_eval and self.subset_dataloader is not None and rank == 0:
+            self.eval_pool = build_eval_pool(self.subset_dataloader.dataset, self.eval_workers)
+
+    def after_run(self, runner):
+        """ Wait for the background evaluations
+
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        self.collect_async_evaluations(runner, wait=True)
+        if self.eval_pool is not None:
+            self.eval_pool.shutdown()
+            self.eval_pool = None
+
+    def use_subset(self, runner):
+        """ Whether the current iteration-level evaluation uses the validation subset
+
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+            bool: True for the subset evaluation, False for the full evaluation
+        """
+        if self.subset_dataloader is None or self.is_last_iter(runner):
+            return False
+        if self.full_iter_interval > 0 and self.every_n_iters(runner, self.full_iter_interval):
+            return False
+        return True
+
+    def log_eval_time(self, runner, mode, infer_time, metric_time):
+        """ Report the evaluation wall-time separately from the training time
+
+        Args:
+            runner (Runner): the controller of the training process
+            mode (str): evaluation mode, including ["full", "subset"]
+            infer_time (float): model inference time in seconds
+            metric_time (float): metric computation time in seconds
+
+        Returns:
+
+        """
+        runner.log_buffer.output['{}_eval_infer_time'.format(mode)] = infer_time
+        runner.log_buffer.output['{}_eval_metric_time'.format(mode)] = metric_time
+        print_log('Evaluation ({}) wall-time: inference {:.2f}s, metric {:.2f}s'.format(
+            mode, infer_time, metric_time), logger=runner.logger)
+
+    def timed_evaluate(self, runner, results, infer_time):
+        """ Full evaluation with the metric time reported
+
+        Args:
+            runner (Runner): the controller of the training process
+            results (list): model predictions
+            infer_time (float): model inference time in seconds
+
+        Returns:
+            float: key score
+        """
+        start = time.time()
+        key_score = self.evaluate(runner, results)
+        self.log_eval_time(runner, 'full', infer_time, time.time() - start)
+        return key_score
+
+    def update_subset_results(self, runner, eval_res, iteration):
+        """ Write the subset metrics into the logger, with prefix `subset_`
+
+        Args:
+            runner (Runner): the controller of the training process
+            eval_res (dict): evaluation results
+            iteration (int): the iteration evaluated
+
+        Returns:
+
+        """
+        for name, val in eval_res.items():
+            runner.log_buffer.output['subset_' + name] = val
+        runner.log_buffer.ready = True
+        print_log('Subset evaluation of iteration {}: {}'.format(iteration, eval_res), logger=runner.logger)
+
+    def evaluate_subset(self, runner, results, infer_time):
+        """ Compute the subset metrics, in background if the worker pool exists
+
+        Args:
+            runner (Runner): the controller of the training process
+            results (list): model predictions of the subset
+            infer_time (float): model inference time in seconds
+
+        Returns:
+
+        """
+        if self.eval_pool is not None:
+            future = submit_evaluation(self.eval_pool, results, self.eval_kwargs)
+            self.pending_evals.append((future, runner.iter + 1, infer_time, time.time()))
+            return
+
+        start = time.time()
+        eval_res = self.subset_dataloader.dataset.evaluate(results, logger=runner.logger, **self.eval_kwargs)
+        self.update_subset_results(runner, eval_res, runner.iter + 1)
+        self.log_eval_time(runner, 'subset', infer_time, time.time() - start)
+
+    def collect_async_evaluations(self, runner, wait=False):
+        """ Report the finished background evaluations
+
+        Args:
+            runner (Runner): the controller of the training process
+            wait (bool): whether to wait for all the pending evaluations
+
+        Returns:
+
+        """
+        pending = []
+        for future, iteration, infer_time, submit_time in self.pending_evals:
+            if not wait and not future.done():
+                pending.append((future, iteration, infer_time, submit_time))
+                continue
+            self.update_subset_results(runner, future.result(), iteration)
+            # Measured from the submission, the metric computation overlaps with training
+            self.log_eval_time(runner, 'subset', infer_time, time.time() - submit_time)
+        self.pending_evals = pending
+
     def evaluation_iteration_flag(self, runner):
         """
         Args:
@@ -99,17 +272,28 @@ class DavarEvalHook(EvalHook):
         Returns:
 
         """
+        self.collect_async_evaluations(runner)
         if not self.by_iter or self.iter_interval == -1 or not self.evaluation_iteration_flag(runner):
             return
 
+        use_subset = self.use_subset(runner)
+        dataloader = self.subset_dataloader if use_subset else self.dataloader
+
         # model inference
-        results = single_gpu_test(runner.model, self.dataloader, show=False, model_type=self.model_type)
+        start = time.time()
+        results = single_gpu_test(runner.model, dataloader, show=False, model_type=self.model_type,
+                                  show_progress=self.show_progress)
+        infer_time = time.time() - start
 
         # change the training state
         runner.model.train()
 
+        if use_subset:
+            self.evaluate_subset(runner, results, infer_time)
+            return
+
         # calculate the evaluation metric
-        key_score = self.evaluate(runner, results)
+        key_score = self.timed_evaluate(runner, results, infer_time)
 
         if self.save_best:
             if self.eval_mode == "general":
@@ -133,10 +317,13 @@ class DavarEvalHook(EvalHook):
             return
 
         # model inference
-        results = single_gpu_test(runner.model, self.dataloader, show=False, model_type=self.model_type)
+        start = time.time()
+        results = single_gpu_test(runner.model, self.dataloader, show=False, model_type=self.model_type,
+                                  show_progress=self.show_progress)
+        infer_time = time.time() - start
 
         # calculate the evaluation metric
-        key_score = self.evaluate(runner, results)
+        key_score = self.timed_evaluate(runner, results, infer_time)
 
         if self.save_best:
             eval_hists = getattr(runner, 'eval_hists', [])
@@ -222,6 +409,8 @@ class DavarEvalHook(EvalHook):
 
 class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
     """ Customized evaluation hook, support for evaluate by iterations. """
+    distributed = True
+
     def __init__(self, dataloader,
                  start=None,
                  start_iter=None,
@@ -233,6 +422,12 @@ class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
                  by_iter=False,
                  save_best=None,
                  rule=None,
+                 subset_size=None,
+                 subset_seed=0,
+                 full_iter_interval=-1,
+                 async_eval=False,
+                 eval_workers=1,
+                 show_progress=False,
                  **eval_kwargs):
         """
         Args:
@@ -247,13 +442,22 @@ class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
             by_iter (bool): Saving checkpoints by iteration
             save_best (str): If a metric is specified, it would measure the best checkpoint during evaluation.
             rule (str): Comparison rule for best score.
+            subset_size (int | float): Number (or ratio if <= 1.0) of validation samples used in iteration-level
+                                       evaluation. None means always evaluating the full validation set.
+            subset_seed (int): Random seed to choose the fixed subset.
+            full_iter_interval (int): The iteration period of the full evaluation when `subset_size` is set.
+            async_eval (bool): Whether to compute the subset metrics in background CPU workers.
+            eval_workers (int): Number of the background CPU workers.
+            show_progress (bool): Whether to show the progressbar during evaluation.
             **eval_kwargs (None): backup parameter
         """
         super().__init__(dataloader=dataloader, model_type=model_type,
                          start=start, start_iter=start_iter, interval=interval,
                          iter_interval=iter_interval, eval_mode=eval_mode,
                          by_epoch=by_epoch, by_iter=by_iter, save_best=save_best,
-                         rule=rule, **eval_kwargs)
+                         rule=rule, subset_size=subset_size, subset_seed=subset_seed,
+                         full_iter_interval=full_iter_interval, async_eval=async_eval,
+                         eval_workers=eval_workers, show_progress=show_progress, **eval_kwargs)
 
         # evaluation interval including epoch and iteration
         self.iter_interval = iter_interval
@@ -290,18 +494,21 @@ class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
             tmpdir = osp.join(runner.work_dir, '.eval_hook')
 
         # model inference
+        start = time.time()
         results = multi_gpu_test(
             runner.model,
             self.dataloader,
             tmpdir=tmpdir,
             gpu_collect=self.gpu_collect,
-            model_type=self.model_type)
+            model_type=self.model_type,
+            show_progress=self.show_progress)
+        infer_time = time.time() - start
 
         best_score = torch.full((1,), 0., dtype=torch.float, device='cuda')
 
         if runner.rank == 0:
             # calculate the evaluation metric
-            key_score = self.evaluate(runner, results)
+            key_score = self.timed_evaluate(runner, results, infer_time)
             if self.save_best:
                 best_score[0] = key_score
 
@@ -327,6 +534,8 @@ class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
         Returns:
 
         """
+        if runner.rank == 0:
+            self.collect_async_evaluations(runner)
         if not self.by_iter or self.iter_interval == -1 or not self.evaluation_iteration_flag(runner):
             return
         if self.broadcast_bn_buffer:
@@ -336,21 +545,29 @@ class DavarDistEvalHook(DavarEvalHook, DistEvalHook):
         if tmpdir is None:
             tmpdir = osp.join(runner.work_dir, '.eval_hook')
 
+        use_subset = self.use_subset(runner)
+        dataloader = self.subset_dataloader if use_subset else self.dataloader
+
         # model inference
+        start = time.time()
         results = multi_gpu_test(
             runner.model,
-            self.dataloader,
+            dataloader,
             tmpdir=tmpdir,
             gpu_collect=self.gpu_collect,
-            model_type=self.model_type
+            model_type=self.model_type,
+            show_progress=self.show_progress
         )
+        infer_time = time.time() - start
 
         # change the training state
         runner.model.train()
 
-        if runner.rank == 0:
+        if runner.rank == 0 and use_subset:
+            self.evaluate_subset(runner, results, infer_time)
+        elif runner.rank == 0:
             # calculate the evaluation metric
-            key_score = self.evaluate(runner, results)
+            key_score = self.timed_evaluate(runner, results, infer_time)
 
             if self.save_best:
                 if self.eval_mode == "general":
@@ -0,0 +1,193 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    eval_subset.py
+# Abstract       :    Fixed, stratified validation subsets and the evaluation worker pool used by DavarEvalHook
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import copy
+import inspect
+import multiprocessing
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from torch.utils.data import Dataset, ConcatDataset
+
+from ...datasets import DavarMultiDataset, AnnotationStore
+
+
+class EvalSubset(Dataset):
+    """ A fixed subset of a validation dataset.
+
+    Samples and annotations are fetched from the wrapped dataset through `indices`, and `evaluate` runs the wrapped
+    dataset's own `evaluate` implementation on the subset. The per-sample attributes (`PER_SAMPLE_ATTRS`) are seen
+    through `indices`, and the methods of the wrapped dataset are bound to the subset, so that index-taking helpers
+    like `process_anns(i)` and `get_relations(i)` called by `evaluate` read the i-th sample of the subset. Other
+    attributes are forwarded to the wrapped dataset.
+    """
+
+    # Attributes holding one item per sample of the wrapped dataset
+    PER_SAMPLE_ATTRS = ('data_infos', 'img_ids')
+
+    def __init__(self, dataset, indices):
+        """
+        Args:
+            dataset (Dataset): the full validation dataset
+            indices (list(int) | np.ndarray): the indices of the subset in `dataset`
+        """
+        self.dataset = dataset
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        return self.dataset[int(self.indices[idx])]
+
+    def get_ann_info(self, idx):
+        """
+        Args:
+            idx (int): index in the subset
+
+        Returns:
+            dict: annotation of the sample
+        """
+        return self.dataset.get_ann_info(int(self.indices[idx]))
+
+    def evaluate(self, results, **kwargs):
+        """ Evaluate the subset with the evaluation implementation of the wrapped dataset
+
+        Args:
+            results (list): model predictions of the subset
+            **kwargs (None): evaluation parameters
+
+        Returns:
+            dict: evaluation results
+        """
+        return type(self.dataset).evaluate(self, results, **kwargs)
+
+    def __getattr__(self, name):
+        # `dataset` is not yet set during unpickling
+        if name == 'dataset' or 'dataset' not in self.__dict__:
+            raise AttributeError(name)
+        if name in self.PER_SAMPLE_ATTRS:
+            value = getattr(self.dataset, name)
+            if isinstance(value, AnnotationStore):
+                value = value.subset(self.indices)
+            elif isinstance(value, np.ndarray):
+                value = value[self.indices]
+            elif hasattr(value, '__getitem__') and not isinstance(value, dict):
+                # lists, or loaders indexed by sample like those of the NLP datasets
+                value = [value[idx] for idx in self.indices.tolist()]
+            else:
+                raise TypeError('Per-sample attribute {} of {} is not a sequence'.format(
+                    name, type(self.dataset).__name__))
+            # Cached, so that it is not sliced again
+            self.__dict__[name] = value
+            return value
+        func = inspect.getattr_static(type(self.dataset), name, None)
+        if isinstance(func, types.FunctionType):
+            return types.MethodType(func, self)
+        return getattr(self.dataset, name)
+
+
+def _stratified_indices(dataset, num, rng):
+    """ Choose `num` samples from `dataset`, proportionally from each group of `dataset.flag` if it exists (e.g. the
+    aspect-ratio groups of mmdet-style datasets), otherwise evenly spaced over the dataset.
+
+    Args:
+        dataset (Dataset): dataset to sample from
+        num (int): number of samples
+        rng (np.random.RandomState): random generator
+
+    Returns:
+        np.ndarray: sorted sample indices
+    """
+    length = len(dataset)
+    num = min(max(num, 1), length)
+    flag = getattr(dataset, 'flag', None)
+    if not isinstance(flag, np.ndarray) or len(flag) != length:
+        return np.unique(np.linspace(0, length - 1, num).round().astype(np.int64))
+
+    indices = []
+    for group in np.unique(flag):
+        members = np.where(flag == group)[0]
+        group_num = max(int(round(num * len(members) / length)), 1)
+        indices.append(rng.choice(members, min(group_num, len(members)), replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def build_eval_subset(dataset, subset_size, seed=0):
+    """ Build a fixed validation subset. For DavarMultiDataset, every sub-dataset contributes in proportion to its
+    size, so that the per-dataset metrics are still reported.
+
+    Args:
+        dataset (Dataset): the full validation dataset
+        subset_size (int | float): number of samples, or the ratio of the full dataset if it is a float <= 1
+        seed (int): random seed
+
+    Returns:
+        Dataset: the subset dataset
+    """
+    rng = np.random.RandomState(seed)
+    if isinstance(subset_size, float) and subset_size <= 1:
+        ratio = subset_size
+    else:
+        ratio = float(subset_size) / max(len(dataset), 1)
+
+    if isinstance(dataset, DavarMultiDataset):
+        subset = copy.copy(dataset)
+        subset.datasets = [EvalSubset(dataset_, _stratified_indices(dataset_, int(round(len(dataset_) * ratio)), rng))
+                           for dataset_ in dataset.datasets]
+        subset.concated_dataset = ConcatDataset(subset.datasets)
+        if isinstance(getattr(dataset, 'flag', None), dict):
+            subset.flag = dict(dataset.flag, group_samples=[len(dataset_) for dataset_ in subset.datasets])
+        return subset
+
+    return EvalSubset(dataset, _stratified_indices(dataset, int(round(len(dataset) * ratio)), rng))
+
+
+_EVAL_DATASET = None
+
+
+def _init_eval_worker(dataset):
+    """ Keep the dataset in the worker process, so only predictions are transferred for each evaluation """
+    global _EVAL_DATASET  # pylint: disable=global-statement
+    _EVAL_DATASET = dataset
+
+
+def _evaluate_in_worker(results, eval_kwargs):
+    """ Run `dataset.evaluate` in the worker process """
+    return _EVAL_DATASET.evaluate(results, logger='silent', **eval_kwargs)
+
+
+def build_eval_pool(dataset, num_workers=1):
+    """ Build a CPU process pool to compute metrics in background. The dataset is inherited by forking, instead of
+    being pickled for every evaluation.
+
+    Args:
+        dataset (Dataset): the dataset to evaluate
+        num_workers (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: the worker pool
+    """
+    return ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('fork'),
+                               initializer=_init_eval_worker, initargs=(dataset,))
+
+
+def submit_evaluation(pool, results, eval_kwargs):
+    """
+    Args:
+        pool (ProcessPoolExecutor): the worker pool built by `build_eval_pool`
+        results (list): model predictions
+        eval_kwargs (dict): evaluation parameters
+
+    Returns:
+        Future: future of the evaluation results
+    """
+    return pool.submit(_evaluate_in_worker, results, eval_kwargs)
@@ -9,10 +9,13 @@
 ##################################################################################################
 """
 from mmdet.datasets.builder import DATASETS, build_dataloader, build_dataset
-from .pipelines import DavarLoadAnnotations, DavarLoadImageFromFile, DavarResize, RandomRotate, DavarRandomCrop, DavarRandomFlip
+from .pipelines import DavarLoadAnnotations, DavarLoadImageFromFile, DavarResize, RandomRotate, DavarRandomCrop, DavarRandomFlip, \
+    DavarRandomAffine, CroppedBitmapMasks
 from .davar_custom import DavarCustomDataset
+from .ann_store import AnnotationStore, convert_datalist
 from .davar_multi_dataset import DavarMultiDataset
-from .builder import SAMPLER, build_sampler, davar_build_dataset, davar_build_dataloader
+from .builder import SAMPLER, build_sampler, davar_build_dataset, davar_build_dataloader, pad_collate, \
+    sliding_window_collate, build_collate_fn, dataset_pad_values
 from .sampler import DistBatchBalancedSampler, BatchBalancedSampler
 
 __all__ = [
@@ -25,11 +28,19 @@ __all__ = [
     'RandomRotate',
     'DavarRandomCrop',
     'DavarRandomFlip',
+    'CroppedBitmapMasks',
+    'DavarRandomAffine',
     'DavarCustomDataset',
+    'AnnotationStore',
+    'convert_datalist',
     'build_sampler',
     'SAMPLER',
     'DistBatchBalancedSampler',
     'BatchBalancedSampler',
     'davar_build_dataset',
     'davar_build_dataloader',
+    'pad_collate',
+    'sliding_window_collate',
+    'build_collate_fn',
+    'dataset_pad_values',
 ]
@@ -0,0 +1,461 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    ann_store.py
+# Abstract       :    Columnar, memory-mapped annotation store converted from the davar datalists
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import collections
+import json
+import os
+import os.path as osp
+import shutil
+import warnings
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+
+STORE_VERSION = 1
+
+# Bits of the `present` column
+_HAS_BBOXES = 1
+_HAS_CARES = 2
+_HAS_LABELS = 4
+_HAS_TEXTS = 8
+_NO_ANN = 16         # 'content_ann' is None
+_IRREGULAR = 32      # 'bboxes' or 'cares' is not columnar, and is kept in the extra JSON
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _offsets(counts):
+    """ Offsets table from the item counts """
+    return np.concatenate([[0], np.cumsum(np.asarray(counts, dtype=np.int64))]).astype(np.int64)
+
+
+class _StoreWriter:
+    """ Packs the entries of a datalist into the columns of the store """
+
+    def __init__(self):
+        self.filename_bytes = bytearray()
+        self.filename_lens = array('q')
+        self.heights = array('i')
+        self.widths = array('i')
+        self.present = array('B')
+        self.bbox_nums = array('q')
+        self.bbox_lens = array('q')
+        self.bbox_coords = array('d')
+        self.coords_int = True
+        self.care_nums = array('q')
+        self.cares = array('b')
+        self.label_nums = array('q')
+        self.label_lens = array('q')
+        self.label_ids = array('i')
+        self.label_vocab = collections.OrderedDict()
+        self.text_nums = array('q')
+        self.text_lens = array('q')
+        self.text_bytes = bytearray()
+        self.extra_lens = array('q')
+        self.extra_bytes = bytearray()
+
+    def add(self, filename, info):
+        """
+        Args:
+            filename (str): relative path of the image
+            info (dict): annotation of the image, with 'height', 'width', 'content_ann' and optional 'content_ann2'
+        """
+        encoded = filename.encode('utf-8')
+        self.filename_bytes += encoded
+        self.filename_lens.append(len(encoded))
+        self.heights.append(int(info['height']))
+        self.widths.append(int(info['width']))
+
+        ann = info['content_ann']
+        present = 0
+        extra = dict()
+        if ann is None:
+            present |= _NO_ANN
+            ann = dict()
+        for key, value in ann.items():
+            if key == 'bboxes' and self._add_bboxes(value):
+                present |= _HAS_BBOXES
+            elif key == 'cares' and self._add_cares(value):
+                present |= _HAS_CARES
+            elif key == 'labels' and self._add_labels(value):
+                present |= _HAS_LABELS
+            elif key == 'texts' and self._add_texts(value):
+                present |= _HAS_TEXTS
+            else:
+                if key in ('bboxes', 'cares'):
+                    present |= _IRREGULAR
+                extra[key] = value
+        for flag, nums in ((_HAS_BBOXES, self.bbox_nums), (_HAS_CARES, self.care_nums),
+                           (_HAS_LABELS, self.label_nums), (_HAS_TEXTS, self.text_nums)):
+            if not present & flag:
+                nums.append(0)
+        self.present.append(present)
+
+        extra = dict(content_ann=extra) if extra else dict()
+        if info.get('content_ann2', None) is not None:
+            extra['content_ann2'] = info['content_ann2']
+        encoded = json.dumps(extra, ensure_ascii=False).encode('utf-8') if extra else b''
+        self.extra_bytes += encoded
+        self.extra_lens.append(len(encoded))
+
+    def _add_bboxes(self, bboxes):
+        if not isinstance(bboxes, list) or \
+                not all(isinstance(bbox, list) and all(_is_number(coord) for coord in bbox) for bbox in bboxes):
+            return False
+        self.bbox_nums.append(len(bboxes))
+        for bbox in bboxes:
+            self.bbox_lens.append(len(bbox))
+            self.bbox_coords.extend(bbox)
+            self.coords_int = self.coords_int and all(_is_int(coord) and abs(coord) < 2 ** 31 for coord in bbox)
+        return True
+
+    def _add_cares(self, cares):
+        if not isinstance(cares, list) or not all(isinstance(care, int) and -128 <= care < 128 for care in cares):
+            return False
+        self.care_nums.append(len(cares))
+        self.cares.extend(int(care) for care in cares)
+        return True
+
+    def _add_labels(self, labels):
+        # Labels are lists of `str` or `int` values, e.g. [['title'], ['code']] or [[1], [2]]
+        if not isinstance(labels, list) or not all(
+                isinstance(label, list) and all(isinstance(item, str) or _is_int(item) for item in label)
+                for label in labels):
+            return False
+        self.label_nums.append(len(labels))
+        for label in labels:
+            self.label_lens.append(len(label))
+            for item in label:
+                # 1 and '1' are different labels
+                key = (isinstance(item, str), item)
+                if key not in self.label_vocab:
+                    self.label_vocab[key] = len(self.label_vocab)
+                self.label_ids.append(self.label_vocab[key])
+        return True
+
+    def _add_texts(self, texts):
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return False
+        self.text_nums.append(len(texts))
+        for text in texts:
+            encoded = text.encode('utf-8')
+            self.text_bytes += encoded
+            self.text_lens.append(len(encoded))
+        return True
+
+    def columns(self):
+        """
+        Returns:
+            dict: name and array of each column
+        """
+        return dict(
+            filename_offsets=_offsets(self.filename_lens),
+            filename_bytes=np.frombuffer(bytes(self.filename_bytes), dtype=np.uint8),
+            heights=np.asarray(self.heights, dtype=np.int32),
+            widths=np.asarray(self.widths, dtype=np.int32),
+            present=np.asarray(self.present, dtype=np.uint8),
+            bbox_offsets=_offsets(self.bbox_nums),
+            bbox_coord_offsets=_offsets(self.bbox_lens),
+            bbox_coords=np.asarray(self.bbox_coords, dtype=np.int32 if self.coords_int else np.float64),
+            care_offsets=_offsets(self.care_nums),
+            cares=np.asarray(self.cares, dtype=np.int8),
+            label_offsets=_offsets(self.label_nums),
+            label_item_offsets=_offsets(self.label_lens),
+            label_ids=np.asarray(self.label_ids, dtype=np.int32),
+            text_offsets=_offsets(self.text_nums),
+            text_byte_offsets=_offsets(self.text_lens),
+            text_bytes=np.frombuffer(bytes(self.text_bytes), dtype=np.uint8),
+            extra_offsets=_offsets(self.extra_lens),
+            extra_bytes=np.frombuffer(bytes(self.extra_bytes), dtype=np.uint8),
+        )
+
+
+def _source_stat(ann_file):
+    stat = os.stat(ann_file)
+    return dict(size=stat.st_size, mtime=int(stat.st_mtime))
+
+
+def convert_datalist(ann_file, store_dir):
+    """ Convert a datalist into an annotation store, once. The store is written into a temporary directory and then
+    renamed, so that the processes converting the same datalist concurrently do not see a partial store.
+
+    Args:
+        ann_file (str): path to the datalist, in the format of `DavarCustomDataset`
+        store_dir (str): directory of the store
+    """
+    with open(ann_file, 'r', encoding='utf-8') as load_f:
+        datalist = json.load(load_f, object_pairs_hook=collections.OrderedDict)
+    datalist.pop('###', None)
+
+    writer = _StoreWriter()
+    for filename, info in datalist.items():
+        writer.add(filename, info)
+    del datalist
+
+    tmp_dir = '{}.tmp{}'.format(store_dir.rstrip('/'), os.getpid())
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, column in writer.columns().items():
+        np.save(osp.join(tmp_dir, name + '.npy'), column)
+    meta = dict(version=STORE_VERSION, num_images=len(writer.heights),
+                label_vocab=[value for _, value in writer.label_vocab], source=_source_stat(ann_file))
+    with open(osp.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as write_f:
+        json.dump(meta, write_f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_dir, store_dir)
+    except OSError:
+        # Converted by another process in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not osp.exists(osp.join(store_dir, 'meta.json')):
+            raise
+
+
+class AnnotationStore(Sequence):
+    """ Read-only annotation store of a datalist, in which the annotations of all the images are packed into a few
+    columns: an offsets table per field, packed boxes, cares, label ids and utf-8 texts, and the remaining fields as
+    JSON. The columns are memory-mapped, so that all the dataloader workers and ranks on a machine share the same pages,
+    and an image is decoded lazily when it is accessed.
+
+    It can replace the `data_infos` list of `DavarCustomDataset`: `store[idx]` returns the same dict as `_cvt_list`,
+    i.e. {"filename": "xxx", "width": 120, "height": 320, "ann": {}, "ann2": {}}.
+    """
+
+    def __init__(self, store_dir, indices=None):
+        """
+        Args:
+            store_dir (str): directory of the store
+            indices (np.ndarray | None): indices of the images in the store to be used, None means all
+        """
+        self.store_dir = store_dir
+        with open(osp.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as load_f:
+            self.meta = json.load(load_f)
+        assert self.meta['version'] == STORE_VERSION, \
+            'Unsupported annotation store version {} in {}'.format(self.meta['version'], store_dir)
+        self.label_vocab = self.meta['label_vocab']
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.int64)
+        self._columns = dict()
+
+    @classmethod
+    def from_datalist(cls, ann_file, store_dir):
+        """ Open the store of a datalist, converting it first if it does not exist
+
+        Args:
+            ann_file (str): path to the datalist
+            store_dir (str): directory of the store
+
+        Returns:
+            AnnotationStore: the store
+        """
+        if not osp.exists(osp.join(store_dir, 'meta.json')):
+            convert_datalist(ann_file, store_dir)
+        store = cls(store_dir)
+        if osp.exists(ann_file) and store.meta.get('source') != _source_stat(ann_file):
+            warnings.warn('The annotation store {} may be out of date with {}, remove it to convert again.'.format(
+                store_dir, ann_file))
+        return store
+
+    def __getstate__(self):
+        # The memory maps are opened again in the unpickled copy, rather than copied
+        state = self.__dict__.copy()
+        state['_columns'] = dict()
+        return state
+
+    def column(self, name):
+        """
+        Args:
+            name (str): column name
+
+        Returns:
+            np.ndarray: the read-only memory-mapped column
+        """
+        if name not in self._columns:
+            self._columns[name] = np.load(osp.join(self.store_dir, name + '.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def subset(self, inds):
+        """
+        Args:
+            inds (list(int)): indices of the images to keep, relative to this store
+
+        Returns:
+            AnnotationStore: store sharing the same columns, with the kept images only
+        """
+        inds = np.asarray(inds, dtype=np.int64)
+        store = AnnotationStore.__new__(AnnotationStore)
+        store.__dict__.update(self.__dict__)
+        store.indices = inds if self.indices is None else self.indices[inds]
+        return store
+
+    def __len__(self):
+        return self.meta['num_images'] if self.indices is None else len(self.indices)
+
+    def _global_index(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('index {} is out of range'.format(idx))
+        return idx if self.indices is None else int(self.indices[idx])
+
+    def _per_image(self, name):
+        column = np.asarray(self.column(name))
+        return column if self.indices is None else column[self.indices]
+
+    @property
+    def heights(self):
+        """ np.ndarray: heights of the images """
+        return self._per_image('heights')
+
+    @property
+    def widths(self):
+        """ np.ndarray: widths of the images """
+        return self._per_image('widths')
+
+    def has_field(self, field):
+        """
+        Args:
+            field (str): field name, in range of ['content_ann', 'bboxes', 'cares', 'labels', 'texts']
+
+        Returns:
+            np.ndarray: whether the field is present in the columns of each image. The irregular 'bboxes' and 'cares'
+                        kept in the extra JSON are not counted, see `irregular`.
+        """
+        present = self._per_image('present')
+        if field == 'content_ann':
+            return (present & _NO_ANN) == 0
+        bit = dict(bboxes=_HAS_BBOXES, cares=_HAS_CARES, labels=_HAS_LABELS, texts=_HAS_TEXTS)[field]
+        return (present & bit) > 0
+
+    def irregular(self):
+        """
+        Returns:
+            np.ndarray: whether the 'bboxes' or 'cares' of each image are not columnar, and need to be decoded
+        """
+        return (self._per_image('present') & _IRREGULAR) > 0
+
+    def num_items(self, field):
+        """
+        Args:
+            field (str): columnar field, in range of ['bbox', 'care', 'label', 'text']
+
+        Returns:
+            np.ndarray: number of the items of the field in each image, 0 if the field is absent
+        """
+        offsets = np.asarray(self.column(field + '_offsets'))
+        nums = offsets[1:] - offsets[:-1]
+        return nums if self.indices is None else nums[self.indices]
+
+    def num_cared(self):
+        """
+        Returns:
+            np.ndarray: number of the cares equal to 1 in each image
+        """
+        offsets = np.asarray(self.column('care_offsets'))
+        cumsum = np.concatenate([[0], np.cumsum(np.asarray(self.column('cares')) == 1)])
+        nums = cumsum[offsets[1:]] - cumsum[offsets[:-1]]
+        return nums if self.indices is None else nums[self.indices]
+
+    def has_suffix(self, suffix):
+        """ Check the file suffixes of all the images without decoding the filenames
+
+        Args:
+            suffix (str): file suffix, e.g. '.gif', compared case-insensitively for ascii letters
+
+        Returns:
+            np.ndarray: whether the filename of each image ends with the suffix
+        """
+        suffix = np.frombuffer(suffix.lower().encode('utf-8'), dtype=np.uint8)
+        offsets = np.asarray(self.column('filename_offsets'))
+        names = np.asarray(self.column('filename_bytes'))
+        ends = offsets[1:]
+        matched = (ends - offsets[:-1]) >= len(suffix)
+        for i, char in enumerate(suffix):
+            pos = np.maximum(ends - len(suffix) + i, 0)
+            byte = names[pos] if len(names) else np.zeros_like(pos, dtype=np.uint8)
+            is_upper = (byte >= ord('A')) & (byte <= ord('Z'))
+            matched &= np.where(is_upper, byte | 0x20, byte) == char
+        return matched if self.indices is None else matched[self.indices]
+
+    def _bounds(self, name, start, end):
+        """ Boundaries of the items in [start, end) of an offsets column, as python ints """
+        return self.column(name)[start:end + 1].tolist()
+
+    def _bytes(self, name, start, end):
+        return self.column(name)[start:end].tobytes().decode('utf-8')
+
+    def get_filename(self, idx):
+        """
+        Args:
+            idx (int): image index
+
+        Returns:
+            str: relative path of the image
+        """
+        idx = self._global_index(idx)
+        start, end = self._bounds('filename_offsets', idx, idx + 1)
+        return self._bytes('filename_bytes', start, end)
+
+    def get_ann(self, idx):
+        """ Decode the annotations of an image
+
+        Args:
+            idx (int): image index
+
+        Returns:
+            dict: content annotations of the image
+        Returns:
+            dict | None: second-level annotations of the image
+        """
+        idx = self._global_index(idx)
+        present = int(self.column('present')[idx])
+        ann = dict()
+        if present & _HAS_BBOXES:
+            start, end = self._bounds('bbox_offsets', idx, idx + 1)
+            bounds = self._bounds('bbox_coord_offsets', start, end)
+            coords = self.column('bbox_coords')[bounds[0]:bounds[-1]].tolist()
+            ann['bboxes'] = [coords[s - bounds[0]:e - bounds[0]] for s, e in zip(bounds[:-1], bounds[1:])]
+        if present & _HAS_CARES:
+            start, end = self._bounds('care_offsets', idx, idx + 1)
+            ann['cares'] = self.column('cares')[start:end].tolist()
+        if present & _HAS_LABELS:
+            start, end = self._bounds('label_offsets', idx, idx + 1)
+            bounds = self._bounds('label_item_offsets', start, end)
+            ids = self.column('label_ids')[bounds[0]:bounds[-1]].tolist()
+            ann['labels'] = [[self.label_vocab[i] for i in ids[s - bounds[0]:e - bounds[0]]]
+                             for s, e in zip(bounds[:-1], bounds[1:])]
+        if present & _HAS_TEXTS:
+            start, end = self._bounds('text_offsets', idx, idx + 1)
+            bounds = self._bounds('text_byte_offsets', start, end)
+            texts = self.column('text_bytes')[bounds[0]:bounds[-1]].tobytes()
+            ann['texts'] = [texts[s - bounds[0]:e - bounds[0]].decode('utf-8') for s, e in zip(bounds[:-1], bounds[1:])]
+
+        start, end = self._bounds('extra_offsets', idx, idx + 1)
+        extra = json.loads(self._bytes('extra_bytes', start, end)) if end > start else dict()
+        ann.update(extra.get('content_ann', dict()))
+        return None if present & _NO_ANN else ann, extra.get('content_ann2', None)
+
+    def __getitem__(self, idx):
+        """
+        Args:
+            idx (int): image index
+
+        Returns:
+            dict: the image info, in form of {"filename": "xxx", width: 120, height: 320, ann: {}, ann2: {}}
+        """
+        ann, ann2 = self.get_ann(idx)
+        global_idx = self._global_index(idx)
+        return dict(filename=self.get_filename(idx), height=int(self.column('heights')[global_idx]),
+                    width=int(self.column('widths')[global_idx]), ann=ann, ann2=ann2)
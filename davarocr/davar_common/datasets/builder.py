@@ -9,6 +9,7 @@
 ##################################################################################################
 """
 import copy
+import inspect
 import platform
 from functools import partial
 import torch
@@ -53,6 +54,20 @@ def build_sampler(cfg):
     return build(cfg, SAMPLER)
 
 
+def _sampler_accepts(cfg, name):
+    """ Whether the sampler built from `cfg` takes the argument `name`
+
+    Args:
+        cfg (dict): sampler cfg
+        name (str): argument name
+
+    Returns:
+        bool: True if the argument is accepted
+    """
+    sampler_cls = cfg['type'] if inspect.isclass(cfg['type']) else SAMPLER.get(cfg['type'])
+    return sampler_cls is not None and name in inspect.signature(sampler_cls.__init__).parameters
+
+
 def davar_build_dataloader(dataset,
                            samples_per_gpu=1,
                            workers_per_gpu=1,
@@ -74,7 +89,7 @@ def davar_build_dataloader(dataset,
         dist (boolean): whether to use distributed mode
         shuffle (boolean): whether to shuffle the dataset
         seed (int): seed number
-        **kwargs (None): back parameter
+        **kwargs (None): back parameter, `cfg_collate` selects the collate function, see `build_collate_fn`
 
     Returns:
         the training data loader
@@ -99,6 +114,9 @@ def davar_build_dataloader(dataset,
             else:
                 sampler['dataset'] = dataset
                 sampler['samples_per_gpu'] = samples_per_gpu
+                if _sampler_accepts(sampler, 'workers_per_gpu'):
+                    # e.g. WindowSampler, which lays out the batches by dataloader worker
+                    sampler['workers_per_gpu'] = workers_per_gpu
 
                 # build distributed sampler
                 sampler = build_sampler(sampler)
@@ -116,6 +134,9 @@ def davar_build_dataloader(dataset,
             else:
                 sampler['dataset'] = dataset
                 sampler['samples_per_gpu'] = samples_per_gpu
+                if _sampler_accepts(sampler, 'workers_per_gpu'):
+                    # e.g. WindowSampler, which lays out the batches by dataloader worker
+                    sampler['workers_per_gpu'] = workers_per_gpu
 
                 # build non-distributed sampler
                 sampler = build_sampler(sampler)
@@ -137,8 +158,7 @@ def davar_build_dataloader(dataset,
         batch_size=batch_size,
         sampler=sampler,
         num_workers=num_workers,
-        collate_fn=multi_frame_collate if cfg_collate == 'multi_frame_collate' else partial(collate, samples_per_gpu=
-                                                                                            samples_per_gpu),
+        collate_fn=build_collate_fn(cfg_collate, samples_per_gpu, dataset_pad_values(dataset)),
         pin_memory=False,
         worker_init_fn=init_fn,
         **kwargs)
@@ -341,4 +361,134 @@ def multi_frame_collate(batch):
 
     else:
         raise "not support type {} of batch".format(type(batch[0]))
-    return data
\ No newline at end of file
+    return data
+
+
+# Padding values of the sequences when the dataset gives none, see `dataset_pad_values`
+DEFAULT_PAD_VALUES = dict(input_ids=0, attention_masks=0, token_type_ids=0, labels=0, start_positions=0,
+                          end_positions=0, tokens_index=-1)
+
+
+def pad_collate(batch, samples_per_gpu=1, pad_values=None):
+    """ Collate token sequences of different lengths, padding them to the longest sample of each batch instead of
+    to a fixed maximum length. The other keys are collated by the mmcv `collate`.
+
+    Args:
+        batch (list(dict)): one batch data
+        samples_per_gpu (int): samples on each gpu
+        pad_values (dict | None): padding value of each sequence key, which updates `DEFAULT_PAD_VALUES`. The
+                                  dataloader takes them from the label converter of the dataset (see
+                                  `dataset_pad_values`), e.g. the id of the pad token for `input_ids`.
+
+    Returns:
+        dict: collate batch data
+    """
+    if not isinstance(batch[0], dict):
+        return collate(batch, samples_per_gpu=samples_per_gpu)
+
+    values = dict(DEFAULT_PAD_VALUES)
+    if pad_values is not None:
+        values.update(pad_values)
+
+    padded = dict()
+    for key, pad_value in values.items():
+        if key not in batch[0]:
+            continue
+        sequences = [sample[key] for sample in batch]
+        if isinstance(sequences[0], (list, tuple)):
+            if not all(isinstance(item, (int, float)) for sequence in sequences for item in sequence):
+                continue
+            sequences = [torch.as_tensor(sequence) for sequence in sequences]
+        if not all(isinstance(sequence, torch.Tensor) and sequence.dim() == 1 for sequence in sequences):
+            continue
+
+        max_len = max(len(sequence) for sequence in sequences)
+        padded[key] = torch.stack([torch.nn.functional.pad(sequence, (0, max_len - len(sequence)), value=pad_value)
+                                   for sequence in sequences])
+
+    data = collate([{key: value for key, value in sample.items() if key not in padded} for sample in batch],
+                   samples_per_gpu=samples_per_gpu)
+    data.update(padded)
+    return data
+
+
+def sliding_window_collate(batch, samples_per_gpu=1, pad_values=None):
+    """ Collate the sliding windows (produced by `SlidingWindow`) of several documents into one batch of windows, so
+    that the windows of many documents share the forward passes. The windows are padded by `pad_collate`, and are
+    recorded with the document they belong to in `window_doc`, and their token range in the document in `range`.
+
+    Args:
+        batch (list(dict)): one batch data, each value of a document is a list of its windows' values
+        samples_per_gpu (int): samples on each gpu
+        pad_values (dict | None): padding value of each sequence key, see `pad_collate`
+
+    Returns:
+        dict: collate batch data, the sequences in shape of [N, L] for the N windows of the batch
+    """
+    if not isinstance(batch[0], dict) or 'range' not in batch[0]:
+        return pad_collate(batch, samples_per_gpu=samples_per_gpu, pad_values=pad_values)
+
+    windows, window_doc, window_range = [], [], []
+    for doc_index, sample in enumerate(batch):
+        for i, text_range in enumerate(sample['range']):
+            windows.append({key: value[i] for key, value in sample.items()
+                            if key not in ('range', 'tokens') and isinstance(value, list)})
+            window_doc.append(doc_index)
+            window_range.append(text_range)
+
+    data = pad_collate(windows, samples_per_gpu=len(windows), pad_values=pad_values)
+    data['window_doc'] = torch.as_tensor(window_doc, dtype=torch.long)
+    data['range'] = torch.as_tensor(window_range, dtype=torch.long).reshape(-1, 2)
+    return data
+
+
+def dataset_pad_values(dataset):
+    """ Padding values of the sequences given by the label converters in the pipelines of a dataset, e.g. the pad
+    token id of the tokenizer of `TransformersConverter`
+
+    Args:
+        dataset (Dataset): the dataset, or a wrapper of datasets
+
+    Returns:
+        dict: padding value of each sequence key, empty if no converter gives them
+    """
+    pad_values = dict()
+    for sub_dataset in getattr(dataset, 'datasets', []):
+        pad_values.update(dataset_pad_values(sub_dataset))
+    if hasattr(dataset, 'dataset'):
+        pad_values.update(dataset_pad_values(dataset.dataset))
+    for transform in getattr(getattr(dataset, 'pipeline', None), 'transforms', []):
+        converter = getattr(transform, 'label_converter', None)
+        if isinstance(getattr(converter, 'pad_values', None), dict):
+            pad_values.update(converter.pad_values)
+    return pad_values
+
+
+def build_collate_fn(cfg_collate, samples_per_gpu=1, pad_values=None):
+    """
+    Args:
+        cfg_collate (str | dict | None): name of the collate function, or a dict with its `type` and arguments
+        samples_per_gpu (int): samples on each gpu
+        pad_values (dict | None): padding value of each sequence key of `pad_collate` and `sliding_window_collate`,
+                                  e.g. given by `dataset_pad_values`. The `pad_values` in `cfg_collate` take
+                                  precedence.
+
+    Returns:
+        callable: collate function of the DataLoader
+    """
+    if isinstance(cfg_collate, dict):
+        cfg_collate = copy.deepcopy(cfg_collate)
+        collate_type = cfg_collate.pop('type')
+    else:
+        collate_type, cfg_collate = cfg_collate, dict()
+
+    if collate_type in ('pad_collate', 'sliding_window_collate'):
+        cfg_collate['pad_values'] = dict(pad_values or dict(), **(cfg_collate.get('pad_values', None) or dict()))
+
+    if collate_type == 'multi_frame_collate':
+        return multi_frame_collate
+    if collate_type == 'pad_collate':
+        return partial(pad_collate, samples_per_gpu=samples_per_gpu, **cfg_collate)
+    if collate_type == 'sliding_window_collate':
+        return partial(sliding_window_collate, samples_per_gpu=samples_per_gpu, **cfg_collate)
+    return partial(collate, samples_per_gpu=samples_per_gpu)
@@ -24,6 +24,8 @@ from mmdet.datasets.builder import DATASETS
 from mmdet.datasets.pipelines import Compose
 from mmdet.core import eval_map, eval_recalls
 
+from .ann_store import AnnotationStore
+
 
 @DATASETS.register_module()
 class DavarCustomDataset(CustomDataset):
@@ -75,6 +77,7 @@ class DavarCustomDataset(CustomDataset):
                  filter_empty_gt=True,
                  classes_config=None,
                  classes=None,
+                 ann_store=None,
                  ):
         """
         Args:
@@ -88,6 +91,9 @@ class DavarCustomDataset(CustomDataset):
             filter_empty_gt(boolean): whether to filter out image without ground-truthes.
             classes_config(str): the path to classes config file, used to transfer 'str' labels into 'int'
             classes(str): Dataset class, default None.
+            ann_store(str | bool): directory of the annotation store of the datalist, which is converted from
+                                   `ann_file` if it does not exist. True means `ann_file + '.store'`. Default None,
+                                   the datalist is parsed into a list of dicts.
         """
 
         self.CLASSES = self.get_classes(classes)
@@ -98,6 +104,7 @@ class DavarCustomDataset(CustomDataset):
         self.proposal_file = proposal_file
         self.test_mode = test_mode
         self.filter_empty_gt = filter_empty_gt
+        self.ann_store = ann_store
 
         # Join paths if data_root is specified
         if self.data_root is not None:
@@ -111,10 +118,19 @@ class DavarCustomDataset(CustomDataset):
                     or osp.isabs(self.proposal_file)):
                 self.proposal_file = osp.join(self.data_root,
                                               self.proposal_file)
+            if isinstance(self.ann_store, str) and not osp.isabs(self.ann_store):
+                self.ann_store = osp.join(self.data_root, self.ann_store)
+        if self.ann_store is True:
+            self.ann_store = self.ann_file + '.store'
 
         # Load annotations (and proposals)
-        data_infos = self.load_annotations(self.ann_file)
-        self.data_infos = self._cvt_list(data_infos)
+        if self.ann_store:
+            assert type(self)._cvt_list is DavarCustomDataset._cvt_list, \
+                "ann_store only supports the datalist format of DavarCustomDataset !!!"
+            self.data_infos = AnnotationStore.from_datalist(self.ann_file, self.ann_store)
+        else:
+            data_infos = self.load_annotations(self.ann_file)
+            self.data_infos = self._cvt_list(data_infos)
         if self.proposal_file is not None:
             self.proposals = self.load_proposals(self.proposal_file)
         else:
@@ -123,7 +139,10 @@ class DavarCustomDataset(CustomDataset):
         # Filter images with no annotation during training
         if not test_mode:
             valid_inds = self._filter_imgs()
-            self.data_infos = [self.data_infos[i] for i in valid_inds]
+            if isinstance(self.data_infos, AnnotationStore):
+                self.data_infos = self.data_infos.subset(valid_inds)
+            else:
+                self.data_infos = [self.data_infos[i] for i in valid_inds]
             if self.proposals is not None:
                 self.proposals = [self.proposals[i] for i in valid_inds]
 
@@ -188,6 +207,8 @@ class DavarCustomDataset(CustomDataset):
         Returns:
             list(int): the valid indexes of images.
         """
+        if isinstance(self.data_infos, AnnotationStore):
+            return self._filter_store(min_size)
 
         valid_inds = []
         for i, img_info in enumerate(self.data_infos):
@@ -206,6 +227,38 @@ class DavarCustomDataset(CustomDataset):
                 valid_inds.append(i)
         return valid_inds
 
+    def _filter_store(self, min_size=32):
+        """ Same as `_filter_imgs`, computed on the columns of the annotation store without decoding the images
+
+        Args:
+            min_size(in): minimum supported image size
+
+        Returns:
+            list(int): the valid indexes of images.
+        """
+        store = self.data_infos
+        valid = ~store.has_suffix('.gif') & (np.minimum(store.widths, store.heights) >= min_size)
+        if self.filter_empty_gt:
+            empty = (store.has_field('bboxes') & (store.num_items('bbox') == 0)) | \
+                    (store.has_field('cares') & (store.num_cared() == 0))
+            valid &= ~(store.has_field('content_ann') & empty)
+
+            # The irregular annotations are checked one by one
+            for i in np.nonzero(valid & store.irregular())[0]:
+                ann = store.get_ann(i)[0]
+                if ('bboxes' in ann and len(ann['bboxes']) == 0) or ('cares' in ann and 1 not in ann['cares']):
+                    valid[i] = False
+        return np.nonzero(valid)[0].tolist()
+
+    def _set_group_flag(self):
+        """ Set flag according to the image aspect ratio, images with ratio greater than 1 are set as group 1,
+        otherwise group 0.
+        """
+        if isinstance(self.data_infos, AnnotationStore):
+            self.flag = (self.data_infos.widths > self.data_infos.heights).astype(np.uint8)
+        else:
+            super()._set_group_flag()
+
     def load_annotations(self, ann_file):
         """ Load annotation from file
 
@@ -237,6 +290,8 @@ class DavarCustomDataset(CustomDataset):
         Returns:
             dict: the annotation of the instance.
         """
+        if isinstance(self.data_infos, AnnotationStore):
+            return self.data_infos.get_ann(idx)[0]
         return self.data_infos[idx].get('ann', None)
 
     def get_ann_info_2(self, idx):
@@ -248,6 +303,8 @@ class DavarCustomDataset(CustomDataset):
         Returns:
             dict: the annotation of the instance.
         """
+        if isinstance(self.data_infos, AnnotationStore):
+            return self.data_infos.get_ann(idx)[1]
         return self.data_infos[idx].get('ann2', None)
 
     def pre_pipeline(self, results):
@@ -8,19 +8,25 @@
 # Date           :    2020-05-31
 ##################################################################################################
 """
+from .cropped_masks import CroppedBitmapMasks
 from .davar_loading import DavarLoadAnnotations, DavarLoadImageFromFile
-from .transforms import DavarResize, RandomRotate, ColorJitter, ResizeNormalize, DavarRandomCrop, DavarRandomFlip
+from .transforms import DavarResize, RandomRotate, ColorJitter, ResizeNormalize, DavarRandomCrop, DavarRandomFlip, \
+    DavarRandomAffine
 from .davar_formating import DavarCollect, DavarDefaultFormatBundle
+from .target_encoding import TargetEncoder
 
 __all__ = [
+    'CroppedBitmapMasks',
     'DavarLoadAnnotations',
     'DavarLoadImageFromFile',
     'DavarResize',
     'RandomRotate',
     'DavarRandomCrop',
     'DavarRandomFlip',
+    'DavarRandomAffine',
     'ColorJitter',
     'ResizeNormalize',
     'DavarCollect',
-    'DavarDefaultFormatBundle'
+    'DavarDefaultFormatBundle',
+    'TargetEncoder'
 ]
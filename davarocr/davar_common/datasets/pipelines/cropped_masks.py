@@ -0,0 +1,440 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    cropped_masks.py
+# Abstract       :    Instance masks stored as tight crops, rasterized to the full image size only on demand
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import cv2
+import numpy as np
+import mmcv
+import pycocotools.mask as maskUtils
+import torch
+from mmcv.image.geometric import cv2_interp_codes
+from mmcv.ops.roi_align import roi_align
+from mmdet.core import BitmapMasks
+from mmdet.core.mask.structures import BaseInstanceMasks
+
+
+class CroppedBitmapMasks(BaseInstanceMasks):
+    """ Bitmap masks of instances, each stored as the crop of its tight bounding box and the offset of the crop.
+
+    The memory of a mask is proportional to its instance rather than the image, and the geometric transforms of the
+    data pipelines (rescale, resize, flip, crop, pad, affine warps) work on the crops. The crops are rasterized to the
+    full image size only by `to_ndarray` / `masks`, and `crop_and_resize` (used by `mask_target`) samples the RoIs
+    from small canvases around them.
+
+    The results are the same as those of `BitmapMasks`, except that the nearest-neighbor / bilinear warps may differ
+    on a few boundary pixels, due to the fixed-point coordinates of cv2.
+    """
+
+    def __init__(self, crops, offsets, height, width):
+        """
+        Args:
+            crops (list(np.ndarray)): crop of each instance, in shape of (h_i, w_i)
+            offsets (np.ndarray): (x, y) of the top-left corner of each crop in the image, in shape of (N, 2)
+            height (int): height of the image
+            width (int): width of the image
+        """
+        self.height = height
+        self.width = width
+        self.crops = list(crops)
+        self.offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+        assert len(self.crops) == len(self.offsets)
+
+    @classmethod
+    def from_polygons(cls, polygons, height, width):
+        """ Rasterize polygons within their bounding boxes
+
+        Args:
+            polygons (list(list(np.ndarray))): polygons of each instance, an instance may consist of multiple parts
+            height (int): height of the image
+            width (int): width of the image
+
+        Returns:
+            CroppedBitmapMasks: the masks
+        """
+        crops, offsets = [], []
+        for parts in polygons:
+            parts = [np.asarray(part, dtype=np.float64) for part in parts]
+            points = np.concatenate(parts).reshape(-1, 2) if parts else np.zeros((0, 2))
+            if len(points) == 0:
+                crops.append(np.zeros((0, 0), dtype=np.uint8))
+                offsets.append((0, 0))
+                continue
+
+            # A margin of 1 pixel, and integer offsets keep the rasterization the same as on the full image
+            x_min = int(np.clip(np.floor(points[:, 0].min()) - 1, 0, width))
+            y_min = int(np.clip(np.floor(points[:, 1].min()) - 1, 0, height))
+            x_max = int(np.clip(np.ceil(points[:, 0].max()) + 2, x_min, width))
+            y_max = int(np.clip(np.ceil(points[:, 1].max()) + 2, y_min, height))
+            if x_max == x_min or y_max == y_min:
+                crop = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+            else:
+                shifted = [(part.reshape(-1, 2) - (x_min, y_min)).reshape(-1).tolist() for part in parts]
+                rle = maskUtils.merge(maskUtils.frPyObjects(shifted, y_max - y_min, x_max - x_min))
+                crop = maskUtils.decode(rle)
+            crop, offset = _tighten(crop, x_min, y_min)
+            crops.append(crop)
+            offsets.append(offset)
+        return cls(crops, np.array(offsets).reshape(-1, 2), height, width)
+
+    @classmethod
+    def from_bitmaps(cls, masks, height=None, width=None):
+        """
+        Args:
+            masks (np.ndarray | BitmapMasks): full-size masks in shape of (N, H, W)
+            height (int | None): height of the image, default to the height of the masks
+            width (int | None): width of the image, default to the width of the masks
+
+        Returns:
+            CroppedBitmapMasks: the masks
+        """
+        if isinstance(masks, BitmapMasks):
+            height, width, masks = masks.height, masks.width, masks.masks
+        height = masks.shape[1] if height is None else height
+        width = masks.shape[2] if width is None else width
+        crops, offsets = [], []
+        for mask in masks:
+            crop, offset = _tighten(mask, 0, 0)
+            crops.append(crop)
+            offsets.append(offset)
+        return cls(crops, np.array(offsets).reshape(-1, 2), height, width)
+
+    def __getitem__(self, index):
+        """
+        Args:
+            index (int | ndarray | list | slice): indices of the instances
+
+        Returns:
+            CroppedBitmapMasks: the indexed masks
+        """
+        inds = np.atleast_1d(np.arange(len(self))[index])
+        return CroppedBitmapMasks([self.crops[i] for i in inds], self.offsets[inds], self.height, self.width)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._paste(i)
+
+    def __len__(self):
+        return len(self.crops)
+
+    def __repr__(self):
+        return '{}(num_masks={}, height={}, width={})'.format(self.__class__.__name__, len(self), self.height,
+                                                              self.width)
+
+    def _paste(self, i):
+        """ Full-size mask of an instance """
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        crop = self.crops[i]
+        x_off, y_off = self.offsets[i]
+        height, width = min(crop.shape[0], self.height - y_off), min(crop.shape[1], self.width - x_off)
+        if height > 0 and width > 0:
+            mask[y_off:y_off + height, x_off:x_off + width] = crop[:height, :width]
+        return mask
+
+    @property
+    def masks(self):
+        """ np.ndarray: full-size masks in shape of (N, H, W), rasterized on every access """
+        return self.to_ndarray()
+
+    def to_ndarray(self):
+        """
+        Returns:
+            np.ndarray: full-size masks in shape of (N, H, W)
+        """
+        if len(self) == 0:
+            return np.empty((0, self.height, self.width), dtype=np.uint8)
+        return np.stack([self._paste(i) for i in range(len(self))])
+
+    def to_tensor(self, dtype, device):
+        """
+        Args:
+            dtype (torch.dtype): dtype of the tensor
+            device (torch.device): device of the tensor
+
+        Returns:
+            Tensor: full-size masks in shape of (N, H, W)
+        """
+        return torch.tensor(self.to_ndarray(), dtype=dtype, device=device)
+
+    def to_bitmap(self):
+        """
+        Returns:
+            BitmapMasks: the full-size masks
+        """
+        return BitmapMasks(self.to_ndarray(), self.height, self.width)
+
+    @property
+    def areas(self):
+        """ np.ndarray: areas of the masks """
+        return np.array([crop.sum() for crop in self.crops], dtype=np.float64)
+
+    def rescale(self, scale, interpolation='nearest'):
+        """ Rescale the masks as `mmcv.imrescale`
+
+        Args:
+            scale (float | tuple[int]): the scaling factor or the maximum size
+            interpolation (str): interpolation method
+
+        Returns:
+            CroppedBitmapMasks: the rescaled masks
+        """
+        new_w, new_h = mmcv.rescale_size((self.width, self.height), scale)
+        return self.resize((new_h, new_w), interpolation)
+
+    def resize(self, out_shape, interpolation='nearest'):
+        """ Resize the masks as `mmcv.imresize`. The nearest-neighbor resizing picks the pixels of the crops by the
+        index maps of cv2, and the other methods fall back to the full-size masks.
+
+        Args:
+            out_shape (tuple[int]): target (h, w)
+            interpolation (str): interpolation method
+
+        Returns:
+            CroppedBitmapMasks: the resized masks
+        """
+        new_h, new_w = out_shape
+        if interpolation != 'nearest':
+            return CroppedBitmapMasks.from_bitmaps(self.to_bitmap().resize(out_shape, interpolation))
+
+        # Source index of each target pixel, as in cv2 INTER_NEAREST
+        x_map = np.minimum(np.floor(np.arange(new_w) * (1. / (new_w / self.width))).astype(np.int64),
+                           self.width - 1)
+        y_map = np.minimum(np.floor(np.arange(new_h) * (1. / (new_h / self.height))).astype(np.int64),
+                           self.height - 1)
+        crops, offsets = [], []
+        for crop, (x_off, y_off) in zip(self.crops, self.offsets):
+            x_start, x_end = np.searchsorted(x_map, [x_off, x_off + crop.shape[1]])
+            y_start, y_end = np.searchsorted(y_map, [y_off, y_off + crop.shape[0]])
+            crops.append(crop[np.ix_(y_map[y_start:y_end] - y_off, x_map[x_start:x_end] - x_off)])
+            offsets.append((x_start, y_start))
+        return CroppedBitmapMasks(crops, np.array(offsets).reshape(-1, 2), new_h, new_w)
+
+    def flip(self, flip_direction='horizontal'):
+        """
+        Args:
+            flip_direction (str): 'horizontal', 'vertical' or 'diagonal'
+
+        Returns:
+            CroppedBitmapMasks: the flipped masks
+        """
+        assert flip_direction in ('horizontal', 'vertical', 'diagonal')
+        crops, offsets = [], self.offsets.copy()
+        sizes = np.array([(crop.shape[1], crop.shape[0]) for crop in self.crops]).reshape(-1, 2)
+        for crop in self.crops:
+            if flip_direction in ('horizontal', 'diagonal'):
+                crop = crop[:, ::-1]
+            if flip_direction in ('vertical', 'diagonal'):
+                crop = crop[::-1]
+            crops.append(np.ascontiguousarray(crop))
+        if flip_direction in ('horizontal', 'diagonal'):
+            offsets[:, 0] = self.width - offsets[:, 0] - sizes[:, 0]
+        if flip_direction in ('vertical', 'diagonal'):
+            offsets[:, 1] = self.height - offsets[:, 1] - sizes[:, 1]
+        return CroppedBitmapMasks(crops, offsets, self.height, self.width)
+
+    def pad(self, out_shape, pad_val=0):
+        """ Pad the masks at the bottom and the right
+
+        Args:
+            out_shape (tuple[int]): target (h, w)
+            pad_val (int): padding value
+
+        Returns:
+            CroppedBitmapMasks: the padded masks
+        """
+        if pad_val != 0:
+            return CroppedBitmapMasks.from_bitmaps(self.to_bitmap().pad(out_shape, pad_val))
+        return CroppedBitmapMasks(self.crops, self.offsets, *out_shape)
+
+    def crop(self, bbox):
+        """ Crop the masks as `BitmapMasks.crop`
+
+        Args:
+            bbox (np.ndarray): the region [x1, y1, x2, y2]
+
+        Returns:
+            CroppedBitmapMasks: the cropped masks
+        """
+        assert isinstance(bbox, np.ndarray)
+        assert bbox.ndim == 1
+        bbox = bbox.copy()
+        bbox[0::2] = np.clip(bbox[0::2], 0, self.width)
+        bbox[1::2] = np.clip(bbox[1::2], 0, self.height)
+        x_1, y_1, x_2, y_2 = [int(value) for value in bbox]
+        width = max(x_2 - x_1, 1)
+        height = max(y_2 - y_1, 1)
+
+        crops, offsets = [], []
+        for crop, (x_off, y_off) in zip(self.crops, self.offsets):
+            left, top = max(x_off, x_1), max(y_off, y_1)
+            right = min(x_off + crop.shape[1], x_1 + width, self.width)
+            bottom = min(y_off + crop.shape[0], y_1 + height, self.height)
+            crop = crop[top - y_off:max(bottom, top) - y_off, left - x_off:max(right, left) - x_off]
+            crop, offset = _tighten(crop, left - x_1, top - y_1)
+            crops.append(crop)
+            offsets.append(offset)
+        return CroppedBitmapMasks(crops, np.array(offsets).reshape(-1, 2), height, width)
+
+    def crop_and_resize(self, bboxes, out_shape, inds, device='cpu', interpolation='bilinear'):
+        """ Crop the RoIs of the assigned masks and resize them to the target size, as `BitmapMasks.crop_and_resize`.
+        Each RoI is aligned on a canvas that only covers the RoI and its 1-pixel neighborhood (clipped to the image),
+        instead of the full image.
+
+        Args:
+            bboxes (Tensor | np.ndarray): RoIs in format [x1, y1, x2, y2], in shape of (N, 4)
+            out_shape (tuple[int]): target (h, w) of the resized masks
+            inds (np.ndarray): indexes of the masks assigned to each RoI, in shape of (N,)
+            device (str): device of the results
+            interpolation (str): only 'bilinear' is supported by RoIAlign
+
+        Returns:
+            BitmapMasks: the resized masks
+        """
+        if len(self) == 0 or len(bboxes) == 0:
+            return BitmapMasks(np.empty((0, *out_shape), dtype=np.uint8), *out_shape)
+        if isinstance(bboxes, torch.Tensor):
+            bboxes = bboxes.detach().cpu().numpy()
+        if isinstance(inds, torch.Tensor):
+            inds = inds.cpu().numpy()
+        bboxes = np.asarray(bboxes, dtype=np.float32)
+
+        # Window of each RoI: the pixels read by RoIAlign. RoIAlign clamps the samples within 1 pixel outside the
+        # image to the border pixels, and gives 0 for the samples beyond, so a window reaching an image border is
+        # placed at the same border of its canvas, which then behaves as the image for RoIAlign.
+        x_start = np.clip(np.floor(bboxes[:, 0]).astype(np.int64) - 1, 0, self.width)
+        y_start = np.clip(np.floor(bboxes[:, 1]).astype(np.int64) - 1, 0, self.height)
+        x_end = np.clip(np.ceil(bboxes[:, 2]).astype(np.int64) + 2, x_start, self.width)
+        y_end = np.clip(np.ceil(bboxes[:, 3]).astype(np.int64) + 2, y_start, self.height)
+        canvas_w = max(int((x_end - x_start).max()), 1)
+        canvas_h = max(int((y_end - y_start).max()), 1)
+        # Top-left corner of each canvas in the image. A window reaching both borders is as large as the image, and so
+        # is the canvas
+        canvas_x = np.where(x_end == self.width, self.width - canvas_w, x_start)
+        canvas_y = np.where(y_end == self.height, self.height - canvas_h, y_start)
+        canvases = np.zeros((len(bboxes), canvas_h, canvas_w), dtype=np.float32)
+        for i, ind in enumerate(inds):
+            crop = self.crops[ind]
+            x_off, y_off = self.offsets[ind]
+            left, top = max(x_off, canvas_x[i], 0), max(y_off, canvas_y[i], 0)
+            right = min(x_off + crop.shape[1], canvas_x[i] + canvas_w, self.width)
+            bottom = min(y_off + crop.shape[0], canvas_y[i] + canvas_h, self.height)
+            if right > left and bottom > top:
+                canvases[i, top - canvas_y[i]:bottom - canvas_y[i], left - canvas_x[i]:right - canvas_x[i]] = \
+                    crop[top - y_off:bottom - y_off, left - x_off:right - x_off]
+
+        rois = bboxes - np.stack([canvas_x, canvas_y, canvas_x, canvas_y], axis=1).astype(np.float32)
+        rois = torch.from_numpy(np.concatenate([np.arange(len(bboxes), dtype=np.float32)[:, None], rois], 1))
+        targets = roi_align(torch.from_numpy(canvases)[:, None].to(device), rois.to(device), out_shape,
+                            1.0, 0, 'avg', True).squeeze(1)
+        resized_masks = (targets >= 0.5).cpu().numpy()
+        return BitmapMasks(resized_masks, *out_shape)
+
+    def expand(self, expanded_h, expanded_w, top, left):
+        """ Place the masks in a larger image, as `BitmapMasks.expand`
+
+        Returns:
+            CroppedBitmapMasks: the expanded masks
+        """
+        return CroppedBitmapMasks(self.crops, self.offsets + (left, top), expanded_h, expanded_w)
+
+    def warp_affine(self, mat, out_shape, interpolation='nearest'):
+        """ Warp the masks as `cv2.warpAffine` with a zero border, each crop within the bounding box of its warped
+        corners.
+
+        Args:
+            mat (np.ndarray): affine matrix in shape of (2, 3) or (3, 3), in the pixel coordinates of cv2
+            out_shape (tuple[int]): target (h, w)
+            interpolation (str): interpolation method
+
+        Returns:
+            CroppedBitmapMasks: the warped masks
+        """
+        mat = np.asarray(mat, dtype=np.float64)[:2]
+        out_h, out_w = out_shape
+        crops, offsets = [], []
+        for crop, (x_off, y_off) in zip(self.crops, self.offsets):
+            if crop.size == 0:
+                crops.append(np.zeros((0, 0), dtype=np.uint8))
+                offsets.append((0, 0))
+                continue
+
+            # Target window covering the crop and its 1-pixel neighborhood
+            corners = np.array([[x_off - 1, y_off - 1], [x_off + crop.shape[1], y_off - 1],
+                                [x_off - 1, y_off + crop.shape[0]], [x_off + crop.shape[1], y_off + crop.shape[0]]],
+                               dtype=np.float64)
+            corners = corners @ mat[:, :2].T + mat[:, 2]
+            left = int(np.clip(np.floor(corners[:, 0].min()) - 1, 0, out_w))
+            top = int(np.clip(np.floor(corners[:, 1].min()) - 1, 0, out_h))
+            right = int(np.clip(np.ceil(corners[:, 0].max()) + 2, left, out_w))
+            bottom = int(np.clip(np.ceil(corners[:, 1].max()) + 2, top, out_h))
+            if right == left or bottom == top:
+                crops.append(np.zeros((0, 0), dtype=np.uint8))
+                offsets.append((0, 0))
+                continue
+
+            mat_local = mat.copy()
+            mat_local[:, 2] += mat[:, :2] @ np.array([x_off, y_off], dtype=np.float64) - (left, top)
+            warped = cv2.warpAffine(crop, mat_local, (right - left, bottom - top),
+                                    flags=cv2_interp_codes[interpolation], borderValue=0)
+            warped, offset = _tighten(warped, left, top)
+            crops.append(warped)
+            offsets.append(offset)
+        return CroppedBitmapMasks(crops, np.array(offsets).reshape(-1, 2), out_h, out_w)
+
+    def rotate(self, out_shape, angle, center=None, scale=1.0, fill_val=0):
+        """ Rotate the masks as `BitmapMasks.rotate`
+
+        Returns:
+            CroppedBitmapMasks: the rotated masks
+        """
+        if fill_val != 0:
+            return CroppedBitmapMasks.from_bitmaps(self.to_bitmap().rotate(out_shape, angle, center, scale,
+                                                                           fill_val))
+        if center is None:
+            center = ((self.width - 1) * 0.5, (self.height - 1) * 0.5)
+        mat = cv2.getRotationMatrix2D(center, -angle, scale)
+        rotated = self.warp_affine(mat, (self.height, self.width), 'bilinear')
+        return CroppedBitmapMasks(rotated.crops, rotated.offsets, *out_shape)
+
+    def translate(self, out_shape, offset, direction='horizontal', fill_val=0, interpolation='bilinear'):
+        """ Translate the masks as `BitmapMasks.translate`, on the full-size masks
+
+        Returns:
+            CroppedBitmapMasks: the translated masks
+        """
+        return CroppedBitmapMasks.from_bitmaps(self.to_bitmap().translate(out_shape, offset, direction, fill_val,
+                                                                          interpolation))
+
+    def shear(self, out_shape, magnitude, direction='horizontal', border_value=0, interpolation='bilinear'):
+        """ Shear the masks as `BitmapMasks.shear`, on the full-size masks
+
+        Returns:
+            CroppedBitmapMasks: the sheared masks
+        """
+        return CroppedBitmapMasks.from_bitmaps(self.to_bitmap().shear(out_shape, magnitude, direction, border_value,
+                                                                      interpolation))
+
+
+def _tighten(mask, x_off, y_off):
+    """ Crop a mask to the bounding box of its nonzero pixels
+
+    Args:
+        mask (np.ndarray): the mask in shape of (h, w)
+        x_off (int): x of the top-left corner of the mask
+        y_off (int): y of the top-left corner of the mask
+
+    Returns:
+        np.ndarray: the tight crop
+        tuple(int): (x, y) of the top-left corner of the crop
+    """
+    cols = np.flatnonzero(mask.any(axis=0)) if mask.size else []
+    if len(cols) == 0:
+        return np.zeros((0, 0), dtype=np.uint8), (0, 0)
+    rows = np.flatnonzero(mask.any(axis=1))
+    crop = np.ascontiguousarray(mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], dtype=np.uint8)
+    return crop, (int(x_off + cols[0]), int(y_off + rows[0]))
@@ -54,6 +54,11 @@ class DavarCollect():
             if key in results:
                 img_metas[key] = results[key]
 
+        if 'load_scale_factor' in results and 'scale_factor' in self.meta_keys:
+            # The image was decoded at a reduced resolution by `DavarLoadImageFromFile`, the resize transforms only
+            # know the decoded image, so `scale_factor` is composed here to map the original image to the resized one
+            img_metas['scale_factor'] = results.get('scale_factor', 1.) * results['load_scale_factor']
+
         # Add feature to support situation without img_metas.
         if len(img_metas) != 0:
             data['img_metas'] = DC(img_metas, cpu_only=True)
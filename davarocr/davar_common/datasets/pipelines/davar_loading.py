@@ -12,6 +12,7 @@
 ##################################################################################################
 """
 import warnings
+import struct
 import os.path as osp
 import mmcv
 import cv2
@@ -21,25 +22,103 @@ import numpy as np
 from mmdet.datasets.builder import PIPELINES
 from mmdet.core import BitmapMasks, PolygonMasks
 
+from davarocr.davar_common.utils import build_vocabulary
+from .cropped_masks import CroppedBitmapMasks
+
+
+REDUCED_READ_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                      8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def read_image_size(filename):
+    """ Read the size of a JPEG or PNG image from its header, without decoding it
+
+    Args:
+        filename (str): image file
+
+    Returns:
+        tuple(int) | None: (height, width) of the image, None if the format is not supported
+    """
+    try:
+        with open(filename, 'rb') as file:
+            head = file.read(26)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                width, height = struct.unpack('>II', head[16:24])
+                return height, width
+            if head[:2] != b'\xff\xd8':
+                return None
+
+            # Walk the JPEG segments to the start of frame
+            file.seek(2)
+            while True:
+                marker = file.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                while marker[1] == 0xFF:
+                    marker = marker[1:] + file.read(1)
+                if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                    continue
+                length = struct.unpack('>H', file.read(2))[0]
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>xHH', file.read(5))
+                    return height, width
+                file.seek(length - 2, 1)
+    except (OSError, struct.error):
+        return None
+
 
 @PIPELINES.register_module()
 class DavarLoadImageFromFile():
     """Loading image from file, add features of
        - load from nd.array
        - fix the bugs that orientation problem of cv2 reading.
+       - decode at a reduced resolution for images much larger than the target scale
     """
 
     def __init__(self,
                  decode_from_array=False,
-                 to_float32=False):
+                 to_float32=False,
+                 target_scale=None,
+                 max_reduction=8):
         """ Initialization
 
         Args:
             decode_from_array (boolean): directly load image data from nd.array
             to_float32(boolean): transfer image data into float32
+            target_scale (tuple(int) | int | None): the smallest (long edge, short edge) the image is resized to later,
+                                                    e.g. the lower bound of the scales of `DavarResize`, or the max
+                                                    long edge. If set, the image is decoded at the largest reduction
+                                                    (1/2, 1/4 or 1/8, by JPEG DCT scaling or the reduced-read modes
+                                                    of OpenCV) not smaller than it. None means full resolution.
+                                                    The reduction is composed into the `scale_factor` of the image
+                                                    meta by `DavarCollect`.
+            max_reduction (int): the largest reduction, in range of [1, 2, 4, 8]
         """
         self.decode_from_array = decode_from_array
         self.to_float32 = to_float32
+        if isinstance(target_scale, int):
+            target_scale = (target_scale, target_scale)
+        self.target_scale = target_scale
+        assert max_reduction in (1, 2, 4, 8), max_reduction
+        self.max_reduction = max_reduction
+
+    def _reduction(self, height, width):
+        """ The largest reduction that keeps the image not smaller than `target_scale`
+
+        Args:
+            height (int): height of the image
+            width (int): width of the image
+
+        Returns:
+            int: reduction, in range of [1, 2, 4, 8]
+        """
+        long_edge, short_edge = max(self.target_scale), min(self.target_scale)
+        scale = min(long_edge / max(height, width), short_edge / min(height, width))
+        reduction = 1
+        for candidate in (2, 4, 8):
+            if candidate <= self.max_reduction and candidate * scale <= 1:
+                reduction = candidate
+        return reduction
 
     def __call__(self, results):
         """ Main process
@@ -69,8 +148,18 @@ class DavarLoadImageFromFile():
         else:
             filename = results['img']
 
+        # Decode at a reduced resolution if the image is much larger than the target scale
+        reduction, ori_size = 1, None
+        if self.target_scale is not None:
+            if 'img_info' in results and 'height' in results['img_info'] and 'width' in results['img_info']:
+                ori_size = (results['img_info']['height'], results['img_info']['width'])
+            else:
+                ori_size = read_image_size(filename)
+            if ori_size is not None:
+                reduction = self._reduction(*ori_size)
+
         # Fix the problem of reading image reversely
-        img = mmcv.imread(filename, cv2.IMREAD_IGNORE_ORIENTATION + cv2.IMREAD_COLOR)
+        img = mmcv.imread(filename, cv2.IMREAD_IGNORE_ORIENTATION + REDUCED_READ_FLAGS[reduction])
 
         if not isinstance(img, np.ndarray):
             print("Reading Error at {}".format(filename))
@@ -82,10 +171,17 @@ class DavarLoadImageFromFile():
         results['img'] = img
         results['img_shape'] = img.shape
         results['ori_shape'] = img.shape
+        if reduction > 1:
+            # The effective scale factor, applied to the annotations by `DavarLoadAnnotations`, and composed into
+            # the `scale_factor` of the image meta by `DavarCollect`, whichever transform resizes the image
+            w_scale, h_scale = img.shape[1] / ori_size[1], img.shape[0] / ori_size[0]
+            results['ori_shape'] = (ori_size[0], ori_size[1]) + img.shape[2:]
+            results['load_scale_factor'] = np.array([w_scale, h_scale, w_scale, h_scale], dtype=np.float32)
         return results
 
     def __repr__(self):
-        return self.__class__.__name__ + '(to_float32={})'.format(self.to_float32)
+        return self.__class__.__name__ + '(to_float32={}, target_scale={})'.format(self.to_float32,
+                                                                                self.target_scale)
 
 
 @PIPELINES.register_module()
@@ -135,6 +231,7 @@ class DavarLoadAnnotations():
                  text_profile=None,
                  label_start_index=0,
                  poly2mask=True,
+                 crop_mask=False,
                  only_quad=False
                  ):
         """ Parameter initialization
@@ -174,6 +271,9 @@ class DavarLoadAnnotations():
                                      according to `classes_config`. The start label will be added. e.g., for mmdet 1.x,
                                      this value is set to [1];  for mmdet 2.x, this will be set to [0].
             poly2mask (boolean):      Whether to convert the instance masks from polygons to bitmaps. Default: True.
+            crop_mask (boolean):      Whether to keep the bitmaps as tight crops (:obj:`CroppedBitmapMasks`), which are
+                                      rasterized to the image size only when needed. Valid if `poly2mask` is True.
+                                      Default: False.
             only_quad (boolean): Whether only quad format annotation supported.
         """
         self.with_bbox = with_bbox
@@ -188,6 +288,7 @@ class DavarLoadAnnotations():
         self.label_start_index = label_start_index
         self.with_cbbox = with_cbbox
         self.poly2mask = poly2mask
+        self.crop_mask = crop_mask
         self.only_quad = only_quad
 
         assert not (self.with_label and self.with_multi_label), \
@@ -215,6 +316,7 @@ class DavarLoadAnnotations():
                     raise NotImplementedError
             else:
                 self.character = ''
+            self.vocabulary = build_vocabulary(self.character)
 
             # Maximum supported text length
             if 'text_max_length' in self.text_profile:
@@ -479,6 +581,7 @@ class DavarLoadAnnotations():
         Returns:
             dict: The dict contains loaded mask annotations. If ``self.poly2mask`` is set ``True``,
                   `gt_mask` will contain:obj:`PolygonMasks`. Otherwise, :obj:`BitmapMasks` is used.
+                  :obj:`CroppedBitmapMasks` is used if ``self.crop_mask`` is also set ``True``.
         """
 
         height, width = results['img_info']['height'], results['img_info']['width']
@@ -511,7 +614,10 @@ class DavarLoadAnnotations():
             else:
                 invalid_polygons.append([np.array(box)])
 
-        if self.poly2mask:
+        if self.poly2mask and self.crop_mask:
+            gt_masks = CroppedBitmapMasks.from_polygons(valid_polygons, height, width)
+            gt_masks_ignore = CroppedBitmapMasks.from_polygons(invalid_polygons, height, width)
+        elif self.poly2mask:
             gt_masks = BitmapMasks(
                 [self._poly2mask(mask, height, width) for mask in valid_polygons], height, width)
             gt_masks_ignore = BitmapMasks(
@@ -778,8 +884,7 @@ class DavarLoadAnnotations():
         for i, text in enumerate(tmp_texts):
             # If filtered tag is True, then all unsupported characters will be removed
             if self.filtered:
-                text = [c for c in text if c in self.character]
-                text = ''.join(text)
+                text = self.vocabulary.filter(text)
 
             # Transfer text according to the sensitive tag.
             if self.sensitive == 'upper':
@@ -858,7 +963,45 @@ class DavarLoadAnnotations():
             results = self._load_cbboxes(results)
         if self.bieo_labels is not None and self.with_box_bieo_labels:
             results = self._load_box_bieo_labels(results)
+        if 'load_scale_factor' in results:
+            results = self._rescale_to_image(results)
+
+        return results
+
+    def _rescale_to_image(self, results):
+        """ Rescale the annotations to the image decoded at a reduced resolution by `DavarLoadImageFromFile`.
 
+        Args:
+            results(dict): Data flow used in DavarCustomDataset.
+
+        Returns:
+            dict: output data flow, where the boxes, character boxes and masks are scaled by `load_scale_factor`.
+        """
+        w_scale, h_scale = results['load_scale_factor'][:2]
+        for key in results.get('bbox_fields', []):
+            if isinstance(results[key], np.ndarray):
+                results[key] = results[key].astype(np.float32)
+                results[key][..., 0::2] *= w_scale
+                results[key][..., 1::2] *= h_scale
+                continue
+            bboxes = []
+            for box in results[key]:
+                box = np.array(box, dtype=np.float32)
+                box[0::2] *= w_scale
+                box[1::2] *= h_scale
+                bboxes.append(box)
+            results[key] = bboxes
+        for key in results.get('cbbox_fields', []):
+            cbboxes = []
+            for cbox in results[key]:
+                cbox = np.array(cbox, dtype=np.float32)
+                if cbox.size > 0:
+                    cbox[..., 0::2] *= w_scale
+                    cbox[..., 1::2] *= h_scale
+                cbboxes.append(cbox)
+            results[key] = cbboxes
+        for key in results.get('mask_fields', []):
+            results[key] = results[key].resize(results['img_shape'][:2])
         return results
 
     def __repr__(self):
@@ -866,7 +1009,8 @@ class DavarLoadAnnotations():
         repr_str += (
             '(with_bbox={}, with_poly_bbox={}, with_poly_mask={},with_care={}, with_label={}, '
             'with_multi_lalbel={}, with_text={}, with_cbbox={}, text_profile={}, label_start_index={}, '
-            'poly2mask={}, with_box_bieo_labels={}').format( self.with_bbox, self.with_poly_bbox, self.with_poly_mask, self.with_care,
+            'poly2mask={}, crop_mask={}, with_box_bieo_labels={}').format( self.with_bbox, self.with_poly_bbox, self.with_poly_mask, self.with_care,
                                     self.with_label, self.with_multi_label, self.with_text, self.with_cbbox,
-                                    self.text_profile, self.label_start_index, self.poly2mask, self.with_box_bieo_labels)
+                                    self.text_profile, self.label_start_index, self.poly2mask, self.crop_mask,
+                                    self.with_box_bieo_labels)
         return repr_str
@@ -0,0 +1,178 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    target_encoding.py
+# Abstract       :    Shared box preparation and output buffers of the C++ ground-truth encoders (EAST, TP, GPMA)
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+from itertools import chain
+
+import numpy as np
+
+
+def boxes_to_array(boxes, num_coords, dtype=np.float32):
+    """ Convert a list of boxes into an array, dropping the boxes whose length is not `num_coords`.
+
+    Args:
+        boxes(list[list[float]] | np.ndarray): boxes in shape of [[x0, y0, x1, y1, ...], ...]
+        num_coords(int): required number of coordinates of each box
+        dtype(np.dtype): dtype of the returned array
+
+    Returns:
+        np.ndarray: boxes in shape of [N, num_coords]
+    """
+    if len(boxes) == 0:
+        return np.zeros((0, num_coords), dtype=dtype)
+    if isinstance(boxes, np.ndarray) and boxes.ndim == 2 and boxes.shape[1] == num_coords:
+        return boxes.astype(dtype, copy=False)
+
+    lengths = np.fromiter(map(len, boxes), dtype=np.int64, count=len(boxes))
+    if np.any(lengths != num_coords):
+        for idx in np.where(lengths != num_coords)[0]:
+            print("invalid annotation {}".format(boxes[idx]))
+        boxes = [box for box, length in zip(boxes, lengths) if length == num_coords]
+    if not boxes:
+        return np.zeros((0, num_coords), dtype=dtype)
+    return np.fromiter(chain.from_iterable(boxes), dtype=dtype).reshape(-1, num_coords)
+
+
+def quad_edge_lengths(quads):
+    """
+    Args:
+        quads(np.ndarray): quadrangles in shape of [N, 8]
+
+    Returns:
+        np.ndarray: length of the 4 edges of each quadrangle, in shape of [N, 4]
+    """
+    points = quads.reshape(-1, 4, 2).astype(np.float64)
+    return np.linalg.norm(points - np.roll(points, -1, axis=1), axis=2)
+
+
+def pad_polygons(polys, max_coords=48, dtype=np.int32):
+    """ Pad polygons with various number of points into a fixed-size array.
+
+    Args:
+        polys(list[list[float]]): polygons in shape of [[x0, y0, x1, y1, ..., xn, yn], ...]
+        max_coords(int): maximum number of coordinates of each polygon, the exceeding ones are truncated
+        dtype(np.dtype): dtype of the padded array
+
+    Returns:
+        np.ndarray: padded polygons in shape of [N, max_coords]
+    Returns:
+        np.ndarray: number of valid coordinates of each polygon, in shape of [N]
+    """
+    num = len(polys)
+    padded = np.zeros((num, max_coords), dtype=dtype)
+    lengths = np.fromiter(map(len, polys), dtype=np.int32, count=num)
+    if num == 0:
+        return padded, lengths
+
+    if np.any(lengths > max_coords):
+        print("Point length larger than {}!".format(max_coords))
+        polys = [poly[:max_coords] for poly in polys]
+        lengths = np.minimum(lengths, max_coords)
+
+    # Row-major boolean indexing fills each row from its start, in the same order as the flattened polygons
+    valid = np.arange(max_coords)[np.newaxis, :] < lengths[:, np.newaxis]
+    padded[valid] = np.fromiter(chain.from_iterable(polys), dtype=np.float64, count=int(lengths.sum()))
+    return padded, lengths
+
+
+def shrink_aligned_boxes(bboxes, shrink_ratio):
+    """ Shrink axis-aligned boxes towards their centers.
+
+    Args:
+        bboxes(np.ndarray): boxes in shape of [N, 4], [[x1, y1, x2, y2], ...]
+        shrink_ratio(tuple(float)): shrink ratio of the width and the height on each side
+
+    Returns:
+        np.ndarray: shrunk boxes in shape of [N, 4]
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    offsets = (bboxes[:, 2:4] - bboxes[:, 0:2]) * np.asarray(shrink_ratio, dtype=np.float32)
+    return np.concatenate([bboxes[:, 0:2] + offsets, bboxes[:, 2:4] - offsets], axis=1)
+
+
+class TargetEncoder:
+    """ Base class of the ground-truth encoders backed by C++ libs.
+
+    All the target maps of a sample are stored in one [C, H, W] array of `target_dtype`. The C++ functions write their
+    outputs either directly into channel views of that array (when the dtypes match), or into scratch buffers that are
+    reused across samples and then cast into the array, so no intermediate full-size array is allocated per sample.
+    The scratch buffers are owned by the pipeline object and therefore by each dataloader worker.
+
+    Setting `target_dtype='float16'` halves the size of the targets transferred from the workers to the main process.
+    Score maps, class labels and 0/1 weight maps are exact in float16, regression maps keep ~3 significant digits.
+    """
+
+    def __init__(self, target_dtype='float32'):
+        """
+        Args:
+            target_dtype(str): dtype of the encoded targets, in range of ['float32', 'float16']
+        """
+        self.target_dtype = np.dtype(target_dtype)
+        assert self.target_dtype in (np.float32, np.float16), "target_dtype only supports 'float32' and 'float16'!"
+        self._buffers = dict()
+        self._pending = []
+
+    def alloc_targets(self, num_channels, height, width):
+        """
+        Args:
+            num_channels(int): number of target channels
+            height(int): height of the target maps
+            width(int): width of the target maps
+
+        Returns:
+            np.ndarray: uninitialized targets in shape of [num_channels, height, width]
+        """
+        self._pending = []
+        return np.empty((num_channels, height, width), dtype=self.target_dtype)
+
+    def channel_buffer(self, targets, start, num, dtype):
+        """ Get the flat output buffer of channels `start: start + num` to be passed to the C++ function.
+
+        Args:
+            targets(np.ndarray): targets allocated by `alloc_targets`
+            start(int): first channel
+            num(int): number of channels
+            dtype(np.dtype): dtype required by the C++ function
+
+        Returns:
+            np.ndarray: C-contiguous 1-D buffer of `num * H * W` elements
+        """
+        if targets.dtype == np.dtype(dtype):
+            return targets[start:start + num].reshape(-1)
+
+        size = num * targets.shape[1] * targets.shape[2]
+        key = (start, np.dtype(dtype).str)
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[key] = buffer
+        buffer = buffer[:size]
+        self._pending.append((start, num, buffer))
+        return buffer
+
+    def collect_targets(self, targets):
+        """ Cast the scratch buffers filled by the C++ function into the targets.
+
+        Args:
+            targets(np.ndarray): targets allocated by `alloc_targets`
+
+        Returns:
+            np.ndarray: the completed targets
+        """
+        for start, num, buffer in self._pending:
+            targets[start:start + num] = buffer.reshape(num, targets.shape[1], targets.shape[2])
+        self._pending = []
+        return targets
+
+    def __getstate__(self):
+        # Scratch buffers are re-allocated in each worker rather than pickled
+        state = self.__dict__.copy()
+        state['_buffers'] = dict()
+        state['_pending'] = []
+        return state
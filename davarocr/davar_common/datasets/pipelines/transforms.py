@@ -13,12 +13,15 @@ import numpy as np
 import cv2
 import mmcv
 
+from mmcv.image.geometric import cv2_interp_codes
 from mmdet.core import BitmapMasks, PolygonMasks
 from mmdet.datasets.builder import PIPELINES
 from mmdet.datasets.pipelines import Resize, RandomFlip
 import torchvision.transforms as transforms
 from PIL import Image
 
+from .cropped_masks import CroppedBitmapMasks
+
 
 @PIPELINES.register_module()
 class DavarResize(Resize):
@@ -484,6 +487,10 @@ class RandomRotate:
 
         # Rotate corresponding annotations: all masks in mask_fields
         for key in results.get('mask_fields', []):
+            if isinstance(results[key], CroppedBitmapMasks):
+                # Rotate each crop, the area outside the image is not part of any instance
+                results[key] = results[key].warp_affine(mat_rotation, (height_new, width_new), 'bilinear')
+                continue
             mask = results[key].masks.transpose((1, 2, 0))
             if len(results[key].masks) == 0:
                 results[key] = results[key].resize((height_new, width_new))
@@ -644,7 +651,20 @@ class DavarRandomCrop:
         Returns:
             tuple: location of the cropping box
         """
-        h, w, _ = img.shape
+        h, w = img.shape[:2]
+        return self._random_crop_region(h, w, polys)
+
+    def _random_crop_region(self, h, w, polys):
+        """ Randomly choose a cropping box of an image of the given size
+
+        Args:
+            h (int): image height
+            w (int): image width
+            polys (nd.array): location of polys.
+
+        Returns:
+            tuple: location of the cropping box
+        """
         pad_h = h // 10
         pad_w = w // 10
         h_array = np.zeros((h + 2 * pad_h), dtype=np.int32)
@@ -743,6 +763,10 @@ class DavarRandomCrop:
                     poly = np.array(poly).reshape(-1, 2).astype(np.float32)
                     polys.append([poly])
                 results[key] = PolygonMasks(polys, *results['img_shape'][:-1])
+            elif isinstance(results[key], CroppedBitmapMasks):
+                if 'ignore' in key:
+                    continue
+                results[key] = results[key][np.asarray(kept_idx, dtype=np.int64)]
             elif isinstance(results[key], BitmapMasks):
                 # filter gt_masks_ignore
                 if 'ignore' in key:
@@ -761,3 +785,387 @@ class DavarRandomCrop:
     def __repr__(self):
         repr_str = self.__class__.__name__
         return repr_str
+
+
+@PIPELINES.register_module()
+class DavarRandomAffine:
+    """ Fused geometric augmentation. Rotation, crop, resize and flip (in the order of `order`) are composed into one
+    affine matrix, so that the image, the masks and the segmentation maps are resampled only once, and the points of
+    all `bbox_fields` and `cbbox_fields` are transformed as one concatenated array.
+
+    It replaces a pipeline such as [RandomRotate, DavarRandomCrop, DavarResize, DavarRandomFlip], with the same
+    arguments of each step. Annotations are treated as continuous coordinates, where the pixel (i, j) covers
+    [j, j + 1) x [i, i + 1); so that the rotation center is the real image center, and flipping is `w - x`.
+    """
+
+    def __init__(self,
+                 order=('rotate', 'crop', 'resize', 'flip'),
+                 angles=None,
+                 border_value=(255, 255, 255),
+                 crop_cfg=None,
+                 img_scale=None,
+                 multiscale_mode='range',
+                 ratio_range=None,
+                 keep_ratio=True,
+                 bbox_clip_border=True,
+                 flip_ratio=None,
+                 direction='horizontal',
+                 interpolation='bilinear'):
+        """
+        Args:
+            order (list(str) | tuple(str)): order of the steps, in range of ['rotate', 'crop', 'resize', 'flip']
+            angles (list | tuple | None): the rotated degree, as in `RandomRotate`. None means no rotation.
+            border_value (tuple): filled pixels value when rotate.
+            crop_cfg (dict | None): arguments of `DavarRandomCrop`, e.g. dict(instance_key='gt_bboxes').
+                                    None means no cropping.
+            img_scale (tuple or list[tuple] | None): images scales for resizing, as in `DavarResize`.
+                                                     None means no resizing.
+            multiscale_mode (str): either "range" or "value".
+            ratio_range (tuple[float]): (min_ratio, max_ratio)
+            keep_ratio (bool): whether to keep the aspect ratio when resizing the image.
+            bbox_clip_border (bool): whether to clip the boxes outside the border of the image.
+            flip_ratio (float | list[float] | None): the flipping probability, as in `DavarRandomFlip`.
+                                                     None means no flipping.
+            direction (str | list[str]): the flipping direction.
+            interpolation (str): interpolation method of the image, e.g. 'bilinear', 'nearest'.
+        """
+        assert set(order) <= {'rotate', 'crop', 'resize', 'flip'}, order
+        self.order = tuple(order)
+        self.angles = angles
+        self.border_value = border_value
+        self.crop = DavarRandomCrop(**crop_cfg) if crop_cfg is not None else None
+        self.resize = Resize(img_scale=img_scale, multiscale_mode=multiscale_mode, ratio_range=ratio_range,
+                             keep_ratio=keep_ratio) if img_scale is not None else None
+        self.keep_ratio = keep_ratio
+        self.bbox_clip_border = bbox_clip_border
+        self.flip = DavarRandomFlip(flip_ratio=flip_ratio, direction=direction) if flip_ratio is not None else None
+        self.interpolation = interpolation
+
+    @staticmethod
+    def _flatten_boxes(boxes):
+        """ Concatenate the points of boxes of any number of points. 4-value boxes [x1, y1, x2, y2] are converted to
+        their 4 corners.
+
+        Args:
+            boxes (list | np.ndarray): boxes in format of [[x1, y1, ..., xn, yn], ...]
+
+        Returns:
+            np.ndarray: points in shape of [P, 2]
+        Returns:
+            np.ndarray: number of points of each box, in shape of [N]
+        Returns:
+            np.ndarray: whether each box is an axis-aligned 4-value box, in shape of [N]
+        """
+        if isinstance(boxes, np.ndarray) and boxes.ndim == 2:
+            arrays = boxes.astype(np.float64)
+            if arrays.shape[1] == 4:
+                arrays = arrays[:, [0, 1, 2, 1, 2, 3, 0, 3]]
+                aligned = np.ones(len(arrays), dtype=bool)
+            else:
+                aligned = np.zeros(len(arrays), dtype=bool)
+            return arrays.reshape(-1, 2), np.full(len(arrays), arrays.shape[1] // 2, dtype=np.int64), aligned
+
+        arrays = [np.asarray(box, dtype=np.float64).reshape(-1) for box in boxes]
+        aligned = np.array([len(array) == 4 for array in arrays], dtype=bool)
+        arrays = [array[[0, 1, 2, 1, 2, 3, 0, 3]] if len(array) == 4 else array for array in arrays]
+        num_points = np.array([len(array) // 2 for array in arrays], dtype=np.int64)
+        points = np.concatenate(arrays).reshape(-1, 2) if arrays else np.zeros((0, 2), dtype=np.float64)
+        return points, num_points, aligned
+
+    @staticmethod
+    def _unflatten_boxes(points, num_points, aligned):
+        """ Split the points back into boxes. Axis-aligned boxes are converted back to [x1, y1, x2, y2] by the
+        bounding boxes of their transformed corners.
+
+        Args:
+            points (np.ndarray): points in shape of [P, 2]
+            num_points (np.ndarray): number of points of each box, in shape of [N]
+            aligned (np.ndarray): whether each box is an axis-aligned 4-value box, in shape of [N]
+
+        Returns:
+            list(np.ndarray): the boxes
+        """
+        boxes = np.split(points.astype(np.float32), np.cumsum(num_points)[:-1]) if len(num_points) else []
+        return [np.concatenate([box.min(axis=0), box.max(axis=0)]) if is_aligned else box.reshape(-1)
+                for box, is_aligned in zip(boxes, aligned)]
+
+    @staticmethod
+    def _inside(points, num_points, region):
+        """
+        Args:
+            points (np.ndarray): points in shape of [P, 2]
+            num_points (np.ndarray): number of points of each box, in shape of [N]
+            region (tuple): (x_min, y_min, x_max, y_max)
+
+        Returns:
+            np.ndarray: whether all points of each box are in the region, in shape of [N]
+        """
+        if len(num_points) == 0:
+            return np.zeros(0, dtype=bool)
+        x_min, y_min, x_max, y_max = region
+        inside = ((points[:, 0] >= x_min) & (points[:, 1] >= y_min) &
+                  (points[:, 0] <= x_max) & (points[:, 1] <= y_max)).astype(np.int64)
+        starts = np.concatenate([[0], np.cumsum(num_points)[:-1]])
+        counts = np.add.reduceat(inside, starts) if len(inside) else np.zeros(len(num_points), dtype=np.int64)
+        return np.where(num_points > 0, counts, 0) == num_points
+
+    @staticmethod
+    def _apply(mat, points):
+        """
+        Args:
+            mat (np.ndarray): affine matrix in shape of [3, 3]
+            points (np.ndarray): points in shape of [P, 2]
+
+        Returns:
+            np.ndarray: transformed points in shape of [P, 2]
+        """
+        return points @ mat[:2, :2].T + mat[:2, 2]
+
+    def _rotation(self, width, height):
+        """ Rotation around the image center, with the canvas enlarged to hold the whole rotated image
+
+        Returns:
+            np.ndarray: affine matrix in shape of [3, 3]
+        Returns:
+            tuple: (width, height) of the rotated image
+        """
+        # `angles` must be a list or tuple
+        assert isinstance(self.angles, (list, tuple))
+        if len(self.angles) == 1:
+            angle = self.angles[0]
+        elif len(self.angles) == 2:
+            angle = np.random.randint(min(self.angles), max(self.angles))
+        else:
+            angle = np.random.choice(self.angles)
+
+        mat = np.eye(3)
+        mat[:2] = cv2.getRotationMatrix2D((width * 0.5, height * 0.5), -angle, 1)
+        cos = np.abs(mat[0, 0])
+        sin = np.abs(mat[0, 1])
+        width_new = height * sin + width * cos
+        height_new = height * cos + width * sin
+        mat[0, 2] += (width_new - width) * 0.5
+        mat[1, 2] += (height_new - height) * 0.5
+        return mat, (int(np.round(width_new)), int(np.round(height_new)))
+
+    def _scaling(self, results, width, height):
+        """ Scaling as `DavarResize`, which updates `scale`, `scale_factor` and `keep_ratio` of the data flow
+
+        Returns:
+            np.ndarray: affine matrix in shape of [3, 3]
+        Returns:
+            tuple: (width, height) of the resized image
+        """
+        scale_results = dict()
+        self.resize._random_scale(scale_results)
+        if self.keep_ratio:
+            width_new, height_new = mmcv.rescale_size((width, height), scale_results['scale'])
+        else:
+            width_new, height_new = scale_results['scale']
+        w_scale, h_scale = width_new / width, height_new / height
+        results['scale'] = scale_results['scale']
+        results['scale_idx'] = scale_results['scale_idx']
+        results['scale_factor'] = np.array([w_scale, h_scale, w_scale, h_scale], dtype=np.float32)
+        results['keep_ratio'] = self.keep_ratio
+        return np.diag([w_scale, h_scale, 1.]), (width_new, height_new)
+
+    def _flipping(self, results, width, height):
+        """ Flipping as `DavarRandomFlip`, which updates `flip` and `flip_direction` of the data flow
+
+        Returns:
+            np.ndarray: affine matrix in shape of [3, 3]
+        """
+        direction_list = self.flip.direction if isinstance(self.flip.direction, list) else [self.flip.direction]
+        if isinstance(self.flip.flip_ratio, list):
+            flip_ratio_list = self.flip.flip_ratio + [1 - sum(self.flip.flip_ratio)]
+        else:
+            single_ratio = self.flip.flip_ratio / len(direction_list)
+            flip_ratio_list = [single_ratio] * len(direction_list) + [1 - self.flip.flip_ratio]
+        cur_dir = np.random.choice(direction_list + [None], p=flip_ratio_list)
+        results['flip'] = cur_dir is not None
+        results['flip_direction'] = cur_dir
+
+        mat = np.eye(3)
+        if cur_dir in ('horizontal', 'diagonal'):
+            mat[0, 0], mat[0, 2] = -1, width
+        if cur_dir in ('vertical', 'diagonal'):
+            mat[1, 1], mat[1, 2] = -1, height
+        return mat
+
+    @staticmethod
+    def _pixel_matrix(mat):
+        """ Convert an affine matrix in continuous coordinates to the pixel-center coordinates of cv2
+
+        Returns:
+            np.ndarray: the affine matrix in shape of (3, 3)
+        """
+        shift = np.eye(3)
+        shift[:2, 2] = 0.5
+        return np.linalg.inv(shift) @ mat @ shift
+
+    def _warp(self, img, mat, size, interpolation, border_value):
+        """ Resample an image (or stacked maps in shape of [h, w, c]) with an affine matrix in continuous coordinates
+
+        Returns:
+            np.ndarray: the warped image
+        """
+        mat_img = self._pixel_matrix(mat)
+        warped = []
+        # cv2 supports at most 512 channels
+        channels = img.shape[2] if img.ndim == 3 else 0
+        for start in range(0, max(channels, 1), 512):
+            part = img[:, :, start:start + 512] if channels else img
+            part = cv2.warpAffine(part, mat_img[:2], size, flags=cv2_interp_codes[interpolation],
+                                  borderValue=border_value)
+            if channels and part.ndim == 2:
+                part = part[:, :, None]
+            warped.append(part)
+        return np.concatenate(warped, axis=2) if channels else warped[0]
+
+    def __call__(self, results):
+        """ Main process of davar_random_affine
+
+        Args:
+            results (dict): input data flow
+
+        Returns:
+            dict: updated data flow
+        """
+        height, width = results['img'].shape[:2]
+        size = (width, height)
+
+        # Points of all boxes and character boxes, concatenated
+        fields = []
+        for key in results.get('bbox_fields', []):
+            points, num_points, aligned = self._flatten_boxes(results[key])
+            fields.append(dict(key=key, points=points, num_points=num_points, aligned=aligned, instances=None))
+        for key in results.get('cbbox_fields', []):
+            instances = [np.asarray(cbox, dtype=np.float64).reshape(len(cbox), -1) for cbox in results[key]]
+            chars = [char for cbox in instances for char in cbox]
+            points, num_points, aligned = self._flatten_boxes(chars)
+            fields.append(dict(key=key, points=points, num_points=num_points, aligned=aligned,
+                               instances=np.array([len(cbox) for cbox in instances], dtype=np.int64)))
+        field_index = {field['key']: i for i, field in enumerate(fields)}
+
+        # Compose the steps
+        mat = np.eye(3)
+        crop = None
+        for step in self.order:
+            if step == 'rotate' and self.angles is not None:
+                step_mat, size = self._rotation(*size)
+            elif step == 'crop' and self.crop is not None:
+                field = fields[field_index[self.crop.instance_key]]
+                polys = self._unflatten_boxes(self._apply(mat, field['points']), field['num_points'],
+                                              field['aligned'])
+                x_min, y_min, x_max, y_max = self.crop._random_crop_region(size[1], size[0], polys)
+                crop = (mat, (x_min, y_min, x_max, y_max))
+                step_mat = np.eye(3)
+                step_mat[:2, 2] = -x_min, -y_min
+                size = (int(x_max - x_min), int(y_max - y_min))
+            elif step == 'resize' and self.resize is not None:
+                step_mat, size = self._scaling(results, *size)
+            elif step == 'flip' and self.flip is not None:
+                step_mat = self._flipping(results, *size)
+            else:
+                continue
+            mat = step_mat @ mat
+
+        # Transform the points of all fields at once
+        all_points = self._apply(mat, np.concatenate([field['points'] for field in fields])) \
+            if fields else np.zeros((0, 2))
+        crop_points = self._apply(crop[0], np.concatenate([field['points'] for field in fields])) \
+            if fields and crop is not None else None
+        kept_idx, num_instances = None, None
+        if crop is not None:
+            field = fields[field_index[self.crop.instance_key]]
+            num_instances = len(field['num_points'])
+            start = sum(len(fields[i]['points']) for i in range(field_index[self.crop.instance_key]))
+            kept_idx = np.where(self._inside(crop_points[start:start + len(field['points'])],
+                                             field['num_points'], crop[1]))[0]
+
+        start = 0
+        for field in fields:
+            end = start + len(field['points'])
+            points = all_points[start:end]
+            if self.bbox_clip_border:
+                points = np.stack([np.clip(points[:, 0], 0, size[0]), np.clip(points[:, 1], 0, size[1])], axis=1)
+            boxes = self._unflatten_boxes(points, field['num_points'], field['aligned'])
+            key = field['key']
+            if field['instances'] is None:
+                if crop is not None:
+                    # as in DavarRandomCrop, keep the boxes inside the cropping box
+                    inside = self._inside(crop_points[start:end], field['num_points'], crop[1])
+                    boxes = [box for box, is_inside in zip(boxes, inside) if is_inside]
+                if isinstance(results[key], np.ndarray) and results[key].ndim == 2:
+                    results[key] = np.array(boxes, dtype=np.float32).reshape(-1, results[key].shape[1])
+                elif crop is not None and len(boxes) == 0:
+                    results[key] = np.zeros((0, 4 if key == 'gt_bboxes' else 8), dtype=np.float32)
+                elif len(results[key]) > 0:
+                    results[key] = boxes
+            else:
+                ends = np.cumsum(field['instances'])
+                cboxes = [np.array(boxes[end_ - num:end_], dtype=np.float32) if num > 0 else
+                          np.zeros((0, 4), dtype=np.float32) for num, end_ in zip(field['instances'], ends)]
+                if kept_idx is not None and len(cboxes) == num_instances:
+                    cboxes = [cboxes[idx] for idx in kept_idx]
+                results[key] = cboxes
+            start = end
+
+        # Rebuild tight gt_bboxes from the transformed polygons, as in RandomRotate
+        for box_key, poly_key in (('gt_bboxes', 'gt_poly_bboxes'), ('gt_bboxes_ignore', 'gt_poly_bboxes_ignore')):
+            if box_key in results and poly_key in results and len(results[box_key]) == len(results[poly_key]):
+                polys = results[poly_key]
+                results[box_key] = np.array([[np.min(poly[0::2]), np.min(poly[1::2]), np.max(poly[0::2]),
+                                              np.max(poly[1::2])] for poly in polys], dtype=np.float32).reshape(-1, 4)
+
+        # Calculate the kept text and label
+        if kept_idx is not None:
+            for key in ['gt_labels', 'gt_texts']:
+                if key in results:
+                    results[key] = [results[key][idx] for idx in kept_idx]
+
+        # Resample the image, the masks and the segmentation maps once
+        for key in results.get('img_fields', ['img']):
+            results[key] = self._warp(results[key], mat, size, self.interpolation, self.border_value)
+        results['img_shape'] = results['img'].shape
+        for key in results.get('mask_fields', []):
+            masks = results[key]
+            keep = kept_idx if kept_idx is not None and len(masks) == num_instances else None
+            if isinstance(masks, PolygonMasks):
+                polys = [[np.asarray(part, dtype=np.float64).reshape(-1, 2) for part in poly] for poly in masks.masks]
+                parts = [part for poly in polys for part in poly]
+                points = self._apply(mat, np.concatenate(parts)) if parts else np.zeros((0, 2))
+                points = np.split(points, np.cumsum([len(part) for part in parts])[:-1]) if parts else []
+                new_polys, index = [], 0
+                for poly in polys:
+                    new_polys.append([points[index + i].reshape(-1) for i in range(len(poly))])
+                    index += len(poly)
+                if keep is not None:
+                    new_polys = [new_polys[idx] for idx in keep]
+                results[key] = PolygonMasks(new_polys, size[1], size[0])
+            elif isinstance(masks, CroppedBitmapMasks):
+                if keep is not None:
+                    masks = masks[keep]
+                results[key] = masks.warp_affine(self._pixel_matrix(mat), (size[1], size[0]), 'nearest')
+            elif isinstance(masks, BitmapMasks):
+                bitmaps = masks.masks if keep is None else masks.masks[keep]
+                if len(bitmaps) == 0:
+                    bitmaps = np.empty((0, size[1], size[0]), dtype=masks.masks.dtype)
+                else:
+                    bitmaps = self._warp(bitmaps.transpose((1, 2, 0)), mat, size, 'nearest', 0).transpose((2, 0, 1))
+                results[key] = BitmapMasks(bitmaps, size[1], size[0])
+            else:
+                raise TypeError("mask_fields type error")
+        for key in results.get('seg_fields', []):
+            results[key] = self._warp(results[key], mat, size, 'nearest', 255)
+
+        if 'scale_factor' not in results:
+            results['scale_factor'] = np.ones(4, dtype=np.float32)
+        return results
+
+    def __repr__(self):
+        repr_str = self.__class__.__name__
+        repr_str += '(order={}, angles={}, img_scale={}, flip_ratio={})'.format(
+            self.order, self.angles, self.resize.img_scale if self.resize is not None else None,
+            self.flip.flip_ratio if self.flip is not None else None)
+        return repr_str
@@ -0,0 +1,15 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    __init__.py
+# Abstract       :
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+from .crf_scan import (semiring_reduce, semiring_scan, compose_backpointers, crf_sequence_score, crf_log_partition,
+                       crf_viterbi_decode, crf_viterbi_backtrack_nbest)
+
+__all__ = ['semiring_reduce', 'semiring_scan', 'compose_backpointers', 'crf_sequence_score', 'crf_log_partition',
+           'crf_viterbi_decode', 'crf_viterbi_backtrack_nbest']
@@ -0,0 +1,217 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    crf_scan.py
+# Abstract       :    Log-depth CRF inference by associative scans, shared by the CRF layers of NER and IE
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import torch
+
+
+def _neg_fill(tensor):
+    """ A very negative value acting as the zero of the log / max-plus semirings, finite to keep gradients NaN-free
+    when it is added to itself """
+    return torch.finfo(tensor.dtype).min / 2
+
+
+def _transition_matrices(emissions, mask, transitions):
+    """ Semiring matrices of the steps 1 ... T-1, M_t[i, j] = transitions[i, j] + emissions[t, j]. The masked steps
+    are identities, so that the scores stay at the last valid step as in the sequential recursion.
+
+    Args:
+        emissions (Tensor): emission scores in shape of [T, B, K]
+        mask (Tensor): mask in shape of [T, B]
+        transitions (Tensor): transition scores in shape of [K, K]
+
+    Returns:
+        Tensor: matrices in shape of [T - 1, B, K, K]
+    """
+    num_tags = emissions.size(2)
+    mats = transitions + emissions[1:].unsqueeze(2)
+    eye = torch.eye(num_tags, dtype=torch.bool, device=emissions.device)
+    identity = torch.full_like(transitions, _neg_fill(transitions)).masked_fill(eye, 0.)
+    return torch.where(mask[1:].bool().unsqueeze(-1).unsqueeze(-1), mats, identity)
+
+
+def _semiring_matmul(left, right, use_max):
+    """ Batched matrix product in the log semiring (logsumexp, +) or the max-plus semiring (max, +)
+
+    Args:
+        left (Tensor): matrices in shape of [..., K, K]
+        right (Tensor): matrices in shape of [..., K, K]
+        use_max (bool): whether to use the max-plus semiring
+
+    Returns:
+        Tensor: products in shape of [..., K, K]
+    """
+    scores = left.unsqueeze(-1) + right.unsqueeze(-3)
+    if use_max:
+        return scores.max(dim=-2)[0]
+    return torch.logsumexp(scores, dim=-2)
+
+
+def semiring_reduce(mats, use_max=False):
+    """ Product of a sequence of matrices by a pairwise tree reduction, in O(log T) sequential steps
+
+    Args:
+        mats (Tensor): matrices in shape of [T, B, K, K], T > 0
+        use_max (bool): whether to use the max-plus semiring instead of the log semiring
+
+    Returns:
+        Tensor: the product M_0 x M_1 x ... x M_{T-1}, in shape of [B, K, K]
+    """
+    while mats.size(0) > 1:
+        if mats.size(0) % 2 == 1:
+            last = mats[-1:]
+            mats = torch.cat([_semiring_matmul(mats[:-1:2], mats[1::2], use_max), last])
+        else:
+            mats = _semiring_matmul(mats[0::2], mats[1::2], use_max)
+    return mats[0]
+
+
+def semiring_scan(mats, use_max=False):
+    """ Inclusive prefix products of a sequence of matrices by a work-efficient (Blelloch-style) scan, in O(log T)
+    sequential steps and O(T) matrix products
+
+    Args:
+        mats (Tensor): matrices in shape of [T, B, K, K]
+        use_max (bool): whether to use the max-plus semiring instead of the log semiring
+
+    Returns:
+        Tensor: prefix products in shape of [T, B, K, K], the t-th is M_0 x M_1 x ... x M_t
+    """
+    seq_length = mats.size(0)
+    if seq_length == 1:
+        return mats
+
+    # Prefix products at the odd steps, from the scan of the products of adjacent pairs
+    odd = semiring_scan(_semiring_matmul(mats[0:seq_length - 1:2], mats[1::2], use_max), use_max)
+
+    # Prefix products at the even steps, from the previous odd step
+    even = torch.cat([mats[:1], _semiring_matmul(odd[:(seq_length - 1) // 2], mats[2::2], use_max)])
+    prefix = torch.stack([even[:len(odd)], odd], dim=1).flatten(0, 1)
+    return torch.cat([prefix, even[len(odd):]])
+
+
+def compose_backpointers(history, init):
+    """ Backtrack all the steps at once by pointer doubling. The state at step t is history[t][state at t + 1], and
+    the chains of all steps are composed with one batched gather over the stacked history per doubling level.
+
+    Args:
+        history (Tensor): backpointers in shape of [T, B, D], mapping the states of step t + 1 to states of step t
+        init (Tensor): states after the last step, in shape of [B, N]
+
+    Returns:
+        Tensor: states of every step, in shape of [T, B, N]
+    """
+    seq_length = history.size(0)
+    offset = 1
+    while offset < seq_length:
+        # after this level, history[t] composes the backpointers of the steps t ... t + 2 * offset - 1
+        history = torch.cat([history[:-offset].gather(-1, history[offset:]), history[-offset:]])
+        offset *= 2
+    return history.gather(-1, init.unsqueeze(0).expand(seq_length, -1, -1))
+
+
+def crf_sequence_score(emissions, tags, mask, start_transitions, end_transitions, transitions):
+    """ Scores of the given tag sequences, without looping over time
+
+    Args:
+        emissions (Tensor): emission scores in shape of [T, B, K]
+        tags (Tensor): tags in shape of [T, B]
+        mask (Tensor): mask in shape of [T, B], the first step should be valid
+        start_transitions (Tensor): start transition scores in shape of [K]
+        end_transitions (Tensor): end transition scores in shape of [K]
+        transitions (Tensor): transition scores in shape of [K, K]
+
+    Returns:
+        Tensor: scores in shape of [B]
+    """
+    mask = mask.to(emissions.dtype)
+    emitted = emissions.gather(2, tags.unsqueeze(2)).squeeze(2)
+    score = start_transitions[tags[0]] + emitted[0]
+    score = score + ((transitions[tags[:-1], tags[1:]] + emitted[1:]) * mask[1:]).sum(dim=0)
+    seq_ends = mask.long().sum(dim=0) - 1
+    last_tags = tags.gather(0, seq_ends.unsqueeze(0)).squeeze(0)
+    return score + end_transitions[last_tags]
+
+
+def crf_log_partition(emissions, mask, start_transitions, end_transitions, transitions):
+    """ Log partition functions, by a log-semiring tree reduction of the transition matrices
+
+    Args:
+        emissions (Tensor): emission scores in shape of [T, B, K]
+        mask (Tensor): mask in shape of [T, B], the first step should be valid
+        start_transitions (Tensor): start transition scores in shape of [K]
+        end_transitions (Tensor): end transition scores in shape of [K]
+        transitions (Tensor): transition scores in shape of [K, K]
+
+    Returns:
+        Tensor: log partition functions in shape of [B]
+    """
+    score = start_transitions + emissions[0]
+    if emissions.size(0) > 1:
+        product = semiring_reduce(_transition_matrices(emissions, mask, transitions))
+        score = torch.logsumexp(score.unsqueeze(2) + product, dim=1)
+    return torch.logsumexp(score + end_transitions, dim=1)
+
+
+def crf_viterbi_decode(emissions, mask, start_transitions, end_transitions, transitions, pad_tag=0):
+    """ Viterbi decoding, with the max-plus prefix scores of all steps computed by a scan, and backtracking by pointer
+    doubling
+
+    Args:
+        emissions (Tensor): emission scores in shape of [T, B, K]
+        mask (Tensor): mask in shape of [T, B], the first step should be valid
+        start_transitions (Tensor): start transition scores in shape of [K]
+        end_transitions (Tensor): end transition scores in shape of [K]
+        transitions (Tensor): transition scores in shape of [K, K]
+        pad_tag (int): tag at the masked steps
+
+    Returns:
+        Tensor: the best tags in shape of [B, T]
+    """
+    seq_length, batch_size, num_tags = emissions.shape
+    mask = mask.bool()
+    score = start_transitions + emissions[0]
+    if seq_length > 1:
+        prefix = semiring_scan(_transition_matrices(emissions, mask, transitions), use_max=True)
+        score = torch.cat([score.unsqueeze(0), (score.unsqueeze(2) + prefix).max(dim=2)[0]])
+    else:
+        score = score.unsqueeze(0)
+
+    # Backpointers of every step from the best scores of the previous step, 0 at the masked steps
+    history = torch.zeros((seq_length, batch_size, num_tags), dtype=torch.long, device=emissions.device)
+    if seq_length > 1:
+        history[:-1] = (score[:-1].unsqueeze(3) + transitions).max(dim=2)[1] * mask[1:].unsqueeze(2)
+
+    # The best end tag is inserted at each sequence end
+    _, end_tag = (score[-1] + end_transitions).max(dim=1)
+    seq_ends = mask.long().sum(dim=0) - 1
+    history[seq_ends, torch.arange(batch_size, device=emissions.device)] = end_tag.unsqueeze(1)
+
+    init = torch.zeros((batch_size, 1), dtype=torch.long, device=emissions.device)
+    best_tags = compose_backpointers(history, init).squeeze(2)
+    return best_tags.masked_fill(~mask, pad_tag).transpose(0, 1)
+
+
+def crf_viterbi_backtrack_nbest(history, mask, nbest, pad_tag=0):
+    """ Backtracking of the n-best Viterbi decoding by pointer doubling
+
+    Args:
+        history (Tensor): backpointers to the flattened (tag, rank) of the previous step, with the n-best end tags
+                          inserted at the sequence ends, in shape of [T, B, K, nbest]
+        mask (Tensor): mask in shape of [T, B]
+        nbest (int): number of the best paths
+        pad_tag (int): tag at the masked steps
+
+    Returns:
+        Tensor: the n-best tags in shape of [nbest, B, T]
+    """
+    seq_length, batch_size = mask.shape
+    init = torch.arange(nbest, dtype=torch.long, device=history.device).view(1, -1).expand(batch_size, -1)
+    best_tags = compose_backpointers(history.view(seq_length, batch_size, -1), init) // nbest
+    return best_tags.masked_fill(~mask.bool().unsqueeze(-1), pad_tag).permute(2, 1, 0)
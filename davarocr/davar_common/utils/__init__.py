@@ -11,7 +11,10 @@
 from mmcv.utils import Registry, build_from_cfg
 from .collect_env import collect_env
 from .logger import get_root_logger
+from .device import get_default_device, get_module_device, configure_cpu_threads
+from .vocabulary import Vocabulary, build_vocabulary
 
 __all__ = [
-    'Registry', 'build_from_cfg', 'get_root_logger', 'collect_env'
+    'Registry', 'build_from_cfg', 'get_root_logger', 'collect_env', 'get_default_device', 'get_module_device',
+    'configure_cpu_threads', 'Vocabulary', 'build_vocabulary'
 ]
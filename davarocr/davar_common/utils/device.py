@@ -0,0 +1,57 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    device.py
+# Abstract       :    Device helpers, to run models on GPU or on CPU-only machines
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import warnings
+
+import torch
+
+
+def get_default_device():
+    """ The device used when no tensor or module tells where data should live
+
+    Returns:
+        torch.device: 'cuda' if available, else 'cpu'
+    """
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+def get_module_device(module):
+    """
+    Args:
+        module (nn.Module): a model or a sub-module
+
+    Returns:
+        torch.device: device of the first parameter (or buffer) of the module, the default device if it has none
+    """
+    for tensor in module.parameters():
+        return tensor.device
+    for tensor in module.buffers():
+        return tensor.device
+    return get_default_device()
+
+
+def configure_cpu_threads(num_threads=None, num_interop_threads=None):
+    """ Set the intra-op and inter-op thread numbers of torch CPU kernels.
+
+    The inter-op thread number can only be set once, before any inter-op parallel work is started, so later calls
+    only warn.
+
+    Args:
+        num_threads (int | None): intra-op threads, e.g. the physical cores of the socket, None to keep the default
+        num_interop_threads (int | None): inter-op threads, None to keep the default
+    """
+    if num_threads is not None and num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads is not None and num_interop_threads > 0 \
+            and torch.get_num_interop_threads() != num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError as error:
+            warnings.warn('Failed to set inter-op threads: {}'.format(error))
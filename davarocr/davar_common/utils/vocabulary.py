@@ -0,0 +1,147 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    vocabulary.py
+# Abstract       :    Compiled character vocabulary shared by the loaders, tokenizers and label converters
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import re
+
+import numpy as np
+
+
+class Vocabulary:
+    """ A character vocabulary compiled into lookup tables.
+
+    The supported characters are compiled into one regex character class, so that filtering a text is a single scan
+    in C instead of a search in the vocabulary string for each character. The indexes of the characters are compiled
+    into an array indexed by code points, so that a text (or a batch of texts) is encoded by one numpy lookup.
+
+    Multi-character tokens (e.g. '[UNK]', '[GO]') are kept in `char2index`. They are only encoded from the texts given
+    as lists of tokens, and are never used to filter the texts.
+
+    Use `build_vocabulary` to share a vocabulary among all the pipelines and converters of a process.
+    """
+
+    def __init__(self, characters, char2index=None, pattern=False):
+        """
+        Args:
+            characters (str | Iterable(str)): the supported characters, or the content of a regex character class if
+                                              `pattern` is True, e.g. 'a-z0-9'
+            char2index (dict | None): index of each token, default to the position in `characters` (the last one
+                                      of the duplicates)
+            pattern (bool): whether `characters` is the content of a regex character class, as in the recognition
+                            wordmaps
+        """
+        if pattern:
+            assert isinstance(characters, str), "characters should be a str if pattern is True !!!"
+            self.characters = characters
+            self._unsupported = re.compile('[^' + characters + ']') if characters else re.compile('(?s).')
+        else:
+            characters = list(characters)
+            self.characters = ''.join(char for char in characters if len(char) == 1)
+            chars = sorted(set(self.characters))
+            if chars:
+                self._unsupported = re.compile('[^' + ''.join(re.escape(char) for char in chars) + ']')
+            else:
+                self._unsupported = re.compile('(?s).')
+
+        if char2index is None:
+            char2index = {char: idx for idx, char in enumerate(characters)} if not pattern else dict()
+        self.char2index = dict(char2index)
+
+        # Index of each code point, and -1 for the characters out of the vocabulary (also in the last entry, which
+        # all the code points out of the table are clipped to)
+        singles = {ord(char): idx for char, idx in self.char2index.items() if len(char) == 1}
+        self._index_table = np.full(max(singles, default=-1) + 2, -1, dtype=np.int64)
+        if singles:
+            self._index_table[np.array(list(singles.keys()), dtype=np.int64)] = list(singles.values())
+
+    def filter(self, text):
+        """
+        Args:
+            text (str): input text
+
+        Returns:
+            str: text without the unsupported characters
+        """
+        return self._unsupported.sub('', text)
+
+    def is_supported(self, text):
+        """
+        Args:
+            text (str): input text
+
+        Returns:
+            bool: whether all the characters of the text are supported
+        """
+        return self._unsupported.search(text) is None
+
+    def _code_points(self, text):
+        """ Code points of a text, clipped to the last entry of the index table """
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype='<u4').astype(np.int64)
+        return np.minimum(codes, len(self._index_table) - 1)
+
+    def encode(self, text, unknown=None):
+        """
+        Args:
+            text (str | list(str)): input text, or its tokens
+            unknown (int | None): index of the characters out of the vocabulary. None means raising a KeyError
+
+        Returns:
+            np.ndarray: indexes of the characters (tokens), in shape of [len(text)]
+        """
+        if not isinstance(text, str):
+            if any(len(token) != 1 for token in text):
+                # Tokens of multiple characters are looked up one by one
+                if unknown is None:
+                    return np.array([self.char2index[token] for token in text], dtype=np.int64)
+                return np.array([self.char2index.get(token, unknown) for token in text], dtype=np.int64)
+            text = ''.join(text)
+        indexes = self._index_table[self._code_points(text)]
+        missing = indexes < 0
+        if missing.any():
+            if unknown is None:
+                raise KeyError(text[int(np.argmax(missing))])
+            indexes[missing] = unknown
+        return indexes
+
+    def encode_batch(self, texts, unknown=None):
+        """ Encode the texts by one lookup
+
+        Args:
+            texts (list(str | list(str))): input texts, or their tokens
+            unknown (int | None): index of the characters out of the vocabulary. None means raising a KeyError
+
+        Returns:
+            list(np.ndarray): indexes of the characters of each text
+        """
+        if not all(isinstance(text, str) for text in texts):
+            return [self.encode(text, unknown) for text in texts]
+        indexes = self.encode(''.join(texts), unknown)
+        return np.split(indexes, np.cumsum([len(text) for text in texts])[:-1]) if texts else []
+
+
+_VOCABULARIES = dict()
+
+
+def build_vocabulary(characters, char2index=None, pattern=False):
+    """ Build a vocabulary, or return the one built with the same arguments in this process
+
+    Args:
+        characters (str | Iterable(str)): see `Vocabulary`
+        char2index (dict | None): see `Vocabulary`
+        pattern (bool): see `Vocabulary`
+
+    Returns:
+        Vocabulary: the compiled vocabulary
+    """
+    key = (characters if isinstance(characters, str) else tuple(characters),
+           None if char2index is None else tuple(char2index.items()),
+           pattern)
+    if key not in _VOCABULARIES:
+        _VOCABULARIES[key] = Vocabulary(key[0], char2index, pattern)
+    return _VOCABULARIES[key]
@@ -9,5 +9,6 @@
 ##################################################################################################
 """
 from .hmean import evaluate_method
+from .polygon_match import ImageMatching, map_images
 
-__all__ = ['evaluate_method']
+__all__ = ['evaluate_method', 'ImageMatching', 'map_images']
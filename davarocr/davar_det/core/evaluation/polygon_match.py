@@ -0,0 +1,203 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    polygon_match.py
+# Abstract       :    Batched polygon matching engine shared by the hmean-style evaluation metrics
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import multiprocessing
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+def polygons_from_points(points_list):
+    """ Build polygons from lists of arbitrary number of points. As in the official IC15 / CTW1500 protocols,
+    coordinates are truncated to integers. Self-intersecting polygons are repaired with `shapely.make_valid` for the
+    intersections, while their areas are the absolute shoelace areas of the original contours, as in Polygon3.
+
+    Args:
+        points_list(list(list(float))): polygons in format of [[x1, y1, x2, y2, ..., xn, yn], ...]
+
+    Returns:
+        np.ndarray: polygon objects, in shape of [N]
+    Returns:
+        np.ndarray: areas of the polygons, in shape of [N]
+    Returns:
+        np.ndarray: axis-aligned bounding boxes of the polygons, in shape of [N, 4], [[x_min, y_min, x_max, y_max],...]
+    """
+    num = len(points_list)
+    geoms = np.empty(num, dtype=object)
+    areas = np.zeros(num, dtype=np.float64)
+    aabbs = np.zeros((num, 4), dtype=np.float64)
+    for i, points in enumerate(points_list):
+        num_points = len(points) // 2
+        coords = np.trunc(np.asarray(points[:num_points * 2], dtype=np.float64)).reshape(num_points, 2)
+        if num_points >= 3:
+            geoms[i] = Polygon(coords)
+            next_coords = np.roll(coords, -1, axis=0)
+            areas[i] = 0.5 * abs(np.sum(coords[:, 0] * next_coords[:, 1] - next_coords[:, 0] * coords[:, 1]))
+            aabbs[i, :2] = coords.min(axis=0)
+            aabbs[i, 2:] = coords.max(axis=0)
+        else:
+            geoms[i] = Polygon()
+
+    if num > 0:
+        invalid = ~shapely.is_valid(geoms)
+        if np.any(invalid):
+            geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms, areas, aabbs
+
+
+def pairwise_intersection(gt_geoms, gt_aabbs, det_geoms, det_aabbs):
+    """ Compute the intersection areas between all gt and det polygons of an image. Pairs whose bounding boxes do
+    not overlap are pruned, and the remaining pairs are intersected in a single batched call.
+
+    Args:
+        gt_geoms(np.ndarray): gt polygons, in shape of [G]
+        gt_aabbs(np.ndarray): bounding boxes of gt polygons, in shape of [G, 4]
+        det_geoms(np.ndarray): det polygons, in shape of [D]
+        det_aabbs(np.ndarray): bounding boxes of det polygons, in shape of [D, 4]
+
+    Returns:
+        np.ndarray: intersection areas, in shape of [G, D]
+    """
+    inter = np.zeros((len(gt_geoms), len(det_geoms)), dtype=np.float64)
+    if inter.size == 0:
+        return inter
+
+    overlap = (np.minimum(gt_aabbs[:, np.newaxis, 2], det_aabbs[np.newaxis, :, 2]) >
+               np.maximum(gt_aabbs[:, np.newaxis, 0], det_aabbs[np.newaxis, :, 0])) & \
+              (np.minimum(gt_aabbs[:, np.newaxis, 3], det_aabbs[np.newaxis, :, 3]) >
+               np.maximum(gt_aabbs[:, np.newaxis, 1], det_aabbs[np.newaxis, :, 1]))
+    gt_inds, det_inds = np.nonzero(overlap)
+    if len(gt_inds) > 0:
+        inter[gt_inds, det_inds] = shapely.area(shapely.intersection(gt_geoms[gt_inds], det_geoms[det_inds]))
+    return inter
+
+
+class ImageMatching:
+    """ Polygon matching of one image. Each intersection is computed once, and reused by the IoU, the don't-care
+    filtering, and the tiou-recall / tiou-precision of the matched pairs.
+    """
+
+    def __init__(self, gt_points, det_points, gt_dont_care, area_precision_constraint=0.5):
+        """
+        Args:
+            gt_points(list(list(float))): gt polygons, [[x1, y1, ..., xn, yn], ...]
+            det_points(list(list(float))): det polygons, [[x1, y1, ..., xn, yn], ...]
+            gt_dont_care(np.ndarray): whether each gt polygon is marked as don't care, in shape of [G]
+            area_precision_constraint(float): a det covered by a don't-care gt above this ratio is also don't care
+        """
+        self.gt_geoms, self.gt_areas, gt_aabbs = polygons_from_points(gt_points)
+        self.det_geoms, self.det_areas, det_aabbs = polygons_from_points(det_points)
+        self.gt_dont_care = np.asarray(gt_dont_care, dtype=bool).reshape(-1)
+        self.inter = pairwise_intersection(self.gt_geoms, gt_aabbs, self.det_geoms, det_aabbs)
+        self.union = self.gt_areas[:, np.newaxis] + self.det_areas[np.newaxis, :] - self.inter
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.iou = np.where(self.union != 0, self.inter / self.union, 0.)
+
+            # Detections covered by some don't-care gt are don't care
+            cover = np.where(self.det_areas[np.newaxis, :] != 0, self.inter / self.det_areas[np.newaxis, :], 0.)
+        self.det_dont_care = np.any(cover[self.gt_dont_care] > area_precision_constraint, axis=0)
+
+    def greedy_match(self, iou_constraint=0.5):
+        """ Match gts and dets greedily in their original order, as in the official protocols.
+
+        Args:
+            iou_constraint(float): IoU threshold of a match
+
+        Returns:
+            list(tuple(int)): matched pairs, [(gt index, det index), ...]
+        """
+        pairs = []
+        if self.iou.size == 0:
+            return pairs
+        det_free = ~self.det_dont_care
+        candidates = self.iou > iou_constraint
+        for gt_num in np.where(~self.gt_dont_care & np.any(candidates & det_free, axis=1))[0]:
+            det_inds = np.where(candidates[gt_num] & det_free)[0]
+            if len(det_inds) > 0:
+                det_free[det_inds[0]] = False
+                pairs.append((int(gt_num), int(det_inds[0])))
+        return pairs
+
+    def tiou_recall(self, gt_num, det_num):
+        """ tiou-recall of a pair, penalized by the area of the gt not covered by the det (Ct)
+
+        Args:
+            gt_num(int): gt index
+            det_num(int): det index
+
+        Returns:
+            float: tiou-recall
+        """
+        inter, gt_area, union = self.inter[gt_num, det_num], self.gt_areas[gt_num], self.union[gt_num, det_num]
+        ct_area = gt_area - inter
+        if not 0 <= ct_area <= gt_area or gt_area <= 0 or union == 0:
+            return 0
+        return inter * _penalty(ct_area / gt_area) / union
+
+    def tiou_precision(self, gt_num, det_num):
+        """ tiou-precision of a pair, penalized by the area of the det covered by other gts only (Ot)
+
+        Args:
+            gt_num(int): gt index
+            det_num(int): det index
+
+        Returns:
+            float: tiou-precision
+        """
+        inter, det_area, union = self.inter[gt_num, det_num], self.det_areas[det_num], self.union[gt_num, det_num]
+        ot_area = 0
+        others = np.where(self.inter[:, det_num] != 0)[0]
+        others = others[others != gt_num]
+        if not self.gt_dont_care[gt_num] and len(others) > 0:
+            try:
+                det_geom, gt_geom = self.det_geoms[det_num], self.gt_geoms[gt_num]
+                det_inside_others = shapely.intersection(det_geom, shapely.union_all(self.gt_geoms[others]))
+                ot_area = det_inside_others.area - shapely.intersection(det_inside_others, gt_geom).area
+            except shapely.errors.GEOSException:
+                return 0
+            if ot_area <= 1.0e-10:
+                ot_area = 0
+        if not 0 <= ot_area <= det_area or det_area <= 0 or union == 0:
+            return 0
+        return inter * _penalty(ot_area / det_area) / union
+
+
+def _penalty(ratio):
+    """ Penalty of the uncovered (Ct) or outlier (Ot) area ratio in tiou """
+    return 1 if ratio <= 0.01 else 1 - ratio
+
+
+def map_images(func, gt_results, det_results, params, num_workers=0):
+    """ Run the per-image evaluation function over all images, in a process pool if `num_workers` > 1.
+
+    Args:
+        func(callable): module-level function with signature `func(gt_result, det_result, params)`
+        gt_results(list(dict)): ground truth of each image
+        det_results(list(dict)): predictions of each image
+        params(dict): evaluation parameters
+        num_workers(int): number of worker processes, 0 or 1 means evaluating in the current process
+
+    Returns:
+        list: results of each image, in order
+    """
+    tasks = [(gt_result, det_result, params) for gt_result, det_result in zip(gt_results, det_results)]
+
+    # Daemonic processes (e.g. dataloader or background evaluation workers) are not allowed to have children
+    if num_workers > 1 and len(tasks) > 1 and not multiprocessing.current_process().daemon:
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            context = multiprocessing.get_context()
+        chunk_size = max(len(tasks) // (num_workers * 4), 1)
+        with context.Pool(num_workers) as pool:
+            return pool.starmap(func, tasks, chunksize=chunk_size)
+    return [func(*task) for task in tasks]
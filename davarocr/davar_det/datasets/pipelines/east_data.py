@@ -9,7 +9,6 @@
 ##################################################################################################
 """
 import os
-import math
 from ctypes import c_int, c_float
 import numpy as np
 from numpy import random
@@ -17,9 +16,11 @@ import numpy.ctypeslib as ctl
 
 from mmdet.datasets.builder import PIPELINES
 
+from davarocr.davar_common.datasets.pipelines.target_encoding import TargetEncoder, boxes_to_array, quad_edge_lengths
+
 
 @PIPELINES.register_module()
-class EASTDataGeneration:
+class EASTDataGeneration(TargetEncoder):
     """EAST training data generation [1]
 
     Ref: [1] An Efficient and Accurate Scene Text Detector. CVPR-2017
@@ -32,7 +33,8 @@ class EASTDataGeneration:
                  min_text_width=0,
                  max_text_width=2000,
                  lib_name=None,
-                 lib_dir=None
+                 lib_dir=None,
+                 target_dtype='float32'
                  ):
         """
         Args:
@@ -44,7 +46,9 @@ class EASTDataGeneration:
             max_text_width(int): allowed maximum text width, otherwise will be set as IGNORE
             lib_name(str): lib name of calling the function of ground-truth label generation
             lib_dir(str): lib path to calling the function of ground-truth label generation
+            target_dtype(str): dtype of the generated gt_masks, in range of ['float32', 'float16']
         """
+        super().__init__(target_dtype)
         if lib_name is None or not os.path.isfile(os.path.join(lib_dir, lib_name)):
             # Using default lib
             cur_path = os.path.realpath(__file__)
@@ -95,13 +99,8 @@ class EASTDataGeneration:
             dict: updated data flow
         """
         if self.generate_func is not None:
-            gts = self._parse_east_data_cpp(results['pad_shape'], results['gt_poly_bboxes'],
-                                            results['gt_poly_bboxes_ignore'], 4)
-            gt_masks = np.concatenate([gts['gt_score_map'][np.newaxis, :, :],
-                                       gts['gt_score_map_mask'][np.newaxis, :, :],
-                                       gts['gt_geo_map'],
-                                       gts['gt_geo_map_weight']],
-                                      axis=0)
+            gt_masks = self._parse_east_data_cpp(results['pad_shape'], results['gt_poly_bboxes'],
+                                                 results['gt_poly_bboxes_ignore'], 4)
         else:
             raise NotImplementedError('generate_func is None!')
         results['gt_masks'] = gt_masks
@@ -118,52 +117,35 @@ class EASTDataGeneration:
             pool_ratio(int): downsampling ratio of ground-truth map wrt original image
 
         Returns:
-            dict:   All gts in a dict, including:
-                gts['gt_score_map']: target score map
-                gts['gt_score_map_mask']: target score map mask, 0 for ignore, 1 for not ignore
-                gts['gt_geo_map']: target geo map
-                gts['gt_geo_map_weight']: target geo map mask, 0 for ignore, 1 for not ignore
+            np.ndarray: All gts in shape of [14, H, W] (RBOX) or [20, H, W] (QUAD), where
+                gt_masks[0]: target score map
+                gt_masks[1]: target score map mask, 0 for ignore, 1 for not ignore
+                gt_masks[2:7] or gt_masks[2:10]: target geo map
+                gt_masks[7:12] or gt_masks[10:18]: target geo map mask, 0 for ignore, 1 for not ignore
         """
         height, width, _ = img_shape
         height_new = int(height / pool_ratio)
         width_new = int(width / pool_ratio)
 
         # Filter out box whose length not equal to 8, and box whose edge length not support
-        gt_boxes_valid = []
-        gt_boxes_ignore_valid = []
-        for box in gt_boxes:
-            invalid = False
-            if len(box) != 8:
-                print("invalid annotation {}".format(box))
-                continue
-            for k in range(4):
-                # filter out box with unspport text length
-                if not (self.min_text_width <= math.sqrt((box[k * 2] - box[(k + 1) * 2 % 8]) ** 2 + (
-                        box[k * 2 + 1] - box[(k + 1) * 2 % 8 + 1]) ** 2) <= self.max_text_width):
-                    invalid = True
-                    print("filter out oversized text")
-                    gt_boxes_ignore_valid.append(box)
-            if not invalid:
-                gt_boxes_valid.append(np.array(box, dtype=np.int32))
-        for box in gt_boxes_ignore:
-            if len(box) != 8:
-                continue
-            gt_boxes_ignore_valid.append(np.array(box, dtype=np.int32))
-
-        # Used to store output gts.
-        gt_score_map = np.zeros(height_new * width_new, dtype=np.float32)
-        gt_score_map_mask = np.ones(height_new * width_new, dtype=np.int32)
+        gt_boxes = boxes_to_array(gt_boxes, 8, dtype=np.float64)
+        edge_lengths = quad_edge_lengths(gt_boxes)
+        valid = np.all((edge_lengths >= self.min_text_width) & (edge_lengths <= self.max_text_width), axis=1)
+        if not np.all(valid):
+            print("filter out {} oversized text".format(int(np.sum(~valid))))
+        gt_bboxes_np = gt_boxes[valid].astype(np.int32)
+        gt_bboxes_ignore_np = np.concatenate([gt_boxes[~valid], boxes_to_array(gt_boxes_ignore, 8, dtype=np.float64)],
+                                             axis=0).astype(np.int32)
+
         seed = random.randint(0, 999999999)
 
         if self.geometry == 'RBOX':
             # In RBOX mode, geo data is a map with 5 channels, [d1, d2, d3, d4, theta]
-            gt_geo_map = np.zeros(5 * height_new * width_new, dtype=np.float32)
-            gt_geo_map_weight = np.zeros(5 * height_new * width_new, dtype=np.float32)
+            geo_channels = 5
             geometry_mode = 0
         else:
-            # In QUAD mode, geo data is a map with 5 channels, [dx_1, dy_1, dx_2, dy_2, dx_3, dy_3, dx_4, dy_4]
-            gt_geo_map = np.zeros(8 * height_new * width_new, dtype=np.float32)
-            gt_geo_map_weight = np.zeros(8 * height_new * width_new, dtype=np.float32)
+            # In QUAD mode, geo data is a map with 8 channels, [dx_1, dy_1, dx_2, dy_2, dx_3, dy_3, dx_4, dy_4]
+            geo_channels = 8
             geometry_mode = 1
 
         if self.label_shape == 'Normal':
@@ -171,24 +153,20 @@ class EASTDataGeneration:
         else:
             label_shape_mode = 1
 
-        # Calling C++ lib
-        if gt_boxes_valid:
-            gt_bboxes_np = np.array(gt_boxes_valid, dtype=np.int32)
-
-        else:
-            gt_bboxes_np = np.zeros((0, 8), dtype=np.int32)
-
-        if gt_boxes_ignore_valid:
-            gt_bboxes_ignore_np = np.array(gt_boxes_ignore_valid, dtype=np.int32)
-        else:
-            gt_bboxes_ignore_np = np.zeros((0, 8), dtype=np.int32)
+        # The C++ lib writes its outputs into channel views of gt_masks (or reused buffers of the required dtype)
+        gt_masks = self.alloc_targets(2 + 2 * geo_channels, height_new, width_new)
+        gt_score_map = self.channel_buffer(gt_masks, 0, 1, np.float32)
+        gt_score_map_mask = self.channel_buffer(gt_masks, 1, 1, np.int32)
+        gt_geo_map = self.channel_buffer(gt_masks, 2, geo_channels, np.float32)
+        gt_geo_map_weight = self.channel_buffer(gt_masks, 2 + geo_channels, geo_channels, np.float32)
 
+        # Calling C++ lib
         self.generate_func(height,
                            width,
                            gt_bboxes_np,
-                           len(gt_boxes_valid),
+                           len(gt_bboxes_np),
                            gt_bboxes_ignore_np,
-                           len(gt_boxes_ignore_valid),
+                           len(gt_bboxes_ignore_np),
                            pool_ratio,
                            geometry_mode,
                            label_shape_mode,
@@ -200,20 +178,4 @@ class EASTDataGeneration:
                            gt_geo_map_weight,
                            seed)
 
-        gt_score_map = np.array(gt_score_map.reshape(height_new, width_new), dtype=np.float32)
-        gt_score_map_mask = np.array(gt_score_map_mask.reshape(height_new, width_new), dtype=np.uint8)
-
-        if self.geometry == 'RBOX':
-            gt_geo_map = np.array(np.reshape(gt_geo_map, (5, height_new, width_new)), dtype=np.float32)
-            gt_geo_map_weight = np.array(np.reshape(gt_geo_map_weight,(5, height_new, width_new)), dtype=np.float32)
-        elif self.geometry == 'QUAD':
-            gt_geo_map = np.array(np.reshape(gt_geo_map,(8, height_new, width_new)), dtype=np.float32)
-            gt_geo_map_weight = np.array(np.reshape(gt_geo_map_weight,(8, height_new, width_new)), dtype=np.float32)
-
-        gts = dict()
-        gts['gt_score_map'] = gt_score_map
-        gts['gt_score_map_mask'] = gt_score_map_mask
-        gts['gt_geo_map'] = gt_geo_map
-        gts['gt_geo_map_weight'] = gt_geo_map_weight
-
-        return gts
+        return self.collect_targets(gt_masks)
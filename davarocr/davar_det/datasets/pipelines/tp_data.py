@@ -16,9 +16,11 @@ import numpy.ctypeslib as ctl
 
 from mmdet.datasets.builder import PIPELINES
 
+from davarocr.davar_common.datasets.pipelines.target_encoding import TargetEncoder, pad_polygons
+
 
 @PIPELINES.register_module()
-class TPDataGeneration:
+class TPDataGeneration(TargetEncoder):
     """Ground-Truth label generation in Text Perceptron model training, including segmentation and regression.[1]
 
     Ref: [1] Text Perceptron: Towards End-to-End Arbitrary Shaped Text Spotting. AAAI-20.
@@ -31,6 +33,7 @@ class TPDataGeneration:
                  ignore_ratio=0.6,
                  lib_name=None,
                  lib_dir=None,
+                 target_dtype='float32',
                  ):
         """ Ground-Truth label generation in Text Perceptron model training.
 
@@ -40,7 +43,9 @@ class TPDataGeneration:
             ignore_ratio(float)	    :    control pixel fractional ratio (calculated by foreground/background)
             lib_name(str)		    :    lib name of calling the function of ground-truth label generation
             lib_dir(str)		    :    lib path to calling the function of ground-truth label generation
+            target_dtype(str)       :    dtype of the generated gt_masks, in range of ['float32', 'float16']
         """
+        super().__init__(target_dtype)
 
         # If there is no identified lib path, use the default path
         if lib_name is None or not os.path.isfile(os.path.join(lib_dir, lib_name)):
@@ -110,15 +115,8 @@ class TPDataGeneration:
                                         gt_mask:[:,22:26]:  gt_geo_map_bond_weight
 
         """
-        gts = self._parse_tp_data_cpp(results['pad_shape'], results['gt_poly_bboxes'],
-                                      results['gt_poly_bboxes_ignore'], 4)
-
-        # Concatenate all the ground_truth lable
-        gt_masks = np.concatenate(
-            [gts['gt_score_map'][np.newaxis, :, :], gts['gt_score_map_mask'][np.newaxis, :, :],
-             gts['gt_geo_map_head'], gts['gt_geo_map_head_weight'], gts['gt_geo_map_tail'],
-             gts['gt_geo_map_tail_weight'], gts['gt_geo_map_bond'], gts['gt_geo_map_bond_weight']], axis=0)
-        results['gt_masks'] = gt_masks
+        results['gt_masks'] = self._parse_tp_data_cpp(results['pad_shape'], results['gt_poly_bboxes'],
+                                                       results['gt_poly_bboxes_ignore'], 4)
         return results
 
     def _parse_tp_data_cpp(self, img_shape, gt_boxes, gt_boxes_ignore, pool_ratio=4):
@@ -131,76 +129,41 @@ class TPDataGeneration:
             pool_ratio(int)                   :  downsampling ratio of ground-truth map wrt original image
 
         Returns:
-            dict:   All gts in a dict, including
-                    gt_score_map            :    target segmentation ground-truth [H x W]
-                    gt_score_map_mask       :    weight mask of target segmentation map （ignored if 0）[H x W]
-                    gt_geo_map_head         :    pixel regression ground-truth map of target head boundary area
-                                                 [4 x H x W]
-                    gt_score_map_head_weight:    weight mask of pixel regression ground-truth map of target head
-                                                 boundary area [4 x H x W]
-                    gt_geo_map_tail         :    pixel regression ground-truth map of target tail boundary area
-                                                 [4 x H x W]
-                    gt_score_map_tail_weight:    weight mask of pixel regression ground-truth map of target tail
-                                                 boudary area [4 x H x W]
-                    gt_geo_map_bond         :    pixel regression ground-truth map of target center area [4 x H x W]
-                    gt_score_map_bond_weight:    weight mask of pixel regression ground-truth map of target center
-                                                 area [4 x H x W]
+            np.ndarray:   All gts in shape of [26, H, W], including
+                    gt_masks[0]    :    target segmentation ground-truth
+                    gt_masks[1]    :    weight mask of target segmentation map （ignored if 0）
+                    gt_masks[2:6]  :    pixel regression ground-truth map of target head boundary area
+                    gt_masks[6:10] :    weight mask of pixel regression ground-truth map of target head boundary area
+                    gt_masks[10:14]:    pixel regression ground-truth map of target tail boundary area
+                    gt_masks[14:18]:    weight mask of pixel regression ground-truth map of target tail boundary area
+                    gt_masks[18:22]:    pixel regression ground-truth map of target center area
+                    gt_masks[22:26]:    weight mask of pixel regression ground-truth map of target center area
         """
 
         height, width, _ = img_shape
         new_height = int(height / pool_ratio)
         new_width = int(width / pool_ratio)
 
-        gt_boxes_np = np.zeros((len(gt_boxes), 48), dtype=np.int32)
-        gt_boxes_length_np = np.ones(len(gt_boxes), dtype=np.int32)
-        gt_boxes_ignore_np = np.zeros((len(gt_boxes_ignore), 48), dtype=np.int32)
-        gt_boxes_ignore_length_np = np.ones(len(gt_boxes_ignore), dtype=np.int32)
-
-        # Filter out boxes with length greater than 24 points
-        for i, box in enumerate(gt_boxes):
-            if len(box) > 48:
-                print("Point length larger than 48!")
-            gt_boxes_length_np[i] = len(box)
-            for j, box_j in enumerate(box):
-                gt_boxes_np[i, j] = box_j
-
-        for i, box in enumerate(gt_boxes_ignore):
-            if len(box) > 48:
-                print("Point length larger than 48!")
-            gt_boxes_ignore_length_np[i] = len(box)
-            for j, box_j in enumerate(box):
-                gt_boxes_ignore_np[i, j] = box_j
-
-        # Allocate spaces for returned results
-        gt_score_map = np.zeros(new_height * new_width, dtype=np.int32)
-        gt_mask = np.ones(new_height * new_width, dtype=np.int32)
-        gt_geo_head = np.zeros(4 * new_height * new_width, dtype=np.float32)
-        gt_geo_head_weight = np.zeros(4 * new_height * new_width,dtype=np.float32)
-        gt_geo_tail = np.zeros(4 * new_height * new_width, dtype=np.float32)
-        gt_geo_tail_weight = np.zeros(4 * new_height * new_width,dtype=np.float32)
-        gt_geo_bond = np.zeros(4 * new_height * new_width, dtype=np.float32)
-        gt_geo_bond_weight = np.zeros(4 * new_height * new_width,dtype=np.float32)
+        # Boxes with more than 24 points are truncated
+        gt_boxes_np, gt_boxes_length_np = pad_polygons(gt_boxes, 48)
+        gt_boxes_ignore_np, gt_boxes_ignore_length_np = pad_polygons(gt_boxes_ignore, 48)
+
+        # The C++ lib writes its outputs into channel views of gt_masks (or reused buffers of the required dtype)
+        gt_masks = self.alloc_targets(26, new_height, new_width)
+        gt_score_map = self.channel_buffer(gt_masks, 0, 1, np.int32)
+        gt_mask = self.channel_buffer(gt_masks, 1, 1, np.int32)
+        gt_geo_head = self.channel_buffer(gt_masks, 2, 4, np.float32)
+        gt_geo_head_weight = self.channel_buffer(gt_masks, 6, 4, np.float32)
+        gt_geo_tail = self.channel_buffer(gt_masks, 10, 4, np.float32)
+        gt_geo_tail_weight = self.channel_buffer(gt_masks, 14, 4, np.float32)
+        gt_geo_bond = self.channel_buffer(gt_masks, 18, 4, np.float32)
+        gt_geo_bond_weight = self.channel_buffer(gt_masks, 22, 4, np.float32)
 
         # Calling C++ lib
-        self.generate_func(height, width, gt_boxes_np, len(gt_boxes), gt_boxes_length_np, gt_boxes_ignore_np,
-                           len(gt_boxes_ignore), gt_boxes_ignore_length_np, pool_ratio, c_float(self.shrink_head_ratio),
-                           c_float(self.shrink_bond_ratio), c_float(self.ignore_ratio), gt_score_map, gt_mask,
-                           gt_geo_head, gt_geo_head_weight, gt_geo_tail, gt_geo_tail_weight, gt_geo_bond,
-                           gt_geo_bond_weight)
-
-        # Return formatted results
-        gts = dict()
-        gts['gt_score_map'] = np.array(gt_score_map.reshape(new_height, new_width), dtype=np.uint8)
-        gts['gt_score_map_mask'] = np.array(gt_mask.reshape(new_height, new_width), dtype=np.uint8)
-        gts['gt_geo_map_head'] = np.array(np.reshape(gt_geo_head, (4, new_height, new_width)), dtype=np.float32)
-        np.reshape(gt_geo_head, (4, new_height, new_width))
-        gts['gt_geo_map_head_weight'] = np.array(np.reshape(gt_geo_head_weight, (4, new_height, new_width)),
-                                                 dtype=np.float32)
-        gts['gt_geo_map_tail'] = np.array(np.reshape(gt_geo_tail, (4, new_height, new_width)), dtype=np.float32)
-        gts['gt_geo_map_tail_weight'] = np.array(np.reshape(gt_geo_tail_weight, (4, new_height, new_width)),
-                                                 dtype=np.float32)
-        gts['gt_geo_map_bond'] = np.array(np.reshape(gt_geo_bond, (4, new_height, new_width)), dtype=np.float32)
-        gts['gt_geo_map_bond_weight'] = np.array(np.reshape(gt_geo_bond_weight, (4, new_height, new_width)),
-                                                 dtype=np.float32)
-
-        return gts
+        self.generate_func(height, width, gt_boxes_np, len(gt_boxes_np), gt_boxes_length_np, gt_boxes_ignore_np,
+                           len(gt_boxes_ignore_np), gt_boxes_ignore_length_np, pool_ratio,
+                           c_float(self.shrink_head_ratio), c_float(self.shrink_bond_ratio),
+                           c_float(self.ignore_ratio), gt_score_map, gt_mask, gt_geo_head, gt_geo_head_weight,
+                           gt_geo_tail, gt_geo_tail_weight, gt_geo_bond, gt_geo_bond_weight)
+
+        return self.collect_targets(gt_masks)
@@ -28,6 +28,7 @@ class TextDetDataset(DavarCustomDataset):
                  test_mode=False,
                  filter_empty_gt=False,
                  classes_config=None,
+                 ann_store=None,
                  ):
         """
         Args:
@@ -40,14 +41,16 @@ class TextDetDataset(DavarCustomDataset):
             test_mode(boolean): whether in test mode
             filter_empty_gt(boolean): whether to filter out image without ground-truthes.
             classes_config(str): the path to classes config file, used to transfer 'str' labels into 'int'
+            ann_store(str | bool): directory of the annotation store of the datalist, see DavarCustomDataset
         """
         super().__init__(ann_file, pipeline, data_root, img_prefix, seg_prefix, proposal_file, test_mode,
-                         filter_empty_gt, classes_config)
+                         filter_empty_gt, classes_config, ann_store=ann_store)
         self.ignore = "###"
         self.eval_func_params = {
             "IOU_CONSTRAINT": 0.5,                   # IOU threshold for pred v.s. gt matching
             "AREA_PRECISION_CONSTRAINT": 0.5,      # IOU threshold for pred v.s. not-cared gt matching
-            "CONFIDENCES": False                    # If it is True, mAP will be calculated (default False)
+            "CONFIDENCES": False,                   # If it is True, mAP will be calculated (default False)
+            "NUM_WORKERS": 0                        # Number of processes to evaluate images in parallel
         }
 
     def evaluate(self,
@@ -66,7 +69,8 @@ class TextDetDataset(DavarCustomDataset):
                            eval_kwargs['eval_func_params']= dict(
                                "IOU_CONSTRAINT": 0.5 (default),
                                "AREA_PRECISION_CONSTRAINT": 0.5 (default),
-                               "CONFIDENCES": FAlSE (default)).
+                               "CONFIDENCES": FAlSE (default),
+                               "NUM_WORKERS": 0 (default)).
         Returns:
             dict: evaluation results, e.g.,
                   dict(
@@ -88,6 +92,8 @@ class TextDetDataset(DavarCustomDataset):
                 self.eval_func_params["AREA_PRECISION_CONSTRAINT"] = eval_func_params["AREA_PRECISION_CONSTRAINT"]
             if "CONFIDENCES" in eval_func_params:
                 self.eval_func_params["CONFIDENCES"] = eval_func_params["CONFIDENCES"]
+            if "NUM_WORKERS" in eval_func_params:
+                self.eval_func_params["NUM_WORKERS"] = eval_func_params["NUM_WORKERS"]
         det_results = []
         gt_results = []
         output = {}
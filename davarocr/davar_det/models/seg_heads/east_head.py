@@ -115,13 +115,13 @@ class EASTHead(nn.Module):
         Returns:
             Tensor: geo map weights, in shape of [B, 5, H/4, W/4] or [B, 8, H/4, W/4]
         """
-        score_map = gt_masks[:, 0:1, :, :]
+        score_map = gt_masks[:, 0:1, :, :].float()
         score_map_masks = gt_masks[:, 1, :, :].float()
         if self.geometry == 'RBOX':
-            geo_map = gt_masks[:, 2:7, :, :]
+            geo_map = gt_masks[:, 2:7, :, :].float()
             geo_map_weights = gt_masks[:, 7:12, :, :].float()
         else:
-            geo_map = gt_masks[:, 2:10, :, :]
+            geo_map = gt_masks[:, 2:10, :, :].float()
             geo_map_weights = gt_masks[:, 10: 18, :, :].float()
 
         return score_map, score_map_masks, geo_map, geo_map_weights
@@ -226,12 +226,12 @@ class TPHead(nn.Module):
         total_targets['score_map_masks_target'] = gt_masks[:, 1, :, :].float()
 
         # Regression gts
-        total_targets['geo_head_target'] = gt_masks[:, 2:6, :, :]
-        total_targets['geo_head_weights_target'] = gt_masks[:, 6:10, :, :]
-        total_targets['geo_tail_target'] = gt_masks[:, 10:14, :, :]
-        total_targets['geo_tail_weights_target'] = gt_masks[:, 14:18, :, :]
-        total_targets['geo_bond_target'] = gt_masks[:, 18:22, :, :]
-        total_targets['geo_bond_weights_target'] = gt_masks[:, 22:, :, :]
+        total_targets['geo_head_target'] = gt_masks[:, 2:6, :, :].float()
+        total_targets['geo_head_weights_target'] = gt_masks[:, 6:10, :, :].float()
+        total_targets['geo_tail_target'] = gt_masks[:, 10:14, :, :].float()
+        total_targets['geo_tail_weights_target'] = gt_masks[:, 14:18, :, :].float()
+        total_targets['geo_bond_target'] = gt_masks[:, 18:22, :, :].float()
+        total_targets['geo_bond_weights_target'] = gt_masks[:, 22:, :, :].float()
 
         return total_targets
 
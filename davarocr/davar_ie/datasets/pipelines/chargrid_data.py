@@ -21,6 +21,7 @@ from string import punctuation
 from mmcv.parallel import DataContainer as DC
 from mmdet.datasets.builder import PIPELINES
 from davarocr.davar_layout.datasets.pipelines import MMLAFormatBundle
+from davarocr.davar_common.utils import build_vocabulary
 from mmdet.datasets.pipelines.formating import to_tensor
 
 
@@ -82,6 +83,7 @@ class ChargridDataGeneration():
 
                     # default 0 to background
                     self.word2idx = {char: idx for idx, char in enumerate(self.character)}
+                    self.vocabulary = build_vocabulary(self.character)
             else:
                 raise ValueError("vocab.txt is required in chargrid datageneration...")
         else:
@@ -91,6 +93,7 @@ class ChargridDataGeneration():
 
             # default 0 to background
             self.word2idx = {char: idx for idx, char in enumerate(self.character)}
+            self.vocabulary = build_vocabulary(self.character)
 
     def __call__(self, results):
         img = results['img']
@@ -135,15 +138,10 @@ class ChargridDataGeneration():
                 if self.use_tokenization and self.tokenizer:
                     pass
                 else:
-                    for char_idx, per_char in enumerate(real_content):
-                        if per_char in self.word2idx.keys():
-                            fake_data[start_h:end_h,
-                            start_w + char_idx * char_span: start_w + (char_idx + 1) * char_span] = self.word2idx[
-                                per_char]
-                        else:
-                            fake_data[start_h:end_h,
-                            start_w + char_idx * char_span: start_w + (char_idx + 1) * char_span] = self.word2idx[
-                                '[UNK]']
+                    char_ids = self.vocabulary.encode(real_content, unknown=self.word2idx['[UNK]'])
+                    for char_idx, char_id in enumerate(char_ids):
+                        fake_data[start_h:end_h,
+                        start_w + char_idx * char_span: start_w + (char_idx + 1) * char_span] = char_id
 
                         if self.with_label:
                             fake_label[start_h:end_h,
@@ -10,10 +10,10 @@
 # Date           :    2022-12-12
 ##################################################################################################
 """
-import copy
 import numpy as np
 
 from mmdet.datasets.builder import PIPELINES
+from davarocr.davar_common.utils import build_vocabulary
 
 
 @PIPELINES.register_module()
@@ -46,6 +46,7 @@ class CharPadTokenize():
 
         # default 0 to pad
         self.word2idx = {char: idx for idx, char in enumerate(self.character)}
+        self.vocabulary = build_vocabulary(self.character)
 
     def __call__(self, results):
         """Forward process, including tokenization and (optional) padding.
@@ -57,18 +58,17 @@ class CharPadTokenize():
             dict: overwrite or add new k-v pairs in this process.
         """
         for key in self.targets:
-            per_target = copy.deepcopy(results[key])
+            per_target = results[key]
             per_target_token = []
-            for per_line in per_target:
-                tmp_per_line = [self.word2idx[per_char] if per_char in self.word2idx.keys() else self.word2idx['[UNK]']
-                                for per_char in per_line]
+            for tmp_per_line in self.vocabulary.encode_batch(per_target, unknown=self.word2idx['[UNK]']):
                 # pad to max length if required
                 if self.max_length is not None:
                     if len(tmp_per_line) > self.max_length:
                         tmp_per_line = tmp_per_line[:self.max_length]
                     else:
-                        tmp_per_line.extend([self.word2idx['[PAD]']] * (self.max_length - len(tmp_per_line)))
-                per_target_token.append(np.array(tmp_per_line))
+                        tmp_per_line = np.pad(tmp_per_line, (0, self.max_length - len(tmp_per_line)),
+                                              constant_values=self.word2idx['[PAD]'])
+                per_target_token.append(tmp_per_line)
 
             # add map_target to results if required.
             if self.map_target_prefix is not None:
@@ -4,12 +4,10 @@
 # Filename       :    multimodal_context_module.py
 # Abstract       :    compute multimodal context for each bbox/ node.
 
-# Current Version:    1.0.1
-# Date           :    2021-07-28
+# Current Version:    1.0.2
+# Date           :    2026-10-19
 ######################################################################################################
 """
-import copy
-
 import torch
 from torch import nn
 from mmcv.runner import load_checkpoint
@@ -94,7 +92,7 @@ class MultiModalContextModule(nn.Module):
                    img_meta,
                    info_labels,
                    bieo_labels=None):
-        """ Forward computation
+        """ Pack the nodes of a batch into one variable-length sequence, without padding
 
         Args:
             feat_all (list(Tensor)):
@@ -103,84 +101,43 @@ class MultiModalContextModule(nn.Module):
             pos_feat (list(Tensor)): box Tensor for each sample in a batch, e.g. B x 4
             img_meta (list(dict)): img_metas for each sample in a batch
             info_labels (list(Tensor)): category labels for all text bboxes
-            bieo_labels (list(list(Tensor))): category labels for each characters in all bboxes if exist
+            bieo_labels (list(list(list(int)))): category labels for each characters in all bboxes if exist
 
         Returns:
-            list(list(Tensor)):
-                0: visual features for each sample, padded to same length, in Max_N x C x H x W
-                1: textual features for each sample, padded to same length, in Max_N x L x C
+            list(Tensor):
+                0: visual features of all the nodes, in N x C x H x W
+                1: textual features of all the nodes, in N x L x C
+        Returns:
+            Tensor: normalized boxes of all the nodes, in N x 4
         Returns:
-            list(Tensor): box Tensor to same length, in Max_N x 4
+            Tensor: category labels of all the nodes, in N, or None
         Returns:
-            list(Tensor): category label Tensor to same length, in Max_N
+            Tensor: bieo labels of all the nodes, in N x L, or None
         Returns:
-            list(Tensor): bieo label Tensor to same length, in Max_N x L
+            Tensor: cumulative node offsets of the samples, in B + 1, the nodes of the i-th sample are in
+                    [offsets[i], offsets[i + 1])
         """
-        img_feat_all = feat_all
-        max_length = max([per_b.size(0) for per_b in pos_feat])
-
-        # 0: visual feat, 1: textual feat
-        batched_img_feat = [[], []]
-        batched_pos_feat = []
-        batched_img_label = []
-        batched_img_bieo_label = []
-        last_idx = 0
-
-        # pack
-        for i, _ in enumerate(pos_feat):
-            # visual feat
-            b_s = pos_feat[i].size(0)
-            img_feat = img_feat_all[0]
-            img_feat_size = list(img_feat.size())
-            img_feat_size[0] = max_length - b_s
-            batched_img_feat[0].append(
-                torch.cat((img_feat[last_idx: last_idx + b_s], img_feat.new_full(img_feat_size, 0)), 0))
-
-            # textual feat
-            img_feat = img_feat_all[1]
-            img_feat_size = list(img_feat.size())
-            img_feat_size[0] = max_length - b_s
-            batched_img_feat[1].append(
-                torch.cat((img_feat[last_idx: last_idx + b_s], img_feat.new_full(img_feat_size, 0)), 0))
-
-            # pos feat
-            per_pos_feat = pos_feat[i]
-            image_shape_h, image_shape_w = img_meta[i]['img_shape'][:2]
-            per_pos_feat_expand = per_pos_feat.new_full((per_pos_feat.size(0), 4), 0)
-            per_pos_feat_expand[:, 0] = per_pos_feat[:, 0]
-            per_pos_feat_expand[:, 1] = per_pos_feat[:, 1]
-            per_pos_feat_expand[:, 2] = per_pos_feat[:, 2]
-            per_pos_feat_expand[:, 3] = per_pos_feat[:, 3]
-            img_feat_size = list(per_pos_feat_expand.size())
-            img_feat_size[0] = max_length - b_s
-
-            # normalize
-            per_pos_feat_expand[:, ::2] = per_pos_feat_expand[:, ::2] / image_shape_w
-            per_pos_feat_expand[:, 1::2] = per_pos_feat_expand[:, 1::2] / image_shape_h
-
-            batched_pos_feat.append(
-                torch.cat((per_pos_feat_expand, per_pos_feat_expand.new_full(img_feat_size, 0)), 0))
-
-            # classification labels
-            if info_labels is not None:
-                per_label = info_labels[i]
-                img_feat_size = list(per_label.size())
-                img_feat_size[0] = max_length - b_s
-                batched_img_label.append(
-                    torch.cat((per_label, per_label.new_full(img_feat_size, 255)), 0))
-
-            # bieo labels
-            if bieo_labels is not None:
-                per_label = copy.deepcopy(bieo_labels[i])
-                per_label = torch.tensor(per_label, dtype=torch.long).to(img_feat.device)
-
-                img_feat_size = list(per_label.size())
-                img_feat_size[0] = max_length - b_s
-                batched_img_bieo_label.append(
-                    torch.cat((per_label, per_label.new_full(img_feat_size, 255)), 0))
-
-            last_idx += b_s
-        return batched_img_feat, batched_pos_feat, batched_img_label, batched_img_bieo_label
+        device = feat_all[0].device
+        num_nodes = [per_pos.size(0) for per_pos in pos_feat]
+        offsets = torch.cumsum(torch.tensor([0] + num_nodes, device=device), 0)
+
+        # normalize the boxes of every sample by its image shape
+        packed_pos_feat = torch.cat([per_pos[:, :4] for per_pos in pos_feat], 0)
+        img_scales = packed_pos_feat.new_tensor([[meta['img_shape'][1], meta['img_shape'][0]] * 2
+                                                 for meta in img_meta])
+        img_scales = torch.repeat_interleave(img_scales, img_scales.new_tensor(num_nodes, dtype=torch.long), 0)
+        packed_pos_feat = packed_pos_feat / img_scales
+
+        # classification labels
+        packed_img_label = torch.cat(info_labels, 0) if info_labels is not None else None
+
+        # bieo labels, converted to one Tensor at once
+        packed_img_bieo_label = None
+        if bieo_labels is not None:
+            packed_img_bieo_label = torch.tensor([per_box for per_img in bieo_labels for per_box in per_img],
+                                                 dtype=torch.long, device=device)
+
+        return feat_all, packed_pos_feat, packed_img_label, packed_img_bieo_label, offsets
 
     def forward(self,
                 info_feat_list,
@@ -197,40 +154,34 @@ class MultiModalContextModule(nn.Module):
             pos_feat (list(Tensor)): box Tensor for each sample in a batch, e.g. B x 4
             img_metas (list(dict)): img_metas for each sample in a batch
             info_labels (list(Tensor)): category labels for all text bboxes
-            bieo_labels (list(list(Tensor))): category labels for each characters in all bboxes if exist
+            bieo_labels (list(list(list(int)))): category labels for each characters in all bboxes if exist
 
         Returns:
-            Tensor: fused feature maps, in shape of [B x Max_N x C]
+            Tensor: fused feature of all the nodes in a batch, in shape of [N x C]
         Returns:
-            list(Tensor): category labels for bboxes in each sample
+            Tensor: category labels of all the nodes, in shape of [N], or None
         Returns:
-            list(Tensor): bieo label Tensor to same length, in B x Max_N x L
+            Tensor: bieo labels of all the nodes, in shape of [N x L], or None
         """
-        # pack data in a batch to same length
-        batched_img_feat, batched_pos_feat, batched_img_label, batched_img_bieo_label = self.pack_batch(info_feat_list,
-                                                                                                pos_feat=pos_feat,
-                                                                                                img_meta=img_metas,
-                                                                                                info_labels=info_labels,
-                                                                                                bieo_labels=bieo_labels)
-        origin_visual_context = batched_img_feat[0]
-        origin_textual_context = batched_img_feat[1]
-        # textual embedding
-        textual_context = self.textual_embedding(origin_textual_context, batched_pos_feat)
-
-        # textual context embedding
+        # pack data in a batch to one sequence
+        packed_feat, packed_pos_feat, packed_img_label, packed_img_bieo_label, offsets = self.pack_batch(
+            info_feat_list, pos_feat=pos_feat, img_meta=img_metas, info_labels=info_labels, bieo_labels=bieo_labels)
+        origin_visual_context = packed_feat[0]
+        origin_textual_context = packed_feat[1]
+
+        # textual embedding, the packed nodes are embedded as one sample
+        textual_context = self.textual_embedding([origin_textual_context], [packed_pos_feat])
+
+        # textual context embedding, every sample only attends to its own nodes
         if self.with_textual_relation_module:
             head_mask = [None] * self.infor_bert_config.num_hidden_layers
-
-            tmp_batched_pos_bboxes = torch.stack(batched_pos_feat, 0)
-            sentence_mask = (torch.sum(torch.abs(tmp_batched_pos_bboxes), dim=-1) != 0).float()
-            sentence_mask = sentence_mask.to(dtype=next(self.parameters()).dtype)  # fp16 compatibility
-            sentence_mask = (1.0 - sentence_mask) * -10000.0
+            segment_lengths = (offsets[1:] - offsets[:-1]).tolist()
             all_bert_outputs = self.textual_relation_module(textual_context,
-                                                            attention_mask=sentence_mask[:, None, None, :],
-                                                            head_mask=head_mask)
+                                                            head_mask=head_mask,
+                                                            segment_lengths=segment_lengths)
             textual_context = all_bert_outputs[0]
 
         # multimodal context fusion
-        multimodal_contenxt = self.multimodal_fusion_module(origin_visual_context, textual_context)
+        multimodal_contenxt = self.multimodal_fusion_module([origin_visual_context], textual_context)
 
-        return multimodal_contenxt, batched_img_label, batched_img_bieo_label
+        return multimodal_contenxt[0], packed_img_label, packed_img_bieo_label
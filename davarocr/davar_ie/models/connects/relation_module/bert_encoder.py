@@ -52,6 +52,33 @@ class BertSelfAttention(nn.Module):
         x = x.view(*new_x_shape)
         return x.permute(0, 2, 1, 3)
 
+    def attend(self, query_layer, key_layer, value_layer, attention_mask=None, head_mask=None, relative_alpha=None):
+        # Take the dot product between "query" and "key" to get the raw attention scores.
+        attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
+        attention_scores = attention_scores / math.sqrt(self.attention_head_size)
+
+        # correct position
+        if relative_alpha is not None:
+            attention_scores += relative_alpha
+
+        if attention_mask is not None:
+            # Apply the attention mask is (precomputed for all layers in BertModel forward() function)
+            attention_scores = attention_scores + attention_mask
+
+        # Normalize the attention scores to probabilities.
+        attention_probs = nn.Softmax(dim=-1)(attention_scores)
+
+        # This is actually dropping out entire tokens to attend to, which might
+        # seem a bit unusual, but is taken from the original Transformer paper.
+        attention_probs = self.dropout(attention_probs)
+
+        # Mask heads if we want to
+        if head_mask is not None:
+            attention_probs = attention_probs * head_mask
+
+        context_layer = torch.matmul(attention_probs, value_layer)
+        return context_layer, attention_probs
+
     def forward(
             self,
             hidden_states,
@@ -59,7 +86,8 @@ class BertSelfAttention(nn.Module):
             head_mask=None,
             encoder_hidden_states=None,
             encoder_attention_mask=None,
-            relative_alpha=None
+            relative_alpha=None,
+            segment_lengths=None
     ):
         mixed_query_layer = self.query(hidden_states)
 
@@ -78,30 +106,22 @@ class BertSelfAttention(nn.Module):
         key_layer = self.transpose_for_scores(mixed_key_layer)
         value_layer = self.transpose_for_scores(mixed_value_layer)
 
-        # Take the dot product between "query" and "key" to get the raw attention scores.
-        attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
-        attention_scores = attention_scores / math.sqrt(self.attention_head_size)
-
-        # correct position
-        if relative_alpha is not None:
-            attention_scores += relative_alpha
-
-        if attention_mask is not None:
-            # Apply the attention mask is (precomputed for all layers in BertModel forward() function)
-            attention_scores = attention_scores + attention_mask
-
-        # Normalize the attention scores to probabilities.
-        attention_probs = nn.Softmax(dim=-1)(attention_scores)
-
-        # This is actually dropping out entire tokens to attend to, which might
-        # seem a bit unusual, but is taken from the original Transformer paper.
-        attention_probs = self.dropout(attention_probs)
-
-        # Mask heads if we want to
-        if head_mask is not None:
-            attention_probs = attention_probs * head_mask
-
-        context_layer = torch.matmul(attention_probs, value_layer)
+        if segment_lengths is None:
+            context_layer, attention_probs = self.attend(query_layer, key_layer, value_layer, attention_mask,
+                                                         head_mask, relative_alpha)
+        else:
+            # Packed sequences (1 x sum(N) x C): every segment only attends to itself, so that no padded token
+            # (and no N x N score of two different segments) is ever computed.
+            assert attention_mask is None and relative_alpha is None, \
+                "Segments of packed sequences can not be masked by a padded attention mask !!!"
+            context_layer, attention_probs = [], []
+            for query, key, value in zip(query_layer.split(segment_lengths, 2), key_layer.split(segment_lengths, 2),
+                                         value_layer.split(segment_lengths, 2)):
+                per_context, per_probs = self.attend(query, key, value, head_mask=head_mask)
+                context_layer.append(per_context)
+                attention_probs.append(per_probs)
+            context_layer = torch.cat(context_layer, 2)
+            attention_probs = tuple(attention_probs)
 
         context_layer = context_layer.permute(0, 2, 1, 3).contiguous()
         new_context_layer_shape = context_layer.size()[:-2] + (self.all_head_size,)
@@ -186,11 +206,12 @@ class BertAttention(nn.Module):
             head_mask=None,
             encoder_hidden_states=None,
             encoder_attention_mask=None,
-            relative_alpha=None
+            relative_alpha=None,
+            segment_lengths=None
     ):
         self_outputs = self.self(
             hidden_states, attention_mask, head_mask, encoder_hidden_states, encoder_attention_mask,
-            relative_alpha=relative_alpha
+            relative_alpha=relative_alpha, segment_lengths=segment_lengths
         )
         attention_output = self.output(self_outputs[0], hidden_states)
         outputs = (attention_output,) + self_outputs[1:]  # add attentions if we output them
@@ -243,9 +264,11 @@ class BertLayer(nn.Module):
             head_mask=None,
             encoder_hidden_states=None,
             encoder_attention_mask=None,
-            relative_alpha=None
+            relative_alpha=None,
+            segment_lengths=None
     ):
-        self_attention_outputs = self.attention(hidden_states, attention_mask, head_mask, relative_alpha=relative_alpha)
+        self_attention_outputs = self.attention(hidden_states, attention_mask, head_mask, relative_alpha=relative_alpha,
+                                                segment_lengths=segment_lengths)
         attention_output = self_attention_outputs[0]
         outputs = self_attention_outputs[1:]  # add self attentions if we output attention weights
 
@@ -277,7 +300,8 @@ class BertEncoder(nn.Module):
             head_mask=None,
             encoder_hidden_states=None,
             encoder_attention_mask=None,
-            relative_alpha=None
+            relative_alpha=None,
+            segment_lengths=None
     ):
         all_hidden_states = ()
         all_attentions = ()
@@ -287,7 +311,7 @@ class BertEncoder(nn.Module):
 
             layer_outputs = layer_module(
                 hidden_states, attention_mask, head_mask[i], encoder_hidden_states, encoder_attention_mask,
-                relative_alpha
+                relative_alpha, segment_lengths=segment_lengths
             )
             hidden_states = layer_outputs[0]
 
@@ -26,6 +26,9 @@ class TRIE(TwoStageEndToEnd):
     Ref: [1] TRIE: End-to-End Text Reading and Information Extraction for Document Understanding. ACM MM-20.
                 <https://arxiv.org/pdf/2005.13118.pdf>`_
     """
+    # simple_test returns the result of each image in a batch
+    batch_test = True
+
     def __init__(self,
                  backbone,
                  rcg_backbone,
@@ -260,17 +263,16 @@ class TRIE(TwoStageEndToEnd):
         info_feat_list.append(recog_hidden)
 
         # multimodal context module
-        multimodal_context, batched_img_label, _ = self.infor_context_module(info_feat_list,
-                                                                                           pos_feat=gt_bboxes,
-                                                                                           img_metas=img_metas,
-                                                                                           info_labels=info_labels,
-                                                                                           bieo_labels=gt_bieo_labels)
+        multimodal_context, node_labels, bieo_labels = self.infor_context_module(info_feat_list,
+                                                                                 pos_feat=gt_bboxes,
+                                                                                 img_metas=img_metas,
+                                                                                 info_labels=info_labels,
+                                                                                 bieo_labels=gt_bieo_labels)
 
         # node classification head if required
         if self.with_infor_node_cls_head:
             cls_pred = self.infor_node_cls_head(multimodal_context)
-            cls_pred = cls_pred.view(-1, cls_pred.size(-1))
-            tmp_labels = torch.cat(batched_img_label, 0).view(-1)
+            tmp_labels = node_labels.view(-1)
             valid_mask = tmp_labels != 255
             info_loss = self.infor_node_cls_head.loss(cls_pred[valid_mask], tmp_labels[valid_mask],
                                                             prefix='infor_')
@@ -278,22 +280,14 @@ class TRIE(TwoStageEndToEnd):
 
         # lstm + crf if required
         if self.with_infor_sequence_module and self.with_infor_ner_head:
-            valid_multimodal_context = []
-            for idx, per_gt_bbox in enumerate(gt_bboxes):
-                valid_length = per_gt_bbox.size(0)
-                valid_multimodal_context.append(multimodal_context[idx, :valid_length, :])
-
-            valid_multimodal_context = torch.cat(valid_multimodal_context, 0)[:, None, :].repeat(1,
-                                                                                                 recog_hidden.size(1),
-                                                                                                 1)
+            valid_multimodal_context = multimodal_context[:, None, :].expand(-1, recog_hidden.size(1), -1)
 
             fused_features = torch.cat((recog_hidden, valid_multimodal_context), -1)
 
             fused_features = self.infor_sequence_module(fused_features)
             outputs = self.infor_ner_head(fused_features)
 
-            valid_target = [torch.tensor(per, dtype=torch.long).to(fused_features.device) for per in gt_bieo_labels]
-            target = torch.cat(valid_target, 0)
+            target = bieo_labels
             mask = target.lt(255)
             target[target.eq(255)] = 0
             crf_loss = self.infor_ner_head.loss(outputs, target, mask)
@@ -319,11 +313,9 @@ class TRIE(TwoStageEndToEnd):
                 `with_rpn` is False.
 
         Returns:
-            list(dict) : predicted result, e.g. ['bboxes': np.array, 'texts': ['abc', 'def' ...],
+            list(dict) : predicted result of each image, e.g. ['bboxes': np.array, 'texts': ['abc', 'def' ...],
                     'bboxes_labels_pred': np.array, 'bboxes_bieo_labels_pred': np.array]
         """
-        result = {}
-
         # text detection branch
         x = self.extract_feat(img)
         # get origin input shape to onnx dynamic input shape
@@ -339,8 +331,8 @@ class TRIE(TwoStageEndToEnd):
 
         det_bboxes = [np.concatenate(box, axis=0) for box in results]
         if sum([box.shape[0] for box in det_bboxes]) == 0:
-            # non positive gts in current batch, we just not train the recognition branch
-            return results + (None, )
+            # non positive detections in current batch, we just not run the recognition branch
+            return [dict(bboxes=per_bbox[:, :4], texts=[]) for per_bbox in det_bboxes]
 
         if rescale:
             _bboxes = [torch.from_numpy(per_bbox[:, :4] * img_metas[idx]['scale_factor']).to(img.device) for
@@ -348,7 +340,11 @@ class TRIE(TwoStageEndToEnd):
         else:
             _bboxes = [torch.from_numpy(per_bbox[:, :4]).to(img.device) for per_bbox in det_bboxes]
 
-        result['bboxes'] = _bboxes[0].cpu().numpy()
+        # the rcg and ie stages run on the packed boxes of all images, and the results are split by image in the end
+        num_boxes = [per_bbox.size(0) for per_bbox in _bboxes]
+        box_ends = np.cumsum(num_boxes).tolist()
+        box_starts = [0] + box_ends[:-1]
+        result = [dict(bboxes=per_bbox.cpu().numpy()) for per_bbox in _bboxes]
 
         recog_rois = bbox2roi(_bboxes)
 
@@ -390,7 +386,8 @@ class TRIE(TwoStageEndToEnd):
         info_feat_list.append(recog_hidden)
 
         text = self.recog_sequence_head.get_pred_text(recog_prediction, self.test_cfg.batch_max_length)
-        result['texts'] = text
+        for per_result, start, end in zip(result, box_starts, box_ends):
+            per_result['texts'] = text[start:end]
 
         # multimodal context module
         multimodal_context, _, _ = self.infor_context_module(info_feat_list,
@@ -400,29 +397,24 @@ class TRIE(TwoStageEndToEnd):
                                                               bieo_labels=None)
 
         if self.with_infor_node_cls_head:
-            cls_pred = self.infor_node_cls_head(multimodal_context)
-            result['bboxes_labels_pred'] = cls_pred[0].cpu().numpy()
+            cls_pred = self.infor_node_cls_head(multimodal_context).cpu().numpy()
+            for per_result, start, end in zip(result, box_starts, box_ends):
+                per_result['bboxes_labels_pred'] = cls_pred[start:end]
 
         # lstm + crf if required
         if self.with_infor_sequence_module and self.with_infor_ner_head:
-            valid_multimodal_context = []
-            for idx, _ in enumerate(_bboxes):
-                valid_length = _bboxes[idx].size(0)
-                valid_multimodal_context.append(multimodal_context[idx, :valid_length, :])
-            valid_multimodal_context = torch.cat(valid_multimodal_context, 0)[:, None, :].repeat(1,
-                                                                                                 recog_hidden.size(
-                                                                                                     1), 1)
+            valid_multimodal_context = multimodal_context[:, None, :].expand(-1, recog_hidden.size(1), -1)
 
             fused_features = torch.cat((recog_hidden, valid_multimodal_context), -1)
 
             fused_features = self.infor_sequence_module(fused_features)
             outputs = self.infor_ner_head(fused_features)
 
-            tags = self.infor_ner_head.get_predict(outputs)
-
-            result['bboxes_bieo_labels_pred'] = tags[0].cpu().numpy()
+            tags = self.infor_ner_head.get_predict(outputs)[0].cpu().numpy()
+            for per_result, start, end in zip(result, box_starts, box_ends):
+                per_result['bboxes_bieo_labels_pred'] = tags[start:end]
 
-        return [result]
+        return result
 
     def aug_test(self, imgs, img_metas, rescale=False):
         """Forward aug_test. Not implemented.
@@ -201,39 +201,30 @@ class TRIEGT(TRIE):
             info_feat_list.append(recog_hidden)
 
         # multimodal context module
-        multimodal_context, batched_img_label, _ = self.infor_context_module(info_feat_list,
-                                                                                           pos_feat=gt_bboxes,
-                                                                                           img_metas=img_metas,
-                                                                                           info_labels=info_labels,
-                                                                                           bieo_labels=gt_bieo_labels)
+        multimodal_context, node_labels, bieo_labels = self.infor_context_module(info_feat_list,
+                                                                                 pos_feat=gt_bboxes,
+                                                                                 img_metas=img_metas,
+                                                                                 info_labels=info_labels,
+                                                                                 bieo_labels=gt_bieo_labels)
 
         # node classification task if required
         if self.with_infor_node_cls_head:
             cls_pred = self.infor_node_cls_head(multimodal_context)
-            cls_pred = cls_pred.view(-1, cls_pred.size(-1))
-            tmp_labels = torch.cat(batched_img_label, 0).view(-1)
+            tmp_labels = node_labels.view(-1)
             valid_mask = tmp_labels != 255
             info_loss = self.infor_node_cls_head.loss(cls_pred[valid_mask], tmp_labels[valid_mask], prefix='infor_')
             losses.update(info_loss)
 
         # lstm + crf if required
         if self.with_infor_sequence_module and self.with_infor_ner_head:
-            valid_multimodal_context = []
-            for idx, per_gt_bbox in enumerate(gt_bboxes):
-                valid_length = per_gt_bbox.size(0)
-                valid_multimodal_context.append(multimodal_context[idx, :valid_length, :])
-
-            valid_multimodal_context = torch.cat(valid_multimodal_context, 0)[:, None, :].repeat(1,
-                                                                                                 recog_hidden.size(1),
-                                                                                                 1)
+            valid_multimodal_context = multimodal_context[:, None, :].expand(-1, recog_hidden.size(1), -1)
 
             fused_features = torch.cat((recog_hidden, valid_multimodal_context), -1)
 
             fused_features = self.infor_sequence_module(fused_features)
             outputs = self.infor_ner_head(fused_features)
 
-            valid_target = [torch.tensor(per, dtype=torch.long).to(fused_features.device) for per in gt_bieo_labels]
-            target = torch.cat(valid_target, 0)
+            target = bieo_labels
             mask = target.lt(255)
             target[target.eq(255)] = 0
             crf_loss = self.infor_ner_head.loss(outputs, target, mask)
@@ -261,13 +252,15 @@ class TRIEGT(TRIE):
             gt_bieo_labels (list(list(list(float))): character-level labels
 
         Returns:
-            list(dict) : predicted result, e.g. ['bboxes': np.array, 'texts': ['abc', 'def' ...],
+            list(dict) : predicted result of each image, e.g. ['bboxes': np.array, 'texts': ['abc', 'def' ...],
                     'bboxes_labels_pred': np.array, 'bboxes_bieo_labels_pred': np.array]
         """
-
-        result = {}
-        result['bboxes'] = gt_bboxes[0][0].cpu().numpy()
-        result['texts'] = gt_texts[0][0]
+        # the ie stages run on the packed boxes of all images, and the results are split by image in the end
+        num_boxes = [per_bbox.size(0) for per_bbox in gt_bboxes[0]]
+        box_ends = np.cumsum(num_boxes).tolist()
+        box_starts = [0] + box_ends[:-1]
+        result = [dict(bboxes=per_bbox.cpu().numpy(), texts=per_texts)
+                  for per_bbox, per_texts in zip(gt_bboxes[0], gt_texts[0])]
 
         # text detection branch
         img_feat = self.extract_feat(img)
@@ -295,18 +288,13 @@ class TRIEGT(TRIE):
 
         # node classification task if required
         if self.with_infor_node_cls_head:
-            cls_pred = self.infor_node_cls_head(multimodal_context)
-            result['bboxes_labels_pred'] = cls_pred[0].cpu().numpy()
+            cls_pred = self.infor_node_cls_head(multimodal_context).cpu().numpy()
+            for per_result, start, end in zip(result, box_starts, box_ends):
+                per_result['bboxes_labels_pred'] = cls_pred[start:end]
 
         # lstm + crf if required
         if self.with_infor_sequence_module and self.with_infor_ner_head:
-            valid_multimodal_context = []
-            for idx, per_gt_bbox in enumerate(gt_bboxes):
-                valid_length = per_gt_bbox[0].size(0)
-                valid_multimodal_context.append(multimodal_context[idx, :valid_length, :])
-            valid_multimodal_context = torch.cat(valid_multimodal_context, 0)[:, None, :].repeat(1,
-                                                                                                 recog_hidden.size(
-                                                                                                     1), 1)
+            valid_multimodal_context = multimodal_context[:, None, :].expand(-1, recog_hidden.size(1), -1)
 
             fused_features = torch.cat((recog_hidden, valid_multimodal_context), -1)
 
@@ -316,11 +304,11 @@ class TRIEGT(TRIE):
             valid_target = [torch.tensor(per, dtype=torch.long).to(fused_features.device) for per in gt_bieo_labels[0]]
             target = torch.cat(valid_target, 0)
             mask = target.lt(255)
-            tags = self.infor_ner_head.get_predict(outputs, mask=mask)
-
-            result['bboxes_bieo_labels_pred'] = tags[0].cpu().numpy()
+            tags = self.infor_ner_head.get_predict(outputs, mask=mask)[0].cpu().numpy()
+            for per_result, start, end in zip(result, box_starts, box_ends):
+                per_result['bboxes_bieo_labels_pred'] = tags[start:end]
 
-        return [result]
+        return result
 
     def aug_test(self, imgs, img_metas, rescale=False):
         """Forward aug_test. Not implemented.
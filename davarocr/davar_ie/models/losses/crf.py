@@ -15,6 +15,9 @@ from torch import nn
 
 from mmdet.models.builder import LOSSES
 
+from davarocr.davar_common.models.layers import (crf_sequence_score, crf_log_partition, crf_viterbi_decode,
+                                                 crf_viterbi_backtrack_nbest)
+
 
 @LOSSES.register_module()
 class CRF(nn.Module):
@@ -26,6 +29,9 @@ class CRF(nn.Module):
     Args:
         num_tags: Number of tags.
         batch_first: Whether the first dimension corresponds to the size of a minibatch.
+        parallel: Whether to compute the partition function and the Viterbi decoding by associative scans in
+            O(log seq_length) sequential steps instead of looping over time, which is faster for long sequences
+            at the cost of O(num_tags^3) work per step.
     Attributes:
         start_transitions (`~torch.nn.Parameter`): Start transition score tensor of size
             ``(num_tags,)``.
@@ -40,12 +46,13 @@ class CRF(nn.Module):
     .. _Viterbi algorithm: https://en.wikipedia.org/wiki/Viterbi_algorithm
     """
 
-    def __init__(self, num_tags: int, batch_first: bool = False) -> None:
+    def __init__(self, num_tags: int, batch_first: bool = False, parallel: bool = False) -> None:
         if num_tags <= 0:
             raise ValueError(f'invalid number of tags: {num_tags}')
         super().__init__()
         self.num_tags = num_tags
         self.batch_first = batch_first
+        self.parallel = parallel
         self.start_transitions = nn.Parameter(torch.empty(num_tags))
         self.end_transitions = nn.Parameter(torch.empty(num_tags))
         self.transitions = nn.Parameter(torch.empty(num_tags, num_tags))
@@ -62,7 +69,7 @@ class CRF(nn.Module):
         nn.init.uniform_(self.transitions, -0.1, 0.1)
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}(num_tags={self.num_tags})'
+        return f'{self.__class__.__name__}(num_tags={self.num_tags}, parallel={self.parallel})'
 
     def forward(self, emissions: torch.Tensor,
                 tags: torch.LongTensor,
@@ -99,10 +106,18 @@ class CRF(nn.Module):
             tags = tags.transpose(0, 1)
             mask = mask.transpose(0, 1)
 
-        # shape: (batch_size,)
-        numerator = self._compute_score(emissions, tags, mask)
-        # shape: (batch_size,)
-        denominator = self._compute_normalizer(emissions, mask)
+        if self.parallel:
+            # shape: (batch_size,)
+            numerator = crf_sequence_score(emissions, tags, mask, self.start_transitions,
+                                           self.end_transitions, self.transitions)
+            # shape: (batch_size,)
+            denominator = crf_log_partition(emissions, mask, self.start_transitions,
+                                            self.end_transitions, self.transitions)
+        else:
+            # shape: (batch_size,)
+            numerator = self._compute_score(emissions, tags, mask)
+            # shape: (batch_size,)
+            denominator = self._compute_normalizer(emissions, mask)
         # shape: (batch_size,)
         llh = numerator - denominator
 
@@ -147,6 +162,9 @@ class CRF(nn.Module):
             mask = mask.transpose(0, 1)
 
         if nbest == 1:
+            if self.parallel:
+                return crf_viterbi_decode(emissions, mask, self.start_transitions, self.end_transitions,
+                                          self.transitions, 0 if pad_tag is None else pad_tag).unsqueeze(0)
             return self._viterbi_decode(emissions, mask, pad_tag).unsqueeze(0)
         return self._viterbi_decode_nbest(emissions, mask, nbest, pad_tag)
 
@@ -384,7 +402,7 @@ class CRF(nn.Module):
 
             # Find the top `nbest` maximum score over all possible current tag
             # shape: (batch_size, nbest, num_tags)
-            next_score, indices = next_score.view(batch_size, -1, self.num_tags).topk(nbest, dim=1)
+            next_score, indices = next_score.reshape(batch_size, -1, self.num_tags).topk(nbest, dim=1)
 
             if i == 1:
                 score = score.unsqueeze(-1).expand(-1, -1, nbest)
@@ -403,7 +421,7 @@ class CRF(nn.Module):
 
         # End transition score shape: (batch_size, num_tags, nbest)
         end_score = score + self.end_transitions.unsqueeze(-1)
-        _, end_tag = end_score.view(batch_size, -1).topk(nbest, dim=1)
+        _, end_tag = end_score.reshape(batch_size, -1).topk(nbest, dim=1)
 
         # shape: (batch_size,)
         seq_ends = mask.long().sum(dim=0) - 1
@@ -414,6 +432,9 @@ class CRF(nn.Module):
                              end_tag.view(-1, 1, 1, nbest).expand(-1, 1, self.num_tags, nbest))
         history_idx = history_idx.transpose(1, 0).contiguous()
 
+        if self.parallel:
+            return crf_viterbi_backtrack_nbest(history_idx, mask, nbest, pad_tag)
+
         # The most probable path for each sequence
         best_tags_arr = torch.zeros((seq_length, batch_size, nbest),
                                     dtype=torch.long, device=device)
@@ -10,7 +10,8 @@
 """
 from .docbank_dataset import DocBankDataset
 from .publaynet_dataset import PublaynetDataset
+from .layout_records import LayoutRecords, pack_layout_records
 from .pipelines import MMLALoadAnnotations, MMLAFormatBundle, CharTokenize
 
 __all__ = ['DocBankDataset', 'PublaynetDataset', 'MMLALoadAnnotations', 'MMLAFormatBundle',
-           'CharTokenize']
+           'CharTokenize', 'LayoutRecords', 'pack_layout_records']
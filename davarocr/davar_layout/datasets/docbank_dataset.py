@@ -8,9 +8,6 @@
 # Date           :    2020-12-06
 ##################################################################################################
 """
-import json
-import os
-import copy
 import random
 import torch
 import numpy as np
@@ -43,7 +40,9 @@ class DocBankDataset(MMLayoutDataset):
                  classes=None,
                  ann_prefix='',
                  eval_level=0,
-                 max_num=1024):
+                 max_num=1024,
+                 ann_records=None,
+                 record_vocab=None):
         """
         Args:
             ann_file(str): the path to datalist.
@@ -59,6 +58,8 @@ class DocBankDataset(MMLayoutDataset):
             ann_prefix(str): Annotation prefix path for each annotation file.
             eval_level(int): evaluation in which level. 1 for highest level, 0 for lowest level.
             max_num(int): specify the max number of tokens loading.
+            ann_records(str | bool): directory of the sharded annotation records, see MMLayoutDataset
+            record_vocab(str): vocabulary to tokenize the 'ctexts' when packing the records, see MMLayoutDataset
         """
         self.max_num = max_num
         super().__init__(
@@ -73,7 +74,9 @@ class DocBankDataset(MMLayoutDataset):
             classes_config=classes_config,
             ann_prefix=ann_prefix,
             classes=classes,
-            eval_level=eval_level
+            eval_level=eval_level,
+            ann_records=ann_records,
+            record_vocab=record_vocab
         )
 
     def pre_prepare(self, img_info):
@@ -88,57 +91,32 @@ class DocBankDataset(MMLayoutDataset):
 
         """
         if img_info['url'] is not None:
-            tmp_img_info = copy.deepcopy(img_info)
-            ann = json.load(open(os.path.join(self.ann_prefix, tmp_img_info['url']), 'r', encoding='utf8'))
+            tmp_img_info = dict(img_info)
+            ann = self.load_ann(tmp_img_info)
 
             if "content_ann" in ann.keys():
                 tmp_img_info["ann"] = ann["content_ann"]
-                cares = ann["content_ann"]["cares"]
-                bboxes = ann["content_ann"]["bboxes"]
-                cnt_bboxes = 0
-                areas = []
-                for idx, per_bbox in enumerate(bboxes):
-                    w_s, h_s, w_e, h_e = per_bbox
-                    area = (w_e - w_s) * (h_e - h_s)
-                    areas.append(area)
-                    if w_e > w_s and h_e > h_s:
-                        cnt_bboxes += 1
-                        continue
-                    else:
-                        # filter bboxes whose area equals 0.
-                        cares[idx] = 0
+                cares = np.asarray(ann["content_ann"]["cares"])
+                bboxes = np.asarray(ann["content_ann"]["bboxes"]).reshape(-1, 4)
+                areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
 
-                # we divide all tokens into three groups according to their areas, and sample due to memory limit.
-                if cnt_bboxes > self.max_num:
-                    area1 = []
-                    area10 = []
-                    area10_up = []
-                    for idx, area in enumerate(areas):
-                        if area > 10:
-                            area10_up.append(idx)
-                        elif area > 1:
-                            area10.append(idx)
-                        elif area == 1:
-                            area1.append(idx)
-                        else:
-                            continue
-                    if len(area1) > self.max_num//16:
-                        index = random.sample(area1, len(area1) - self.max_num//16)
-                        for i in index:
-                            cares[i] = 0
-
-                    if len(area10) > self.max_num//16:
-                        index10 = random.sample(area10, len(area10) - self.max_num//16)
-                        for i in index10:
-                            cares[i] = 0
+                # filter bboxes whose area equals 0.
+                dropped = ~((bboxes[:, 2] > bboxes[:, 0]) & (bboxes[:, 3] > bboxes[:, 1]))
 
+                # we divide all tokens into three groups according to their areas, and sample due to memory limit.
+                if len(dropped) - np.count_nonzero(dropped) > self.max_num:
+                    area1 = np.nonzero(areas == 1)[0].tolist()
+                    area10 = np.nonzero((areas > 1) & (areas <= 10))[0].tolist()
+                    area10_up = np.nonzero(areas > 10)[0].tolist()
                     num_res = self.max_num - min(self.max_num//16, len(area1)) - min(self.max_num//16, len(area10))
-                    if len(area10_up) > num_res:
-                        index10_up = random.sample(area10_up, len(area10_up) - num_res)
-                        for i in index10_up:
-                            cares[i] = 0
+                    for indexes, num_keep in ((area1, self.max_num//16), (area10, self.max_num//16),
+                                              (area10_up, num_res)):
+                        if len(indexes) > num_keep:
+                            dropped[random.sample(indexes, len(indexes) - num_keep)] = True
 
+                cares[dropped] = 0
                 tmp_img_info["ann"]["cares"] = cares
+
             else:
                 tmp_img_info["ann"] = None
 
@@ -146,15 +124,8 @@ class DocBankDataset(MMLayoutDataset):
                 tmp_img_info["ann2"] = ann["content_ann2"]
 
                 # filter wrong labels to not care
-                cares = ann["content_ann2"]["cares"]
-                bboxes = ann["content_ann2"]["bboxes"]
-                for idx, per_bbox in enumerate(bboxes):
-                    w_s, h_s, w_e, h_e = per_bbox
-                    if w_e > w_s and h_e > h_s:
-                        continue
-                    else:
-                        cares[idx] = 0
-                tmp_img_info["ann2"]["cares"] = cares
+                tmp_img_info["ann2"]["cares"] = self.filter_invalid_bboxes(ann["content_ann2"]["bboxes"],
+                                                                           ann["content_ann2"]["cares"])
 
             else:
                 tmp_img_info["ann2"] = None
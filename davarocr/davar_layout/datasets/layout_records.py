@@ -0,0 +1,299 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    layout_records.py
+# Abstract       :    Sharded binary records of the per-image layout annotations, used by MMLayoutDataset
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import json
+import multiprocessing
+import os
+import os.path as osp
+import pickle
+import shutil
+import time
+from functools import partial
+
+import numpy as np
+from mmcv.runner import get_dist_info
+
+from .pipelines.mm_layout_tokenizer import load_char_vocabulary
+
+RECORD_VERSION = 1
+
+# Numeric fields converted into arrays, and the nested ones into (flat array, end of each line)
+_ARRAY_FIELDS = ('bboxes', 'cares')
+_NESTED_FIELDS = ('cbboxes',)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _regular_array(items):
+    """ Convert a list of numbers, or of lists of numbers with the same length, into an array
+
+    Args:
+        items (list): input items
+
+    Returns:
+        np.ndarray | None: the array, or None if the items are not regular
+    """
+    if not isinstance(items, list):
+        return None
+    if all(_is_number(item) for item in items):
+        flat = items
+    elif all(isinstance(item, list) and all(_is_number(value) for value in item) for item in items) and \
+            len(set(len(item) for item in items)) == 1:
+        flat = [value for item in items for value in item]
+    else:
+        return None
+    array = np.array(flat)
+    if array.dtype.kind not in 'iuf':
+        return None
+    if array.dtype.kind in 'iu' and len(array) and array.min() >= -2 ** 31 and array.max() < 2 ** 31:
+        array = array.astype(np.int32)
+    return array.reshape(len(items), -1) if flat is not items else array
+
+
+def _nested_array(lines):
+    """ Convert a list of lines, each a regular list of numbers (or of lists of numbers), into a flat array
+
+    Args:
+        lines (list): input lines, e.g. the character boxes of each text line
+
+    Returns:
+        tuple(np.ndarray, np.ndarray) | None: the concatenated array and the end of each line in it, or None if the
+                                              lines are not regular
+    """
+    if not isinstance(lines, list) or not all(isinstance(line, list) for line in lines):
+        return None
+    array = _regular_array([item for line in lines for item in line])
+    if array is None:
+        return None
+    return array, np.cumsum([len(line) for line in lines], dtype=np.int64)
+
+
+def encode_record(ann, vocabulary=None, unknown=None):
+    """ Encode the annotation of an image into a binary record
+
+    Args:
+        ann (dict): per-image annotation, in the format of `MMLayoutDataset`, with 'content_ann', 'content_ann2', ...
+        vocabulary (Vocabulary | None): vocabulary to tokenize the 'ctexts' into 'ctext_ids'. None means not tokenized
+        unknown (int | None): index of the characters out of the vocabulary
+
+    Returns:
+        bytes: the record
+    """
+    record = dict(fields=dict(), arrays=dict(), splits=dict())
+    for key, value in ann.items():
+        if key not in ('content_ann', 'content_ann2') or not isinstance(value, dict):
+            record['fields'][key] = value
+            continue
+        fields = dict()
+        for name, item in value.items():
+            converted = None
+            if name in _ARRAY_FIELDS:
+                converted = _regular_array(item)
+            elif name in _NESTED_FIELDS:
+                converted = _nested_array(item)
+            elif name == 'ctexts' and vocabulary is not None and key == 'content_ann':
+                ids = vocabulary.encode_batch(item, unknown=unknown)
+                converted = (np.concatenate(ids).astype(np.int32) if ids else np.zeros(0, dtype=np.int32),
+                             np.cumsum([len(per_ids) for per_ids in ids], dtype=np.int64))
+                name = 'ctext_ids'
+
+            if converted is None:
+                fields[name] = item
+            elif isinstance(converted, tuple):
+                record['arrays'][(key, name)], record['splits'][(key, name)] = converted
+            else:
+                record['arrays'][(key, name)] = converted
+        record['fields'][key] = fields
+    return pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_record(data):
+    """ Decode a binary record
+
+    Args:
+        data (bytes): the record
+
+    Returns:
+        dict: the annotation of the image, in which the regular numeric fields are arrays, the nested fields are lists
+              of arrays (e.g. 'cbboxes' in shape of [[K x 4] x N]), and 'ctexts' is replaced by 'ctext_ids' if the
+              records are tokenized
+    """
+    record = pickle.loads(data)
+    ann = record['fields']
+    for (key, name), array in record['arrays'].items():
+        ends = record['splits'].get((key, name), None)
+        if ends is None:
+            ann[key][name] = array
+        else:
+            ann[key][name] = np.split(array, ends[:-1]) if len(ends) else []
+    return ann
+
+
+def _load_record(url, ann_prefix, vocabulary=None, unknown=None):
+    with open(osp.join(ann_prefix, url), 'r', encoding='utf8') as load_f:
+        return encode_record(json.load(load_f), vocabulary, unknown)
+
+
+def pack_layout_records(ann_file, ann_prefix, record_dir, vocab=None, add_space=True, shard_size=1 << 30,
+                        num_workers=0):
+    """ Pack the per-image annotation files of a datalist into sharded records, once. The records are written into a
+    temporary directory and then renamed, so that a partial directory is never used.
+
+    Args:
+        ann_file (str): path to the datalist, in the format of `MMLayoutDataset`
+        ann_prefix (str): annotation prefix path of the per-image annotation files
+        record_dir (str): directory of the records
+        vocab (str | None): vocabulary file of `CharTokenize`, used to tokenize the 'ctexts'. None means the 'ctexts'
+                            are kept as texts
+        add_space (bool): same as `CharTokenize`
+        shard_size (int): maximum bytes of a shard
+        num_workers (int): number of processes parsing the annotation files, 0 or 1 means the current process
+    """
+    with open(ann_file, 'r', encoding='utf8') as load_f:
+        datalist = json.load(load_f)
+    urls = sorted(set(info['url'] for key, info in datalist.items()
+                      if key != '###' and info.get('url', None) is not None))
+    del datalist
+
+    vocab_key = None
+    encode_func = partial(_load_record, ann_prefix=ann_prefix)
+    if vocab is not None:
+        word2idx, vocabulary, vocab_key = load_char_vocabulary(vocab, add_space)
+        encode_func = partial(encode_func, vocabulary=vocabulary, unknown=word2idx["UNKNOWN"])
+
+    tmp_dir = '{}.tmp{}'.format(record_dir.rstrip('/'), os.getpid())
+    os.makedirs(tmp_dir, exist_ok=True)
+    index = np.zeros((len(urls), 3), dtype=np.int64)
+    shard_id, shard_file, shard_bytes = -1, None, shard_size
+
+    pool = None
+    if num_workers > 1 and len(urls) > 1:
+        pool = multiprocessing.Pool(num_workers)
+        records = pool.imap(encode_func, urls, chunksize=max(min(len(urls) // (num_workers * 4), 256), 1))
+    else:
+        records = map(encode_func, urls)
+    try:
+        for idx, data in enumerate(records):
+            if shard_bytes + len(data) > shard_size and shard_bytes > 0:
+                if shard_file is not None:
+                    shard_file.close()
+                shard_id, shard_bytes = shard_id + 1, 0
+                shard_file = open(osp.join(tmp_dir, 'shard_{:05d}.bin'.format(shard_id)), 'wb')
+            index[idx] = shard_id, shard_bytes, len(data)
+            shard_file.write(data)
+            shard_bytes += len(data)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if shard_file is not None:
+            shard_file.close()
+
+    np.save(osp.join(tmp_dir, 'index.npy'), index)
+    meta = dict(version=RECORD_VERSION, num_records=len(urls), num_shards=shard_id + 1, vocab=vocab,
+                vocab_key=vocab_key, urls=urls)
+    with open(osp.join(tmp_dir, 'meta.json'), 'w', encoding='utf8') as write_f:
+        json.dump(meta, write_f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_dir, record_dir)
+    except OSError:
+        # Packed by another process in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not osp.exists(osp.join(record_dir, 'meta.json')):
+            raise
+
+
+class LayoutRecords:
+    """ Read-only sharded records of the per-image annotation files of a layout datalist. Each record is found by its
+    (shard, offset, length) in the index, so that loading an image is one read in a memory-mapped shard instead of
+    opening and parsing a JSON file. The shards are shared by all the dataloader workers and ranks on a machine.
+    """
+
+    def __init__(self, record_dir):
+        """
+        Args:
+            record_dir (str): directory of the records
+        """
+        self.record_dir = record_dir
+        with open(osp.join(record_dir, 'meta.json'), 'r', encoding='utf8') as load_f:
+            meta = json.load(load_f)
+        assert meta['version'] == RECORD_VERSION, \
+            'Unsupported layout record version {} in {}'.format(meta['version'], record_dir)
+        self.vocab_key = meta['vocab_key']
+        self.num_shards = meta['num_shards']
+        self.url_to_idx = {url: idx for idx, url in enumerate(meta['urls'])}
+        self.index = np.load(osp.join(record_dir, 'index.npy'))
+        self._shards = dict()
+
+    def __getstate__(self):
+        # The memory maps are opened again in the unpickled copy, rather than copied
+        state = self.__dict__.copy()
+        state['_shards'] = dict()
+        return state
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, url):
+        return url in self.url_to_idx
+
+    def _shard(self, shard_id):
+        if shard_id not in self._shards:
+            self._shards[shard_id] = np.memmap(osp.join(self.record_dir, 'shard_{:05d}.bin'.format(shard_id)),
+                                               dtype=np.uint8, mode='r')
+        return self._shards[shard_id]
+
+    def get(self, url):
+        """
+        Args:
+            url (str): relative path of the per-image annotation file, as in the datalist
+
+        Returns:
+            dict: the annotation of the image, see `decode_record`
+        """
+        shard_id, offset, length = self.index[self.url_to_idx[url]].tolist()
+        ann = decode_record(self._shard(shard_id)[offset:offset + length].tobytes())
+        content_ann = ann.get('content_ann', None)
+        if content_ann is not None and 'ctext_ids' in content_ann:
+            content_ann['ctext_vocab'] = self.vocab_key
+        return ann
+
+    @classmethod
+    def from_datalist(cls, ann_file, ann_prefix, record_dir, vocab=None, add_space=True, timeout=3600):
+        """ Open the records of a datalist. If they do not exist, they are packed by rank 0, and the other ranks wait
+        for them, so that each annotation file is parsed once. Use `tools/pack_layout_records.py` to pack them offline
+        for large datalists, or if the ranks do not share the file system.
+
+        Args:
+            ann_file (str): path to the datalist
+            ann_prefix (str): annotation prefix path of the per-image annotation files
+            record_dir (str): directory of the records
+            vocab (str | None): vocabulary file of `CharTokenize`, see `pack_layout_records`
+            add_space (bool): same as `CharTokenize`
+            timeout (int): maximum seconds the other ranks wait for the records
+
+        Returns:
+            LayoutRecords: the records
+        """
+        meta_file = osp.join(record_dir, 'meta.json')
+        if not osp.exists(meta_file):
+            rank, _ = get_dist_info()
+            if rank == 0:
+                pack_layout_records(ann_file, ann_prefix, record_dir, vocab, add_space)
+            else:
+                start = time.time()
+                while not osp.exists(meta_file):
+                    if time.time() - start > timeout:
+                        raise TimeoutError('Rank {} timed out waiting for the layout records {} packed by rank 0, '
+                                           'pack them with tools/pack_layout_records.py'.format(rank, record_dir))
+                    time.sleep(5)
+        return cls(record_dir)
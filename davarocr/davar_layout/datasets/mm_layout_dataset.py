@@ -9,7 +9,6 @@
 ##################################################################################################
 """
 import json
-import copy
 import os
 
 import numpy as np
@@ -17,6 +16,8 @@ import numpy as np
 from mmdet.datasets.builder import DATASETS
 from davarocr.davar_common.datasets import DavarCustomDataset
 
+from .layout_records import LayoutRecords
+
 
 @DATASETS.register_module()
 class MMLayoutDataset(DavarCustomDataset):
@@ -75,7 +76,9 @@ class MMLayoutDataset(DavarCustomDataset):
                  classes_config=None,
                  classes=None,
                  ann_prefix='',
-                 eval_level=1):
+                 eval_level=1,
+                 ann_records=None,
+                 record_vocab=None):
         """
         Args:
             ann_file(str): the path to datalist.
@@ -90,6 +93,12 @@ class MMLayoutDataset(DavarCustomDataset):
             classes(str): Dataset class, default None.
             ann_prefix(str): Annotation prefix path for each annotation file.
             eval_level(int): evaluation in which level. 1 for highest level, 0 for lowest level.
+            ann_records(str | bool): directory of the sharded records of the per-image annotation files, which are
+                                     packed from `ann_file` by rank 0 if they do not exist (see
+                                     `tools/pack_layout_records.py` to pack them offline). True means
+                                     `ann_file + '.records'`. Default None, the annotation file is parsed every time
+                                     an image is loaded.
+            record_vocab(str): vocabulary of `CharTokenize`, used to tokenize the 'ctexts' when packing the records.
         """
         self.ann_prefix = ann_prefix
         self.eval_level = eval_level
@@ -105,6 +114,13 @@ class MMLayoutDataset(DavarCustomDataset):
             classes_config=classes_config,
             classes=classes)
 
+        self.records = None
+        if ann_records:
+            record_dir = self.ann_file + '.records' if ann_records is True else ann_records
+            if self.data_root is not None and not os.path.isabs(record_dir):
+                record_dir = os.path.join(self.data_root, record_dir)
+            self.records = LayoutRecords.from_datalist(self.ann_file, self.ann_prefix, record_dir, vocab=record_vocab)
+
     def _cvt_list(self, img_info):
         """ Convert JSON dict into a list.
 
@@ -134,6 +150,40 @@ class MMLayoutDataset(DavarCustomDataset):
 
         return result_dict
 
+    def load_ann(self, img_info):
+        """Load the annotation file of an image, from the layout records if they are packed.
+
+        Args:
+            img_info(dict): img_info dict.
+
+        Returns:
+            dict: annotations of the image, with 'content_ann', 'content_ann2', ...
+        """
+        if self.records is not None and img_info['url'] in self.records:
+            return self.records.get(img_info['url'])
+        with open(os.path.join(self.ann_prefix, img_info['url']), 'r', encoding='utf8') as load_f:
+            return json.load(load_f)
+
+    @staticmethod
+    def filter_invalid_bboxes(bboxes, cares):
+        """Set the cares of the bboxes without area to 0.
+
+        Args:
+            bboxes(list | np.ndarray): bboxes in form of [[x0, y0, x1, y1], ...]
+            cares(list | np.ndarray): cares of the bboxes, updated in place
+
+        Returns:
+            list | np.ndarray: updated cares.
+        """
+        bboxes = np.asarray(bboxes).reshape(-1, 4)
+        invalid = ~((bboxes[:, 2] > bboxes[:, 0]) & (bboxes[:, 3] > bboxes[:, 1]))
+        if isinstance(cares, np.ndarray):
+            cares[invalid] = 0
+        else:
+            for idx in np.nonzero(invalid)[0].tolist():
+                cares[idx] = 0
+        return cares
+
     def pre_prepare(self, img_info):
         """Load per annotation file and reset img_info ann& ann2 fields.
 
@@ -145,23 +195,16 @@ class MMLayoutDataset(DavarCustomDataset):
 
         """
         if img_info['url'] is not None:
-            tmp_img_info = copy.deepcopy(img_info)
-            ann = json.load(open(os.path.join(self.ann_prefix, tmp_img_info['url']), 'r', encoding='utf8'))
+            tmp_img_info = dict(img_info)
+            ann = self.load_ann(tmp_img_info)
 
             tmp_img_info["ann"] = ann.get("content_ann", None)
             if "content_ann2" in ann.keys():
                 tmp_img_info["ann2"] = ann.get("content_ann2", None)
 
                 # filter invalid annotations.
-                cares = ann["content_ann2"]["cares"]
-                bboxes = ann["content_ann2"]["bboxes"]
-                for idx, per_bbox in enumerate(bboxes):
-                    w_s, h_s, w_e, h_e = per_bbox
-                    if w_e > w_s and h_e > h_s:
-                        continue
-                    else:
-                        cares[idx] = 0
-                tmp_img_info["ann2"]["cares"] = cares
+                tmp_img_info["ann2"]["cares"] = self.filter_invalid_bboxes(ann["content_ann2"]["bboxes"],
+                                                                           ann["content_ann2"]["cares"])
             else:
                 tmp_img_info["ann2"] = None
             return tmp_img_info
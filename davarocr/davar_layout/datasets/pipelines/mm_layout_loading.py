@@ -12,7 +12,7 @@ import numpy as np
 
 from mmdet.core import BitmapMasks, PolygonMasks
 from mmdet.datasets.builder import PIPELINES
-from davarocr.davar_common.datasets import DavarLoadAnnotations
+from davarocr.davar_common.datasets import DavarLoadAnnotations, CroppedBitmapMasks
 
 
 @PIPELINES.register_module()
@@ -29,6 +29,7 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
                  text_profile=None,
                  label_start_index=0,
                  poly2mask=True,
+                 crop_mask=False,
                  bieo_labels=None,
 
                  #mmla_loading
@@ -77,6 +78,8 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
                                      according to `classes_config`. The start label will be added. e.g., for mmdet 1.x,
                                      this value is set to [1];  for mmdet 2.x, this will be set to [0].
             poly2mask (boolean):      Whether to convert the instance masks from polygons to bitmaps. Default: True.
+            crop_mask (boolean):      Whether to keep the bitmaps as tight crops (:obj:`CroppedBitmapMasks`).
+                                      Default: False.
             with_cattribute (boolean): Whether to load attribute in character granularity.
             with_ctexts (boolean):     Whether to load character sequence annotations.
             with_bbox_2 (boolean):     Whether to load bbox annotation in larger scope (e.g. layout compared to text).
@@ -106,7 +109,8 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
             bieo_labels=bieo_labels,
             text_profile=text_profile,
             label_start_index=label_start_index,
-            poly2mask=poly2mask
+            poly2mask=poly2mask,
+            crop_mask=crop_mask
         )
 
     def _load_cares(self, results):
@@ -214,7 +218,9 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
                 if cares[idx] == 1:
                     gt_masks.append(ori_masks[idx])
 
-        if self.poly2mask:
+        if self.poly2mask and self.crop_mask:
+            gt_masks = CroppedBitmapMasks.from_polygons(gt_masks, height, width)
+        elif self.poly2mask:
             gt_masks = BitmapMasks(
                 [self._poly2mask(mask, height, width) for mask in gt_masks], height, width)
         else:
@@ -343,8 +349,7 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
 
         for i, text in enumerate(tmp_texts):
             if self.filtered:
-                text = [c for c in text if c in self.character]
-                text = ''.join(text)
+                text = self.vocabulary.filter(text)
 
             # Transfer text according to the sensitive tag.
             if self.sensitive == 'upper':
@@ -455,6 +460,13 @@ class MMLALoadAnnotations(DavarLoadAnnotations):
 
         """
         ann = results['ann_info']
+
+        # character ids tokenized in the layout records, `CharTokenize` will skip them
+        if 'ctext_ids' in ann:
+            results['gt_ctexts'] = ann['ctext_ids']
+            results.setdefault('tokenized', dict())['gt_ctexts'] = ann['ctext_vocab']
+            return results
+
         tmp_texts = ann.get('ctexts', [])
         results['gt_ctexts'] = tmp_texts
         return results
@@ -8,9 +8,45 @@
 # Date           :    2020-12-06
 ##################################################################################################
 """
+import hashlib
+import io
 import os
 
 from mmdet.datasets.builder import PIPELINES
+from davarocr.davar_common.utils import build_vocabulary
+
+
+def load_char_vocabulary(vocab, add_space=True):
+    """ Load the character vocabulary of `CharTokenize`
+
+    Args:
+        vocab (str): vocab.txt
+        add_space (bool): whether the white spaces are encoded as "SEP"
+
+    Returns:
+        dict: index of each word, 0 is the background
+    Returns:
+        Vocabulary: compiled vocabulary
+    Returns:
+        str: key of the vocabulary, which is the same for the same file content and `add_space`
+    """
+    with open(vocab, 'rb') as load_f:
+        content = load_f.read()
+    all_words = io.StringIO(content.decode('utf8'), newline=None).readlines()
+
+    # default 0 to background
+    word2idx = {char.strip(): idx + 1 for idx, char in enumerate(all_words)}
+    word2idx["UNKNOWN"] = len(all_words) + 1
+
+    if add_space:
+        word2idx["SEP"] = len(all_words) + 2
+
+    # the white spaces are encoded as "SEP"
+    char2index = dict(word2idx)
+    for char in [' ', '\n', '\t']:
+        char2index[char] = word2idx.get("SEP", word2idx["UNKNOWN"])
+    vocab_key = hashlib.md5(content + (b'+SEP' if add_space else b'')).hexdigest()
+    return word2idx, build_vocabulary(list(char2index.keys()), char2index), vocab_key
 
 
 @PIPELINES.register_module()
@@ -27,16 +63,10 @@ class CharTokenize():
         """
         self.vocab = vocab
         self.targets = targets
+        self.vocab_key = None
 
         if os.path.exists(self.vocab):
-            all_words = open(self.vocab, 'r', encoding='utf8').readlines()
-
-            # default 0 to background
-            self.word2idx = {char.strip(): idx + 1 for idx, char in enumerate(all_words)}
-            self.word2idx["UNKNOWN"] = len(all_words) + 1
-
-            if add_space:
-                self.word2idx["SEP"] = len(all_words) + 2
+            self.word2idx, self.vocabulary, self.vocab_key = load_char_vocabulary(self.vocab, add_space)
 
     def __call__(self, results):
         """ Main process.
@@ -47,13 +77,17 @@ class CharTokenize():
         Returns:
             dict: output data flow.
         """
+        # targets already tokenized in the layout records, see `LayoutRecords`
+        tokenized = results.get('tokenized', dict())
         for key in self.targets:
+            if key in tokenized:
+                assert tokenized[key] == self.vocab_key, \
+                    "{} was tokenized by another vocabulary than {}, pack the records again !!!".format(key, self.vocab)
+                continue
+
             per_target = results[key]
-            per_target_token = []
-            for per_line in per_target:
-                per_line = ["SEP" if per_char in [' ', '\n', '\t'] else per_char for per_char in per_line]
-                per_target_token.append([self.word2idx[per_char] if per_char in self.word2idx.keys() else \
-                                             self.word2idx["UNKNOWN"] for per_char in per_line])
+            per_target_token = [per_line.tolist() for per_line in
+                                self.vocabulary.encode_batch(per_target, unknown=self.word2idx["UNKNOWN"])]
 
             results[key] = per_target_token
 
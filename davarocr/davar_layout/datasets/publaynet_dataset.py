@@ -9,7 +9,6 @@
 ##################################################################################################
 """
 import json
-import copy
 import tempfile
 import itertools
 import os.path as osp
@@ -48,7 +47,9 @@ class PublaynetDataset(MMLayoutDataset):
                  ann_prefix='',
                  classes=None,
                  eval_level=1,
-                 coco_ann=None):
+                 coco_ann=None,
+                 ann_records=None,
+                 record_vocab=None):
         """
         Args:
             ann_file(str): the path to datalist.
@@ -64,6 +65,8 @@ class PublaynetDataset(MMLayoutDataset):
             ann_prefix(str): Annotation prefix path for each annotation file.
             eval_level(int): evaluation in which level. 1 for highest level, 0 for lowest level.
             coco_ann(str): path for coco annotation file.
+            ann_records(str | bool): directory of the sharded annotation records, see MMLayoutDataset
+            record_vocab(str): vocabulary to tokenize the 'ctexts' when packing the records, see MMLayoutDataset
         """
         self.coco_ann = coco_ann
         if coco_ann is not None:
@@ -80,7 +83,9 @@ class PublaynetDataset(MMLayoutDataset):
             classes_config=classes_config,
             ann_prefix=ann_prefix,
             classes=classes,
-            eval_level=eval_level
+            eval_level=eval_level,
+            ann_records=ann_records,
+            record_vocab=record_vocab
         )
 
     def get_iou(self, pred_bbox, gt_bbox):
@@ -148,6 +153,11 @@ class PublaynetDataset(MMLayoutDataset):
                     break
 
             if not exists:
+                # the annotations loaded from the layout records are arrays
+                for key in ['bboxes', 'cares']:
+                    if isinstance(tmp_img_info['ann2'][key], np.ndarray):
+                        tmp_img_info['ann2'][key] = tmp_img_info['ann2'][key].tolist()
+
                 tmp_img_info['ann2']['bboxes'].append(line_bboxes[cooresp])
                 tmp_img_info['ann2']['bboxes'].append(line_bboxes[received])
 
@@ -174,8 +184,8 @@ class PublaynetDataset(MMLayoutDataset):
 
         """
         if img_info['url'] is not None:
-            tmp_img_info = copy.deepcopy(img_info)
-            ann = json.load(open(osp.join(self.ann_prefix, tmp_img_info['url']), 'r', encoding='utf8'))
+            tmp_img_info = dict(img_info)
+            ann = self.load_ann(tmp_img_info)
 
             tmp_img_info["ann"] = ann.get("content_ann", None)
 
@@ -183,16 +193,8 @@ class PublaynetDataset(MMLayoutDataset):
                 tmp_img_info["ann2"] = ann["content_ann2"]
 
                 # filter non-valid annotations.
-                cares = ann["content_ann2"]["cares"]
-                bboxes = ann["content_ann2"]["bboxes"]
-                for idx, per_bbox in enumerate(bboxes):
-                    w_s, h_s, w_e, h_e = per_bbox
-                    if w_e > w_s and h_e > h_s:
-                        continue
-                    else:
-                        cares[idx] = 0
-
-                tmp_img_info["ann2"]["cares"] = cares
+                tmp_img_info["ann2"]["cares"] = self.filter_invalid_bboxes(ann["content_ann2"]["bboxes"],
+                                                                           ann["content_ann2"]["cares"])
 
             else:
                 tmp_img_info["ann2"] = None
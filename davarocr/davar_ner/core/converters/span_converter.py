@@ -74,7 +74,7 @@ class SpanConverter(TransformersConverter):
             #add [CLS] at begin
             start_ids = [0]+ start_ids
             end_ids = [0]+ end_ids
-        padding_length = self.max_len - len(labels) - 2
+        padding_length = 0 if self.dynamic_padding else self.max_len - len(labels) - 2
         if pad_on_left:
             #pad on left
             start_ids = ([0] * padding_length) + start_ids
@@ -97,16 +97,9 @@ class SpanConverter(TransformersConverter):
                                 entity_start, entity_end]]].
         """
         id2label = self.id2label
-        pred_entities = []
-        for pred in preds:
-            entities = []
-            entity = [0, 0, 0]
-            for tag in pred:
-                entity[0] = id2label[tag[0]]
-                entity[1] = tag[1] - 1
-                entity[2] = tag[2] - 1
-                entities.append(entity.copy())
-            pred_entities.append(entities.copy())
-        tokens_index = [index.cpu().numpy().tolist()[0] for index in kwargs['tokens_index']]
-        pred_entities = [self._labels_convert_ori(pred_entity, tokens_index) for pred_entity in pred_entities]
+        # remove cls token
+        pred_entities = [[[id2label[label], start - 1, end - 1] for label, start, end in pred] for pred in preds]
+        batch_tokens_index = self._batch_tokens_index(kwargs['tokens_index'], len(pred_entities))
+        pred_entities = [self._labels_convert_ori(pred_entity, tokens_index)
+                         for pred_entity, tokens_index in zip(pred_entities, batch_tokens_index)]
         return pred_entities
@@ -13,6 +13,7 @@ import transformers
 from transformers import AutoTokenizer
 from seqeval.scheme import Tokens, IOBES
 import numpy as np
+import torch
 from davarocr.davar_common.core import CONVERTERS
 from .base_converter import BaseConverter
 
@@ -39,6 +40,7 @@ class TransformersConverter(BaseConverter):
                  unk_token="[UNK]",
                  pad_token="[PAD]",
                  cls_token_segment_id = 1,
+                 dynamic_padding=False,
                  **kwargs):
         """
         Args:
@@ -59,6 +61,8 @@ class TransformersConverter(BaseConverter):
             unk_token (str): the unk token.
             pad_token (str): the pad token.
             cls_token_segment_id (str): token_type id corresponding to the cls token.
+            dynamic_padding (bool): whether to leave the sequences unpadded, so that they are padded to the longest
+                sample of each batch by `pad_collate`, instead of to `max_len`.
         """
         super().__init__(**kwargs)
         if use_auto:
@@ -90,6 +94,7 @@ class TransformersConverter(BaseConverter):
         assert self.max_len > 2
         assert self.annotation_type =='bioes'
         self.unk_token = unk_token
+        self.dynamic_padding = dynamic_padding
 
         self.label2id_dict, self.id2label = \
                 self._generate_labelid_dict()
@@ -283,6 +288,44 @@ class TransformersConverter(BaseConverter):
                 final.append(entity)
         return final
 
+    def _tokenize_words(self, text):
+        """ Tokenize the words of a text into sub-word ids. A fast tokenizer encodes all the words in one batched
+        call, which gives the same sub-words as tokenizing the words one by one.
+
+        Args:
+            text (list[str]): words of the text
+
+        Returns:
+            list[int]: ids of the sub-words
+            list[int]: index of the word of each sub-word
+        """
+        tokenizer = self.tokenizer
+        if not self.use_custom_tokenize and getattr(tokenizer, 'is_fast', False) and text:
+            word_ids = tokenizer(list(text), add_special_tokens=False)['input_ids']
+        else:
+            word_ids = []
+            for word in text:
+                if self.use_custom_tokenize:
+                    token = self.custom_tokenize(word)
+                else:
+                    token = tokenizer.tokenize(word)
+                word_ids.append(tokenizer.convert_tokens_to_ids(token))
+        input_ids = []
+        tokens_index = []
+        for i, ids in enumerate(word_ids):
+            input_ids.extend(ids)
+            tokens_index += [i]*len(ids)
+        return input_ids, tokens_index
+
+    @property
+    def pad_values(self):
+        """ dict: padding value of each sequence, used by `pad_collate` to pad the unpadded sequences when
+        `dynamic_padding` is set """
+        return dict(input_ids=self.tokenizer.convert_tokens_to_ids(self.pad_token),
+                    attention_masks=0 if self.mask_padding_with_zero else 1,
+                    token_type_ids=self.pad_token_segment_id,
+                    labels=self.pad_token_label)
+
     def convert_text2id(self, results):
         """ Convert token to ids.
 
@@ -290,67 +333,54 @@ class TransformersConverter(BaseConverter):
             results (dict): the input containd tokens list
 
         Returns:
-            dict: corresponding ids
+            dict: corresponding ids, padded to `max_len`, or unpadded if `dynamic_padding` is set
         """
         text = results['tokens']
         cls_token_at_end=self.cls_token_at_end#add [CLS] at end or begin
-        cls_token = self.cls_token#cls_token
         cls_token_segment_id = self.cls_token_segment_id#cls token type id
-        sep_token = self.sep_token#SEP token
         pad_on_left = self.pad_on_left #pad on left
-        pad_token = self.pad_token #pad token
         pad_token_segment_id = self.pad_token_segment_id #pad token type id
         sequence_a_segment_id = self.sequence_a_segment_id
         mask_padding_with_zero = self.mask_padding_with_zero
-        tokenizer = self.tokenizer
+        cls_token_id, sep_token_id, pad_token_id = self.tokenizer.convert_tokens_to_ids(
+            [self.cls_token, self.sep_token, self.pad_token])
 
-        tokens = []
-        tokens_index = []
         #the indexs of tokens after wordpiece tokenizer
         #eg:[jim,henson,was,a,puppeteer]->[jim,hen,##son,was,a,puppet,##eer] tokens_index=[0,1,1,2,3,4,4]
-        for i, word in enumerate(text):
-            if self.use_custom_tokenize:
-                token = self.custom_tokenize(word)
-            else:
-                token = tokenizer.tokenize(word)
-            tokens.extend(token)
-            tokens_index += [i]*len(token)
-
+        input_ids, tokens_index = self._tokenize_words(text)
 
         self.tokens_index = tokens_index
         special_tokens_count = 2
-        if len(tokens) > self.max_len - special_tokens_count:
-            print('warning: tokens length %s is longer than max_len, truncate to the maximum length!'%len(tokens))
-            tokens = tokens[: (self.max_len - special_tokens_count)]
+        if len(input_ids) > self.max_len - special_tokens_count:
+            print('warning: tokens length %s is longer than max_len, truncate to the maximum length!'%len(input_ids))
+            input_ids = input_ids[: (self.max_len - special_tokens_count)]
         #add [SEP]
-        tokens += [sep_token]
-        segment_ids = [sequence_a_segment_id] * len(tokens)
-        input_mask = [1 if mask_padding_with_zero else 0] * len(tokens)#input mask
+        input_ids += [sep_token_id]
+        segment_ids = [sequence_a_segment_id] * len(input_ids)
+        input_mask = [1 if mask_padding_with_zero else 0] * len(input_ids)#input mask
 
         if cls_token_at_end:#add [CLS] at end
-            tokens += [cls_token]
+            input_ids += [cls_token_id]
             segment_ids += [cls_token_segment_id]
             input_mask += [1 if mask_padding_with_zero else 0]
         else:#add [CLS] at begin
-            tokens = [cls_token] + tokens
+            input_ids = [cls_token_id] + input_ids
             segment_ids = [cls_token_segment_id] + segment_ids
             input_mask = [1 if mask_padding_with_zero else 0] + input_mask
 
-        input_len = len(tokens)
-        padding_length = self.max_len - input_len
+        input_len = len(input_ids)
+        padding_length = 0 if self.dynamic_padding else self.max_len - input_len
         if pad_on_left:#pad on left
-            tokens = ([pad_token] * padding_length) + tokens
+            input_ids = ([pad_token_id] * padding_length) + input_ids
             input_mask = ([0 if mask_padding_with_zero else 1] * padding_length) + input_mask
             segment_ids = ([pad_token_segment_id] * padding_length) + segment_ids
         else:#pad on right
-            tokens += [pad_token] * padding_length
+            input_ids += [pad_token_id] * padding_length
             input_mask += [0 if mask_padding_with_zero else 1] * padding_length
             segment_ids += [pad_token_segment_id] * padding_length
 
-        input_ids = tokenizer.convert_tokens_to_ids(tokens)#convert tokens to ids
-        assert len(input_ids) == self.max_len
-        assert len(input_mask) == self.max_len
-        assert len(segment_ids) == self.max_len
+        assert len(input_ids) == len(input_mask) == len(segment_ids)
+        assert len(input_ids) == (input_len if self.dynamic_padding else self.max_len)
         res = dict(input_ids=input_ids,
                     attention_masks=input_mask,
                     token_type_ids=segment_ids,
@@ -391,7 +421,7 @@ class TransformersConverter(BaseConverter):
             label_ids = [label_map['O']] + label_ids
 
         # Zero-pad up to the sequence length, padding length is max_length minus label length minus [CLS]和[SEP].
-        padding_length = max_seq_length - len(labels) - 2
+        padding_length = 0 if self.dynamic_padding else max_seq_length - len(labels) - 2
         if pad_on_left:
             label_ids = ([pad_token_label] * padding_length) + label_ids
         else:
@@ -426,6 +456,30 @@ class TransformersConverter(BaseConverter):
             else:
                 entities = [[t.to_tuple()[1], t.to_tuple()[2], t.to_tuple()[3]] for t in Tokens(tag_list, IOBES).entities]
             pred_entities.append(entities)
-        tokens_index = [index.cpu().numpy().tolist()[0] for index in kwargs['tokens_index']]
-        pred_entities = [self._labels_convert_ori(pred_entity, tokens_index, self.only_label_first_subword) for pred_entity in pred_entities]
+        batch_tokens_index = self._batch_tokens_index(kwargs['tokens_index'], len(pred_entities))
+        pred_entities = [self._labels_convert_ori(pred_entity, tokens_index, self.only_label_first_subword)
+                         for pred_entity, tokens_index in zip(pred_entities, batch_tokens_index)]
         return pred_entities
+
+    @staticmethod
+    def _batch_tokens_index(tokens_index, batch_size):
+        """ Fetch the tokens_index of each sequence with a single device-to-host transfer.
+
+        Args:
+            tokens_index (list(Tensor) | Tensor | list(int)): tokens_index collated by position, in shape of L x [B],
+                or in shape of [B, L] padded with -1 (by `pad_collate`), or of a single sequence
+            batch_size (int): number of sequences
+
+        Returns:
+            list(list(int)): tokens_index of each sequence
+        """
+        if isinstance(tokens_index, (list, tuple)) and tokens_index and isinstance(tokens_index[0], torch.Tensor):
+            tokens_index = torch.stack([index.reshape(-1) for index in tokens_index], dim=1)
+        if isinstance(tokens_index, torch.Tensor):
+            tokens_index = [[index for index in indices if index >= 0]
+                            for indices in tokens_index.reshape(-1, tokens_index.shape[-1]).cpu().tolist()]
+            if len(tokens_index) == batch_size:
+                return tokens_index
+            # the same tokens_index is shared by all sequences
+            return [tokens_index[0]] * batch_size
+        return [list(tokens_index)] * batch_size
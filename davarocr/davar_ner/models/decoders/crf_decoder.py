@@ -21,17 +21,19 @@ class CRFDecoder(BaseDecoder):
     def __init__(self,
                  hidden_dropout_prob=0.1,
                  hidden_size=768,
+                 crf_parallel=False,
                  **kwargs):
         """
         Args:
             hidden_dropout_prob (float): The dropout probability of hidden layer.
             hidden_size (int): Hidden layer output layer channels.
+            crf_parallel (bool): Whether the CRF runs with log-depth associative scans, for long sequences.
         """
         super().__init__(**kwargs)
         self.num_labels = self.label_converter.num_labels
         self.dropout = nn.Dropout(hidden_dropout_prob)
         self.classifier = nn.Linear(hidden_size, self.num_labels)
-        self.crf = CRF(num_tags=self.num_labels, batch_first=True)
+        self.crf = CRF(num_tags=self.num_labels, batch_first=True, parallel=crf_parallel)
 
     def forward(self, outputs, **kwargs):
         sequence_output = outputs[0]
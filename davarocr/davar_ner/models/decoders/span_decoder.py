@@ -115,21 +115,35 @@ class SpanDecoder(BaseDecoder):
         return res
 
     def _extract_item(self, start_logits, end_logits, attention_masks):
-        """ get entities from preds
+        """ get entities from preds. Each valid start is paired with the nearest end of the same label at or after it,
+        for the whole batch at once.
+
+        Args:
+            start_logits (Tensor): start logits in shape of [B, L, num_labels]
+            end_logits (Tensor): end logits in shape of [B, L, num_labels]
+            attention_masks (Tensor): attention masks in shape of [B, L] or [B, 1, L]
+
+        Returns:
+            list(list(tuple)): entities of each sequence, [[(label, start, end), ...], ...]
         """
-        res = []
-        batch_size = start_logits.shape[0]
-        for batch in range(batch_size):
-            attention_mask = attention_masks.cpu().numpy()[batch]
-            start_pred = torch.argmax(start_logits, -1).cpu().numpy()[batch]
-            end_pred = torch.argmax(end_logits, -1).cpu().numpy()[batch]
-            entity = []
-            for i, s_l in enumerate(start_pred):
-                if s_l == 0 or attention_mask[i] == 0:
-                    continue
-                for j, e_l in enumerate(end_pred[i:]):
-                    if s_l == e_l:
-                        entity.append((s_l, i, i+j+1))
-                        break
-            res.append(entity)
+        batch_size, seq_len = start_logits.shape[:2]
+        start_pred = torch.argmax(start_logits, -1)
+        end_pred = torch.argmax(end_logits, -1)
+        attention_mask = attention_masks.reshape(batch_size, -1)[:, :seq_len]
+
+        # next_end[b, c, i]: the first position j >= i with end label c, seq_len if there is none
+        labels = torch.arange(self.num_labels, device=end_pred.device)
+        positions = torch.arange(seq_len, device=end_pred.device)
+        next_end = torch.where(end_pred.unsqueeze(1) == labels.view(1, -1, 1), positions, seq_len)
+        next_end = torch.flip(torch.cummin(torch.flip(next_end, [2]), dim=2)[0], [2])
+        end_index = next_end.gather(1, start_pred.unsqueeze(1)).squeeze(1)
+
+        valid = (start_pred != 0) & (attention_mask != 0) & (end_index < seq_len)
+        batch_inds, start_inds = torch.nonzero(valid, as_tuple=True)
+        entities = torch.stack([batch_inds, start_pred[batch_inds, start_inds], start_inds,
+                                end_index[batch_inds, start_inds] + 1], dim=1).cpu().tolist()
+
+        res = [[] for _ in range(batch_size)]
+        for batch, label, start, end in entities:
+            res[batch].append((label, start, end))
         return res
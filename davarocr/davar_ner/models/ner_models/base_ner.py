@@ -9,6 +9,7 @@
 ##################################################################################################
 """
 import numpy as np
+import torch
 from davarocr.davar_nlp_common.models import EncoderDecoder
 from ..builder import NERS
 
@@ -47,32 +48,177 @@ class BaseNER(EncoderDecoder):
         return encoder_output, all_token_index
 
     def aug_test(self, input_ids, attention_masks=None, token_type_ids=None, **kwargs):
-        """Aug test. currently only support batch is 1 and the text range's intersection is empty.
-        used for sliding window test.
+        """ Sliding window test. The windows (of one or many documents) are encoded in shared forward batches, the
+        encoder outputs of the overlapping windows are merged into one sequence per document, which is decoded once.
+
+        The windows are either packed by `sliding_window_collate` (tensors in shape of [N, L], with `window_doc` and
+        `range`), or are lists of the windows of a single document collated by the default `collate`.
+
+        Merge modes of `test_cfg.window_merge`:
+            - 'average' (default): the outputs of a token in all windows containing it are averaged.
+            - 'center': a token takes the output of the window in which it is farthest from the window's edges.
+        `test_cfg.max_windows_per_batch` (default 32) limits the windows of a forward pass.
+
+        Args:
+            input_ids(Tensor | list(Tensor)): input ids of the windows
+            attention_masks(Tensor | list(Tensor)): attention masks of the windows
+            token_type_ids(Tensor | list(Tensor)): token type ids of the windows
+            **kwargs(dict): `range` and `tokens_index` of the windows, and `window_doc` if packed
+
+        Returns:
+            list(list): entities of each document, with word positions in the document
         """
         assert "range" in kwargs
-        assert len(input_ids) == len(attention_masks)
-        assert len(input_ids) == len(token_type_ids)
-        assert len(input_ids) == len(kwargs['range'])
-        range_list = kwargs['range']
-        res = []
-        for i, (input_id, attention_mask, token_type_id) in \
-        enumerate(zip(input_ids, attention_masks, token_type_ids)):#sliding window test's input
-            other_kwargs = {}
-            for key, value in kwargs.items():
-                if isinstance(value, list) and len(value) == len(input_ids):
-                    other_kwargs[key] = value[i]
-            pred_entities = self.simple_test(input_id, attention_mask, token_type_id,**other_kwargs)
-            for batch_index, batch_entity in enumerate(pred_entities):#batch must be one
-                temp_entity = []
-                for _entity in batch_entity:
-                    if len(_entity) == 3:
-                        entity = [_entity[0],
-                                int(_entity[1] + range_list[i].cpu().numpy()[batch_index][0]),\
-                                int(_entity[2] + range_list[i].cpu().numpy()[batch_index][0])]#add offset
-                    else:
-                        entity = [_entity[0],
-                                list(map(lambda x: x + range_list[i].cpu().numpy()[batch_index][0], _entity[1]))]
-                    temp_entity.append(entity)
-                res += temp_entity
-        return res
+        if isinstance(input_ids, list):
+            input_ids, attention_masks, token_type_ids, kwargs = self._pack_windows(
+                input_ids, attention_masks, token_type_ids, **kwargs)
+
+        test_cfg = self.test_cfg if self.test_cfg is not None else dict()
+        merge_mode = test_cfg.get('window_merge', 'average')
+        max_windows = test_cfg.get('max_windows_per_batch', 32)
+        assert merge_mode in ('average', 'center'), merge_mode
+
+        window_doc = kwargs.pop('window_doc').cpu().numpy()
+        window_range = kwargs.pop('range').cpu().numpy().reshape(-1, 2)
+        tokens_index = kwargs.pop('tokens_index')
+        if not isinstance(tokens_index, torch.Tensor):
+            tokens_index = torch.as_tensor(tokens_index)
+        tokens_index = tokens_index.reshape(len(window_doc), -1).cpu().numpy()
+        num_windows = len(window_doc)
+        other_kwargs = {key: value for key, value in kwargs.items()
+                        if isinstance(value, torch.Tensor) and value.dim() > 0 and value.size(0) == num_windows}
+
+        # Forward the windows in batches, each cut to its longest window
+        valid_lens = attention_masks.reshape(num_windows, -1).sum(-1).cpu().numpy()
+        encoder_output = []
+        for start in range(0, num_windows, max_windows):
+            end = min(start + max_windows, num_windows)
+            seq_len = int(valid_lens[start:end].max())
+            batch_kwargs = {key: value[start:end] for key, value in other_kwargs.items()}
+            encode_out = self.encoder(input_ids=input_ids[start:end, :seq_len],
+                                      attention_masks=attention_masks[start:end, :seq_len],
+                                      token_type_ids=token_type_ids[start:end, :seq_len],
+                                      **batch_kwargs)
+            encoder_output.append(encode_out[0])
+
+        merged, doc_masks, doc_tokens_index = self._merge_windows(
+            encoder_output, valid_lens, window_doc, window_range, tokens_index, merge_mode)
+        return self.decoder.forward_test([merged],
+                                         attention_masks=doc_masks,
+                                         tokens_index=doc_tokens_index)
+
+    @staticmethod
+    def _pack_windows(input_ids, attention_masks, token_type_ids, **kwargs):
+        """ Pack the windows of a single document, collated as lists by the default `collate`, into a window batch
+        as `sliding_window_collate` does.
+
+        Returns:
+            tuple: input_ids, attention_masks, token_type_ids in shape of [N, L], and the packed kwargs
+        """
+        assert len(input_ids) == len(attention_masks) == len(token_type_ids) == len(kwargs['range'])
+        assert input_ids[0].size(0) == 1, 'Windows of several documents should be packed by sliding_window_collate'
+        windows_index = [[int(index.reshape(-1)[0]) for index in window_index]
+                         for window_index in kwargs['tokens_index']]
+        max_len = max([len(window_index) for window_index in windows_index] + [1])
+        packed = dict(
+            window_doc=torch.zeros(len(input_ids), dtype=torch.long),
+            range=torch.stack([torch.as_tensor(text_range).reshape(-1)[:2] for text_range in kwargs['range']]),
+            tokens_index=torch.as_tensor([window_index + [-1] * (max_len - len(window_index))
+                                          for window_index in windows_index]))
+        return torch.cat(input_ids), torch.cat(attention_masks), torch.cat(token_type_ids), packed
+
+    @staticmethod
+    def _merge_windows(encoder_output, valid_lens, window_doc, window_range, tokens_index, merge_mode):
+        """ Merge the encoder outputs of the windows into one sequence per document.
+
+        Each word is tokenized in the same way in every window, so the k-th sub-token of the word w of a window is the
+        k-th sub-token of the word (start + w) in the document. The [CLS] and [SEP] outputs of the windows of a
+        document are averaged.
+
+        Args:
+            encoder_output(list(Tensor)): encoder outputs of the window batches, each in shape of [n, l, C]
+            valid_lens(np.ndarray): valid lengths of the windows (including [CLS] and [SEP]), in shape of [N]
+            window_doc(np.ndarray): document index of the windows, in shape of [N]
+            window_range(np.ndarray): word range of the windows in their document, in shape of [N, 2]
+            tokens_index(np.ndarray): word index of each sub-token in its window, padded with -1, in shape of [N, T]
+            merge_mode(str): 'average' or 'center'
+
+        Returns:
+            Tensor: merged encoder outputs of the documents, in shape of [B, S + 2, C]
+        Returns:
+            Tensor: attention masks of the documents, in shape of [B, S + 2]
+        Returns:
+            Tensor: word index of each sub-token in its document, padded with -1, in shape of [B, S]
+        """
+        num_docs = int(window_doc.max()) + 1
+        num_windows, max_tokens = tokens_index.shape
+        device = encoder_output[0].device
+        channels = encoder_output[0].size(-1)
+
+        # Sub-tokens kept by each window, the truncated ones are excluded
+        num_tokens = np.minimum((tokens_index >= 0).sum(-1), np.maximum(valid_lens - 2, 0))
+        win, col = np.nonzero(np.arange(max_tokens)[np.newaxis, :] < num_tokens[:, np.newaxis])
+        local_word = tokens_index[win, col]
+
+        # Rank of each sub-token in its word, as tokens_index is non-decreasing in a window
+        is_first = np.ones(len(col), dtype=bool)
+        is_first[1:] = (win[1:] != win[:-1]) | (local_word[1:] != local_word[:-1])
+        rank = np.arange(len(col)) - np.maximum.accumulate(np.where(is_first, np.arange(len(col)), 0))
+
+        # Number of sub-tokens of each word of the documents, and offsets of the words in the merged sequences
+        doc = window_doc[win]
+        doc_words = np.zeros(num_docs, dtype=np.int64)
+        np.maximum.at(doc_words, window_doc, window_range[:, 1])
+        word_base = np.cumsum(doc_words) - doc_words
+        word = word_base[doc] + window_range[win, 0] + local_word
+        word_tokens = np.zeros(int(doc_words.sum()), dtype=np.int64)
+        np.maximum.at(word_tokens, word, rank + 1)
+        word_doc = np.repeat(np.arange(num_docs), doc_words)
+        doc_tokens = np.bincount(word_doc, weights=word_tokens, minlength=num_docs).astype(np.int64)
+        doc_offset = np.cumsum(doc_tokens) - doc_tokens
+        word_offset = np.cumsum(word_tokens) - word_tokens - doc_offset[word_doc]
+        seq_len = int(doc_tokens.max()) + 2
+
+        # Destinations of the sub-tokens, [CLS] and [SEP] of the windows in the flattened [B * (S + 2)] sequences
+        token_pos = doc * seq_len + 1 + word_offset[word] + rank
+        cls_pos = window_doc * seq_len
+        sep_pos = cls_pos + 1 + doc_tokens[window_doc]
+
+        weight = np.ones(len(col), dtype=np.float32)
+        if merge_mode == 'center':
+            # Keep the windows in which the token is farthest from the edges, the edges of the document do not count
+            left = np.where(window_range[win, 0] == 0, max_tokens, col)
+            right = np.where(window_range[win, 1] == doc_words[doc], max_tokens, num_tokens[win] - 1 - col)
+            score = np.minimum(left, right)
+            best = np.full(num_docs * seq_len, -1, dtype=np.int64)
+            np.maximum.at(best, token_pos, score)
+            weight = (score == best[token_pos]).astype(np.float32)
+
+        # Sources in the flattened outputs of the window batches
+        window_base = np.zeros(num_windows, dtype=np.int64)
+        row, base = 0, 0
+        for output in encoder_output:
+            window_base[row:row + output.size(0)] = base + np.arange(output.size(0)) * output.size(1)
+            row += output.size(0)
+            base += output.size(0) * output.size(1)
+        src = np.concatenate([window_base[win] + 1 + col, window_base, window_base + np.maximum(valid_lens - 1, 0)])
+        dst = np.concatenate([token_pos, cls_pos, sep_pos])
+        weight = np.concatenate([weight, np.ones(2 * num_windows, dtype=np.float32)])
+
+        flat_output = torch.cat([output.reshape(-1, channels) for output in encoder_output])
+        src = torch.as_tensor(src, device=device)
+        dst = torch.as_tensor(dst, device=device)
+        weight = torch.as_tensor(weight, device=device, dtype=flat_output.dtype)
+        merged = flat_output.new_zeros(num_docs * seq_len, channels)
+        merged.index_add_(0, dst, flat_output[src] * weight[:, None])
+        total = flat_output.new_zeros(num_docs * seq_len).index_add_(0, dst, weight)
+        merged = (merged / total.clamp(min=1e-6)[:, None]).reshape(num_docs, seq_len, channels)
+
+        doc_masks = (torch.arange(seq_len)[None, :] < torch.as_tensor(doc_tokens + 2)[:, None]).long().to(device)
+
+        # Word index of each sub-token in its document
+        doc_tokens_index = np.full((num_docs, max(seq_len - 2, 1)), -1, dtype=np.int64)
+        token_word = np.repeat(np.arange(len(word_tokens)) - word_base[word_doc], word_tokens)
+        token_doc = np.repeat(word_doc, word_tokens)
+        doc_tokens_index[token_doc, np.arange(len(token_doc)) - doc_offset[token_doc]] = token_word
+        return merged, doc_masks, torch.as_tensor(doc_tokens_index)
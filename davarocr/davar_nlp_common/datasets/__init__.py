@@ -13,6 +13,7 @@ from mmdet.datasets.builder import DATASETS, build_dataset
 from .base_nlp_dataset import BaseNLPDataset
 from .pipelines import KeyFilter,SlidingWindow
 from .loaders import BaseLoader
+from .samplers import LengthBucketSampler
 from .builder import LOADERS, PARSERS,build_loader,build_parser
 
 __all__ = [
@@ -22,6 +23,7 @@ __all__ = [
     'KeyFilter',
     'SlidingWindow',
     'BaseLoader',
+    'LengthBucketSampler',
     'LOADERS',
     'PARSERS',
     'build_parser',
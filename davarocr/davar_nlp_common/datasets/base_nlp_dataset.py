@@ -57,6 +57,17 @@ class BaseNLPDataset(Dataset):
         """Set flag."""
         self.flag = np.zeros(len(self), dtype=np.uint8)
 
+    def get_lengths(self):
+        """Get the length of each sample, used by `LengthBucketSampler` to batch samples of similar lengths.
+
+        Returns:
+            np.ndarray: number of tokens of each sample (before sub-word tokenization)
+        """
+        if getattr(self, '_lengths', None) is None:
+            self._lengths = np.array([len(info.get('tokens', ())) if isinstance(info, dict) else 0
+                                      for info in self.data_infos], dtype=np.int64)
+        return self._lengths
+
     def pre_pipeline(self, results):
         """Prepare results dict for pipeline."""
         #results['img_prefix'] = self.img_prefix
@@ -29,7 +29,8 @@ class SlidingWindow:
         transforms(list): Transforms to apply in each test
         max_len(int): the text's max length
         truncation(bool): is truncation, if True, maintain the first only.
-        stride(int): sliding stride size.
+        stride(int): sliding stride size. A stride smaller than max_len gives overlapping windows, whose predictions
+            are merged by `BaseNER.aug_test`.
     """
     def __init__(self,
                  transforms: list,
@@ -90,6 +91,9 @@ class SlidingWindow:
                             key_value = results[_key]
                             temp.update({_key:key_value[text_range[0]:text_range[1]]})
                     lines.append(temp)
+                    if text_range[1] == len(texts):
+                        # the later windows (stride < max_len) would be contained in this one
+                        break
                 
             else:
                 pass
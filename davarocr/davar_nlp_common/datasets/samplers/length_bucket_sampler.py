@@ -0,0 +1,104 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    length_bucket_sampler.py
+# Abstract       :    The sampler batching token sequences of similar lengths
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+from __future__ import division
+import math
+
+import numpy as np
+from torch.utils.data import Sampler
+
+from mmcv.runner import get_dist_info
+
+from davarocr.davar_common.datasets.builder import SAMPLER
+
+
+@SAMPLER.register_module()
+class LengthBucketSampler(Sampler):
+    """ Length-bucketing sampler for the NLP datasets.
+
+    The shuffled indices are split into pools of `bucket_size` global batches, and the samples in each pool are sorted
+    by length before being cut into batches, so that the samples in a batch have similar lengths and little padding is
+    needed with `pad_collate`. The order of the batches is shuffled again, and every global batch is split over the
+    ranks, so that all ranks process batches of similar lengths at each step.
+
+    It supports both distributed and non-distributed training. The dataset should implement `get_lengths()`.
+    """
+
+    def __init__(self,
+                 dataset,
+                 samples_per_gpu=1,
+                 bucket_size=50,
+                 num_replicas=None,
+                 rank=None,
+                 shuffle=True,
+                 seed=0):
+        """
+        Args:
+            dataset(dataset): dataset for sampling, e.g. NERDataset
+            samples_per_gpu(int): samples in each gpu
+            bucket_size(int): number of global batches in a pool sorted by length, 1 means no bucketing
+            num_replicas(int): distributed gpu number, default to the world size
+            rank(int): device index, default to the current rank
+            shuffle(bool): whether to shuffle the samples and the batches
+            seed(int): random seed, the shuffle of each epoch is seeded with `seed + epoch`
+        """
+        _rank, _num_replicas = get_dist_info()
+        if num_replicas is None:
+            num_replicas = _num_replicas
+        if rank is None:
+            rank = _rank
+
+        self.dataset = dataset
+        self.samples_per_gpu = samples_per_gpu
+        self.bucket_size = max(bucket_size, 1)
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.lengths = np.asarray(dataset.get_lengths())
+
+        # Make sure every rank gets the same number of complete batches
+        self.num_samples = int(math.ceil(len(self.dataset) / self.num_replicas / self.samples_per_gpu)) \
+            * self.samples_per_gpu
+        self.total_size = self.num_samples * self.num_replicas
+
+    def __iter__(self):
+        rng = np.random.RandomState(self.seed + self.epoch)
+        num = len(self.dataset)
+        indices = rng.permutation(num) if self.shuffle else np.arange(num)
+        if len(indices) < self.total_size:
+            extra = rng.randint(0, num, self.total_size - len(indices))
+            indices = np.concatenate([indices, extra])
+
+        # Sort the samples by length in each pool, and cut them into global batches
+        global_batch = self.samples_per_gpu * self.num_replicas
+        pool_size = global_batch * self.bucket_size
+        batches = []
+        for start in range(0, self.total_size, pool_size):
+            pool = indices[start:start + pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind='stable')]
+            batches.extend(pool[i:i + global_batch] for i in range(0, len(pool), global_batch))
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+
+        # Each rank takes its part of every global batch
+        own = [batch[self.rank * self.samples_per_gpu:(self.rank + 1) * self.samples_per_gpu] for batch in batches]
+        return iter(np.concatenate(own).tolist() if own else [])
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        """
+        Args:
+            epoch (int): epoch number
+        """
+        self.epoch = epoch
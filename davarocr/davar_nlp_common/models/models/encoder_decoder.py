@@ -28,6 +28,8 @@ class EncoderDecoder(nn.Module, metaclass=ABCMeta):
         super().__init__()
         self.encoder = build_encoder(encoder)
         self.decoder = build_decoder(decoder)
+        self.train_cfg = train_cfg
+        self.test_cfg = test_cfg
 
     def extract_feat(self, imgs):
         """Extract features from images."""
@@ -65,8 +67,11 @@ class EncoderDecoder(nn.Module, metaclass=ABCMeta):
 
     def forward_test(self, input_ids, attention_masks=None, token_type_ids=None, **kwargs):
         """ Calls either :func:`aug_test` or :func:`simple_test` depending
-        on whether ``input_ids`` is ``list``.
+        on whether ``input_ids`` is ``list``, or is a batch of sliding windows
+        packed by ``sliding_window_collate`` (with ``window_doc``).
         """
+        if 'window_doc' in kwargs:
+            return self.aug_test(input_ids, attention_masks, token_type_ids, **kwargs)
         if isinstance(input_ids, list):
             assert len(input_ids) > 0
             assert input_ids[0].size(0) == 1, ('aug test does not support '
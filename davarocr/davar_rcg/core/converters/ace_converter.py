@@ -16,6 +16,7 @@ import torch
 from mmcv.utils import print_log
 
 from davarocr.davar_common.core.builder import CONVERTERS
+from davarocr.davar_common.utils import build_vocabulary
 
 
 @CONVERTERS.register_module()
@@ -65,14 +66,17 @@ class ACELabelConverter:
         else:
             raise Exception("dictionary file only support the txt and json file !!!")
 
+        self.vocabulary = build_vocabulary(list(self.dict.keys()), self.dict)
+
         print("recognition dictionary %s \t" % str(self.dict).encode(encoding="utf-8").decode(encoding="utf-8"))
 
-    def encode(self, text, batch_max_length=25):
+    def encode(self, text, batch_max_length=25, device='cpu'):
         """
             convert text-label into text-index.
         Args:
             text (list): text labels of each image. [batch_size]
             batch_max_length (tensor): max length of text label in the batch. 25 by default
+            device (torch.device | str): device of the returned tensors, the device of the model to train
 
         Returns:
             Torch.Tensor : the training target. [batch_size x (character_num)].
@@ -86,23 +90,19 @@ class ACELabelConverter:
         batch_max_length += 1
 
         # batch_text is padded with [PAD] token.
-        batch_text = torch.cuda.LongTensor(len(text), len(self.character)).fill_(0)
-
-        for i, t_ in enumerate(text):
-            text = [item for item in list(t_)]
-            if self.with_unknown:
-                text = [self.dict[char] if char in self.dict.keys() else self.dict["[UNK]"] for char in text]
-            else:
-                try:
-                    text = [self.dict[char] for char in text]
-                except Exception as DictionaryError:
-                    raise KeyError from DictionaryError
-            text_cnt = torch.cuda.LongTensor(len(self.character) - 1).fill_(0)
-            for ln_ in text:
-                text_cnt[ln_ - 1] += 1  # label construction for ACE
+        batch_text = torch.zeros(len(text), len(self.character), dtype=torch.long)
+
+        try:
+            indexes = self.vocabulary.encode_batch(text, self.dict.get("[UNK]") if self.with_unknown else None)
+        except Exception as DictionaryError:
+            raise KeyError from DictionaryError
+        for i, chars in enumerate(indexes):
+            # label construction for ACE
+            text_cnt = torch.bincount(torch.from_numpy(chars) - 1, minlength=len(self.character) - 1)
             batch_text[i][1:] = text_cnt
-        batch_text[:, 0] = torch.cuda.IntTensor(length)
-        return batch_text, torch.cuda.IntTensor(length)
+        batch_text[:, 0] = torch.tensor(length, dtype=torch.long)
+
+        return batch_text.to(device), torch.tensor(length, dtype=torch.int32, device=device)
 
     def decode(self, text_index, length):
         """
@@ -18,6 +18,7 @@ import numpy as np
 from mmcv.utils import print_log
 
 from davarocr.davar_common.core.builder import CONVERTERS
+from davarocr.davar_common.utils import build_vocabulary
 
 
 @CONVERTERS.register_module()
@@ -93,14 +94,17 @@ class AttnLabelConverter:
         else:
             raise Exception("dictionary file only support the txt and json file !!!")
 
+        self.vocabulary = build_vocabulary(list(self.dict.keys()), self.dict)
+
         print("recognition dictionary %s \t" % str(self.dict).encode(encoding="utf-8").decode(encoding="utf-8"))
 
-    def encode(self, text, batch_max_length=25):
+    def encode(self, text, batch_max_length=25, device='cpu'):
         """
             convert text-label into text-index.
         Args:
             text (list): text labels of each image. [batch_size]
             batch_max_length (tensor): max length of text label in the batch. 25 by default
+            device (torch.device | str): device of the returned tensors, the device of the model to train
 
         Returns:
             Torch.Tensor : the input of attention decoder. [batch_size x (character_num)].
@@ -114,21 +118,16 @@ class AttnLabelConverter:
         batch_max_length += 1
         # +1 means at the first time step add symbol '[GO]', last time step add symbol '[s]'
         batch_text = np.full((len(text), batch_max_length + 1), self.bos, dtype=np.long)
-        for i, content in enumerate(text):
-            chars = ['[GO]'] + list(content)
-            chars.append('[s]')
-
-            if self.with_unknown:
-                chars = [self.dict[char] if char in self.dict else self.dict["[UNK]"] for char in chars]
-            else:
-                try:
-                    chars = [self.dict[char] for char in chars]
-                except Exception as DictionaryError:
-                    raise KeyError from DictionaryError
+        try:
+            indexes = self.vocabulary.encode_batch(text, self.dict.get("[UNK]") if self.with_unknown else None)
+        except Exception as DictionaryError:
+            raise KeyError from DictionaryError
+        for i, chars in enumerate(indexes):
+            chars = np.concatenate([[self.dict['[GO]']], chars, [self.dict['[s]']]])
             batch_text[i, :len(chars)] = chars
 
-        batch_text = torch.tensor(batch_text).long().cuda()
-        length = torch.tensor(length).int().cuda()
+        batch_text = torch.tensor(batch_text, dtype=torch.long, device=device)
+        length = torch.tensor(length, dtype=torch.int32, device=device)
 
         return batch_text, length
 
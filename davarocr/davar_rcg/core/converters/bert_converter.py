@@ -12,9 +12,11 @@ import os.path as osp
 import json
 
 import torch
+import numpy as np
 from mmcv.utils import print_log
 
 from davarocr.davar_common.core.builder import CONVERTERS
+from davarocr.davar_common.utils import build_vocabulary
 
 
 @CONVERTERS.register_module()
@@ -94,14 +96,17 @@ class BertLabelConverter:
 
         self.max_index = len(self.character) - 1
 
+        self.vocabulary = build_vocabulary(list(self.dict.keys()), self.dict)
+
         print("recognition dictionary %s \t" % str(self.dict).encode(encoding="utf-8").decode(encoding="utf-8"))
 
-    def encode(self, text, batch_max_length=25):
+    def encode(self, text, batch_max_length=25, device='cpu'):
         """
             convert text-label into text-index.
         Args:
             text (list): text labels of each image. [batch_size]
             batch_max_length (Torch.tensor): max length of text label in the batch. 25 by default
+            device (torch.device | str): device of the returned tensors, the device of the model to train
 
         Returns:
             Torch.Tensor : the input of attention decoder. [batch_size x (character_num)].
@@ -112,24 +117,17 @@ class BertLabelConverter:
 
         # +1 at the last time step add symbol "[s]"
         length = [len(s) + 1 for s in text]
-        batch_text = torch.cuda.LongTensor(len(text), batch_max_length).fill_(self.bos)
-
-        for i, content in enumerate(text):
-            text = list(content)
-            text.append('[s]')
-
-            if self.with_unknown:
-                text = [self.dict[char] if char in self.dict else self.dict["[UNK]"]
-                        for char in text][0:batch_max_length]
-            else:
-                try:
-                    text = [self.dict[char] for char in text][0:batch_max_length]
-                except Exception as DictionaryError:
-                    raise KeyError from DictionaryError
+        batch_text = torch.full((len(text), batch_max_length), self.bos, dtype=torch.long)
 
-            batch_text[i][0:len(text)] = torch.cuda.LongTensor(text)
+        try:
+            indexes = self.vocabulary.encode_batch(text, self.dict.get("[UNK]") if self.with_unknown else None)
+        except Exception as DictionaryError:
+            raise KeyError from DictionaryError
+        for i, chars in enumerate(indexes):
+            chars = np.append(chars, self.dict['[s]'])[0:batch_max_length]
+            batch_text[i][0:len(chars)] = torch.from_numpy(chars)
 
-        return batch_text, torch.cuda.IntTensor(length)
+        return batch_text.to(device), torch.tensor(length, dtype=torch.int32, device=device)
 
     def decode(self, text_index, length):
         """
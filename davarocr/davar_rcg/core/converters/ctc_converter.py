@@ -19,6 +19,7 @@ import numpy as np
 from mmcv.utils import print_log
 
 from davarocr.davar_common.core.builder import CONVERTERS
+from davarocr.davar_common.utils import build_vocabulary
 from .utils.beams import Beams
 
 
@@ -93,13 +94,16 @@ class CTCLabelConverter:
 
         self.max_index = len(self.character) - 1
 
+        self.vocabulary = build_vocabulary(list(self.dict.keys()), self.dict)
+
         print("recognition dictionary %s \t" % str(self.dict).encode(encoding="utf-8").decode(encoding="utf-8"))
 
-    def encode(self, text):
+    def encode(self, text, device='cpu'):
         """
             convert text-label into text-index.
         Args:
             text (list): text labels of each image. [batch_size]
+            device (torch.device | str): device of the returned tensors, the device of the model to train
 
         Returns:
             Torch.Tensor: the training target of the ctc loss. [batch_size x (character_num)].
@@ -114,15 +118,13 @@ class CTCLabelConverter:
         length = [len(s) for s in text]
         text = ''.join(text)
 
-        if self.with_unknown:
-            text = [self.dict[char] if char in self.dict else self.dict["[UNK]"] for char in text]
-        else:
-            try:
-                text = [self.dict[char] for char in text]
-            except KeyError:
-                raise Exception("Dictionary Error, some character not in the predefined recognition dictionary !!!")
+        try:
+            text = self.vocabulary.encode(text, self.dict.get("[UNK]") if self.with_unknown else None)
+        except KeyError:
+            raise Exception("Dictionary Error, some character not in the predefined recognition dictionary !!!")
 
-        return torch.cuda.IntTensor(text), torch.cuda.IntTensor(length)
+        return torch.tensor(text, dtype=torch.int32, device=device), \
+            torch.tensor(length, dtype=torch.int32, device=device)
 
     def decode(self, text_index, length, get_before_decode=False):
         """
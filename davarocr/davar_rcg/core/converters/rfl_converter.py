@@ -12,6 +12,7 @@ import os.path as osp
 import json
 
 import torch
+import numpy as np
 from mmcv.utils import print_log
 
 from davarocr.davar_common.core.builder import CONVERTERS
@@ -92,11 +93,12 @@ class RFLLabelConverter:
 
         print("recognition dictionary %s \t" % str(self.dict).encode(encoding="utf-8").decode(encoding="utf-8"))
 
-    def encode(self, text):
+    def encode(self, text, device='cpu'):
         """
             convert text-label into text-index.
         Args:
             text (list): text labels of each image. [batch_size]
+            device (torch.device | str): device of the returned tensors, the device of the model to train
 
         Returns:
             Torch.Tensor : the training target. [batch_size x (character_num)].
@@ -104,7 +106,8 @@ class RFLLabelConverter:
 
         """
 
-        batch_one_hot = torch.cuda.FloatTensor(len(text), len(self.character)).fill_(0.0)
+        # count the characters on host and transfer the whole batch once
+        batch_one_hot = np.zeros((len(text), len(self.character)), dtype=np.float32)
         for i, item in enumerate(batch_one_hot):
             for char_ in text[i]:
                 try:
@@ -112,7 +115,7 @@ class RFLLabelConverter:
                 except Exception as DictionaryError:
                     raise KeyError from DictionaryError
 
-        return batch_one_hot
+        return torch.from_numpy(batch_one_hot).to(device)
 
     def decode(self, pred):
         """
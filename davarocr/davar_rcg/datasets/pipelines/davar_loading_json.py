@@ -8,7 +8,6 @@
 # Date           :    2021-05-01
 ##################################################################################################
 """
-import re
 import os.path as osp
 
 import cv2
@@ -17,7 +16,7 @@ import numpy as np
 
 from mmdet.datasets.builder import PIPELINES
 
-from .utils.loading_utils import wordmap_loader, shake_crop, shake_point, \
+from .utils.loading_utils import wordmap_loader, compile_wordmap, shake_crop, shake_point, \
     scale_box, scale_box_hori_vert, get_perspective_img, crop_and_transform, rotate_and_crop, scale_point_hori_vert
 
 
@@ -36,7 +35,9 @@ def rcg_json_dataload(load_type,
                       character=None,
                       abandon_unsupport=False,
                       expand_ratio=None,
-                      crop_config=None):
+                      crop_config=None,
+                      vocabulary=None,
+                      support_vocabulary=None):
     """
         File|Tight|Loose dataset data loading
     Args:
@@ -56,6 +57,8 @@ def rcg_json_dataload(load_type,
         abandon_unsupport (bool): whether to drop the unsupported character, only supported in File|Tight data type
         expand_ratio (float): ratios of the fixed expand
         crop_config (dict): setting of rotating images to horizontal, then cropping image patchers
+        vocabulary (Vocabulary): compiled filter of `character`, compiled from `character` if not given
+        support_vocabulary (Vocabulary): compiled `support_chars`, compiled from `support_chars` if not given
 
     Returns:
         dict: dict for saving the processed image data and labels
@@ -162,13 +165,15 @@ def rcg_json_dataload(load_type,
             # Discard samples that contain unsupported characters
             # (transfer full-width characters to half-width character)
             if abandon_unsupport:
-                for char in label:
-                    if char not in support_chars:
-                        return None
+                if support_vocabulary is None:
+                    _, support_vocabulary = compile_wordmap(character, support_chars, abandon_unsupport=True)
+                if not support_vocabulary.is_supported(label):
+                    return None
             else:
                 # only filter unsupported character
-                out_of_char = '[^' + character + ']'
-                label = re.sub(out_of_char, '', label)
+                if vocabulary is None:
+                    vocabulary, _ = compile_wordmap(character)
+                label = vocabulary.filter(label)
 
         if label == '':
             print('Tight Empty Label:', filename)
@@ -234,6 +239,10 @@ class RCGLoadImageFromFile:
 
         # load the character dictionary
         self.character, self.support_chars, self.table = wordmap_loader(character, self.load_type)
+        # the labels are only filtered in training
+        self.vocabulary, self.support_vocabulary = compile_wordmap(self.character, self.support_chars,
+                                                                   self.fil_ops and not self.test_mode,
+                                                                   self.abandon_unsupport)
 
     def __call__(self, results):
         """
@@ -257,6 +266,8 @@ class RCGLoadImageFromFile:
                                     support_chars=self.support_chars,
                                     character=self.character,
                                     abandon_unsupport=self.abandon_unsupport,
+                                    vocabulary=self.vocabulary,
+                                    support_vocabulary=self.support_vocabulary,
                                     expand_ratio=self.expand_ratio)
 
         return results
@@ -306,6 +317,10 @@ class RCGLoadImageFromTight:
 
         # load the character dictionary
         self.character, self.support_chars, self.table = wordmap_loader(character, self.load_type)
+        # the labels are only filtered in training
+        self.vocabulary, self.support_vocabulary = compile_wordmap(self.character, self.support_chars,
+                                                                   self.fil_ops and not self.test_mode,
+                                                                   self.abandon_unsupport)
 
     def __call__(self, results):
         """
@@ -327,7 +342,9 @@ class RCGLoadImageFromTight:
                                     fil_ops=self.fil_ops,
                                     support_chars=self.support_chars,
                                     character=self.character,
-                                    abandon_unsupport=self.abandon_unsupport)
+                                    abandon_unsupport=self.abandon_unsupport,
+                                    vocabulary=self.vocabulary,
+                                    support_vocabulary=self.support_vocabulary)
 
         return results
 
@@ -375,6 +392,10 @@ class RCGLoadImageFromLoose:
 
         # load the character dictionary
         self.character, self.support_chars, self.table = wordmap_loader(character, self.load_type)
+        # the labels are only filtered in training
+        self.vocabulary, self.support_vocabulary = compile_wordmap(self.character, self.support_chars,
+                                                                   self.fil_ops and not self.test_mode,
+                                                                   self.abandon_unsupport)
 
         assert 'crop_method' in crop_config and crop_config['crop_method'] in \
                ("crop_and_transform", "rotate_and_crop", "perspective_crop")
@@ -402,6 +423,8 @@ class RCGLoadImageFromLoose:
                                     support_chars=self.support_chars,
                                     character=self.character,
                                     abandon_unsupport=self.abandon_unsupport,
+                                    vocabulary=self.vocabulary,
+                                    support_vocabulary=self.support_vocabulary,
                                     crop_config=self.crop_config)
 
         return results
@@ -8,7 +8,6 @@
 # Date           :    2022-04-27
 ##################################################################################################
 """
-import re
 import json
 import os.path as osp
 
@@ -17,7 +16,7 @@ from PIL import Image
 import numpy as np
 from mmdet.datasets import PIPELINES
 
-from .utils.loading_utils import wordmap_loader, shake_crop
+from .utils.loading_utils import wordmap_loader, shake_crop, compile_wordmap
 
 
 def rcg_lmdb_dataload(load_type,
@@ -32,7 +31,9 @@ def rcg_lmdb_dataload(load_type,
                       character=None,
                       sensitive=False,
                       abandon_unsupport=None,
-                      support_chars=None):
+                      support_chars=None,
+                      vocabulary=None,
+                      support_vocabulary=None):
     """
         LMDB_Davar|LMDB_Standard dataset data loading
     Args:
@@ -49,6 +50,8 @@ def rcg_lmdb_dataload(load_type,
         sensitive (bool): upper or lower, default False(lower)
         abandon_unsupport (bool): whether to drop the unsupported character, only supported in LMDB data type
         support_chars (str): supported recognition character
+        vocabulary (Vocabulary): compiled filter of `character`, compiled from `character` if not given
+        support_vocabulary (Vocabulary): compiled `support_chars`, compiled from `support_chars` if not given
 
     Returns:
         dict: dict for saving the processed image data and labels
@@ -154,20 +157,23 @@ def rcg_lmdb_dataload(load_type,
             if load_type == "LMDB_Standard":
                 if fil_ops:
                     # only filter unsupported character
-                    out_of_char = '[^' + str(character) + ']'
-                    label = re.sub(out_of_char, '', label)
+                    if vocabulary is None:
+                        vocabulary, _ = compile_wordmap(str(character))
+                    label = vocabulary.filter(label)
             else:
                 if fil_ops:
                     # Discard samples that contain unsupported characters
                     # (transfer full-width characters to half-width character)
                     if abandon_unsupport:
-                        for char in label:
-                            if char not in support_chars:
-                                return None
+                        if support_vocabulary is None:
+                            _, support_vocabulary = compile_wordmap(character, support_chars, abandon_unsupport=True)
+                        if not support_vocabulary.is_supported(label):
+                            return None
                     else:
                         # Discard samples that contain unsupported characters
-                        out_of_char = '[^' + character + ']'
-                        label = re.sub(out_of_char, '', label)
+                        if vocabulary is None:
+                            vocabulary, _ = compile_wordmap(character)
+                        label = vocabulary.filter(label)
 
             if label == '':
                 # print('LMDB_Davar Empty Label:',key)
@@ -220,6 +226,8 @@ class LoadImageFromLMDB:
         else:
             # load the character
             self.character = character
+        # the labels are only filtered in training
+        self.vocabulary, _ = compile_wordmap(self.character, fil_ops=self.fil_ops and not self.test_mode)
 
     def __call__(self, results):
         """
@@ -237,7 +245,8 @@ class LoadImageFromLMDB:
                                     img_w=self.img_w,
                                     fil_ops=self.fil_ops,
                                     character=self.character,
-                                    sensitive=self.sensitive,)
+                                    sensitive=self.sensitive,
+                                    vocabulary=self.vocabulary)
         return results
 
 
@@ -283,6 +292,10 @@ class RCGLoadImageFromLMDB:
 
         # load the character dictionary
         self.character, self.support_chars, self.table = wordmap_loader(character, self.load_type)
+        # the labels are only filtered in training
+        self.vocabulary, self.support_vocabulary = compile_wordmap(self.character, self.support_chars,
+                                                                   self.fil_ops and not self.test_mode,
+                                                                   self.abandon_unsupport)
 
     def __call__(self, results):
         """
@@ -302,6 +315,8 @@ class RCGLoadImageFromLMDB:
                                     character=self.character,
                                     sensitive=self.sensitive,
                                     abandon_unsupport=self.abandon_unsupport,
-                                    support_chars=self.support_chars)
+                                    support_chars=self.support_chars,
+                                    vocabulary=self.vocabulary,
+                                    support_vocabulary=self.support_vocabulary)
 
         return results
@@ -16,6 +16,8 @@ import os.path as osp
 import cv2
 import numpy as np
 
+from davarocr.davar_common.utils import build_vocabulary
+
 
 def wordmap_loader(wordmap, load_type):
     """
@@ -78,6 +80,26 @@ def wordmap_loader(wordmap, load_type):
         return character, character, None
 
 
+def compile_wordmap(character, support_chars=None, fil_ops=True, abandon_unsupport=False):
+    """ Compile the character filters of the recognition loaders once, instead of for each sample
+
+    Args:
+        character (str): content of the regex character class of the supported characters, from `wordmap_loader`
+        support_chars (set|str|None): supported characters, from `wordmap_loader`
+        fil_ops (bool): whether to filter the symbol out of the character dictionary
+        abandon_unsupport (bool): whether to drop the samples containing unsupported characters
+
+    Returns:
+        Vocabulary|None: filter of the unsupported characters, None if not used
+        Vocabulary|None: vocabulary of the supported characters, None if not used
+    """
+    if not fil_ops:
+        return None, None
+    if abandon_unsupport:
+        return None, build_vocabulary(support_chars)
+    return build_vocabulary(character, pattern=True), None
+
+
 def clc_points(points):
     """
 
@@ -68,4 +68,4 @@ class CTCLoss(nn.Module):
                                                      input_lengths.cpu(),
                                                      target_lengths.cpu())
         # torch.backends.cudnn.enabled=True
-        return loss_ctc.cuda()
+        return loss_ctc.to(log_probs.device)
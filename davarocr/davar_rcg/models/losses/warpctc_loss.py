@@ -63,4 +63,4 @@ class WarpCTCLoss(nn.Module):
                                                          target_lengths.cpu())
 
         # torch.backends.cudnn.enabled = True
-        return loss_warpctc.cuda()
+        return loss_warpctc.to(log_probs.device)
@@ -21,12 +21,13 @@ from .. import builder as recog_builder
 from .test_mixins import TextRecognitionTestMixin
 
 
-def word_acc(pred, target, topk=1):
+def word_acc(pred, target, topk=1, device='cpu'):
     """
     Args:
         pred (tensor): model prediction
         target (tensor): label information
         topk (int): top k accuracy, default 1
+        device (torch.device | str): device of the returned accuracy, the device of the losses
 
     Returns:
         torch.Tensor: model prediction accuracy
@@ -37,7 +38,7 @@ def word_acc(pred, target, topk=1):
     p_n = np.array(pred)
     t_n = np.array(target)
     acc = sum(p_n == t_n) * 1.0 / len(target)
-    acc = torch.FloatTensor([acc]).cuda()
+    acc = torch.tensor([acc], dtype=torch.float32, device=device)
     return acc
 
 
@@ -211,7 +212,7 @@ class GeneralRecognizor(BaseRecognizor, TextRecognitionTestMixin):
         # show the training accuracy online
         # text = self.sequence_head.get_pred_text(prediction, self.test_cfg.batch_max_length)
         #
-        # acc = word_acc(text, gt_text)
+        # acc = word_acc(text, gt_text, device=prediction.device)
         # losses.update({'WordAcc': acc})  # too slow
 
         return losses
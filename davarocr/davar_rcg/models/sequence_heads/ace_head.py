@@ -19,6 +19,7 @@ from mmdet.models.builder import build_loss
 from mmcv.runner import load_checkpoint
 
 from davarocr.davar_common.core.builder import build_converter
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -137,7 +138,7 @@ class ACEHead(nn.Module):
             Torch.Tensor: vector transformed text length
         """
         if gt_texts is not None:
-            text, length = self.converter.encode(gt_texts, self.batch_max_length)
+            text, length = self.converter.encode(gt_texts, self.batch_max_length, device=get_module_device(self))
             return text, length
 
         return None, None
@@ -156,7 +157,7 @@ class ACEHead(nn.Module):
         batch_size = preds.size()[0]
         _, preds_index = preds.max(2)
 
-        length_for_pred = torch.cuda.IntTensor([length + 1] * batch_size)
+        length_for_pred = torch.full((batch_size,), length + 1, dtype=torch.int32, device=preds.device)
 
         # transfer the model prediction to text
         preds_str = self.converter.decode(preds_index, length_for_pred)
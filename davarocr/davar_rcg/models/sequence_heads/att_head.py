@@ -22,6 +22,7 @@ from mmdet.models.builder import build_loss
 from mmcv.runner import load_checkpoint
 
 from davarocr.davar_common.core.builder import build_converter
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -107,9 +108,9 @@ class AttentionHead(nn.Module):
         batch_size = input_char.size(0)
 
         # initialize the one hot tensor
-        one_hot = torch.cuda.FloatTensor(batch_size,
-                                         onehot_dim,
-                                         device=input_char.device).zero_()
+        one_hot = torch.zeros(batch_size,
+                              onehot_dim,
+                              device=input_char.device)
         one_hot = one_hot.scatter_(1, input_char, 1)
         return one_hot
 
@@ -146,13 +147,14 @@ class AttentionHead(nn.Module):
         batch_size = batch_H.size(0)
         num_steps = self.batch_max_length + 1  # +1 for [s] at end of sentence. # 31
 
-        output_hiddens = torch.cuda.FloatTensor(batch_size,
-                                                num_steps,
-                                                self.hidden_size).fill_(0)
-        hidden = (torch.cuda.FloatTensor(batch_size, self.hidden_size,
-                                         device=batch_H.device).fill_(0),
-                  torch.cuda.FloatTensor(batch_size, self.hidden_size,
-                                         device=batch_H.device).fill_(0))
+        output_hiddens = torch.zeros(batch_size,
+                                     num_steps,
+                                     self.hidden_size,
+                                     device=batch_H.device)
+        hidden = (torch.zeros(batch_size, self.hidden_size,
+                              device=batch_H.device),
+                  torch.zeros(batch_size, self.hidden_size,
+                              device=batch_H.device))
         if is_train:
             for i in range(num_steps):
                 # The vector corresponding to the i-th text in one batch
@@ -164,12 +166,12 @@ class AttentionHead(nn.Module):
             probs = self.generator(output_hiddens)
 
         else:
-            targets = torch.cuda.LongTensor(batch_size,
-                                            device=batch_H.device).fill_(self.bos)  # [GO] token
-            probs = torch.cuda.FloatTensor(batch_size,
-                                           num_steps,
-                                           self.num_classes,
-                                           device=batch_H.device).fill_(0)
+            targets = torch.full((batch_size,), self.bos, dtype=torch.long,
+                                 device=batch_H.device)  # [GO] token
+            probs = torch.zeros(batch_size,
+                                num_steps,
+                                self.num_classes,
+                                device=batch_H.device)
 
             for i in range(num_steps):
                 char_onehots = self._char_to_onehot(targets, onehot_dim=self.num_classes)
@@ -230,7 +232,7 @@ class AttentionHead(nn.Module):
 
         """
         if gt_texts is not None:
-            text, length = self.converter.encode(gt_texts, self.batch_max_length)
+            text, length = self.converter.encode(gt_texts, self.batch_max_length, device=get_module_device(self))
             return text, length
 
         return None, None
@@ -247,7 +249,7 @@ class AttentionHead(nn.Module):
 
         """
         batch_size = preds.size(0)
-        length_for_pred = torch.cuda.IntTensor([batch_max_length] * batch_size)
+        length_for_pred = torch.full((batch_size,), batch_max_length, dtype=torch.int32, device=preds.device)
 
         preds = preds[:, :batch_max_length, :]
         _, preds_index = preds.max(2)
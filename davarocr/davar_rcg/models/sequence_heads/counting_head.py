@@ -20,6 +20,7 @@ from mmdet.models.builder import build_loss
 from mmcv.runner import load_checkpoint
 
 from davarocr.davar_common.core.builder import build_converter
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -141,7 +142,7 @@ class CNTHead(nn.Module):
 
         """
         if gt_texts is not None:
-            gt_embed = self.converter_visual.encode(gt_texts)
+            gt_embed = self.converter_visual.encode(gt_texts, device=get_module_device(self))
             return gt_embed
 
         return None
@@ -15,6 +15,7 @@ from mmdet.models.builder import HEADS
 from mmdet.models.builder import build_loss
 
 from davarocr.davar_common.core.builder import build_converter
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -105,7 +106,7 @@ class CTCHead(nn.Module):
 
         if gt_texts is not None:
             # transfer the label to the model supervision format
-            text, length = self.converter.encode(gt_texts)
+            text, length = self.converter.encode(gt_texts, device=get_module_device(self))
             return text, length
 
         return None, None
@@ -131,7 +132,7 @@ class CTCHead(nn.Module):
 
         # prob: B, L, C
         # torch.backends.cudnn.enabled=False
-        loss_ctc = self.loss_ctc(prob, gt_text.cuda(), prob_size, text_length)
+        loss_ctc = self.loss_ctc(prob, gt_text.to(prob.device), prob_size, text_length)
         # torch.backends.cudnn.enabled=True
         loss['loss_ctc'] = loss_ctc
         return loss
@@ -150,7 +151,7 @@ class CTCHead(nn.Module):
 
         pred = pred.squeeze(1)
         batch_size = pred.size(0)
-        length_for_pred = torch.cuda.IntTensor([batch_max_length] * batch_size)
+        length_for_pred = torch.full((batch_size,), batch_max_length, dtype=torch.int32, device=pred.device)
 
         pred = pred[:, :batch_max_length, :]
         _, preds_index = pred.max(2)
@@ -20,6 +20,7 @@ from mmdet.models.builder import HEADS
 from mmdet.models.builder import build_loss
 
 from davarocr.davar_common.core.builder import build_converter
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -122,7 +123,7 @@ class WarpCTCHead(nn.Module):
             Torch.Tensor: vector transformed by text length
         """
         if gt_texts is not None:
-            text, length = self.converter.encode(gt_texts)
+            text, length = self.converter.encode(gt_texts, device=get_module_device(self))
             return text, length
         return None, None
 
@@ -186,8 +187,8 @@ class WarpCTCHead(nn.Module):
         else:
             batch_size = pred.size(0)
             batch_max_length = pred.size(1)
-            length_for_pred = torch.cuda.IntTensor([batch_max_length] *
-                                                   batch_size)
+            length_for_pred = torch.full((batch_size,), batch_max_length,
+                                         dtype=torch.int32, device=pred.device)
 
             _, preds_index = pred.max(2)
             preds_index = preds_index.contiguous().view(-1)
@@ -18,7 +18,7 @@ import torch.nn.functional as F
 
 from davarocr.davar_common.models.builder import TRANSFORMATIONS
 from .tps_transformation import GridGenerator
-from .spin_transformation import SP_TransformerNetwork
+from .spin_transformation import SP_TransformerNetwork, INPUT_DATA_TYPES
 
 
 @TRANSFORMATIONS.register_module()
@@ -32,7 +32,7 @@ class GA_SPIN_Transformer(nn.Module):
 
     def __init__(self, input_channel=3,
                  I_r_size=(32, 100),
-                 inputDataType='torch.cuda.FloatTensor',
+                 inputDataType='torch.FloatTensor',
                  offsets=False,
                  norm_type='BN',
                  default_type=6,
@@ -42,8 +42,8 @@ class GA_SPIN_Transformer(nn.Module):
             input_channel (int): channel of input features,
                                 set it to 1 if the grayscale images and 3 if RGB input
             I_r_size (tuple): size of rectified images (used in STN transformations)
-            inputDataType (str): the type of input data,
-                                only support 'torch.cuda.FloatTensor' this version
+            inputDataType (str): the type of input data, see `INPUT_DATA_TYPES`,
+                                only support FloatTensor this version, on either cuda or cpu
             offsets (bool): set it to False if use SPN w.o. AIN,
                             and set it to True if use SPIN (both with SPN and AIN)
             norm_type (str): the normalization type of the module,
@@ -55,7 +55,9 @@ class GA_SPIN_Transformer(nn.Module):
         """
         super(GA_SPIN_Transformer, self).__init__()
         self.nc = input_channel
+        assert inputDataType in INPUT_DATA_TYPES, 'Unsupported inputDataType {}'.format(inputDataType)
         self.inputDataType = inputDataType
+        self.input_dtype = INPUT_DATA_TYPES[inputDataType]
         self.spt = True
         self.offsets = offsets
         self.stn = True  # set to True in GA-SPIN, while set it to False in SPIN
@@ -202,7 +204,7 @@ class GA_SPIN_Transformer(nn.Module):
     def forward(self, x, return_weight=False):
         """
         Args:
-            x (torch.cuda.FloatTensor): input image batch
+            x (torch.FloatTensor): input image batch
             return_weight (bool): set to False by default,
                                   if set to True return the predicted offsets of AIN, denoted as x_{offsets}
 
@@ -210,7 +212,7 @@ class GA_SPIN_Transformer(nn.Module):
             torch.Tensor: rectified image [batch_size x I_channel_num x I_height x I_width], the same as the input size
         """
 
-        assert x.data.type() == self.inputDataType
+        assert x.dtype == self.input_dtype
         if self.spt:
             feat = self.spt_convnet(x)
             fc1 = self.stucture_fc1(feat)
@@ -18,6 +18,10 @@ import numpy as np
 
 from davarocr.davar_common.models.builder import TRANSFORMATIONS, build_transformation
 
+# dtype of each supported `inputDataType`. The cuda type names of the earlier configs give the same dtype, since the
+# device of the input follows the model
+INPUT_DATA_TYPES = {'torch.FloatTensor': torch.float32, 'torch.cuda.FloatTensor': torch.float32}
+
 
 class SP_TransformerNetwork(nn.Module):
     """
@@ -105,7 +109,7 @@ class SPIN_ColorTransformer(nn.Module):
 
     '''
     def __init__(self, input_channel=1,
-                 inputDataType='torch.cuda.FloatTensor',
+                 inputDataType='torch.FloatTensor',
                  offsets=False,
                  norm_type='BN',
                  stn=None,
@@ -116,8 +120,8 @@ class SPIN_ColorTransformer(nn.Module):
         Args:
             input_channel (int): channel of input features,
                                 set it to 1 if the grayscale images and 3 if RGB input
-            inputDataType (str): the type of input data,
-                                only support 'torch.cuda.FloatTensor' this version
+            inputDataType (str): the type of input data, see `INPUT_DATA_TYPES`,
+                                only support FloatTensor this version, on either cuda or cpu
             offsets (bool): set it to False if use SPN w.o. AIN,
                             and set it to True if use SPIN (both with SPN and AIN)
             norm_type (str): the normalization type of the module,
@@ -131,7 +135,9 @@ class SPIN_ColorTransformer(nn.Module):
         """
         super().__init__()
         self.nc = input_channel
+        assert inputDataType in INPUT_DATA_TYPES, 'Unsupported inputDataType {}'.format(inputDataType)
         self.inputDataType = inputDataType
+        self.input_dtype = INPUT_DATA_TYPES[inputDataType]
         self.spt = True  # SPN is necessary in SPIN, so set the parameter to True
         self.offsets = offsets
 
@@ -298,7 +304,7 @@ class SPIN_ColorTransformer(nn.Module):
     def forward(self, x, return_weight=False):
         """
         Args:
-            x (torch.cuda.FloatTensor): input image batch
+            x (torch.FloatTensor): input image batch
             return_weight (bool): set to False by default,
                                   if set to True return the predicted offsets of AIN, denoted as x_{offsets}
 
@@ -307,7 +313,7 @@ class SPIN_ColorTransformer(nn.Module):
 
         """
 
-        assert x.data.type() == self.inputDataType
+        assert x.dtype == self.input_dtype
 
         if self.spt:
             # if x.size(2) > 32:
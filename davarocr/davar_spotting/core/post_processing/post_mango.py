@@ -227,6 +227,7 @@ class PostMango(BasePostSpotter):
         """
 
         _, height, width = seg_pred.shape
+        device = cate_conf.device
 
         # Flatten
         seg_pred = seg_pred.cpu().numpy().reshape(-1)
@@ -249,6 +250,6 @@ class PostMango(BasePostSpotter):
 
         # Select the result according to the number of instances
         seg_result = seg_result.reshape(-1, 8)[:seg_num]
-        cate_result = torch.IntTensor(cate_result).cuda()
+        cate_result = torch.from_numpy(cate_result).to(device)
         cate_result = cate_result.unsqueeze(0)
         return seg_result, cate_result, cate_weight
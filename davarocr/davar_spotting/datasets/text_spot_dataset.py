@@ -29,6 +29,7 @@ class TextSpotDataset(DavarCustomDataset):
                  test_mode=False,
                  filter_empty_gt=False,
                  classes_config=None,
+                 ann_store=None,
                  ):
         """
         Args:
@@ -41,11 +42,12 @@ class TextSpotDataset(DavarCustomDataset):
             test_mode (boolean): whether in test mode
             filter_empty_gt (boolean): whether to filter out image without ground-truthes.
             classes_config (str): the path to classes config file, used to transfer 'str' labels into 'int'
+            ann_store (str | bool): directory of the annotation store of the datalist, see DavarCustomDataset
 
         """
 
         super().__init__(ann_file, pipeline, data_root, img_prefix, seg_prefix, proposal_file, test_mode,
-                         filter_empty_gt, classes_config)
+                         filter_empty_gt, classes_config, ann_store=ann_store)
         self.ignore = "###"
         self.eval_func_params = {
             "IOU_CONSTRAINT": 0.5,  # IOU threshold for pred v.s. gt matching
@@ -53,7 +55,8 @@ class TextSpotDataset(DavarCustomDataset):
             "WORD_SPOTTING": True,  # If it is True, words that not in dictionary will be not considered
             "MIN_LENGTH_CARE_WORD": 3,  # The words are shorter in length (<3) will be not considered
             "SPECIAL_CHARACTERS": "[]+-#$()@=_!?,:;/.%&\'\">*|<`{~}^\ ",
-            "ONLY_REMOVE_FIRST_LAST_CHARACTER": True  # Whether to only remove the first&last character
+            "ONLY_REMOVE_FIRST_LAST_CHARACTER": True,  # Whether to only remove the first&last character
+            "NUM_WORKERS": 0  # Number of processes to evaluate images in parallel
         }
 
     def evaluate(self,
@@ -105,6 +108,8 @@ class TextSpotDataset(DavarCustomDataset):
             if "ONLY_REMOVE_FIRST_LAST_CHARACTER" in eval_func_params:
                 self.eval_func_params["ONLY_REMOVE_FIRST_LAST_CHARACTER"] = eval_func_params[
                     "ONLY_REMOVE_FIRST_LAST_CHARACTER"]
+            if "NUM_WORKERS" in eval_func_params:
+                self.eval_func_params["NUM_WORKERS"] = eval_func_params["NUM_WORKERS"]
         print("\nDo {} evaluation with iou constraint {}...".format(
             "Word Spotting" if self.eval_func_params["WORD_SPOTTING"] else "End-to-End",
             self.eval_func_params["IOU_CONSTRAINT"]))
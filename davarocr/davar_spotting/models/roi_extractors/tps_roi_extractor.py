@@ -86,7 +86,7 @@ class TPSRoIExtractor(nn.Module):
         for feat, points in zip(feats, fiducial_points):
             if len(points) == 0:
                 continue
-            points = torch.Tensor(points).cuda(device=feat.device)
+            points = torch.tensor(points, dtype=torch.float32, device=feat.device)
             points = points / scale_factor
             for point in points:
                 # Clip points
@@ -157,7 +157,7 @@ class MultiRecogSeqHead(nn.Module):
             val = values[batch_id]
             gt_text = gt_texts[batch_id]
             # Convert string into int
-            encode_text, _ = self.converter.encode(gt_text, self.text_max_length)
+            encode_text, _ = self.converter.encode(gt_text, self.text_max_length, device=device)
 
             for idx, text in enumerate(encode_text):
                 indices = torch.where(val == idx + 1)[0]
@@ -250,8 +250,8 @@ class MultiRecogSeqHead(nn.Module):
         for pred in preds:
             pred = pred.squeeze(0)
             batch_size = pred.size(0)
-            length_for_pred = torch.cuda.IntTensor([self.text_max_length] *
-                                                   batch_size)
+            length_for_pred = torch.full((batch_size,), self.text_max_length,
+                                         dtype=torch.int32, device=pred.device)
             pred = pred[:, :self.text_max_length, :]
             _, preds_index = pred.max(2)
             preds_index = preds_index.contiguous()
@@ -20,6 +20,9 @@ class BaseEndToEnd(BaseDetector):
 
     __metaclass__ = ABCMeta
 
+    # Whether simple_test returns the result of each image in a batch. Otherwise the test batch size must be 1.
+    batch_test = False
+
     def __init__(self):
         super(BaseEndToEnd, self).__init__()
         self.fp16_enabled = False
@@ -53,9 +56,10 @@ class BaseEndToEnd(BaseDetector):
             raise ValueError(
                 'num of augmentations ({}) != num of image meta ({})'.format(
                     len(imgs), len(img_metas)))
-        # TODO: remove the restriction of imgs_per_gpu == 1 when prepared
+        # TODO: remove the restriction of imgs_per_gpu == 1 when prepared for all the models
         imgs_per_gpu = imgs[0].size(0)
-        assert imgs_per_gpu == 1
+        assert imgs_per_gpu == 1 or self.batch_test, \
+            '{} only supports imgs_per_gpu == 1 in test'.format(self.__class__.__name__)
 
         if num_augs == 1:
             return self.simple_test(imgs[0], img_metas[0], **kwargs)
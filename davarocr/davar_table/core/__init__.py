@@ -9,10 +9,10 @@
 ##################################################################################################
 """
 
-from .mask import BitmapMasksTable, get_lpmasks
-from .bbox import recon_noncell, recon_largecell
+from .mask import BitmapMasksTable, get_lpmasks, get_lpmask_targets
+from .bbox import recon_noncell, recon_largecell, cell_relation_candidates
 from .post_processing import PostLGPMA
 from .evaluation import evaluate_tree_f1, evaluate_cellcls_f1
 
 __all__ = ['BitmapMasksTable', 'get_lpmasks', 'recon_noncell', 'recon_largecell', 'PostLGPMA', 'evaluate_tree_f1',
-           'evaluate_cellcls_f1']
+           'evaluate_cellcls_f1', 'cell_relation_candidates', 'get_lpmask_targets']
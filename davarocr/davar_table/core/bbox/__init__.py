@@ -9,6 +9,8 @@
 ##################################################################################################
 """
 
-from .bbox_process import recon_noncell, recon_largecell, nms_inter_classes, bbox2adj
+from .bbox_process import recon_noncell, recon_largecell, nms_inter_classes, bbox2adj, span_overlap_pairs, \
+    cell_relation_candidates
 
-__all__ = ['recon_noncell', 'recon_largecell', 'nms_inter_classes', 'bbox2adj']
+__all__ = ['recon_noncell', 'recon_largecell', 'nms_inter_classes', 'bbox2adj', 'span_overlap_pairs',
+           'cell_relation_candidates']
@@ -250,3 +250,52 @@ def bbox2adj(bboxes_non):
                     adjc[j, i], adjc[i, j] = 1, 1
 
     return adjr, adjc
+
+
+def span_overlap_pairs(starts, ends):
+    """ All the ordered pairs of overlapping spans, by a sort-based interval sweep instead of comparing every pair.
+    After sorting by the starts, a span overlaps exactly the following spans that start before its end.
+
+    Args:
+        starts (np.array): (n).start indexes of the spans, e.g. start rows of cells
+        ends (np.array): (n).end indexes of the spans (inclusive, not less than the starts)
+
+    Returns:
+        np.array: (m).first span of each pair, including the pair of each span with itself
+        np.array: (m).second span of each pair
+    """
+    starts = np.asarray(starts)
+    ends = np.asarray(ends)
+    num = len(starts)
+    order = np.argsort(starts, kind='stable')
+    stops = np.searchsorted(starts[order], ends[order], side='right')
+    counts = np.maximum(stops - np.arange(num) - 1, 0)
+
+    # For the span at each sorted position, the spans at the following `counts` positions
+    first = np.repeat(np.arange(num), counts)
+    second = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + first + 1
+    first, second = order[first], order[second]
+    diag = np.nonzero(ends >= starts)[0]
+    return np.concatenate([diag, first, second]), np.concatenate([diag, second, first])
+
+
+def cell_relation_candidates(cells, direction='row'):
+    """ Candidate cell pairs of the relation linking, only which can be related.
+
+    Args:
+        cells (list | np.array): (n x 4).start row, start column, end row and end column of each cell
+        direction (str): 'row' for pairs whose row or column spans overlap, 'col' for pairs whose column spans overlap
+
+    Returns:
+        np.array: (m).first cell of each candidate pair
+        np.array: (m).second cell of each candidate pair
+    """
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 4)
+    col_first, col_second = span_overlap_pairs(cells[:, 1], cells[:, 3])
+    if direction == 'col':
+        return col_first, col_second
+    assert direction == 'row', 'direction should be "row" or "col", but got {}'.format(direction)
+    row_first, row_second = span_overlap_pairs(cells[:, 0], cells[:, 2])
+    num = len(cells)
+    keys = np.unique(np.concatenate([row_first * num + row_second, col_first * num + col_second]))
+    return keys // num, keys % num
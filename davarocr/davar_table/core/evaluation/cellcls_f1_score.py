@@ -22,19 +22,31 @@ def evaluate_cellcls_f1(preds, gts, class_num=4):
     Returns:
         list(float): average f1-score (each table has the same weight) of each type of cells.
     """
-    cellcls_f1_pertab = [[] for _ in range(class_num)]
-    for pred, gt in zip(preds, gts):
-        pred_np = np.array([v[0] for v in pred])
-        gt_np = np.array([v[0] for v in gt])
-        for lab_id in range(class_num):  # th, lh, data, other
-            preds_num = (pred_np == lab_id).sum()
-            gts_num = (gt_np == lab_id).sum()
-            if (not gts_num) and (not preds_num):
-                continue
-            correct_num = ((pred_np == lab_id) & (gt_np == lab_id)).sum()
-            f1_id = 2 * correct_num / (preds_num + gts_num)
-            cellcls_f1_pertab[lab_id].append(f1_id)
-
-    cellcls_f1_avg = [sum(cellcls_f1_pertab[lab_id]) / len(cellcls_f1_pertab[lab_id]) for lab_id in range(class_num)]
+    # Cells of all tables are concatenated, and counted per (table, type) by one bincount
+    num_tables = min(len(preds), len(gts))
+    cells_num = [len(gt) for gt in gts[:num_tables]]
+    assert cells_num == [len(pred) for pred in preds[:num_tables]], \
+        'preds and gts should have the same number of cells in each table'
+    table_ids = np.repeat(np.arange(num_tables), cells_num)
+    pred_np = np.array([v[0] for pred in preds[:num_tables] for v in pred])
+    gt_np = np.array([v[0] for gt in gts[:num_tables] for v in gt])
+
+    def count(labels, mask=None):
+        """ Number of cells of each type in each table, in shape of [num_tables, class_num] """
+        valid = np.isin(labels, np.arange(class_num))
+        if mask is not None:
+            valid &= mask
+        bins = table_ids[valid] * class_num + labels[valid].astype(np.int64)
+        return np.bincount(bins, minlength=num_tables * class_num).reshape(num_tables, class_num)
+
+    preds_num = count(pred_np)  # th, lh, data, other
+    gts_num = count(gt_np)
+    correct_num = count(gt_np, pred_np == gt_np)
+
+    # The types neither predicted nor annotated in a table are skipped
+    valid = (preds_num + gts_num) > 0
+    f1_pertab = 2 * correct_num / np.maximum(preds_num + gts_num, 1)
+
+    cellcls_f1_avg = [f1_pertab[valid[:, lab_id], lab_id].sum() / valid[:, lab_id].sum() for lab_id in range(class_num)]
 
     return cellcls_f1_avg
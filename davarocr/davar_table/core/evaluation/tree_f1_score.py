@@ -9,13 +9,16 @@
 ##################################################################################################
 """
 import re
-import numpy as np
 from collections import deque
+
+import numpy as np
 from apted import APTED
 from apted.helpers import Tree
 
+from davarocr.davar_det.core.evaluation.polygon_match import map_images
 
-def evaluate_tree_f1(preds, gts, eval_type='hard'):
+
+def evaluate_tree_f1(preds, gts, eval_type='hard', num_workers=0):
     """Evaluate the prediction with similarity.
 
     Args:
@@ -24,6 +27,7 @@ def evaluate_tree_f1(preds, gts, eval_type='hard'):
         gts (list(list(list(int)))): predicted relations. like [list(N_1 x N_1), ..., list(N_C x N_C)].
             where C is the number of tables and N_i is the cells number of i-th table.
         eval_type (str): evaluation type. Optional values are 'hard' and 'soft'.
+        num_workers (int): number of worker processes to evaluate the tables, 0 or 1 means the current process.
 
     Returns:
         float: tree based recall of basic information trees.
@@ -34,10 +38,7 @@ def evaluate_tree_f1(preds, gts, eval_type='hard'):
     """
     recall, precision, f1 = 0, 0, 0
     num_samples = 0
-    for pred, gt in zip(preds, gts):
-        pred_tree = ajacent_to_tree(pred)
-        gt_tree = ajacent_to_tree(gt)
-        r_cur, p_cur, f1_cur = cal_tree_f1_score(gt_tree, pred_tree, eval_type=eval_type)
+    for r_cur, p_cur, f1_cur in map_images(evaluate_table, gts, preds, dict(eval_type=eval_type), num_workers):
         recall += r_cur
         precision += p_cur
         f1 += f1_cur
@@ -51,80 +52,146 @@ def evaluate_tree_f1(preds, gts, eval_type='hard'):
     return recall, precision, f1
 
 
+def evaluate_table(gt, pred, params):
+    """Evaluate the prediction of one table.
+
+    Args:
+        gt (list(list(int))): ground-truth relations of the table, in shape of N x N.
+        pred (list(list(int))): predicted relations of the table, in shape of N x N.
+        params (dict): evaluation parameters, containing 'eval_type'.
+
+    Returns:
+        tuple(float): tree based recall, precision and f1-score of the table.
+    """
+    pred_tree = ajacent_to_tree(pred)
+    gt_tree = ajacent_to_tree(gt)
+    return cal_tree_f1_score(gt_tree, pred_tree, eval_type=params['eval_type'])
+
+
 def ajacent_to_tree(ajacency, leftlabel=2, rightlabel=1):
     """Convert ajacent matrix to tree.
 
+    Each tree is a hashable canonical key (root, top, left), where top and left are tuples of the sub-trees of the
+    root's top and left children, and each sub-tree is a key (idx, children), e.g.
+    (0, ((1, ((3, ()),)),), ((2, ()),)) for a root 0 with a top child 1 (which has a child 3) and a left child 2.
+    Two trees are equal if and only if their keys are equal.
+
     Args:
         ajacency (list(list(int): ajacent matrix of a table.
         leftlabel (int): the corresponding categories in the adjacency matrix represent the left edge
         rightlabel (int): the corresponding categories in the adjacency matrix represent the right edge
 
     Returns:
-        list(dict): A list of tree. Each tree describing a table items in table.
+        list(tuple): A list of tree. Each tree describing a table items in table.
     """
-    trees = []
+    num_nodes = len(ajacency)
+    if num_nodes == 0:
+        return []
+    ajacency_np = np.array(ajacency).reshape(num_nodes, -1)
 
     # Find the root node from ajacenct matrix. (in-degree == 0, out-degree > 0)
-    ajacency_np = np.array(ajacency)
-    root_nodes = [idx for idx in range(len(ajacency)) if ajacency_np[:, idx].sum() == 0 and ajacency_np[idx, :].sum()]
+    root_nodes = np.nonzero((ajacency_np.sum(0) == 0) & (ajacency_np.sum(1) != 0))[0].tolist()
+    if not root_nodes:
+        return []
+
+    # Sparse adjacency: the children of each node in ascending order, and their edge labels
+    rows, cols = np.nonzero(ajacency_np)
+    splits = np.cumsum(np.bincount(rows, minlength=num_nodes))[:-1]
+    children = [per_children.tolist() for per_children in np.split(cols, splits)]
+    edges = np.split(ajacency_np[rows, cols], splits)
 
+    subtrees = _build_subtrees(children, num_nodes)
+
+    trees = []
     for root in root_nodes:
         top, left = [], []
-        for node, edge in enumerate(ajacency[root]):
+        for node, edge in zip(children[root], edges[root].tolist()):
             if edge == leftlabel:
                 left.append(node)
             elif edge == rightlabel:
                 top.append(node)
-            else:
-                continue
-        top_child_list = [get_child_tree(ajacency, node) for node in top]
-        left_child_list = [get_child_tree(ajacency, node) for node in left]
-
-        tree_dict = {'idx': root, 'top': top_child_list, 'left': left_child_list}
-        trees.append(tree_dict)
+        top_child_list = tuple(subtrees[node] if subtrees is not None else get_child_tree(children, node)
+                               for node in top)
+        left_child_list = tuple(subtrees[node] if subtrees is not None else get_child_tree(children, node)
+                                for node in left)
+        trees.append((root, top_child_list, left_child_list))
 
     return trees
 
 
-def get_child_tree(ajacency, node):
-    """Generate left tree and top tree for a node.
+def _build_subtrees(children, num_nodes):
+    """Build the sub-trees of all nodes in a single traversal, if the graph is a forest.
+
+    In a forest (each node has at most one parent and there is no cycle), the sub-tree of a node is the node with the
+    sub-trees of its children, so that the sub-trees are built bottom-up from the leaves, and shared by the trees.
+
+    Args:
+        children (list(list(int))): children of each node in ascending order.
+        num_nodes (int): number of nodes.
+
+    Returns:
+        list(tuple) | None: sub-tree key of each node, or None if the graph is not a forest.
+    """
+    in_degree = [0] * num_nodes
+    for per_children in children:
+        for child in per_children:
+            in_degree[child] += 1
+    if max(in_degree) > 1:
+        return None
+
+    # Topological order of the nodes, starting from the nodes without parents
+    order = [node for node in range(num_nodes) if in_degree[node] == 0]
+    for node in order:
+        order.extend(children[node])
+    if len(order) != num_nodes:
+        return None
+
+    subtrees = [None] * num_nodes
+    for node in reversed(order):
+        subtrees[node] = (node, tuple(subtrees[child] for child in children[node]))
+    return subtrees
+
+
+def get_child_tree(children, node):
+    """Generate left tree and top tree for a node, in a graph that is not a forest.
+
+    The nodes are visited in depth-first order, and a node is appended as a child of every visited parent which
+    reaches it before it is visited.
 
     Args:
-        ajacency (list(list(int): ajacent matrix of a table..
+        children (list(list(int))): children of each node in ascending order.
         node (int): node number in table.
     Returns:
-        dict: left tree or top tree for a node.
+        tuple: left tree or top tree for a node.
     """
-    tree_dict = {'idx': node}
+    tree_list = [node, []]
     que = deque()
-    que.append(tree_dict)
-    vis = [False for _ in range(len(ajacency))]
+    que.append(tree_list)
+    vis = [False for _ in range(len(children))]
     while len(que) != 0:
-        q_len = len(que)
-        for i in range(q_len):
-            u_dict = que.pop()
-            u = u_dict['idx']
-            vis[u] = True
-            u_list = []
-            for v in range(len(ajacency[u])):
-                if vis[v]:
-                    continue
-                if ajacency[u][v] == 0:
-                    continue
-                v_dict = {'idx': v}
-                que.append(v_dict)
-                u_list.append(v_dict)
-            u_dict['children'] = u_list
-
-    return tree_dict
+        u_list = que.pop()
+        u = u_list[0]
+        vis[u] = True
+        for v in children[u]:
+            if vis[v]:
+                continue
+            v_list = [v, []]
+            que.append(v_list)
+            u_list[1].append(v_list)
+
+    def to_key(sub_tree):
+        """Convert the nested lists to the sub-tree key."""
+        return sub_tree[0], tuple(to_key(child) for child in sub_tree[1])
+
+    return to_key(tree_list)
 
 
 def cal_tree_f1_score(gt, pred, eval_type='hard'):
     """ Calculate tree-base precision, recall and f1 score.
 
     Args:
-        gt (list(dict)）: A list of tree. Each tree describing a table items in table.
-        pred (list(dict)）: A list of tree. Each tree describing a table items in table.
+        gt (list(tuple)）: A list of tree. Each tree describing a table items in table.
+        pred (list(tuple)）: A list of tree. Each tree describing a table items in table.
         eval_type (str): evaluation type. Optional values are 'hard' and 'soft'.
 
     Returns:
@@ -140,10 +207,10 @@ def cal_tree_f1_score(gt, pred, eval_type='hard'):
         return 0, 1, 0
 
     if eval_type == 'hard':
-        gt_check = [1 if per_gt in pred else 0 for per_gt in gt]
-        r = sum(gt_check) / len(gt_check)
-        pred_check = [1 if per_pred in gt else 0 for per_pred in pred]
-        p = sum(pred_check) / len(pred_check)
+        pred_set = set(pred)
+        gt_set = set(gt)
+        r = sum(1 for per_gt in gt if per_gt in pred_set) / len(gt)
+        p = sum(1 for per_pred in pred if per_pred in gt_set) / len(pred)
     elif eval_type == 'soft':
         r = cal_tree_recall(gt, pred)
         p = cal_tree_precision(gt, pred)
@@ -159,21 +226,18 @@ def cal_tree_recall(gt, pred):
     """ Calculate soft tree-base recall.
 
     Args:
-        gt (list(dict)）: A list of tree. Each tree describing a table items in table.
-        pred (list(dict)）: A list of tree. Each tree describing a table items in table.
+        gt (list(tuple)）: A list of tree. Each tree describing a table items in table.
+        pred (list(tuple)）: A list of tree. Each tree describing a table items in table.
     Returns:
         float: tree based recall of a table.
     """
+    pred_index = {per_pred[0]: per_pred for per_pred in pred}
+    assert len(pred_index) == len(pred)
+
     total_scores = 0.
     for y_true in gt:
-        idx = y_true['idx']
-        pred_match_check = [1 if per_pred['idx'] == idx else 0 for per_pred in pred]
-        assert sum(pred_match_check) <= 1
-        if sum(pred_match_check) == 1:
-            matched_pred = pred[pred_match_check.index(1)]
-            teds_score = compute_teds_score(y_true, matched_pred)
-        else:
-            teds_score = 0.
+        matched_pred = pred_index.get(y_true[0])
+        teds_score = compute_teds_score(y_true, matched_pred) if matched_pred is not None else 0.
         total_scores += teds_score
 
     recall = total_scores / len(gt)
@@ -185,21 +249,18 @@ def cal_tree_precision(gt, pred):
     """ Calculate soft tree-base precision.
 
     Args:
-        gt (list(dict)）: A list of tree. Each tree describing a table items in table.
-        pred (list(dict)）: A list of tree. Each tree describing a table items in table.
+        gt (list(tuple)）: A list of tree. Each tree describing a table items in table.
+        pred (list(tuple)）: A list of tree. Each tree describing a table items in table.
     Returns:
         float: tree based precision of a table.
     """
+    gt_index = {per_gt[0]: per_gt for per_gt in gt}
+    assert len(gt_index) == len(gt)
+
     total_scores = 0.
     for y_pred in pred:
-        idx = y_pred['idx']
-        gt_match_check = [1 if per_gt['idx'] == idx else 0 for per_gt in gt]
-        assert sum(gt_match_check) <= 1
-        if sum(gt_match_check) == 1:
-            matched_gt = gt[gt_match_check.index(1)]
-            teds_score = compute_teds_score(matched_gt, y_pred)
-        else:
-            teds_score = 0.
+        matched_gt = gt_index.get(y_pred[0])
+        teds_score = compute_teds_score(matched_gt, y_pred) if matched_gt is not None else 0.
         total_scores += teds_score
 
     precision = total_scores / len(pred)
@@ -210,11 +271,15 @@ def cal_tree_precision(gt, pred):
 def compute_teds_score(tree_gt, tree_pred):
     """Calculate the teds-score between two trees.
     Args:
-        tree_gt (string）: Ground-truth tree.
-        tree_pred (string）: Predicted tree.
+        tree_gt (tuple）: Ground-truth tree.
+        tree_pred (tuple）: Predicted tree.
     Returns:
         float: teds-score between two trees.
     """
+    # The edit distance between the same trees is 0
+    if tree_gt == tree_pred:
+        return 1.
+
     tree_gt = cvt_tree2str(tree_gt)
     tree_pred = cvt_tree2str(tree_pred)
 
@@ -233,40 +298,37 @@ def compute_teds_score(tree_gt, tree_pred):
 def cvt_tree2str(tree):
     """Convert tree to string.
     Args:
-        tree (dict）: Tree stored as a dict.
+        tree (tuple）: Tree stored as a canonical key.
     Returns:
         string: Tree stored as a string.
     """
+    tree_str = []
 
     def dfs(tree_ori):
         """
         Args:
-            tree_ori (dict）: sub-tree stored as a dict.
-        Returns:
-            string: sub-tree stored as a string.
+            tree_ori (tuple）: sub-tree stored as a canonical key.
         """
-        tree_string = '{' + str(tree_ori['idx'])
-        for child_node in tree_ori['children']:
-            tree_string += dfs(child_node)
-        tree_string += '}'
-
-        return tree_string
+        tree_str.append('{' + str(tree_ori[0]))
+        for child_node in tree_ori[1]:
+            dfs(child_node)
+        tree_str.append('}')
 
-    root = tree['idx']
-    tree_str = '{' + str(root)  # start
+    root, top, left = tree
+    tree_str.append('{' + str(root))  # start
 
-    for tt_d in tree['top']:
-        tree_str += '{top' + str(tt_d['idx'])
-        for child in tt_d['children']:
-            tree_str += dfs(child)
-        tree_str += '}'
+    for tt_d in top:
+        tree_str.append('{top' + str(tt_d[0]))
+        for child in tt_d[1]:
+            dfs(child)
+        tree_str.append('}')
 
-    for ll_d in tree['left']:
-        tree_str += '{left' + str(ll_d['idx'])
-        for child in ll_d['children']:
-            tree_str += dfs(child)
-        tree_str += '}'
+    for ll_d in left:
+        tree_str.append('{left' + str(ll_d[0]))
+        for child in ll_d[1]:
+            dfs(child)
+        tree_str.append('}')
 
-    tree_str += '}'  # end
+    tree_str.append('}')  # end
 
-    return tree_str
+    return ''.join(tree_str)
@@ -10,6 +10,6 @@
 """
 
 from .structures import BitmapMasksTable
-from .lp_mask_target import get_lpmasks
+from .lp_mask_target import get_lpmasks, get_lpmask_targets
 
-__all__ = ['BitmapMasksTable', 'get_lpmasks']
+__all__ = ['BitmapMasksTable', 'get_lpmasks', 'get_lpmask_targets']
@@ -11,6 +11,9 @@
 
 from math import ceil
 import numpy as np
+import torch
+from torch.nn.modules.utils import _pair
+from davarocr.davar_common.datasets import CroppedBitmapMasks
 from .structures import BitmapMasksTable
 
 
@@ -72,3 +75,189 @@ def get_lpmask_single(gt_mask, gt_bbox):
     mask_s2 = BitmapMasksTable(mask_s2, high, width)
 
     return mask_s1, mask_s2
+
+
+def get_lpmask_targets(pos_proposals_list, pos_assigned_gt_inds_list, gt_masks, gt_bboxes, cfg):
+    """Produce local pyramid mask targets of the sampled RoIs at the mask head resolution (for a batch of images).
+    The results are the same as `mask_target` on the masks of `get_lpmasks`, without producing the full-image masks.
+
+    Args:
+        pos_proposals_list(list(Tensor)): positive proposals of each image
+        pos_assigned_gt_inds_list(list(Tensor)): assigned gt index of each positive proposal
+        gt_masks(list(BitmapMasks)): masks of the text regions
+        gt_bboxes(list(Tensor)): bboxes of the aligned cells
+        cfg(obj:ConfigDict): `train_cfg` of RCNN, with `mask_size`
+
+    Returns:
+        Tensor: pyramid mask targets in horizontal direction, in shape of [N, mask_h, mask_w]
+        Tensor: pyramid mask targets in vertical direction, in shape of [N, mask_h, mask_w]
+    """
+
+    targets = list(map(get_lpmask_targets_single, pos_proposals_list, pos_assigned_gt_inds_list, gt_masks,
+                       gt_bboxes, [cfg] * len(pos_proposals_list)))
+    targets_hor = torch.cat([target[0] for target in targets])
+    targets_ver = torch.cat([target[1] for target in targets])
+    return targets_hor, targets_ver
+
+
+def get_lpmask_targets_single(pos_proposals, pos_assigned_gt_inds, gt_mask, gt_bbox, cfg):
+    """Produce local pyramid mask targets of the sampled RoIs (for one image).
+
+    A pyramid mask is the product of a profile along x and a profile along y, e.g. the horizontal one is the
+    pyramid of the columns times the rows of the cell. RoIAlign (aligned, adaptive sampling) of such a mask is also
+    separable, so each target is the outer product of two RoIAligned 1-D profiles, which only depend on the cell box
+    and the centroid of its text region.
+
+    Args:
+        pos_proposals(Tensor): (m x 4).positive proposals
+        pos_assigned_gt_inds(Tensor): (m).assigned gt index of each positive proposal
+        gt_mask(BitmapMasks | CroppedBitmapMasks): masks of the text regions (for one image)
+        gt_bbox(Tensor): (n x 4).bboxes of the aligned cells (for one image)
+        cfg(obj:ConfigDict): `train_cfg` of RCNN, with `mask_size`
+
+    Returns:
+        Tensor: (m x mask_h x mask_w).pyramid mask targets in horizontal direction
+        Tensor: (m x mask_h x mask_w).pyramid mask targets in vertical direction
+    """
+
+    device = pos_proposals.device
+    mask_size = _pair(cfg.mask_size)
+    if pos_proposals.size(0) == 0:
+        return pos_proposals.new_zeros((0,) + mask_size), pos_proposals.new_zeros((0,) + mask_size)
+
+    # Proposals are clipped to the image as in `mask_target`
+    high, width = gt_mask.height, gt_mask.width
+    proposals = pos_proposals.detach().cpu().numpy().astype(np.float32)
+    proposals[:, [0, 2]] = np.clip(proposals[:, [0, 2]], 0, width)
+    proposals[:, [1, 3]] = np.clip(proposals[:, [1, 3]], 0, high)
+    inds = pos_assigned_gt_inds.cpu().numpy()
+
+    # Boxes and text centroids of the assigned cells only
+    uniq_inds, inverse = np.unique(inds, return_inverse=True)
+    cells = gt_bbox.detach().cpu().numpy()[uniq_inds].astype(np.float64)
+    if isinstance(gt_mask, CroppedBitmapMasks):
+        middles = np.array([_text_centroid(gt_mask.crops[ind], cell, gt_mask.offsets[ind])
+                            for ind, cell in zip(uniq_inds, cells)])
+    else:
+        middles = np.array([_text_centroid(gt_mask.masks[ind], cell) for ind, cell in zip(uniq_inds, cells)])
+    cells, middles = cells[inverse], middles[inverse]
+
+    pyramid_x = _roi_align_1d(_pyramid_profile(cells[:, 0], cells[:, 2], middles[:, 0]), width,
+                              proposals[:, 0], proposals[:, 2], mask_size[1])
+    pyramid_y = _roi_align_1d(_pyramid_profile(cells[:, 1], cells[:, 3], middles[:, 1]), high,
+                              proposals[:, 1], proposals[:, 3], mask_size[0])
+    span_x = _roi_align_1d(_span_profile(cells[:, 0], cells[:, 2]), width,
+                           proposals[:, 0], proposals[:, 2], mask_size[1])
+    span_y = _roi_align_1d(_span_profile(cells[:, 1], cells[:, 3]), high,
+                           proposals[:, 1], proposals[:, 3], mask_size[0])
+
+    targets_hor = torch.from_numpy(span_y[:, :, None] * pyramid_x[:, None, :]).float().to(device)
+    targets_ver = torch.from_numpy(pyramid_y[:, :, None] * span_x[:, None, :]).float().to(device)
+    return targets_hor, targets_ver
+
+
+def _text_centroid(box_text, cell, offset=(0, 0)):
+    """ Rounded centroid (x, y) of a text region mask, from its row and column projections
+
+    Args:
+        box_text(np.ndarray): (H x W).mask of the text region, or its crop
+        cell(np.ndarray): (4).bbox of the aligned cell, whose center is used if the text region is empty
+        offset(tuple(int)): (x, y) of the top-left corner of the crop in the image
+
+    Returns:
+        tuple(int): centroid of the text region
+    """
+
+    text = box_text == 1
+    col_counts = np.count_nonzero(text, axis=0)
+    total = col_counts.sum()
+    if total == 0:
+        return int(round((cell[0] + cell[2]) / 2)), int(round((cell[1] + cell[3]) / 2))
+    row_counts = np.count_nonzero(text, axis=1)
+    middle_x = np.dot(np.arange(len(col_counts)), col_counts) / total + offset[0]
+    middle_y = np.dot(np.arange(len(row_counts)), row_counts) / total + offset[1]
+    return int(np.round(middle_x)), int(np.round(middle_y))
+
+
+def _pyramid_profile(left, right, middle):
+    """ Pyramid profile of cells along an axis, the same as in `get_lpmask_single`, as a function of pixel indexes
+
+    Args:
+        left(np.ndarray): (m).left (top) boundaries of the cells
+        right(np.ndarray): (m).right (bottom) boundaries of the cells
+        middle(np.ndarray): (m).centroids of the text regions along the axis
+
+    Returns:
+        function: mapping pixel indexes in shape of [m, ...] to values in shape of [m, ...]
+    """
+
+    start, end = np.ceil(left), np.ceil(right) - 1
+    left, right, middle, start, end = [value[:, None, None] for value in (left, right, middle, start, end)]
+
+    def profile(index):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rising = (index - left) / (middle - left)
+            falling = (right - index) / (right - middle)
+        value = np.where(index < middle, rising, falling)
+        return np.where((index >= start) & (index <= end), value, 0.).astype(np.float32)
+    return profile
+
+
+def _span_profile(left, right):
+    """ Indicator profile of the pixels covered by cells along an axis
+
+    Args:
+        left(np.ndarray): (m).left (top) boundaries of the cells
+        right(np.ndarray): (m).right (bottom) boundaries of the cells
+
+    Returns:
+        function: mapping pixel indexes in shape of [m, ...] to values in shape of [m, ...]
+    """
+
+    start, end = np.ceil(left)[:, None, None], (np.ceil(right) - 1)[:, None, None]
+
+    def profile(index):
+        return ((index >= start) & (index <= end)).astype(np.float32)
+    return profile
+
+
+def _roi_align_1d(profile, length, roi_start, roi_end, out_size):
+    """ RoIAlign of a 1-D profile, following mmcv `roi_align` with spatial_scale=1, sampling_ratio=0 and aligned=True
+    along one axis. The bins are averaged over the adaptive number of samples `ceil(roi_size / out_size)`.
+
+    Args:
+        profile(function): the profile as a function of pixel indexes
+        length(int): image size along the axis
+        roi_start(np.ndarray): (m).start coordinates of the RoIs
+        roi_end(np.ndarray): (m).end coordinates of the RoIs
+        out_size(int): output size along the axis
+
+    Returns:
+        np.ndarray: (m x out_size).RoIAligned profiles
+    """
+
+    roi_start = roi_start.astype(np.float32) - np.float32(0.5)
+    roi_size = roi_end.astype(np.float32) - np.float32(0.5) - roi_start
+    bin_size = roi_size / np.float32(out_size)
+    grid = np.ceil(roi_size / np.float32(out_size)).astype(np.int64)
+    max_grid = max(int(grid.max()), 1)
+
+    # Sample positions in shape of [m, out_size, max_grid], the samples beyond the grid of each RoI are not used
+    bins = np.arange(out_size, dtype=np.float32)[None, :, None]
+    samples = np.arange(max_grid, dtype=np.float32)[None, None, :]
+    grid_f = np.maximum(grid, 1).astype(np.float32)[:, None, None]
+    pos = roi_start[:, None, None] + bins * bin_size[:, None, None] + \
+        (samples + np.float32(0.5)) * bin_size[:, None, None] / grid_f
+    used = samples < grid[:, None, None]
+
+    # Bilinear interpolation along the axis
+    inside = (pos >= -1.) & (pos <= length)
+    pos = np.maximum(pos, 0.)
+    low = np.floor(pos).astype(np.int64)
+    at_end = low >= length - 1
+    low = np.where(at_end, length - 1, low)
+    high = np.where(at_end, length - 1, low + 1)
+    frac = np.where(at_end, 0., pos - low).astype(np.float32)
+    value = (1 - frac) * profile(low) + frac * profile(high)
+    value = np.where(inside & used, value, np.float32(0.))
+    return (value.sum(-1) / grid_f[:, :, 0]).astype(np.float32)
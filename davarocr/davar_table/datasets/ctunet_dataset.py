@@ -146,7 +146,8 @@ class CTUNetDataset(DavarCustomDataset):
             logger (logging.Logger | None | str): Logger used for printing related information during evaluation.
                 Default: None.
             metric (str | list[str]): Metrics to be evaluated. Default: 'macro_f1'.
-            metric_options (dict): specify the ignores classes if exist.
+            metric_options (dict): specify the ignores classes if exist, and the number of worker processes to
+                evaluate the tree-f1-score of tables by `num_workers`.
 
         Returns:
             dict: evaluation results.
@@ -233,13 +234,14 @@ class CTUNetDataset(DavarCustomDataset):
             eval_results['img_avg_col_linking_f1'] = np.array(edge_col_f1).sum() / (len(edge_col_f1))
 
             # tree-f1-score used in paper <<End-to-End Compound Table Understanding with Multi-Modal Modeling>>
+            num_workers = metric_options.get('num_workers', 0)
             hard_recall, hard_precision, hard_f1 = evaluate_tree_f1(relations_pred_list, relations_list,
-                                                                    eval_type='hard')
+                                                                    eval_type='hard', num_workers=num_workers)
             eval_results['hard_recall'] = hard_recall
             eval_results['hard_precision'] = hard_precision
             eval_results['hard_f1'] = hard_f1
             tree_recall, tree_precision, tree_f1 = evaluate_tree_f1(relations_pred_list, relations_list,
-                                                                    eval_type='soft')
+                                                                    eval_type='soft', num_workers=num_workers)
             eval_results['tree_recall'] = tree_recall
             eval_results['tree_precision'] = tree_precision
             eval_results['tree_f1'] = tree_f1
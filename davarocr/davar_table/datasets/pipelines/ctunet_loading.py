@@ -28,6 +28,7 @@ class CTUNetLoadAnnotations(DavarLoadAnnotations):
                  text_profile=None,
                  label_start_index=0,
                  poly2mask=True,
+                 crop_mask=False,
                  with_relations=False,
                  with_rowcols=False
                  ):
@@ -68,6 +69,8 @@ class CTUNetLoadAnnotations(DavarLoadAnnotations):
                                      according to `classes_config`. The start label will be added. e.g., for mmdet 1.x,
                                      this value is set to [1];  for mmdet 2.x, this will be set to [0].
             poly2mask (boolean):      Whether to convert the instance masks from polygons to bitmaps. Default: True.
+            crop_mask (boolean):      Whether to keep the bitmaps as tight crops (:obj:`CroppedBitmapMasks`).
+                                      Default: False.
             with_relations (boolean): Whether to parse and load the relations of cells. Default: Fasle.
             with_rowcols (boolean): Whether to parse and load the row/column numbers of cells. Default: Fasle.
         """
@@ -84,7 +87,8 @@ class CTUNetLoadAnnotations(DavarLoadAnnotations):
             bieo_labels=bieo_labels,
             text_profile=text_profile,
             label_start_index=label_start_index,
-            poly2mask=poly2mask
+            poly2mask=poly2mask,
+            crop_mask=crop_mask
         )
 
         self.with_relations = with_relations
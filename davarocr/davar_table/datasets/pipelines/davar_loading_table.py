@@ -60,6 +60,7 @@ class DavarLoadTableAnnotations(DavarLoadAnnotations):
                  text_profile=None,
                  label_start_index=0,
                  poly2mask=True,
+                 crop_mask=False,
                  with_enlarge_bbox=False,
                  with_empty_bbox=False,
                  ):
@@ -100,6 +101,8 @@ class DavarLoadTableAnnotations(DavarLoadAnnotations):
                                      according to `classes_config`. The start label will be added. e.g., for mmdet 1.x,
                                      this value is set to [1];  for mmdet 2.x, this will be set to [0].
             poly2mask (boolean):      Whether to convert the instance masks from polygons to bitmaps. Default: True.
+            crop_mask (boolean):      Whether to keep the bitmaps as tight crops (:obj:`CroppedBitmapMasks`).
+                                      Default: False.
             with_enlarge_bbox (boolean):    Whether to parse and load the enlarge bbox annotation. Default: Fasle.
             with_empty_bbox (boolean):  Whether to parse and load the empty bbox annotation. Default: Fasle.
         """
@@ -116,7 +119,8 @@ class DavarLoadTableAnnotations(DavarLoadAnnotations):
             bieo_labels=bieo_labels,
             text_profile=text_profile,
             label_start_index=label_start_index,
-            poly2mask=poly2mask
+            poly2mask=poly2mask,
+            crop_mask=crop_mask
         )
 
         self.with_enlarge_bbox = with_enlarge_bbox
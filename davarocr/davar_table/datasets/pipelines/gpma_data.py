@@ -15,9 +15,11 @@ import numpy as np
 from numpy import ctypeslib as ctl
 from mmdet.datasets.builder import PIPELINES
 
+from davarocr.davar_common.datasets.pipelines.target_encoding import TargetEncoder, shrink_aligned_boxes
+
 
 @PIPELINES.register_module()
-class GPMADataGeneration:
+class GPMADataGeneration(TargetEncoder):
     """ Generate gt_mask for training(GPMA branch).
 
     Ref: Qiao L, Li Z, Cheng Z, et al. LGPMA: Complicated Table Structure Recognition with Local and Global Pyramid Mask
@@ -29,7 +31,8 @@ class GPMADataGeneration:
                  ignore_ratio=0.6,
                  shrink_ratio=(0, 1 / 10),
                  lib_name=None,
-                 lib_dir=None
+                 lib_dir=None,
+                 target_dtype='float32'
                  ):
         """Generate gt_mask for training(GPMA branch)
 
@@ -38,7 +41,9 @@ class GPMADataGeneration:
             shrink_ratio (tuple): Controls the ratio of shrink (ensure that virtual or real table lines are preserved)
             lib_name (str): lib name of calling the function of ground-truth label generation
             lib_dir (str): lib path to calling the function of ground-truth label generation
+            target_dtype (str): dtype of the generated gt_semantic_seg, in range of ['float32', 'float16']
         """
+        super().__init__(target_dtype)
 
         if lib_name is None or not os.path.isfile(os.path.join(lib_dir, lib_name)):
             # Using default lib
@@ -94,11 +99,7 @@ class GPMADataGeneration:
         if 'gt_labels' not in results:
             results['gt_labels'] = [1] * len(results['gt_bboxes'])
         # shrinked bboxes of empty cells
-        gt_empty_bboxes = []
-        for bbox in results.get("gt_empty_bboxes", []):
-            xoffset, yoffset = (bbox[2] - bbox[0]) * self.shrink_ratio[0], (bbox[3] - bbox[1]) * self.shrink_ratio[1]
-            temp = [bbox[0] + xoffset, bbox[1] + yoffset, bbox[2] - xoffset, bbox[3] - yoffset]
-            gt_empty_bboxes.append(temp)
+        gt_empty_bboxes = shrink_aligned_boxes(results.get("gt_empty_bboxes", []), self.shrink_ratio)
 
         gt_semantic_seg = self._parse_gpma_data_cpp(results['pad_shape'], results['gt_bboxes'],
                                                     results['gt_content_bboxes'], gt_empty_bboxes)
@@ -118,37 +119,29 @@ class GPMADataGeneration:
             pool_ratio(int): downsampling ratio of ground-truth map wrt original image
 
         Returns:
-            np.array: All gts in a np.array, including
+            np.ndarray: All gts in shape of [6, H, W], including
                     gt_cell_region: target aligned cell region mask ground-truth [H x W]
                     cell_region_weight: weight mask of target aligned cell region (ignored if 0) [H x W]
                     gt_global_pyramid: target global pyramid mask ground-truth [2 x H x W]
                     global_pyramid_weight: weight mask of target global pyramid mask (ignored if 0) [2 x H x W]
         """
 
-        gt_shrink_bboxes = []
-        for bbox in gt_cell_bboxes:
-            xoffset, yoffset = (bbox[2] - bbox[0]) * self.shrink_ratio[0], (bbox[3] - bbox[1]) * self.shrink_ratio[1]
-            temp = [bbox[0] + xoffset, bbox[1] + yoffset, bbox[2] - xoffset, bbox[3] - yoffset]
-            gt_shrink_bboxes.append(temp)
+        gt_cell_bboxes = np.asarray(gt_cell_bboxes, dtype=np.float32).reshape(-1, 4)
+        gt_content_bboxes = np.asarray(gt_content_bboxes, dtype=np.float32).reshape(-1, 4)
+        gt_empty_bboxes = np.asarray(gt_empty_bboxes, dtype=np.float32).reshape(-1, 4)
+        gt_shrink_bboxes = shrink_aligned_boxes(gt_cell_bboxes, self.shrink_ratio)
         assert len(gt_cell_bboxes) == len(gt_content_bboxes) == len(gt_shrink_bboxes)
 
-        gt_cell_bboxes = np.array([[box[0], box[1], box[2], box[3]] for box in gt_cell_bboxes], dtype=np.float32)
-        gt_shrink_bboxes = np.array([[box[0], box[1], box[2], box[3]] for box in gt_shrink_bboxes], dtype=np.float32)
-        gt_content_bboxes = np.array([[box[0], box[1], box[2], box[3]] for box in gt_content_bboxes], dtype=np.float32)
-        if len(gt_empty_bboxes) == 0:
-            gt_empty_bboxes = np.zeros((0, 4), dtype=np.float32)
-        else:
-            gt_empty_bboxes = np.array([[box[0], box[1], box[2], box[3]] for box in gt_empty_bboxes], dtype=np.float32)
-
         height, width, _ = img_shape
         new_height = int(height / pool_ratio)
         new_width = int(width / pool_ratio)
 
-        # Used to store output results.
-        gt_cell_region = np.zeros(new_height * new_width, dtype=np.int32)
-        cell_region_weight = np.ones(new_height * new_width, dtype=np.int32)
-        gt_global_pyramid = np.zeros(2 * new_height * new_width, dtype=np.float32)
-        global_pyramid_weight = np.zeros(2 * new_height * new_width, dtype=np.float32)
+        # The C++ lib writes its outputs into channel views of the targets (or reused buffers of the required dtype)
+        gt_semantic_seg = self.alloc_targets(6, new_height, new_width)
+        gt_cell_region = self.channel_buffer(gt_semantic_seg, 0, 1, np.int32)
+        cell_region_weight = self.channel_buffer(gt_semantic_seg, 1, 1, np.int32)
+        gt_global_pyramid = self.channel_buffer(gt_semantic_seg, 2, 2, np.float32)
+        global_pyramid_weight = self.channel_buffer(gt_semantic_seg, 4, 2, np.float32)
 
         # Call C++ lib execution
         self.generate_func(height, width, gt_cell_bboxes, len(gt_cell_bboxes), gt_shrink_bboxes, len(gt_shrink_bboxes),
@@ -157,11 +150,4 @@ class GPMADataGeneration:
                            pool_ratio, self.ignore_ratio, gt_cell_region, cell_region_weight,
                            gt_global_pyramid, global_pyramid_weight)
 
-        # Return the formatted results
-        gt_cell_region = np.array(gt_cell_region.reshape(new_height, new_width), dtype=np.int32)
-        cell_region_weight = np.array(cell_region_weight.reshape(new_height, new_width), dtype=np.int32)
-        gt_global_pyramid = np.array(gt_global_pyramid.reshape((2, new_height, new_width)), dtype=np.float32)
-        global_pyramid_weight = np.array(global_pyramid_weight.reshape((2, new_height, new_width)), dtype=np.float32)
-
-        return np.concatenate([gt_cell_region[np.newaxis, :, :], cell_region_weight[np.newaxis, :, :],
-                               gt_global_pyramid, global_pyramid_weight], axis=0)
+        return self.collect_targets(gt_semantic_seg)
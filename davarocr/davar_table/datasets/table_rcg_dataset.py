@@ -51,7 +51,8 @@ class TableRcgDataset(DavarCustomDataset):
             "IOU_CONSTRAINT": 0.5,  # IOU threshold for pred v.s. gt matching
             "AREA_PRECISION_CONSTRAINT": 0.5,  # IOU threshold for pred v.s. not-cared gt matching
             "CONFIDENCES": False,  # If it is True, mAP will be calculated (default False)
-            "ENLARGE_ANN_BBOXES": True  # If it is True, using enlarge strategy to generate aligned cells
+            "ENLARGE_ANN_BBOXES": True,  # If it is True, using enlarge strategy to generate aligned cells
+            "NUM_WORKERS": 0  # Number of processes to evaluate images in parallel
         }
 
     def evaluate(self,
@@ -121,6 +122,8 @@ class TableRcgDataset(DavarCustomDataset):
                     self.eval_func_params["CONFIDENCES"] = eval_func_params["CONFIDENCES"]
                 if "ENLARGE_ANN_BBOXES" in eval_func_params:
                     self.eval_func_params["ENLARGE_ANN_BBOXES"] = eval_func_params["ENLARGE_ANN_BBOXES"]
+                if "NUM_WORKERS" in eval_func_params:
+                    self.eval_func_params["NUM_WORKERS"] = eval_func_params["NUM_WORKERS"]
 
             det_results = []
             gt_results = []
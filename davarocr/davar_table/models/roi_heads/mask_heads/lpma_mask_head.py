@@ -19,7 +19,7 @@ from mmdet.core.mask import mask_target
 from mmdet.models.roi_heads import FCNMaskHead
 from mmdet.models.builder import HEADS, build_loss
 from mmdet.models.roi_heads.mask_heads.fcn_mask_head import _do_paste_mask
-from davarocr.davar_table.core import get_lpmasks
+from davarocr.davar_table.core import get_lpmask_targets
 
 BYTES_PER_FLOAT = 4
 # TODO: This memory limit may be too much or too little. It would be better to
@@ -103,10 +103,10 @@ class LPMAMaskHead(FCNMaskHead):
             res.pos_assigned_gt_inds for res in sampling_results
         ]
 
-        mask_targets = []
-        gt_lpma_hor, gt_lpma_ver = get_lpmasks(gt_masks, gt_bboxes)
-        for masks in [gt_masks, gt_lpma_hor, gt_lpma_ver]:
-            mask_targets.append(mask_target(pos_proposals, pos_assigned_gt_inds, masks, rcnn_train_cfg))
+        # The pyramid mask targets are produced at the mask head resolution, without the full-image pyramid masks
+        mask_targets = [mask_target(pos_proposals, pos_assigned_gt_inds, gt_masks, rcnn_train_cfg)]
+        mask_targets.extend(get_lpmask_targets(pos_proposals, pos_assigned_gt_inds, gt_masks, gt_bboxes,
+                                               rcnn_train_cfg))
 
         return mask_targets
 
@@ -197,8 +197,8 @@ class GPMAMaskHead(nn.Module):
         score_map_weights = gt_semantic_seg[:, 1, :, :].float()
 
         # global pyramid mask
-        geo_bond_target = gt_semantic_seg[:, 2:4, :, :]
-        geo_bond_weights_target = gt_semantic_seg[:, 4:6, :, :]
+        geo_bond_target = gt_semantic_seg[:, 2:4, :, :].float()
+        geo_bond_weights_target = gt_semantic_seg[:, 4:6, :, :].float()
 
         return score_map_target, score_map_weights, geo_bond_target, geo_bond_weights_target
 
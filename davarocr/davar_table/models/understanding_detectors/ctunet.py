@@ -15,6 +15,7 @@ from davarocr.davar_common.models.builder import build_connect
 from davarocr.davar_common.models.builder import build_embedding
 from davarocr.davar_spotting.models import SPOTTER
 from davarocr.davar_spotting.models import TwoStageEndToEnd
+from davarocr.davar_table.core import cell_relation_candidates
 from mmdet.core import bbox2roi
 from mmdet.models import build_head
 from mmdet.models import build_roi_extractor
@@ -22,6 +23,9 @@ from mmdet.models import build_roi_extractor
 
 @SPOTTER.register_module()
 class CTUNet(TwoStageEndToEnd):
+    # simple_test returns the result of each image in a batch
+    batch_test = True
+
     def __init__(self,
                  backbone,
                  neck=None,
@@ -273,104 +277,14 @@ class CTUNet(TwoStageEndToEnd):
 
         # row relation linking classification
         if self.with_infor_row_relation_head:
-            banch_length = multimodal_context.size()[1]
-            # get adjacent matrix
-            multimodal_context_1 = multimodal_context[:, :, None, :].repeat(1, 1, banch_length, 1)
-            multimodal_context_2 = multimodal_context[:, None, :, :].repeat(1, banch_length, 1, 1)
-            pairwise_context = torch.cat([multimodal_context_1, multimodal_context_2], -1)
-
-            cls_pred = self.infor_row_relation_head(pairwise_context)
-
-            # get labels
-            tmp_labels = []
-            tmp_masks = []
-            for per_img_order_idx, per_img_order in enumerate(relations):
-                tmp_batch_img_label = batched_img_label[per_img_order_idx]
-                tmp_batch_img_label = tmp_batch_img_label[:, None, None].repeat(1, banch_length, 1) + \
-                                      tmp_batch_img_label[None, :, None].repeat(banch_length, 1, 1)
-                tmp_batch_img_label[tmp_batch_img_label >= 255] = 255
-                tmp_batch_img_label[tmp_batch_img_label < 255] = 0
-                if per_img_order:
-                    relations_np = np.array(per_img_order)
-                    for (x, y) in np.argwhere(relations_np == 2):
-                        tmp_batch_img_label[x, y, 0] = 1
-                tmp_labels.append(tmp_batch_img_label)
-
-                # achieve the relationship mask
-                per_img_masks = torch.zeros_like(tmp_batch_img_label)
-                per_img_gt_rowcols = np.array(gt_rowcols[per_img_order_idx])
-                for i, rowcol in enumerate(per_img_gt_rowcols):
-                    indexr = \
-                        np.where((per_img_gt_rowcols[:, 2] >= rowcol[0]) & (per_img_gt_rowcols[:, 0] <= rowcol[2]))[0]
-                    indexc = \
-                        np.where((per_img_gt_rowcols[:, 3] >= rowcol[1]) & (per_img_gt_rowcols[:, 1] <= rowcol[3]))[0]
-                    per_img_masks[indexr, i, 0] = 1
-                    per_img_masks[i, indexr, 0] = 1
-                    per_img_masks[indexc, i, 0] = 1
-                    per_img_masks[i, indexc, 0] = 1
-                tmp_masks.append(per_img_masks)
-            tmp_labels = torch.stack(tmp_labels, axis=0)
-            tmp_masks = torch.stack(tmp_masks, axis=0)
-
-            # calculate loss
-            cls_pred = cls_pred.view(-1, cls_pred.size(-1))
-            tmp_labels = tmp_labels.view(-1)
-
-            # valid_mask = (tmp_labels != 255)
-            tmp_masks = tmp_masks.view(-1)
-            valid_mask = (tmp_labels != 255) & (tmp_masks != 0)
-
-            info_loss = self.infor_row_relation_head.multi_loss(cls_pred[valid_mask], tmp_labels[valid_mask],
-                                                                prefix='infor_row_relation_')
+            info_loss = self._relation_loss(self.infor_row_relation_head, multimodal_context, batched_img_label,
+                                            relations, gt_rowcols, direction='row', prefix='infor_row_relation_')
             losses.update(info_loss)
 
         # col relation linking classification
         if self.with_infor_col_relation_head:
-            banch_length = multimodal_context.size()[1]
-            # get adjacent matrix
-            multimodal_context_1 = multimodal_context[:, :, None, :].repeat(1, 1, banch_length, 1)
-            multimodal_context_2 = multimodal_context[:, None, :, :].repeat(1, banch_length, 1, 1)
-            pairwise_context = torch.cat([multimodal_context_1, multimodal_context_2], -1)
-
-            cls_pred = self.infor_col_relation_head(pairwise_context)
-
-            # get labels
-            tmp_labels = []
-            tmp_masks = []
-            for per_img_order_idx, per_img_order in enumerate(relations):
-                tmp_batch_img_label = batched_img_label[per_img_order_idx]
-                tmp_batch_img_label = tmp_batch_img_label[:, None, None].repeat(1, banch_length, 1) + \
-                                      tmp_batch_img_label[None, :, None].repeat(banch_length, 1, 1)
-                tmp_batch_img_label[tmp_batch_img_label >= 255] = 255
-                tmp_batch_img_label[tmp_batch_img_label < 255] = 0
-                if per_img_order:
-                    relations_np = np.array(per_img_order)
-                    for (x, y) in np.argwhere(relations_np == 1):
-                        tmp_batch_img_label[x, y, 0] = 1
-                tmp_labels.append(tmp_batch_img_label)
-
-                # achieve the relationship mask
-                per_img_masks = torch.ones_like(tmp_batch_img_label)
-                per_img_gt_rowcols = np.array(gt_rowcols[per_img_order_idx])
-                for i, rowcol in enumerate(per_img_gt_rowcols):
-                    indexc = \
-                        np.where((per_img_gt_rowcols[:, 3] < rowcol[1]) | (per_img_gt_rowcols[:, 1] > rowcol[3]))[0]
-                    per_img_masks[indexc, i, 0] = 0
-                    per_img_masks[i, indexc, 0] = 0
-                tmp_masks.append(per_img_masks)
-            tmp_labels = torch.stack(tmp_labels, axis=0)
-            tmp_masks = torch.stack(tmp_masks, axis=0)
-
-            # calculate loss
-            cls_pred = cls_pred.view(-1, cls_pred.size(-1))
-            tmp_labels = tmp_labels.view(-1)
-
-            # valid_mask = (tmp_labels != 255)
-            tmp_masks = tmp_masks.view(-1)
-            valid_mask = (tmp_labels != 255) & (tmp_masks != 0)
-
-            info_loss = self.infor_col_relation_head.multi_loss(cls_pred[valid_mask], tmp_labels[valid_mask],
-                                                                prefix='infor_col_relation_')
+            info_loss = self._relation_loss(self.infor_col_relation_head, multimodal_context, batched_img_label,
+                                            relations, gt_rowcols, direction='col', prefix='infor_col_relation_')
             losses.update(info_loss)
 
         return losses
@@ -394,9 +308,12 @@ class CTUNet(TwoStageEndToEnd):
             array_gt_texts (list(np.array)): text transcription after tokenization in np.array format.
 
         Returns:
-            dict: formated inference results
+            list(dict): formated inference results of each image
         """
-        result = dict()
+        # the cells of all images are packed in the fusion and graph stages, and the results are split by image
+        num_cells = [per_bbox.size(0) for per_bbox in gt_bboxes[0]]
+        result = [dict() for _ in num_cells]
+
         # extract feats
         x = self.extract_feat(img)
 
@@ -427,58 +344,116 @@ class CTUNet(TwoStageEndToEnd):
         # ===================== Relational Graph Construction ====================
         # node classification
         if self.with_infor_node_cls_head:
-            cls_pred = self.infor_node_cls_head(multimodal_context)
-            result['bboxes_labels_pred'] = F.softmax(cls_pred[0], dim=-1).cpu().numpy()
+            cls_pred = F.softmax(self.infor_node_cls_head(multimodal_context), dim=-1).cpu().numpy()
+            for idx, per_result in enumerate(result):
+                per_result['bboxes_labels_pred'] = cls_pred[idx, :num_cells[idx]]
 
         # row relation linking classification
         if self.with_infor_row_relation_head:
-            banch_length = multimodal_context.size()[1]
-            multimodal_context_1 = multimodal_context[:, :, None, :].repeat(1, 1, banch_length, 1)
-            multimodal_context_2 = multimodal_context[:, None, :, :].repeat(1, banch_length, 1, 1)
-            pairwise_context = torch.cat([multimodal_context_1, multimodal_context_2], -1)
-
-            cls_pred = self.infor_row_relation_head(pairwise_context)
-
-            # relationship mask
-            imgs_masks = torch.zeros_like(cls_pred)
-            for per_img_rowcols_idx, per_img_rowcols in enumerate(gt_rowcols[0]):
-                assert per_img_rowcols_idx == 0
-                per_img_rowcols_np = np.array(per_img_rowcols)
-                for i, rowcol in enumerate(per_img_rowcols_np):
-                    indexr = \
-                        np.where((per_img_rowcols_np[:, 2] >= rowcol[0]) & (per_img_rowcols_np[:, 0] <= rowcol[2]))[0]
-                    indexc = \
-                        np.where((per_img_rowcols_np[:, 3] >= rowcol[1]) & (per_img_rowcols_np[:, 1] <= rowcol[3]))[0]
-                    imgs_masks[per_img_rowcols_idx, indexr, i, 1] = 1
-                    imgs_masks[per_img_rowcols_idx, i, indexr, 1] = 1
-                    imgs_masks[per_img_rowcols_idx, indexc, i, 1] = 1
-                    imgs_masks[per_img_rowcols_idx, i, indexc, 1] = 1
-            imgs_masks[:, :, :, 1] = (imgs_masks[:, :, :, 1] - 1) * 10000
-            result['bboxes_edges_pred_row'] = F.softmax(cls_pred[0] + imgs_masks[0], dim=-1).cpu().numpy()
+            edges_pred = self._relation_pred(self.infor_row_relation_head, multimodal_context, gt_rowcols[0],
+                                             num_cells, direction='row')
+            for per_result, per_edges_pred in zip(result, edges_pred):
+                per_result['bboxes_edges_pred_row'] = per_edges_pred
 
         # col relation linking classification
         if self.with_infor_col_relation_head:
-            banch_length = multimodal_context.size()[1]
-            multimodal_context_1 = multimodal_context[:, :, None, :].repeat(1, 1, banch_length, 1)
-            multimodal_context_2 = multimodal_context[:, None, :, :].repeat(1, banch_length, 1, 1)
-            pairwise_context = torch.cat([multimodal_context_1, multimodal_context_2], -1)
-
-            cls_pred = self.infor_col_relation_head(pairwise_context)
-
-            # relationship mask
-            imgs_masks = torch.zeros_like(cls_pred)
-            for per_img_rowcols_idx, per_img_rowcols in enumerate(gt_rowcols[0]):
-                assert per_img_rowcols_idx == 0
-                per_img_rowcols_np = np.array(per_img_rowcols)
-                for i, rowcol in enumerate(per_img_rowcols_np):
-                    indexc = \
-                        np.where((per_img_rowcols_np[:, 3] < rowcol[1]) | (per_img_rowcols_np[:, 1] > rowcol[3]))[0]
-                    imgs_masks[per_img_rowcols_idx, indexc, i, 1] = -10000.0
-                    imgs_masks[per_img_rowcols_idx, i, indexc, 1] = -10000.0
-
-            result['bboxes_edges_pred_col'] = F.softmax(cls_pred[0] + imgs_masks[0], dim=-1).cpu().numpy()
-
-        return [result]
+            edges_pred = self._relation_pred(self.infor_col_relation_head, multimodal_context, gt_rowcols[0],
+                                             num_cells, direction='col')
+            for per_result, per_edges_pred in zip(result, edges_pred):
+                per_result['bboxes_edges_pred_col'] = per_edges_pred
+
+        return result
+
+    @staticmethod
+    def _pair_context(multimodal_context, img_inds, first, second):
+        """ Pairwise context of the candidate pairs, instead of the dense pairs of all the nodes
+
+        Args:
+            multimodal_context (Tensor): node features in shape of [B, L, C]
+            img_inds (Tensor): image index of each pair, in shape of [E]
+            first (Tensor): first node of each pair, in shape of [E]
+            second (Tensor): second node of each pair, in shape of [E]
+
+        Returns:
+            Tensor: pairwise context in shape of [E, 2C]
+        """
+        return torch.cat([multimodal_context[img_inds, first], multimodal_context[img_inds, second]], -1)
+
+    def _relation_loss(self, head, multimodal_context, batched_img_label, relations, gt_rowcols, direction, prefix):
+        """ Relation linking loss on the candidate pairs of cells whose spans overlap. The other pairs are never
+        related, and were masked out of the loss.
+
+        Args:
+            head (nn.Module): relation head
+            multimodal_context (Tensor): node features in shape of [B, L, C]
+            batched_img_label (list(Tensor)): node labels of each image, 255 for the ignored nodes
+            relations (list(list(list(int)))): relationship between cells of each image, 1 for column and 2 for row
+            gt_rowcols (list(list(list(int)))): row and column numbers of each cells, [row_s, col_s, row_e, col_e]
+            direction (str): 'row' or 'col'
+            prefix (str): prefix of the loss name
+
+        Returns:
+            dict: relation linking loss
+        """
+        relation_type = 2 if direction == 'row' else 1
+        img_inds, firsts, seconds, positives = [], [], [], []
+        for img_idx, per_img_rowcols in enumerate(gt_rowcols):
+            first, second = cell_relation_candidates(per_img_rowcols, direction)
+            if relations[img_idx]:
+                positive = np.array(relations[img_idx])[first, second] == relation_type
+            else:
+                positive = np.zeros(len(first), dtype=bool)
+            img_inds.append(np.full(len(first), img_idx))
+            firsts.append(first)
+            seconds.append(second)
+            positives.append(positive)
+
+        device = multimodal_context.device
+        img_inds, first, second, positive = [torch.from_numpy(np.concatenate(item)).to(device)
+                                             for item in (img_inds, firsts, seconds, positives)]
+        cls_pred = head(self._pair_context(multimodal_context, img_inds, first, second))
+
+        # a pair is ignored if any of its nodes is ignored, unless it is related
+        node_labels = torch.stack(batched_img_label, 0)
+        pair_labels = node_labels[img_inds, first] + node_labels[img_inds, second]
+        labels = torch.where(pair_labels >= 255, torch.full_like(pair_labels, 255), torch.zeros_like(pair_labels))
+        labels[positive] = 1
+
+        valid_mask = labels != 255
+        return head.multi_loss(cls_pred[valid_mask], labels[valid_mask], prefix=prefix)
+
+    def _relation_pred(self, head, multimodal_context, gt_rowcols, num_cells, direction):
+        """ Relation linking prediction of the images in a batch. Only the candidate pairs of cells whose spans overlap
+        are classified, in one pass for all the images, and the other pairs are not related.
+
+        Args:
+            head (nn.Module): relation head
+            multimodal_context (Tensor): node features in shape of [B, L, C]
+            gt_rowcols (list(list(list(int)))): row and column numbers of each cells, [row_s, col_s, row_e, col_e]
+            num_cells (list(int)): number of cells in each image
+            direction (str): 'row' or 'col'
+
+        Returns:
+            list(np.ndarray): relation probabilities of each image, in shape of [N_i, N_i, 2]
+        """
+        img_inds, firsts, seconds = [], [], []
+        for img_idx, per_img_rowcols in enumerate(gt_rowcols):
+            first, second = cell_relation_candidates(per_img_rowcols, direction)
+            img_inds.append(np.full(len(first), img_idx))
+            firsts.append(first)
+            seconds.append(second)
+
+        device = multimodal_context.device
+        img_inds, first, second = [torch.from_numpy(np.concatenate(item)).to(device)
+                                   for item in (img_inds, firsts, seconds)]
+        cls_pred = F.softmax(head(self._pair_context(multimodal_context, img_inds, first, second)), dim=-1)
+
+        batch_size, length = multimodal_context.shape[:2]
+        edges_pred = cls_pred.new_zeros((batch_size, length, length, cls_pred.size(-1)))
+        edges_pred[..., 0] = 1
+        edges_pred[img_inds, first, second] = cls_pred
+        edges_pred = edges_pred.cpu().numpy()
+        return [edges_pred[idx, :num, :num] for idx, num in enumerate(num_cells)]
 
     def aug_test(self, imgs, img_metas, rescale=False):
         """Forward aug_test. Not implemented.
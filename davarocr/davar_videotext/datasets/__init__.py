@@ -12,5 +12,6 @@ from .pipelines import *
 from .samplers import *
 from .multi_frame_dataset import MultiFrameDataset
 from .yoro_rcg_dataset import YORORCGDataset
+from .frame_cache import LRUCache, PackedFlowStore
 
-__all__ = ['MultiFrameDataset', 'MetricSampler', 'YORORCGDataset']
+__all__ = ['MultiFrameDataset', 'MetricSampler', 'WindowSampler', 'YORORCGDataset', 'LRUCache', 'PackedFlowStore']
@@ -0,0 +1,114 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    frame_cache.py
+# Abstract       :    Per-worker frame/flow LRU cache and memory-mapped optical-flow store
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import os.path as osp
+from collections import OrderedDict
+
+import numpy as np
+import mmcv
+
+
+class LRUCache:
+    """ A small least-recently-used cache. Each dataloader worker owns its own copy (the dataset and pipelines are
+    copied into the worker process), so adjacent windows handled by the same worker share the decoded frames and flows.
+    """
+
+    def __init__(self, capacity=0):
+        """
+        Args:
+            capacity(int): maximum number of cached items, 0 means disable the cache
+        """
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def get(self, key):
+        """ Fetch an item and mark it as recently used.
+
+        Args:
+            key(hashable): cache key
+
+        Returns:
+            object: cached item, None if not cached
+        """
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        """ Insert an item, evicting the least recently used one when full.
+
+        Args:
+            key(hashable): cache key
+            value(object): item to be cached
+        """
+        if self.capacity <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class PackedFlowStore:
+    """ Read-only access to the optical flows packed by `tools/pack_flows.py`.
+
+    The packed directory contains:
+        flow_index.json:  {"dtype": "float16", "videos": {"Video_1": {"1": [offset, [d0, d1, ...]], ...}, ...}}
+        Video_1.npy:      1-D array holding all flows of the video, each frame flow starts at its `offset`
+
+    Video arrays are opened lazily with `np.load(mmap_mode='r')`, so every dataloader worker shares the same page cache
+    and no decompression happens during training.
+    """
+
+    def __init__(self, store_path):
+        """
+        Args:
+            store_path(str): directory generated by `tools/pack_flows.py`
+        """
+        self.store_path = store_path
+        index = mmcv.load(osp.join(store_path, 'flow_index.json'))
+        self.dtype = np.dtype(index['dtype'])
+        self.index = index['videos']
+        self._arrays = dict()
+
+    def _get_array(self, video):
+        """ Open (once per process) the memory-mapped flow array of a video """
+        if video not in self._arrays:
+            self._arrays[video] = np.load(osp.join(self.store_path, video + '.npy'), mmap_mode='r')
+        return self._arrays[video]
+
+    def __contains__(self, key):
+        video, frame_id = key
+        return video in self.index and str(frame_id) in self.index[video]
+
+    def load(self, video, frame_id):
+        """ Load the flow of one frame
+
+        Args:
+            video(str): video name
+            frame_id(str | int): frame number
+
+        Returns:
+            np.ndarray: flow data in float32, e.g.:[window size - 1 x H x W x 2]
+        """
+        offset, shape = self.index[video][str(frame_id)]
+        size = int(np.prod(shape))
+        flow = self._get_array(video)[offset:offset + size]
+        return flow.astype(np.float32).reshape(shape)
+
+    def __getstate__(self):
+        # Memory maps are re-opened in each worker rather than pickled
+        state = self.__dict__.copy()
+        state['_arrays'] = dict()
+        return state
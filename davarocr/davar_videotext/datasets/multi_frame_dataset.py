@@ -19,6 +19,7 @@ from mmdet.datasets.builder import DATASETS
 from mmdet.datasets.pipelines import Compose
 
 from davarocr.davar_common.datasets.davar_custom import DavarCustomDataset
+from .frame_cache import LRUCache, PackedFlowStore
 
 
 @DATASETS.register_module()
@@ -54,6 +55,9 @@ class MultiFrameDataset(DavarCustomDataset):
                  ann_file,
                  pipeline,
                  flow_path=None,
+                 flow_store=None,
+                 flow_cache_size=0,
+                 flow_scale=None,
                  window_size=3,
                  data_root=None,
                  img_prefix='',
@@ -65,7 +69,15 @@ class MultiFrameDataset(DavarCustomDataset):
             Args:
                 ann_file(str): the path to datalist.
                 pipeline(list(dict)): the data-flow handling pipeline
-                flow_path(str): the path to flow dir
+                flow_path(str): the path to flow dir, which contains `video/frameID.npz` files
+                flow_store(str): the path to the flows packed by `tools/pack_flows.py`. If given, flows are read from
+                                 the memory-mapped store instead of decompressing `.npz` files
+                flow_cache_size(int): the number of flows kept in the per-worker LRU cache. Adjacent windows overlap in
+                                      `window_size - 1` frames, so a cache of about `window_size` flows avoids
+                                      reloading them. 0 means no cache.
+                flow_scale(float): the scale to resize flows by when loading, e.g. 0.25 to prepare them at the
+                                   resolution of the feature maps, which saves the memory of the cache and the
+                                   transfer to device. None means keeping the original size.
                 window_size(int): the nums of consecutive frames in a batch
                 data_root(str): the root path of the dataset
                 img_prefix(str): the image prefixes
@@ -80,6 +92,9 @@ class MultiFrameDataset(DavarCustomDataset):
         self.ann_file = ann_file
         self.data_root = data_root
         self.flow_path = flow_path
+        self.flow_store = PackedFlowStore(flow_store) if flow_store is not None else None
+        self.flow_cache = LRUCache(flow_cache_size)
+        self.flow_scale = flow_scale
         self.img_prefix = img_prefix
         self.test_mode = test_mode
         self.filter_empty_gt = filter_empty_gt
@@ -232,8 +247,8 @@ class MultiFrameDataset(DavarCustomDataset):
         results = []
         for index in choice_indices:
 
-            # Loading each instance info
-            img_info = self.data_infos[index]
+            # Loading each instance info, the shallow copy keeps the loaded flow out of the cached data_infos
+            img_info = dict(self.data_infos[index])
             ann_info = self.get_ann_info(index)
 
             # Loading optical flow
@@ -259,7 +274,7 @@ class MultiFrameDataset(DavarCustomDataset):
 
         """
         # Loading each instance info
-        img_info = self.data_infos[idx]
+        img_info = dict(self.data_infos[idx])
         ann_info = self.get_ann_info(idx)
 
         # Loading optical flow
@@ -285,7 +300,10 @@ class MultiFrameDataset(DavarCustomDataset):
         for img_info in data_infos:
             video = img_info['video']
             frame_id = img_info['frameID']
-            assert osp.isfile(osp.join(self.flow_path, video, str(frame_id) + '.npz'))
+            if self.flow_store is not None:
+                assert (video, frame_id) in self.flow_store
+            else:
+                assert osp.isfile(osp.join(self.flow_path, video, str(frame_id) + '.npz'))
 
     def load_flows(self, img_info):
         """Get flow data.
@@ -294,15 +312,46 @@ class MultiFrameDataset(DavarCustomDataset):
              img_info (dict): img info for target img.
 
          Returns:
-             numpy array: flow data.e.g:[window size - 1 x H x W x 2]
+             numpy array: flow data.e.g:[window size - 1 x H x W x 2]. The returned array may be shared with the cache,
+                          pipelines should not modify it in place.
 
          """
         video = img_info['video']
         frame_id = img_info['frameID']
-        data = np.load(os.path.join(self.flow_path, video, str(frame_id) + '.npz'))
-        flow = data['arr_0']
+
+        flow = self.flow_cache.get((video, frame_id))
+        if flow is not None:
+            return flow
+
+        if self.flow_store is not None:
+            flow = self.flow_store.load(video, frame_id)
+        else:
+            data = np.load(os.path.join(self.flow_path, video, str(frame_id) + '.npz'))
+            flow = data['arr_0']
+        if self.flow_scale is not None:
+            flow = self.rescale_flows(flow, self.flow_scale)
+        self.flow_cache.put((video, frame_id), flow)
         return flow
 
+    @staticmethod
+    def rescale_flows(flow, scale):
+        """Resize flows and scale their displacements accordingly.
+
+         Args:
+             flow (numpy array): flow data in shape of [N x H x W x 2]
+             scale (float): the resize scale
+
+         Returns:
+             numpy array: resized flow data, in shape of [N x round(H * scale) x round(W * scale) x 2]
+         """
+        height, width = flow.shape[1:3]
+        new_size = (max(int(width * scale + 0.5), 1), max(int(height * scale + 0.5), 1))
+        flows = []
+        for cur_flow in flow:
+            cur_flow, w_scale, h_scale = mmcv.imresize(cur_flow, new_size, return_scale=True)
+            flows.append(cur_flow * np.array([w_scale, h_scale], dtype=cur_flow.dtype))
+        return np.stack(flows) if flows else flow
+
     def group_sort_process(self, data_infos):
         """Sort the data info according to the video name and frame id.
 
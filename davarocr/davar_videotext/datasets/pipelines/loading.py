@@ -8,16 +8,66 @@
 # Date           :    2021-05-31
 ##################################################################################################
 """
+import os.path as osp
+
 from mmdet.datasets.builder import PIPELINES
 from davarocr.davar_common.datasets import DavarLoadImageFromFile, DavarLoadAnnotations
 
+from ..frame_cache import LRUCache
+
 
 @PIPELINES.register_module()
 class ConsistLoadImageFromFile(DavarLoadImageFromFile):
     """ Same with DavarLoadImageFromFile, the only difference is ConsistLoadImageFromFile support results(list) contain
-    multiple instance
+    multiple instance.
+
+    Consecutive training windows overlap in all but one frame, so the decoded frames can be kept in a per-worker LRU
+    cache (`cache_size` > 0) and shared by adjacent windows instead of being decoded `window_size` times.
     """
 
+    def __init__(self, cache_size=0, **kwargs):
+        """
+        Args:
+            cache_size(int): the number of decoded frames kept in the per-worker LRU cache, 0 means no cache
+            **kwargs: the same as `DavarLoadImageFromFile`
+        """
+        super().__init__(**kwargs)
+        self.cache = LRUCache(cache_size)
+
+    def _load_instance(self, results):
+        """ Load a single instance, using the frame cache if possible
+
+        Args:
+            results(dict): Data flow of one frame
+
+        Returns:
+            dict: Data flow of one frame
+        """
+        if self.cache.capacity <= 0 or self.decode_from_array or 'img_info' not in results:
+            return super().__call__(results)
+
+        filename = osp.join(results.get('img_prefix', ''), results['img_info']['filename'])
+        cached = self.cache.get(filename)
+        if cached is None:
+            results = super().__call__(results)
+            if results is not None:
+                # With `target_scale`, the frame may be decoded at reduced resolution, so its original shape and
+                # scale factor are kept with it
+                self.cache.put(filename, (results['img'].copy(), results['ori_shape'],
+                                          results.get('load_scale_factor', None)))
+            return results
+
+        # Later transforms may modify the image in place, the cached frame is always copied
+        img, ori_shape, load_scale_factor = cached
+        img = img.copy()
+        results['filename'] = filename
+        results['img'] = img
+        results['img_shape'] = img.shape
+        results['ori_shape'] = ori_shape
+        if load_scale_factor is not None:
+            results['load_scale_factor'] = load_scale_factor.copy()
+        return results
+
     def __call__(self, results):
         """ Main process
 
@@ -31,16 +81,20 @@ class ConsistLoadImageFromFile(DavarLoadImageFromFile):
 
         # Deal with results(dict) contains single instance
         if isinstance(results, dict):
-            results = super().__call__(results)
+            results = self._load_instance(results)
             return results
 
         # Deal with results(list(dict)) contains multiple instances
         results_ = []
         for instance in results:
-            instance = super().__call__(instance)
+            instance = self._load_instance(instance)
             results_.append(instance)
         return results_
 
+    def __repr__(self):
+        return self.__class__.__name__ + '(to_float32={}, cache_size={})'.format(self.to_float32,
+                                                                                 self.cache.capacity)
+
 
 @PIPELINES.register_module()
 class ConsistLoadAnnotations(DavarLoadAnnotations):
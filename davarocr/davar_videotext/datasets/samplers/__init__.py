@@ -10,5 +10,6 @@
 """
 
 from .metric_sampler import MetricSampler
+from .window_sampler import WindowSampler
 
-__all__ = ['MetricSampler']
+__all__ = ['MetricSampler', 'WindowSampler']
@@ -9,10 +9,13 @@
 ##################################################################################################
 """
 from __future__ import division
-import random
+import math
 
+import numpy as np
 from torch.utils.data import Sampler
 
+from mmcv.runner import get_dist_info
+
 from davarocr.davar_common.datasets.builder import SAMPLER
 
 
@@ -20,62 +23,121 @@ from davarocr.davar_common.datasets.builder import SAMPLER
 class MetricSampler(Sampler):
     """ Implementation of metric learning sampler"""
 
-    def __init__(self, dataset, shuffle=True, samples_per_gpu=1):
+    def __init__(self, dataset, shuffle=True, samples_per_gpu=1, num_replicas=None, rank=None, seed=1):
         """This sampler is used for video text metric learning: anchor, positive, negative
 
         Args:
             dataset(dataset): dataset for sampling
             shuffle(bool): whether to shuffle data
             samples_per_gpu (int): image numbers in each gpu
+            num_replicas (int): distributed gpu number, default to the world size
+            rank (int): device index, default to the current rank
+            seed (int): random seed, the sampling of each epoch is seeded with `seed + epoch`
         """
-        super().__init__(dataset)
-        random.seed(1)
         assert samples_per_gpu % 3 == 0
 
+        _rank, _num_replicas = get_dist_info()
+        if num_replicas is None:
+            num_replicas = _num_replicas
+        if rank is None:
+            rank = _rank
+
         self.dataset = dataset
         self.group_indices = dict()
         self.shuffle = shuffle
-
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.epoch = 0
+
+        # Sample indices of the sub-datasets are shifted to the indices of the concatenated dataset, and tracks of the
+        # same video in different sub-datasets are merged. Only the samples kept by the filtering and `used_ratio` of
+        # each sub-dataset are indexed, in the order of `filtered_index_list`
+        offset = 0
         for dataset_ in self.dataset.datasets:
-            self.group_indices.update(self.group_index(dataset_.img_infos))
+            index_list = getattr(dataset_, 'filtered_index_list', None)
+            for video, tracks in self.group_index(dataset_.img_infos, offset, index_list).items():
+                video_tracks = self.group_indices.setdefault(video, dict())
+                for track_id, members in tracks.items():
+                    video_tracks.setdefault(track_id, []).extend(members)
+            offset += len(dataset_)
 
         # If one video has only one track, then choose the negative samples for different video
         for key, value in self.group_indices.items():
             if len(value.keys()) == 1:
                 print(key, "this video has only one track, chose negative sample from diff video")
 
+        self.build_index()
+
         # Divide the samples per gpu into 3 parts: anchor, positive, negative
         self.anchor_nums_per_gpu = samples_per_gpu // 3
 
-        # Make sure the total size can be divided by 3
-        self.left_length = len(self.dataset) - (len(self.dataset) // self.anchor_nums_per_gpu) * \
-                                self.anchor_nums_per_gpu
+        # Make sure the anchors of each rank can be divided by anchor_nums_per_gpu
+        self.num_samples = int(math.ceil(len(self.dataset) / (self.anchor_nums_per_gpu * self.num_replicas))) \
+            * self.anchor_nums_per_gpu
+        self.total_size = self.num_samples * self.num_replicas
+
+    def build_index(self):
+        """ Flatten `group_indices` into NumPy arrays, in which tracks of the same video are contiguous:
 
-        self.num_samples = self.anchor_nums_per_gpu - self.left_length + len(self.dataset)
+            - sample_track: the track number of each sample (inverse index), -1 for samples without track
+            - track_members: sample indices sorted by track, track t owns
+                             track_members[track_starts[t]:track_starts[t] + track_sizes[t]]
+            - track_video: the video number of each track
+            - video_track_starts / video_track_nums: the first track number and track numbers of each video
+            - track_rank: the rank of each track inside its video
+        """
+        track_members = []
+        track_starts = []
+        track_sizes = []
+        track_video = []
+        video_track_starts = []
+        video_track_nums = []
+        for video_idx, tracks in enumerate(self.group_indices.values()):
+            video_track_starts.append(len(track_sizes))
+            video_track_nums.append(len(tracks))
+            for members in tracks.values():
+                track_starts.append(len(track_members))
+                track_sizes.append(len(members))
+                track_video.append(video_idx)
+                track_members.extend(members)
+
+        self.track_members = np.array(track_members, dtype=np.int64)
+        self.track_starts = np.array(track_starts, dtype=np.int64)
+        self.track_sizes = np.array(track_sizes, dtype=np.int64)
+        self.track_video = np.array(track_video, dtype=np.int64)
+        self.video_track_starts = np.array(video_track_starts, dtype=np.int64)
+        self.video_track_nums = np.array(video_track_nums, dtype=np.int64)
+        self.track_rank = np.arange(len(track_sizes), dtype=np.int64) - self.video_track_starts[self.track_video]
+
+        self.sample_track = np.full(len(self.dataset), -1, dtype=np.int64)
+        self.sample_track[self.track_members] = np.repeat(np.arange(len(track_sizes), dtype=np.int64),
+                                                          self.track_sizes)
 
     # Init when each epoch begins
     def __iter__(self):
-        # Fetch the anchor indices in dataset
-        anchor_indices = list(range(len(self.dataset)))
+        rng = np.random.RandomState(self.seed + self.epoch)
+
+        # Fetch the anchor indices in dataset, all ranks share the same permutation
+        anchor_indices = np.arange(len(self.dataset))
         if self.shuffle:
-            random.shuffle(anchor_indices)
+            anchor_indices = rng.permutation(anchor_indices)
 
-        # Padding the anchor to make sure it can be divided by anchor_nums_per_gpu
-        anchor_indices += random.sample(anchor_indices, self.anchor_nums_per_gpu - self.left_length)
+        # Padding the anchor to make sure it can be divided by anchor_nums_per_gpu on every rank
+        anchor_indices = np.concatenate([anchor_indices,
+                                         rng.choice(anchor_indices, self.total_size - len(anchor_indices))])
+        anchor_indices = anchor_indices[self.rank * self.num_samples:(self.rank + 1) * self.num_samples]
         assert len(anchor_indices) % self.anchor_nums_per_gpu == 0
 
         # Generating positive and negative indices
-        positive_indices, negative_indices = self.generate_apn(anchor_indices)
-
-        print("length of anchor_indices, positive_indices, negative_indices",  len(anchor_indices),
-              len(positive_indices), len(negative_indices))
+        positive_indices, negative_indices = self.generate_apn(anchor_indices, rng)
 
         # Make sure three parts length are equal
         assert len(anchor_indices) == len(positive_indices) == len(negative_indices)
 
         # Concat the indices by [number of anchor_nums_per_gpu anchor, number of anchor_nums_per_gpu positive,
         # number of anchor_nums_per_gpu negative, number of anchor_nums_per_gpu anchor, ...]
-        indices = self.concat_apn(anchor_indices, positive_indices, negative_indices)
+        indices = self.concat_apn(anchor_indices.tolist(), positive_indices.tolist(), negative_indices.tolist())
 
         assert len(indices) == len(anchor_indices) * 3
 
@@ -84,51 +146,67 @@ class MetricSampler(Sampler):
     def __len__(self):
         return self.num_samples * 3
 
-    def generate_apn(self, anchor_indices):
+    def set_epoch(self, epoch):
+        """
+        Args:
+            epoch (int): epoch number
+        """
+        self.epoch = epoch
+
+    def _random_member(self, tracks, rng):
+        """ Randomly choose one sample from each of the given tracks
+
+        Args:
+            tracks(np.array): track numbers
+            rng(np.random.RandomState): random generator
+
+        Returns:
+            np.array: sample indices
+        """
+        offsets = np.floor(rng.random_sample(len(tracks)) * self.track_sizes[tracks]).astype(np.int64)
+        return self.track_members[self.track_starts[tracks] + offsets]
+
+    def generate_apn(self, anchor_indices, rng=None):
         """Generate the anchor, positive, negative indices
 
         Args:
-            anchor_indices(list): the indices of anchor
+            anchor_indices(list | np.array): the indices of anchor
+            rng(np.random.RandomState): random generator
 
         Returns:
-            positive_indices(list): the indices of positive
-            negative_indices(list): the indices of negative
+            positive_indices(np.array): the indices of positive
+            negative_indices(np.array): the indices of negative
         """
-        positive_indices = []
-        negative_indices = []
-
-        for index in anchor_indices:
-            for video_key, value in self.group_indices.items():
-                for track_key in value.keys():
-
-                    # Find which track this  anchor belongs to
-                    if index in value[track_key]:
-
-                        # this case means that the video has only one track sequence, choose negative sample from diff
-                        # video
-                        if len(value.keys()) == 1:
-
-                            # Random choose video
-                            negative_video_key = random.choice(list(self.group_indices.keys()))
-                            while negative_video_key == video_key:
-                                negative_video_key = random.choice(list(self.group_indices.keys()))
-
-                            # Random choose negative track in video
-                            negative_track_key = random.choice(list(self.group_indices[negative_video_key].keys()))
-                            negative_indices.append(random.choice(
-                                self.group_indices[negative_video_key][negative_track_key]))
-
-                        # choose positive sample from same track sequence, choose negative sample from different track
-                        # sequence
-                        else:
-                            # Random choose negative track in same video
-                            negative_track_key = random.choice(list(value.keys()))
-                            while negative_track_key == track_key:
-                                negative_track_key = random.choice(list(value.keys()))
-                            negative_indices.append(random.choice(value[negative_track_key]))
-
-                        # Random choose positive instance in same track
-                        positive_indices.append(random.choice(value[track_key]))
+        if rng is None:
+            rng = np.random.RandomState(self.seed + self.epoch)
+        anchor_indices = np.asarray(anchor_indices, dtype=np.int64)
+        anchor_tracks = self.sample_track[anchor_indices]
+        assert (anchor_tracks >= 0).all(), "some anchors do not belong to any track"
+        anchor_videos = self.track_video[anchor_tracks]
+        video_track_nums = self.video_track_nums[anchor_videos]
+        num_videos = len(self.video_track_nums)
+
+        # Random choose positive instance in same track
+        positive_indices = self._random_member(anchor_tracks, rng)
+
+        # Choose negative track from different track sequence in same video, the drawn rank skips the anchor's own
+        negative_tracks = np.empty_like(anchor_tracks)
+        multi = video_track_nums > 1
+        draw = np.floor(rng.random_sample(int(multi.sum())) * (video_track_nums[multi] - 1)).astype(np.int64)
+        draw += draw >= self.track_rank[anchor_tracks[multi]]
+        negative_tracks[multi] = self.video_track_starts[anchor_videos[multi]] + draw
+
+        # this case means that the video has only one track sequence, choose negative sample from diff video
+        single = ~multi
+        if single.any():
+            assert num_videos > 1, "negative samples can not be generated with only one track in total"
+            draw = rng.randint(0, num_videos - 1, int(single.sum()))
+            negative_videos = draw + (draw >= anchor_videos[single])
+            draw = np.floor(rng.random_sample(len(negative_videos)) *
+                            self.video_track_nums[negative_videos]).astype(np.int64)
+            negative_tracks[single] = self.video_track_starts[negative_videos] + draw
+
+        negative_indices = self._random_member(negative_tracks, rng)
 
         return positive_indices, negative_indices
 
@@ -150,19 +228,26 @@ class MetricSampler(Sampler):
             indices += negative_indices[i:i + self.anchor_nums_per_gpu]
         return indices
 
-
-    def group_index(self, data_infos):
+    def group_index(self, data_infos, offset=0, index_list=None):
         """ Record  each data index in data_infos in a dict which keys are video name and track id
 
         Args:
            data_infos(list): Data flow used in YORORCGDataset.
+           offset(int): index of the first sample of data_infos in the concatenated dataset
+           index_list(list | None): position in data_infos of each sample of the dataset, i.e. `filtered_index_list`
+                                    of YORORCGDataset. None means all the data_infos are used
 
         Returns:
-           dict: grouped data, each video and track id record the instances index in data_infos
+           dict: grouped data, each video and track id record the instances index in the dataset
         """
         track_dict = dict()
 
-        for i, instance in enumerate(data_infos):
+        if index_list is None:
+            index_list = range(len(data_infos))
+
+        for i, info_idx in enumerate(index_list):
+            instance = data_infos[info_idx]
+
             # Fetch the track id for each text, the track id is like "video_name-text_id"
             track_id = instance['ann']['trackID']
 
@@ -177,6 +262,6 @@ class MetricSampler(Sampler):
                 track_dict[video][track_id] = []
 
             # Append the index
-            track_dict[video][track_id].append(i)
+            track_dict[video][track_id].append(i + offset)
 
         return track_dict
@@ -0,0 +1,129 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    window_sampler.py
+# Abstract       :    The sampler keeping consecutive frame windows on the same dataloader worker
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+from __future__ import division
+import math
+
+import numpy as np
+from torch.utils.data import Sampler
+
+from mmcv.runner import get_dist_info
+
+from davarocr.davar_common.datasets.builder import SAMPLER
+
+
+@SAMPLER.register_module()
+class WindowSampler(Sampler):
+    """ Window-aware sampler for MultiFrameDataset.
+
+    The indices of MultiFrameDataset are consecutive windows of the same video, in which adjacent windows overlap in
+    `window_size - 1` frames. This sampler shuffles chunks of `chunk_size` consecutive windows instead of single windows,
+    and lays the chunks out so that the batches of one chunk are all dispatched to the same dataloader worker (torch
+    DataLoader sends the k-th batch to worker `k % workers_per_gpu`). Together with the frame and flow LRU caches in
+    `ConsistLoadImageFromFile` and `MultiFrameDataset`, most frames are then decoded only once per epoch.
+
+    It supports both distributed and non-distributed training.
+    """
+
+    def __init__(self,
+                 dataset,
+                 samples_per_gpu=1,
+                 workers_per_gpu=1,
+                 chunk_size=16,
+                 num_replicas=None,
+                 rank=None,
+                 shuffle=True,
+                 seed=0):
+        """
+        Args:
+            dataset(dataset): dataset for sampling, MultiFrameDataset
+            samples_per_gpu(int): image numbers in each gpu
+            workers_per_gpu(int): dataloader workers in each gpu, should be the same as `data.workers_per_gpu`
+            chunk_size(int): number of consecutive windows that are kept together on one worker
+            num_replicas(int): distributed gpu number, default to the world size
+            rank(int): device index, default to the current rank
+            shuffle(bool): whether to shuffle the chunks
+            seed(int): random seed, the shuffle of each epoch is seeded with `seed + epoch`
+        """
+        _rank, _num_replicas = get_dist_info()
+        if num_replicas is None:
+            num_replicas = _num_replicas
+        if rank is None:
+            rank = _rank
+
+        self.dataset = dataset
+        self.samples_per_gpu = samples_per_gpu
+        self.workers_per_gpu = max(workers_per_gpu, 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+        # Make sure every rank gets the same number of complete batches
+        self.num_samples = int(math.ceil(len(self.dataset) / self.num_replicas / self.samples_per_gpu)) \
+            * self.samples_per_gpu
+        self.total_size = self.num_samples * self.num_replicas
+
+    def _split_chunks(self):
+        """ Split the dataset indices into chunks of consecutive windows, never crossing videos
+
+        Returns:
+            list(np.array): chunks of dataset indices
+        """
+        num = len(self.dataset)
+        data_infos = self.dataset.data_infos
+        indices = self.dataset.indices
+
+        # The video of each window, a chunk is broken whenever the video changes
+        videos = [data_infos[window[0]]['video'] for window in indices]
+        bounds = [0]
+        for i in range(1, num):
+            if videos[i] != videos[i - 1] or i - bounds[-1] >= self.chunk_size:
+                bounds.append(i)
+        bounds.append(num)
+        return [np.arange(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+    def __iter__(self):
+        rng = np.random.RandomState(self.seed + self.epoch)
+        chunks = self._split_chunks()
+        if self.shuffle:
+            chunks = [chunks[i] for i in rng.permutation(len(chunks))]
+
+        # Distribute the chunks to ranks, then pad to the same length
+        chunks = chunks[self.rank::self.num_replicas]
+        indices = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        if len(indices) < self.num_samples:
+            extra = rng.randint(0, len(self.dataset), self.num_samples - len(indices))
+            indices = np.concatenate([indices, extra])
+        indices = indices[:self.num_samples]
+
+        # Cut the stream into batches and assign contiguous runs of batches to each worker
+        batches = indices.reshape(-1, self.samples_per_gpu)
+        streams = np.array_split(np.arange(len(batches)), self.workers_per_gpu)
+
+        # Interleave the streams in the order the DataLoader dispatches batches to workers
+        ordered = []
+        for step in range(max(len(stream) for stream in streams)):
+            for stream in streams:
+                if step < len(stream):
+                    ordered.append(batches[stream[step]])
+        return iter(np.concatenate(ordered).tolist() if ordered else [])
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        """
+        Args:
+            epoch (int): epoch number
+        """
+        self.epoch = epoch
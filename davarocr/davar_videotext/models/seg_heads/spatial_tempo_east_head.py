@@ -9,10 +9,9 @@
 # Date           :    2021-05-01
 ##################################################################################################
 """
-import numpy as np
 import torch
 from torch import nn
-import mmcv
+import torch.nn.functional as F
 
 from mmdet.models.builder import HEADS
 from davarocr.davar_det.models.seg_heads import EASTHead
@@ -46,6 +45,9 @@ class SpatialTempoEASTHead(EASTHead):
         self.eps = 1e-9
         self.window_size = window_size
 
+        # Normalized base grids of grid_sample, cached by feature map size, device and dtype
+        self._grid_cache = dict()
+
     def forward(self, x, img_meta):
         """ Forward compute of YORO head
 
@@ -277,12 +279,36 @@ class SpatialTempoEASTHead(EASTHead):
         loss["loss_reg"] = self.loss_reg(reg_pred, geo_map, weight=geo_map_weights)
         return loss
 
+    def _base_grid(self, height, width, device, dtype):
+        """ Normalized mesh grid of a feature map, i.e. the sampling grid of zero flow
+
+        Args:
+            height(int): height of the feature map
+            width(int): width of the feature map
+            device(torch.device): device of the feature map
+            dtype(torch.dtype): dtype of the feature map
+
+        Returns:
+            Tensor: grid in shape of 1 x height x width x 2, in range of [-1, 1]
+        """
+        key = (height, width, device, dtype)
+        grid = self._grid_cache.get(key)
+        if grid is None:
+            xx = torch.arange(width, device=device, dtype=dtype) * (2.0 / max(width - 1, 1)) - 1.0
+            yy = torch.arange(height, device=device, dtype=dtype) * (2.0 / max(height - 1, 1)) - 1.0
+            grid = torch.stack((xx.view(1, -1).expand(height, width), yy.view(-1, 1).expand(height, width)), dim=-1)
+            grid = grid.unsqueeze(0)
+            self._grid_cache[key] = grid
+        return grid
+
     def warp(self, x, flow):
         """Warping operation
 
         Args:
             x(Tensor): input feature map in shape of window_size x 32 x H/4 x W/4
-            flow(numpy array): optical flow in shape of window_size - 1 x height x width x 2
+            flow(numpy array | Tensor): optical flow in shape of (window_size - 1) x height x width x 2, or
+                                        window_size x height x width x 2 if the zero anchor flow is included. The flow
+                                        is resized on the device if it is not prepared in the feature map size.
 
         Returns:
             Tensor: warping feature.
@@ -290,38 +316,22 @@ class SpatialTempoEASTHead(EASTHead):
         batch_size, _, height, width = x.size()
         target_idx = (batch_size - 1) // 2
 
+        flow = torch.as_tensor(flow, device=x.device, dtype=x.dtype)
+
         # By default, the flow don't save the anchor to anchor flow, because it's always zero and waste of storage
-        flow = np.insert(flow, target_idx, np.zeros_like(flow[0]),axis=0)
-        flows = []
-
-        # Reshape flow size to be same with x size
-        for batch_idx in range(batch_size):
-            cur_flow = flow[batch_idx]
-            cur_flow, w_scale, h_scale = mmcv.imresize(cur_flow, (width, height), return_scale=True)
-            cur_flow[:, :, 0] = cur_flow[:, :, 0] * w_scale
-            cur_flow[:, :, 1] = cur_flow[:, :, 1] * h_scale
-            flows.append(cur_flow)
-
-        flow = np.stack(flows)
-        flow = torch.from_numpy(flow).permute(0, 3, 1, 2).contiguous()
-
-        # Mesh grid
-        xx = torch.arange(0, width).view(1, -1).repeat(height, 1)
-        yy = torch.arange(0, height).view(-1, 1).repeat(1, width)
-        xx = xx.view(1, 1, height, width).repeat(batch_size, 1, 1, 1)
-        yy = yy.view(1, 1, height, width).repeat(batch_size, 1, 1, 1)
-        grid = torch.cat((xx, yy), 1).float()
-        if x.is_cuda:
-            flow = flow.to(x.device)
-            grid = grid.to(x.device)
-
-        vgrid = grid + flow
-
-        # Normalize, cause grid_sample method need
-        vgrid[:, 0, :, :] = 2.0 * vgrid[:, 0, :, :].clone() / max(width - 1, 1) - 1.0
-        vgrid[:, 1, :, :] = 2.0 * vgrid[:, 1, :, :].clone() / max(height - 1, 1) - 1.0
-        vgrid = vgrid.float()
-        vgrid = vgrid.permute(0, 2, 3, 1)
-
-        output = nn.functional.grid_sample(x, vgrid)
+        if flow.size(0) == batch_size - 1:
+            flow = torch.cat((flow[:target_idx], flow.new_zeros((1,) + flow.shape[1:]), flow[target_idx:]), dim=0)
+        flow = flow.permute(0, 3, 1, 2)
+
+        # Reshape flow size to be same with x size by one batched interpolation, and scale the displacements
+        flow_height, flow_width = flow.shape[2:]
+        if (flow_height, flow_width) != (height, width):
+            flow = F.interpolate(flow, size=(height, width), mode='bilinear', align_corners=False)
+            flow = flow * flow.new_tensor([width / flow_width, height / flow_height]).view(1, 2, 1, 1)
+
+        # Normalize the displacements, cause grid_sample method need
+        flow = flow.permute(0, 2, 3, 1) * flow.new_tensor([2.0 / max(width - 1, 1), 2.0 / max(height - 1, 1)])
+        vgrid = self._base_grid(height, width, x.device, x.dtype) + flow
+
+        output = F.grid_sample(x, vgrid)
         return output
@@ -21,6 +21,7 @@ from mmdet.models.builder import HEADS
 from mmdet.models.builder import build_loss
 from davarocr.davar_rcg.models.sequence_heads import AttentionHead
 from davarocr.davar_rcg.models.sequence_heads.att_head import AttentionCell
+from davarocr.davar_common.utils import get_module_device
 
 
 @HEADS.register_module()
@@ -163,15 +164,16 @@ class TextRecommenderHead(AttentionHead):
         # +1 for [s] at end of sentence.
         num_steps = self.batch_max_length + 1
 
-        output_hiddens = torch.cuda.FloatTensor(batch_size,
-                                                num_steps,
-                                                self.hidden_size).fill_(0)
-        hidden = (torch.cuda.FloatTensor(batch_size, self.hidden_size,
-                                         device=batch_H.device).fill_(0),
-                  torch.cuda.FloatTensor(batch_size, self.hidden_size,
-                                         device=batch_H.device).fill_(0))
+        output_hiddens = torch.zeros(batch_size,
+                                     num_steps,
+                                     self.hidden_size,
+                                     device=batch_H.device)
+        hidden = (torch.zeros(batch_size, self.hidden_size,
+                              device=batch_H.device),
+                  torch.zeros(batch_size, self.hidden_size,
+                              device=batch_H.device))
 
-        glimpses = torch.cuda.FloatTensor(batch_size, num_steps, input_size)
+        glimpses = torch.empty(batch_size, num_steps, input_size, device=batch_H.device)
 
         if is_train:
             for i in range(num_steps):
@@ -190,12 +192,12 @@ class TextRecommenderHead(AttentionHead):
         else:
 
             # [GO] token
-            targets = torch.cuda.LongTensor(batch_size,
-                                            device=batch_H.device).fill_(self.bos)
-            probs = torch.cuda.FloatTensor(batch_size,
-                                           num_steps,
-                                           self.num_classes,
-                                           device=batch_H.device).fill_(0)
+            targets = torch.full((batch_size,), self.bos, dtype=torch.long,
+                                 device=batch_H.device)
+            probs = torch.zeros(batch_size,
+                                num_steps,
+                                self.num_classes,
+                                device=batch_H.device)
             for i in range(num_steps):
 
                 # The vector corresponding to the i-th text in one batch
@@ -295,7 +297,8 @@ class TextRecommenderHead(AttentionHead):
         gt_texts, img_metas = gts
 
         # Fetch gt quality scores
-        scores = torch.cuda.FloatTensor(len(img_metas))
+        device = get_module_device(self)
+        scores = torch.empty(len(img_metas), device=device)
         for i, data in enumerate(img_metas):
             img_info = data['img_info']
             score = img_info['ann']['score']
@@ -305,7 +308,7 @@ class TextRecommenderHead(AttentionHead):
 
         # Fetch gt texts
         if gt_texts is not None:
-            text, length = self.converter.encode(gt_texts, self.batch_max_length)
+            text, length = self.converter.encode(gt_texts, self.batch_max_length, device=device)
             return text, length, scores
 
         return None, None, None
@@ -0,0 +1,113 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    pack_flows.py
+# Abstract       :    Pack per-frame optical flow `.npz` files into memory-mapped per-video arrays
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import os
+import os.path as osp
+import argparse
+import json
+import zipfile
+
+import numpy as np
+
+
+def parse_args():
+    """
+
+    Returns:
+        args parameter of flow packing
+
+    """
+    parser = argparse.ArgumentParser(description='DavarOCR pack optical flows for MultiFrameDataset')
+    parser.add_argument('flow_path', help='flow dir, organized as flow_path/video/frameID.npz')
+    parser.add_argument('out_path', help='output dir of the packed flow store')
+    parser.add_argument('--dtype', type=str, default='float16', help='storage dtype of the packed flows')
+    args_ = parser.parse_args()
+    return args_
+
+
+def read_npz_shape(npz_file, key='arr_0'):
+    """ Read the shape of an array in a `.npz` file from its `.npy` header, without decompressing the data
+
+    Args:
+        npz_file(str): path of the `.npz` file
+        key(str): name of the array
+
+    Returns:
+        list(int): shape of the array
+    """
+    with zipfile.ZipFile(npz_file) as zip_file, zip_file.open(key + '.npy') as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(member)
+    return list(shape)
+
+
+def pack_video(video_dir, out_file, dtype):
+    """ Pack all the flows of one video into a 1-D array, which can be opened with `np.load(mmap_mode='r')`.
+
+    Args:
+        video_dir(str): dir of the video's `.npz` flow files
+        out_file(str): output `.npy` file
+        dtype(np.dtype): storage dtype
+
+    Returns:
+        dict: index of the video, {frame_id: [offset, shape]}
+    """
+    frame_files = [name for name in os.listdir(video_dir) if name.endswith('.npz')]
+    frame_files = sorted(frame_files, key=lambda x: int(osp.splitext(x)[0]))
+
+    # First pass only reads the array headers to compute the offsets
+    index = dict()
+    offset = 0
+    for name in frame_files:
+        shape = read_npz_shape(osp.join(video_dir, name))
+        index[osp.splitext(name)[0]] = [offset, shape]
+        offset += int(np.prod(shape))
+
+    # Second pass writes the flows into the memory-mapped array
+    packed = np.lib.format.open_memmap(out_file, mode='w+', dtype=dtype, shape=(offset,))
+    for name in frame_files:
+        start, shape = index[osp.splitext(name)[0]]
+        with np.load(osp.join(video_dir, name)) as data:
+            packed[start:start + int(np.prod(shape))] = data['arr_0'].astype(dtype).reshape(-1)
+    packed.flush()
+    del packed
+
+    return index
+
+
+def pack_flows(flow_path, out_path, dtype='float16'):
+    """ Pack the flows of all videos in `flow_path`, and write the offset index to `out_path/flow_index.json`.
+
+    Args:
+        flow_path(str): flow dir, organized as flow_path/video/frameID.npz
+        out_path(str): output dir
+        dtype(str): storage dtype
+    """
+    if not osp.exists(out_path):
+        os.makedirs(out_path)
+
+    videos = dict()
+    for video in sorted(os.listdir(flow_path)):
+        video_dir = osp.join(flow_path, video)
+        if not osp.isdir(video_dir):
+            continue
+        videos[video] = pack_video(video_dir, osp.join(out_path, video + '.npy'), np.dtype(dtype))
+        print('packed {} frames of {}'.format(len(videos[video]), video))
+
+    with open(osp.join(out_path, 'flow_index.json'), 'w', encoding='utf-8') as write_file:
+        json.dump(dict(dtype=dtype, videos=videos), write_file)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    pack_flows(args.flow_path, args.out_path, args.dtype)
@@ -12,10 +12,13 @@
 
 import os
 import json
+import queue
 import argparse
+import threading
 
 import numpy as np
 import torch
+from torch.utils.data import Dataset, DataLoader
 
 import mmcv
 from mmcv.parallel import collate, scatter, MMDataParallel
@@ -27,6 +30,213 @@ from davarocr.davar_rcg.models.builder import build_recognizor
 import test_utils
 
 
+class SpottingFrameDataset(Dataset):
+    """ The frames of all the videos in the tracking order. Each item runs the test pipeline (decoding and cropping)
+    for all the text instances of one frame, so that the data loader workers prepare the instances in parallel.
+    """
+    def __init__(self, det_data, img_prefix, pipeline):
+        """
+        Args:
+            det_data (dict): detection results grouped by video, e.g. {video: {'video/1.jpg': img_info, ...}}
+            img_prefix (str): the image prefix
+            pipeline (list(dict)): the test pipeline of the recognizor
+        """
+        self.img_prefix = img_prefix
+        self.pipeline = Compose(pipeline)
+
+        # The frame id in video should start from "1" and should be consecutive by default
+        self.frames = []
+        for video, value in det_data.items():
+            for frame_id in range(1, len(value.keys()) + 1):
+                key = video + '/' + str(frame_id) + '.jpg'
+                self.frames.append(dict(video=video, frame_id=frame_id,
+                                        instance_infos=test_utils.instance_to_list(value[key], key)))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, idx):
+        """
+        Args:
+            idx (int): frame index
+
+        Returns:
+            dict: the frame index, and the pipeline results of its instances
+        """
+        instances = [self.pipeline(dict(img_info=instance, img_prefix=self.img_prefix))
+                     for instance in self.frames[idx]['instance_infos']]
+        return dict(index=idx, instances=instances)
+
+    def batch_indices(self, instances_per_batch):
+        """ Group the consecutive frames (across videos) into batches of about `instances_per_batch` instances
+
+        Args:
+            instances_per_batch (int): the number of instances fed to the model at once
+
+        Returns:
+            list(list(int)): frame indices of each batch
+        """
+        batches = []
+        batch = []
+        num = 0
+        for idx, frame in enumerate(self.frames):
+            batch.append(idx)
+            num += len(frame['instance_infos'])
+            if num >= instances_per_batch:
+                batches.append(batch)
+                batch = []
+                num = 0
+        if batch:
+            batches.append(batch)
+        return batches
+
+
+class SequenceTracker:
+    """ Associate the text instances of the consecutive frames into track sequences, frame by frame """
+    def __init__(self, feat_sim_thresh, feat_sim_with_loc_thresh, max_exist_duration, eps):
+        """
+        Args:
+            feat_sim_thresh (float): the feature similarity threshold
+            feat_sim_with_loc_thresh (float): the feature similarity threshold of the adjacent pairs
+            max_exist_duration (int): the track instance max exist duration
+            eps (float): constant eps
+        """
+        self.feat_sim_thresh = feat_sim_thresh
+        self.feat_sim_with_loc_thresh = feat_sim_with_loc_thresh
+        self.max_exist_duration = max_exist_duration
+        self.eps = eps
+
+        # To save track sequence for all videos
+        self.track_res_dict = dict()
+
+        # The unique identification of text sequence in a video
+        self.text_id = 0
+
+        self.video = None
+        self.his_textid_list = []
+        self.his_duration_list = []
+        self.his_loc_list = []
+        self.his_feat_array = None
+
+    def _new_track(self, frame_id, bbox, text, score):
+        """ Create a new track sequence, and append it in history data except the feature """
+        self.his_textid_list.append(self.text_id)
+        self.his_duration_list.append(0)
+        self.his_loc_list.append(bbox)
+        test_utils.update_track(self.text_id, self.video, self.track_res_dict, frame_id, bbox, text, score)
+        self.text_id = self.text_id + 1
+
+    def update(self, video, frame_id, instance_infos, texts, scores, track_feature):
+        """ Associate the instances of one frame to the history track sequences
+
+        Args:
+            video (str): video name
+            frame_id (int): frame id number
+            instance_infos (list(dict)): the detected instances of the frame
+            texts (list(str)): recognition results of the instances
+            scores (numpy array): quality scores of the instances, in shape of [N]
+            track_feature (numpy array): track features of the instances, in shape of [N x C]
+        """
+        # Generate track sequence by video, the history data is cleared for a new video
+        if video != self.video:
+            print('processing video: ' + str(video))
+            self.video = video
+            self.track_res_dict[video] = dict()
+            self.his_textid_list = []
+            self.his_duration_list = []
+            self.his_loc_list = []
+            self.his_feat_array = None
+
+        print("processing frame :", frame_id)
+        cur_frame_pos = [instance['ann']['bbox'] for instance in instance_infos]
+
+        # In the begging, when no history data to match, create all bboxes as new track sequences
+        if len(self.his_textid_list) == 0:
+            if len(instance_infos) > 0:
+                for cur_idx, bbox in enumerate(cur_frame_pos):
+                    self._new_track(frame_id, bbox, texts[cur_idx], scores[cur_idx].item())
+                self.his_feat_array = np.array(track_feature)
+            return
+
+        ori_his_len = len(self.his_textid_list)
+        his_matched_matrix = np.zeros([ori_his_len], np.int64)
+
+        # Calc feature similarty and adjacent matrix to match history track. In YORO, we only use feat_sim_matrix
+        # and adja_maxtrix to match, You can add other cues (e.g. iou) for your own task
+        if len(instance_infos) > 0:
+            feat_sim_matrix = cosine_similarity(track_feature, self.his_feat_array)
+            adja_matrix = test_utils.adjacent_matrix(cur_frame_pos, self.his_loc_list)
+
+            # Aggregate feature similarity matrix and adjacent matrix, and pad it to a square matrix
+            num_cur, num_his = feat_sim_matrix.shape
+            max_num = max(num_cur, num_his)
+            square_cost_matrix = np.zeros([max_num, max_num], np.float64)
+            square_cost_matrix[:num_cur, :num_his] = feat_sim_matrix + (0.1 * adja_matrix + self.eps)
+
+            # Get the match index result
+            row_ind, col_ind = test_utils.hungary(square_cost_matrix)
+
+            # Iter all match pairs, If the similarity match the condition, then allocate pairs into same track seq
+            new_feats = []
+            for cur_idx, his_idx in zip(row_ind, col_ind):
+
+                # The match idx falls in padding row indices, that means the instance are bogus instance
+                if cur_idx >= num_cur:
+                    continue
+
+                # Only if the feature similarity meet the threshold or paris are adjacent and meet the loc feature
+                # similarity, can they be valid pairs
+                if his_idx < num_his and (feat_sim_matrix[cur_idx, his_idx] >= self.feat_sim_thresh or (
+                        feat_sim_matrix[cur_idx, his_idx] >= self.feat_sim_with_loc_thresh and
+                        adja_matrix[cur_idx, his_idx] >= 1)):
+
+                    # Update matched track
+                    test_utils.update_track(self.his_textid_list[his_idx], video, self.track_res_dict, frame_id,
+                                            cur_frame_pos[cur_idx], texts[cur_idx], scores[cur_idx].item())
+
+                    # Update history data
+                    self.his_feat_array[his_idx, :] = track_feature[cur_idx, :]
+                    self.his_duration_list[his_idx] = 0
+                    self.his_loc_list[his_idx] = cur_frame_pos[cur_idx]
+                    his_matched_matrix[his_idx] = 1
+
+                # Match invalid, or the instance do not match any history data, create new track
+                else:
+                    self._new_track(frame_id, cur_frame_pos[cur_idx], texts[cur_idx], scores[cur_idx].item())
+                    new_feats.append(track_feature[cur_idx, :])
+            if new_feats:
+                self.his_feat_array = np.concatenate((self.his_feat_array, np.stack(new_feats)), axis=0)
+
+        # Updating history data
+        self.his_textid_list, self.his_duration_list, self.his_loc_list, self.his_feat_array = test_utils. \
+            update_history(self.his_textid_list, self.his_duration_list, self.his_loc_list, self.his_feat_array,
+                           his_matched_matrix, self.max_exist_duration, ori_his_len)
+
+
+def track_consumer(tracker, frames, result_queue, errors):
+    """ The consumer stage, which associates the frames in order as their model outputs arrive
+
+    Args:
+        tracker (SequenceTracker): the tracker
+        frames (list(dict)): frames of the dataset
+        result_queue (queue.Queue): model outputs of the frames, in order, ended by None
+        errors (list): to save the exception raised in the consumer
+    """
+    while True:
+        item = result_queue.get()
+        if item is None:
+            break
+        if errors:
+            # Drain the queue after a failure, so that the producer is never blocked
+            continue
+        index, texts, scores, track_feature = item
+        frame = frames[index]
+        try:
+            tracker.update(frame['video'], frame['frame_id'], frame['instance_infos'], texts, scores, track_feature)
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+
 def parse_args():
     """
 
@@ -54,7 +264,6 @@ if __name__ == '__main__':
         torch.backends.cudnn.benchmark = True
 
     cfg.data.test.test_mode = True
-    test_pipeline = Compose(cfg.test_pipeline)
     model_path = cfg.ckpts[0]['ModelPath']
     if not os.path.exists(model_path):
         print(model_path + ' not exist.')
@@ -72,27 +281,14 @@ if __name__ == '__main__':
 
     model = MMDataParallel(model, device_ids=[0])
     device = next(model.parameters()).device
+    device = int(str(device).rsplit(':', maxsplit=1)[-1])
     model.eval()
 
     # Hyper parameters
-
-    # The feature similarity threshold
-    feat_sim_thresh = cfg.feat_sim_thresh
-
-    # The feature similarity with adjacent threshold
-    feat_sim_with_loc_thresh = cfg.feat_sim_with_loc_thresh
-
-    # The track instance max exist duration
-    max_exist_duration = cfg.max_exist_duration
-
-    # The feature channel for tracking
-    feat_channels = cfg.feat_channels
-
-    # Constant eps
-    eps = cfg.eps
-
-    # The unique identification of text sequence in a video
-    text_id = 0
+    tracker = SequenceTracker(feat_sim_thresh=cfg.feat_sim_thresh,
+                              feat_sim_with_loc_thresh=cfg.feat_sim_with_loc_thresh,
+                              max_exist_duration=cfg.max_exist_duration,
+                              eps=cfg.eps)
 
     # The predicted detection result file by detection model
     ori_det_data = mmcv.load(cfg.testsets[0]["AnnFile"])
@@ -110,55 +306,33 @@ if __name__ == '__main__':
             det_data[video] = dict()
         det_data[video][img_key] = ori_det_data[key]
 
-    # to save track sequence for  all videos
-    track_res_dict = dict()
-
     # output(json) file to save track result
     out_dir = cfg.out_dir
     if not os.path.exists(out_dir):
         os.makedirs(out_dir)
 
-    # generate track sequence by video
-    # step1 : construct history dict to store: text id (store folder name) / past duration / newest feat
-    # step2 : extract text feat from current frame
-    # step3 : get current matching list
-    # step4 : confirm each match pair valid and updating feat and duration
-
-    for video, value in det_data.items():
-        print('processing video: ' + str(video))
-        frame_nums = len(value.keys())
-
-        # History data to match current data
-        his_textid_list = []
-        his_duration_list = []
-        his_loc_list = []
-        his_feat_array = None
-
-        # To save track sequence for specific video
-        track_res_dict[video] = dict()
-
-        # The frame id in video should start from "1" and should be consecutive by default
-        for frame_id in range(1, frame_nums + 1):
-            print("processing frame :", frame_id)
-            key = video + '/' + str(frame_id) + '.jpg'
-            img_info = value[key]
-
-            # Read predict bboxes from one image into list
-            instance_infos = test_utils.instance_to_list(img_info, key)
-
-            cur_frame_pos = []
-            track_feature = None
-
-            # Data pipelines and model output
-            if len(instance_infos) > 0:
-                batch_data = []
-                for instance in instance_infos:
-                    cur_frame_pos.append(instance['ann']['bbox'])
-                    data = dict(img_info=instance, img_prefix=img_prefix)
-                    data = test_pipeline(data)
-                    batch_data.append(data)
+    # The inference is staged:
+    # stage1 : the data loader workers decode and crop the instances of the frames
+    # stage2 : the instances of many frames (and videos) are fed to the model in one batch
+    # stage3 : the consumer thread associates the frames in order, while the model runs on the next batches
+    dataset = SpottingFrameDataset(det_data, img_prefix, cfg.test_pipeline)
+    data_loader = DataLoader(dataset,
+                             batch_sampler=dataset.batch_indices(cfg.get('instances_per_batch', 256)),
+                             num_workers=cfg.get('workers_per_gpu', 4),
+                             collate_fn=list)
+
+    result_queue = queue.Queue()
+    consumer_errors = []
+    consumer = threading.Thread(target=track_consumer, args=(tracker, dataset.frames, result_queue, consumer_errors))
+    consumer.start()
+
+    try:
+        for frames in data_loader:
+            if consumer_errors:
+                break
+            batch_data = [instance for frame in frames for instance in frame['instances']]
+            if len(batch_data) > 0:
                 data_collate = collate(batch_data, samples_per_gpu=len(batch_data))
-                device = int(str(device).rsplit(':', maxsplit=1)[-1])
                 data = scatter(data_collate, [device])[0]
 
                 with torch.no_grad():
@@ -166,184 +340,25 @@ if __name__ == '__main__':
 
                 # Get model output
                 texts = result['text']
-                scores = result['scores']
-                scores = scores.cpu().numpy()
-                scores = scores.reshape(-1)
-                track_feature = result['track_feature']
-                track_feature = track_feature.cpu().numpy()
-            else:
-                texts = None
-                scores = None
-                track_feature = None
-
-            # In the begging, when no history data to match, create all bboxes as new track sequences
-            if len(his_textid_list) == 0:
-                if len(instance_infos) > 0:
-                    first_img_flag = True
-                    for text_img_idx, instance in enumerate(instance_infos):
-
-                        # Append the text id, duration time, bbox for a new text instance
-                        his_textid_list.append(text_id)
-                        his_duration_list.append(0)
-                        his_loc_list.append(instance['ann']['bbox'])
-
-                        # For first instance we need to reshape the history feature array to (1, feature_channel)
-                        if first_img_flag:
-                            his_feat_array = np.array(track_feature[text_img_idx, :])
-                            first_img_flag = False
-
-                        # Append left features
-                        else:
-                            his_feat_array = np.row_stack((his_feat_array, np.array([track_feature[text_img_idx, :]])))
-
-                        # Update a new track
-                        test_utils.update_track(text_id, video, track_res_dict, frame_id, instance['ann']['bbox'],
-                                                texts[text_img_idx], scores[text_img_idx].item())
-
-                        # Update text id for next track
-                        text_id = text_id + 1
-                continue
-
-            ori_his_len = len(his_textid_list)
-            his_matched_matrix = np.zeros([ori_his_len], np.int)
-
-            # If current img has no text instance
-            if len(instance_infos) == 0:
-
-                # Update history data
-                his_textid_list, his_duration_list, his_loc_list, his_feat_array = test_utils.\
-                    update_history(his_textid_list, his_duration_list, his_loc_list, his_feat_array, his_matched_matrix,
-                                   max_exist_duration, ori_his_len)
-
-                continue
-
-            # For the case that there is only one history feature, we should reshape to it (1, feat_channels)
-            if len(his_feat_array.shape) == 1 and his_feat_array.shape[0] == feat_channels:
-                his_feat_array = his_feat_array.reshape(1, his_feat_array.shape[0])
-
-            #
-            max_num = max(len(track_feature), len(his_feat_array))
-
-            # Calc feature similarty, iou, adjacent matrix to match history track, In YORO, we only use feat_sim_matrix
-            # and adja_maxtrix to match, You can adjust to your only task
-            feat_sim_matrix = cosine_similarity(track_feature, his_feat_array)
-            iou_matrix = np.zeros([len(cur_frame_pos), len(his_loc_list)], np.float)
-            adja_matrix = np.zeros([len(cur_frame_pos), len(his_loc_list)], np.int)
-
-            for cur_idx, cur_bbox in enumerate(cur_frame_pos):
-                cur_poly = test_utils.polygon_from_points(cur_bbox)
-                for his_idx, his_bbox in enumerate(his_loc_list):
-
-                    # Calculate IOU
-                    his_poly = test_utils.polygon_from_points(his_bbox)
-                    cur_iou = test_utils.get_intersection_over_union(cur_poly, his_poly)
-                    iou_matrix[cur_idx, his_idx] = cur_iou
-
-                    # Calculate the expand coordinates
-                    expand_start_x, expand_end_x, expand_start_y, expand_end_y = test_utils.calculate_expand(his_bbox)
-
-                    for i in range(4):
-                        if expand_start_x <= cur_frame_pos[cur_idx][2 * i] <= expand_end_x and \
-                                expand_start_y <= cur_frame_pos[cur_idx][2 * i + 1] <= expand_end_y:
-                            adja_matrix[cur_idx, his_idx] = 1
-
-            # Aggregate feature similarity matrix and adjacent matrix
-            match_matrix = feat_sim_matrix + (0.1 * adja_matrix + eps)
-
-            # Reshape the match matrix to square matrix
-            square_cost_matrix = np.zeros([max_num, max_num], np.float)
-
-            for i in range(feat_sim_matrix.shape[0]):
-                for j in range(feat_sim_matrix.shape[1]):
-                    square_cost_matrix[i, j] = match_matrix[i, j]
-
-            # Record the padding row and col index
-            useless_row = []
-            useless_col = []
-
-            for i in range(feat_sim_matrix.shape[0], max_num):
-                useless_row.append(i)
-            for j in range(feat_sim_matrix.shape[1], max_num):
-                useless_col.append(j)
-
-            # Get the match index result
-            row_ind, col_ind = test_utils.hungary(square_cost_matrix)
-
-            ori_his_len = len(his_duration_list)
-            his_matched_matrix = np.zeros([ori_his_len], np.int)
-
-            # Iter all match pairs, If the similarity match the condition, then allocate pairs into same track seq
-            for row_ind_idx, row_item in enumerate(row_ind):
-                cur_idx = row_item
-                his_idx = col_ind[row_ind_idx]
-
-                # The match idx falls in padding row indices, that means the instance are bogus instance
-                if cur_idx in useless_row:
-                    continue
-
-                # Match valid
-                if his_idx not in useless_col:
-
-                    # Calculating pairs' feature similarity, adjacent relation, iou
-                    matched_feat_sim = feat_sim_matrix[cur_idx, his_idx]
-                    matched_adja = adja_matrix[cur_idx, his_idx]
-                    matched_iou = iou_matrix[cur_idx, his_idx]
-
-                    # Only if the feature similarity meet the threshold or paris are adjacent and meet the loc feature
-                    # similarity, can they be valid pairs
-                    if (matched_feat_sim >= feat_sim_thresh) or (matched_feat_sim >= feat_sim_with_loc_thresh and
-                                                                 matched_adja >= 1):
-                        matched_text_id = his_textid_list[his_idx]
-
-                        # Update matched track
-                        test_utils.update_track(matched_text_id, video, track_res_dict, frame_id,
-                                                instance_infos[cur_idx]['ann']['bbox'], texts[cur_idx],
-                                                scores[cur_idx].item())
-
-                        # Update history data
-                        his_feat_array[his_idx, :] = track_feature[cur_idx, :]
-                        his_duration_list[his_idx] = 0
-                        his_loc_list[his_idx] = cur_frame_pos[cur_idx]
-                        his_matched_matrix[his_idx] = 1
-
-                    # Match invalid. create new track
-                    else:
-
-                        # Append a new track in history data
-                        his_textid_list.append(text_id)
-                        his_duration_list.append(0)
-                        his_loc_list.append(cur_frame_pos[cur_idx])
-                        his_feat_array = np.row_stack((his_feat_array, np.array([track_feature[cur_idx, :]])))
-
-                        # Append a new track
-                        test_utils.update_track(text_id, video, track_res_dict, frame_id,
-                                                instance_infos[cur_idx]['ann']['bbox'], texts[cur_idx],
-                                                scores[cur_idx].item())
-
-                        text_id = text_id + 1
-
-                # The match idx falls in padding col indices, instance do not match any history data, create new track
+                scores = result['scores'].cpu().numpy().reshape(-1)
+                track_feature = result['track_feature'].cpu().numpy()
+
+            # Split the outputs by frame
+            start = 0
+            for frame in frames:
+                end = start + len(frame['instances'])
+                if end > start:
+                    result_queue.put((frame['index'], texts[start:end], scores[start:end], track_feature[start:end]))
                 else:
-
-                    # Append a new track in history data
-                    his_textid_list.append(text_id)
-                    his_duration_list.append(0)
-                    his_loc_list.append(cur_frame_pos[cur_idx])
-                    his_feat_array = np.row_stack((his_feat_array, np.array([track_feature[cur_idx, :]])))
-
-                    # Append a new track
-                    test_utils.update_track(text_id, video, track_res_dict, frame_id,
-                                            instance_infos[cur_idx]['ann']['bbox'], texts[cur_idx],
-                                            scores[cur_idx].item())
-
-                    text_id = text_id + 1
-
-            # Updating history data
-            his_textid_list, his_duration_list, his_loc_list, his_feat_array = test_utils. \
-                update_history(his_textid_list, his_duration_list, his_loc_list, his_feat_array, his_matched_matrix,
-                               max_exist_duration, ori_his_len)
+                    result_queue.put((frame['index'], None, None, None))
+                start = end
+    finally:
+        result_queue.put(None)
+        consumer.join()
+    if consumer_errors:
+        raise consumer_errors[0]
 
     # Output
     out_file_name = os.path.join(out_dir, cfg.out_file)
     with open(out_file_name, 'w') as write_file:
-        json.dump(track_res_dict, write_file, indent=4)
+        json.dump(tracker.track_res_dict, write_file, indent=4)
@@ -675,6 +675,36 @@ def calculate_expand(bbox):
     return expand_start_x, expand_end_x, expand_start_y, expand_end_y
 
 
+def adjacent_matrix(cur_bboxes, his_bboxes):
+    """ Calculate whether any corner of each current bbox falls in the expanded region (see `calculate_expand`) of
+    each history bbox
+
+    Args:
+        cur_bboxes (list(list(int)) | numpy array): current bboxes in shape of [N x 8]
+        his_bboxes (list(list(int)) | numpy array): history bboxes in shape of [M x 8]
+
+    Returns:
+        numpy array: the adjacent matrix in shape of [N x M], 1 for adjacent pairs
+
+    """
+    cur_bboxes = np.asarray(cur_bboxes, dtype=np.float64).reshape(-1, 8)
+    his_bboxes = np.asarray(his_bboxes, dtype=np.float64).reshape(-1, 8)
+
+    start_x, end_x = his_bboxes[:, 0::2].min(-1), his_bboxes[:, 0::2].max(-1)
+    start_y, end_y = his_bboxes[:, 1::2].min(-1), his_bboxes[:, 1::2].max(-1)
+    center_x = 0.5 * (start_x + end_x)
+    center_y = 0.5 * (start_y + end_y)
+    expand_start_x = (center_x - 1. * (end_x - start_x))[None, :, None]
+    expand_end_x = (center_x + 1. * (end_x - start_x))[None, :, None]
+    expand_start_y = (center_y - 1. * (end_y - start_y))[None, :, None]
+    expand_end_y = (center_y + 1. * (end_y - start_y))[None, :, None]
+
+    cur_x = cur_bboxes[:, None, 0::2]
+    cur_y = cur_bboxes[:, None, 1::2]
+    inside = (expand_start_x <= cur_x) & (cur_x <= expand_end_x) & (expand_start_y <= cur_y) & (cur_y <= expand_end_y)
+    return inside.any(-1).astype(np.int64)
+
+
 def update_track(text_id, video, track_res_dict, frame_id, bbox, text, score):
     """ Updating a track or create a new track
 
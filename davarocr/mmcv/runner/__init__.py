@@ -11,9 +11,11 @@
 
 from .hooks import DavarCheckpointHook, ReduceonplateauLrUpdaterHook
 from .distill_runner import DistillRunner
+from .async_checkpoint import AsyncCheckpointWriter
 
 __all__ = [
     'DavarCheckpointHook',
     'ReduceonplateauLrUpdaterHook',
-    'DistillRunner'
+    'DistillRunner',
+    'AsyncCheckpointWriter'
 ]
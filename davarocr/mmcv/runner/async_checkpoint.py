@@ -0,0 +1,259 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    async_checkpoint.py
+# Abstract       :    Non-blocking checkpoint writer used by DavarCheckpointHook
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import os
+import os.path as osp
+import copy
+import time
+import queue
+import shutil
+import platform
+import threading
+
+import torch
+
+import mmcv
+from mmcv.parallel import is_module_wrapper
+from mmcv.runner import IterBasedRunner
+from mmcv.runner.checkpoint import get_state_dict
+
+
+def snapshot_to_cpu(obj, pin_memory=True, buffers=None):
+    """ Recursively copy all the tensors in a state dict to (pinned) CPU memory.
+
+    The device-to-host copies are issued asynchronously and synchronized once at the end, so the training loop is only
+    blocked for the duration of the copies, not the serialization.
+
+    Args:
+        obj (dict | list | tuple | Tensor | object): the state to be copied
+        pin_memory (bool): whether to copy CUDA tensors into pinned memory
+        buffers (dict | None): host buffers of a previous snapshot, indexed by the position of the tensor in the state.
+                               The buffers with the same shape and dtype are reused, the others are allocated and
+                               stored into it. None means always allocating.
+
+    Returns:
+        dict | list | tuple | Tensor | object: the copied state
+    """
+    def _copy(item, path):
+        if isinstance(item, torch.Tensor):
+            item = item.detach()
+            if item.is_cuda:
+                buffer = buffers.get(path, None) if buffers is not None else None
+                if buffer is None or buffer.size() != item.size() or buffer.dtype != item.dtype:
+                    buffer = torch.empty(item.size(), dtype=item.dtype, layout=item.layout, pin_memory=pin_memory)
+                    if buffers is not None:
+                        buffers[path] = buffer
+                buffer.copy_(item, non_blocking=pin_memory)
+                return buffer
+            return item.clone()
+        if isinstance(item, dict):
+            return type(item)((key, _copy(value, path + (key,))) for key, value in item.items())
+        if isinstance(item, (list, tuple)):
+            return type(item)(_copy(value, path + (idx,)) for idx, value in enumerate(item))
+        return copy.deepcopy(item)
+
+    result = _copy(obj, ())
+    if pin_memory and torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return result
+
+
+def collect_checkpoint(runner, meta=None, save_optimizer=True, buffers=None):
+    """ Build the checkpoint dict in the same format as `runner.save_checkpoint`, with all tensors on CPU.
+
+    Args:
+        runner (Runner): the controller of the training process
+        meta (dict): meta information to be saved
+        save_optimizer (bool): whether to save the optimizer state
+        buffers (dict | None): host buffers to reuse, see `snapshot_to_cpu`
+
+    Returns:
+        dict: checkpoint with keys of `meta`, `state_dict` and `optimizer`
+    """
+    meta = dict() if meta is None else dict(meta)
+    if runner.meta is not None:
+        meta.update(runner.meta)
+
+    # The meta keeps being updated by the runner while the checkpoint is waiting to be written
+    meta = copy.deepcopy(meta)
+    if isinstance(runner, IterBasedRunner):
+        meta.update(iter=runner.iter + 1, epoch=runner.epoch + 1)
+    else:
+        meta.update(epoch=runner.epoch + 1, iter=runner.iter)
+    meta.update(mmcv_version=mmcv.__version__, time=time.asctime())
+
+    model = runner.model
+    if is_module_wrapper(model):
+        model = model.module
+    if hasattr(model, 'CLASSES') and model.CLASSES is not None:
+        meta.update(CLASSES=model.CLASSES)
+
+    pin_memory = torch.cuda.is_available()
+    state = {'state_dict': get_state_dict(model)}
+    optimizer = runner.optimizer if save_optimizer else None
+    if isinstance(optimizer, torch.optim.Optimizer):
+        state['optimizer'] = optimizer.state_dict()
+    elif isinstance(optimizer, dict):
+        state['optimizer'] = {name: optim.state_dict() for name, optim in optimizer.items()}
+
+    checkpoint = {'meta': meta}
+    checkpoint.update(snapshot_to_cpu(state, pin_memory, buffers))
+    return checkpoint
+
+
+class AsyncCheckpointWriter:
+    """ Write checkpoints in a background thread.
+
+    - `submit` enqueues a checkpoint already copied to CPU by `collect_checkpoint`. When `max_pending` checkpoints are
+      waiting, `submit` blocks until one is written (back-pressure), so host memory stays bounded.
+    - Every file is written to `<name>.tmp` and renamed, so a crash never leaves a truncated checkpoint behind.
+    - The host buffers of a written checkpoint are handed back by `acquire_buffers`, so the pinned memory is allocated
+      once for each in-flight checkpoint rather than at every save.
+    - Checkpoints submitted with `keep=False` are rotated, only the latest `max_keep_ckpts` of them are kept, and
+      `latest.pth` next to them links to the newest one, as `runner.save_checkpoint` does.
+    - Latency of each save is recorded and fetched by `pop_stats`.
+    """
+
+    def __init__(self, max_pending=1, max_keep_ckpts=-1, rotated=None):
+        """
+        Args:
+            max_pending (int): maximum number of checkpoints waiting to be written
+            max_keep_ckpts (int): maximum number of rotated checkpoints to keep, -1 means keep all
+            rotated (list(str) | None): rotated checkpoints already on disk from the oldest to the newest, e.g. those of
+                                        the run being resumed
+        """
+        self.max_keep_ckpts = max_keep_ckpts
+        self._queue = queue.Queue(maxsize=max(max_pending, 1))
+        self._rotated = list(rotated) if rotated is not None else []
+        self._free_buffers = []
+        self._stats = []
+        self._lock = threading.Lock()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='AsyncCheckpointWriter', daemon=True)
+        self._thread.start()
+
+    def acquire_buffers(self):
+        """ Fetch the host buffers of a written checkpoint, to be passed to `collect_checkpoint`
+
+        Returns:
+            dict: the buffers, empty if all of them are still in use
+        """
+        with self._lock:
+            return self._free_buffers.pop() if self._free_buffers else dict()
+
+    def submit(self, checkpoint, filepath, keep=False, snapshot_time=0., buffers=None):
+        """ Enqueue a checkpoint to be written.
+
+        Args:
+            checkpoint (dict): checkpoint with all tensors on CPU
+            filepath (str): destination file path
+            keep (bool): whether the file is excluded from the rotation, e.g. the best checkpoint
+            snapshot_time (float): time spent in copying the state, only used for the statistics
+            buffers (dict | None): host buffers holding the tensors of the checkpoint, released once it is written
+
+        Returns:
+            float: time blocked by back-pressure
+        """
+        self._raise_error()
+        start = time.time()
+        self._queue.put((checkpoint, filepath, keep, snapshot_time, start, buffers))
+        return time.time() - start
+
+    def _run(self):
+        """ Main loop of the writer thread """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            checkpoint, filepath, keep, snapshot_time, submit_time, buffers = item
+            try:
+                start = time.time()
+                self._write(checkpoint, filepath)
+                write_time = time.time() - start
+                del checkpoint, item
+                if buffers is not None:
+                    with self._lock:
+                        self._free_buffers.append(buffers)
+                if not keep:
+                    self._link_latest(filepath)
+                    self._rotate(filepath)
+                with self._lock:
+                    self._stats.append(dict(filepath=filepath,
+                                            ckpt_snapshot_time=snapshot_time,
+                                            ckpt_write_time=write_time,
+                                            ckpt_total_time=time.time() - submit_time + snapshot_time))
+            except Exception as error:  # pylint: disable=broad-except
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _write(checkpoint, filepath):
+        """ Atomically write the checkpoint by temp-file-then-rename """
+        mmcv.mkdir_or_exist(osp.dirname(osp.abspath(filepath)))
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            torch.save(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, filepath)
+
+    @staticmethod
+    def _link_latest(filepath):
+        """ Point `latest.pth` in the same directory to the checkpoint, replacing the previous link atomically """
+        dst_file = osp.join(osp.dirname(filepath), 'latest.pth')
+        if platform.system() == 'Windows':
+            shutil.copy(filepath, dst_file)
+            return
+        tmp_link = dst_file + '.tmp'
+        if osp.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(osp.basename(filepath), tmp_link)
+        os.replace(tmp_link, dst_file)
+
+    def _rotate(self, filepath):
+        """ Remove the oldest rotated checkpoints """
+        if filepath in self._rotated:
+            self._rotated.remove(filepath)
+        self._rotated.append(filepath)
+        if self.max_keep_ckpts <= 0:
+            return
+        while len(self._rotated) > self.max_keep_ckpts:
+            old_path = self._rotated.pop(0)
+            if osp.isfile(old_path):
+                os.remove(old_path)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Asynchronous checkpoint writing failed') from error
+
+    def pop_stats(self):
+        """ Fetch the statistics of the checkpoints written since the last call
+
+        Returns:
+            list(dict): file path and latencies (in seconds) of each written checkpoint
+        """
+        with self._lock:
+            stats, self._stats = self._stats, []
+        return stats
+
+    def flush(self):
+        """ Block until all the submitted checkpoints are written """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """ Write the pending checkpoints and stop the writer thread """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
@@ -9,12 +9,16 @@
 ##################################################################################################
 """
 import os
+import re
+import time
 import torch
 
-from mmcv.runner.dist_utils import allreduce_params
+from mmcv.runner.dist_utils import allreduce_params, get_dist_info
 from mmcv.runner.hooks import HOOKS
 from mmcv.runner import CheckpointHook
 
+from ..async_checkpoint import AsyncCheckpointWriter, collect_checkpoint
+
 
 @HOOKS.register_module()
 class DavarCheckpointHook(CheckpointHook):
@@ -39,6 +43,8 @@ class DavarCheckpointHook(CheckpointHook):
                  max_keep_ckpts=-1,
                  save_last=True,
                  sync_buffer=False,
+                 async_save=False,
+                 max_pending_ckpts=1,
                  **kwargs):
         """
         Args:
@@ -57,6 +63,10 @@ class DavarCheckpointHook(CheckpointHook):
             max_keep_ckpts (int): The maximum checkpoints to keep.
             save_last (bool): Whether to force the last checkpoint to be saved regardless of interval.
             sync_buffer (bool): Whether to synchronize buffers in different gpus
+            async_save (bool): Whether to write checkpoints in a background thread. The states are copied to (pinned)
+                               CPU memory and training continues while the file is being written.
+            max_pending_ckpts (int): The maximum checkpoints waiting to be written in async mode, further saves block
+                                     until one of them is finished.
             **kwargs (None): backup parameter
         """
 
@@ -83,6 +93,99 @@ class DavarCheckpointHook(CheckpointHook):
         if self.save_mode == "lightweight":
             self.davar_rule(self.rule)
         self.sync_buffer = sync_buffer
+        self.async_save = async_save
+        self.max_pending_ckpts = max_pending_ckpts
+        self.writer = None
+
+    def before_run(self, runner):
+        """
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        super().before_run(runner)
+        rank, _ = get_dist_info()
+        if self.async_save and rank == 0:
+            # Checkpoints left by the resumed run are rotated together with the new ones
+            self.writer = AsyncCheckpointWriter(self.max_pending_ckpts, self.max_keep_ckpts,
+                                                self._existing_checkpoints())
+
+    def _existing_checkpoints(self):
+        """Find the checkpoints of the rotation already in `out_dir`
+
+        Returns:
+            list(str): paths of the checkpoints, sorted by epoch or iteration
+
+        """
+        filename_tmpl = self.args.get('filename_tmpl', 'epoch_{}.pth' if self.by_epoch else 'iter_{}.pth')
+        pattern = re.compile('^' + re.escape(filename_tmpl).replace(r'\{\}', r'(\d+)') + '$')
+        if not os.path.isdir(self.out_dir):
+            return []
+        found = []
+        for filename in os.listdir(self.out_dir):
+            matched = pattern.match(filename)
+            if matched is not None and os.path.isfile(os.path.join(self.out_dir, filename)):
+                found.append((int(matched.group(1)), os.path.join(self.out_dir, filename)))
+        return [filepath for _, filepath in sorted(found)]
+
+    def after_run(self, runner):
+        """Wait for the pending checkpoints before exiting
+
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self._log_save_stats(runner)
+            self.writer = None
+
+    def _log_save_stats(self, runner):
+        """Report the latency of the finished asynchronous saves to the logger
+
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        for stats in self.writer.pop_stats():
+            filepath = stats.pop('filepath')
+            runner.log_buffer.update(stats)
+            runner.logger.info('Checkpoint {} saved, snapshot {:.2f}s, write {:.2f}s, total {:.2f}s'.format(
+                filepath, stats['ckpt_snapshot_time'], stats['ckpt_write_time'], stats['ckpt_total_time']))
+
+    def _save_checkpoint(self, runner):
+        """Save the current checkpoint, asynchronously if `async_save` is set, and delete unwanted checkpoints.
+
+        Args:
+            runner (Runner): the controller of the training process
+
+        Returns:
+
+        """
+        if not self.async_save:
+            super()._save_checkpoint(runner)
+            return
+        if self.writer is None:
+            return
+
+        if self.by_epoch:
+            cur_ckpt_filename = self.args.get('filename_tmpl', 'epoch_{}.pth').format(runner.epoch + 1)
+        else:
+            cur_ckpt_filename = self.args.get('filename_tmpl', 'iter_{}.pth').format(runner.iter + 1)
+        filepath = os.path.join(self.out_dir, cur_ckpt_filename)
+        if runner.meta is not None:
+            runner.meta.setdefault('hook_msgs', dict())
+            runner.meta['hook_msgs']['last_ckpt'] = filepath
+
+        # Old checkpoints are removed by the writer once the new one is on disk
+        save_checkpoint(runner, self.out_dir, cur_ckpt_filename, self.save_optimizer, self.args.get('meta', None),
+                        self.writer, keep=False)
 
     def davar_rule(self, rule):
         """Initialize rule, key_indicator, comparison_func, and best score.
@@ -107,6 +210,8 @@ class DavarCheckpointHook(CheckpointHook):
         """
 
         self.save_type = 'epoch'
+        if self.writer is not None:
+            self._log_save_stats(runner)
         if not self.by_epoch:
             return
 
@@ -136,6 +241,8 @@ class DavarCheckpointHook(CheckpointHook):
         """
 
         self.save_type = 'iter'
+        if self.writer is not None:
+            self._log_save_stats(runner)
 
         if not self.by_iter or self.iter_interval == -1:
             return
@@ -190,7 +297,8 @@ class DavarCheckpointHook(CheckpointHook):
                                                     self.save_optimizer,
                                                     self.save_last,
                                                     self.is_last_epoch,
-                                                    self.compare_func)
+                                                    self.compare_func,
+                                                    self.writer)
         if save_type == "iter":
             self.init_metric = save_best_checkpoint(runner,
                                                     self.metric,
@@ -201,7 +309,37 @@ class DavarCheckpointHook(CheckpointHook):
                                                     self.save_optimizer,
                                                     self.save_last,
                                                     self.is_last_iter,
-                                                    self.compare_func)
+                                                    self.compare_func,
+                                                    self.writer)
+
+
+def save_checkpoint(runner, out_dir, filename, save_optimizer, meta=None, writer=None, keep=True):
+    """
+    Args:
+        runner (Runner): the controller of the training process
+        out_dir (str): The directory to save checkpoints.
+        filename (str): checkpoint file name
+        save_optimizer (bool): whether to save the optimizer
+        meta (dict): meta information to be saved
+        writer (AsyncCheckpointWriter): if given, the checkpoint is snapshotted to CPU and written in background
+        keep (bool): whether the checkpoint is excluded from the rotation of the writer
+
+    Returns:
+
+    """
+    if writer is None:
+        runner.save_checkpoint(out_dir, filename_tmpl=filename,
+                               save_optimizer=save_optimizer,
+                               meta=meta,
+                               create_symlink=False)
+        return
+
+    start = time.time()
+    buffers = writer.acquire_buffers()
+    checkpoint = collect_checkpoint(runner, meta, save_optimizer, buffers)
+    snapshot_time = time.time() - start
+    wait_time = writer.submit(checkpoint, os.path.join(out_dir, filename), keep, snapshot_time, buffers)
+    runner.log_buffer.update({'ckpt_blocked_time': snapshot_time + wait_time})
 
 
 def save_best_checkpoint(runner,
@@ -213,7 +351,8 @@ def save_best_checkpoint(runner,
                          save_optimizer,
                          save_last,
                          last_flag,
-                         compare_func):
+                         compare_func,
+                         writer=None):
     """
     Args:
         runner (Runner): the controller of the training process
@@ -226,6 +365,7 @@ def save_best_checkpoint(runner,
         save_last (bool): whether to save the last epoch or iteration
         last_flag (function): judge the last epoch or last iteration function
         compare_func (function): compared function
+        writer (AsyncCheckpointWriter): the asynchronous checkpoint writer, None means saving synchronously
 
     Returns:
         float: update the best result compared to the current evaluation result
@@ -259,16 +399,10 @@ def save_best_checkpoint(runner,
                                  }
                     runner.meta.update(best_info)
                     save_name = 'Best_checkpoint.pth'
-                    runner.save_checkpoint(out_dir, filename_tmpl=save_name,
-                                           save_optimizer=save_optimizer,
-                                           meta=runner.meta,
-                                           create_symlink=False)
+                    save_checkpoint(runner, out_dir, save_name, save_optimizer, runner.meta, writer)
 
             # save the latest model
             if torch.cuda.current_device() == 0 and save_last and last_flag(runner):
-                runner.save_checkpoint(out_dir, filename_tmpl='latest_model.pth',
-                                       save_optimizer=save_optimizer,
-                                       meta=None,
-                                       create_symlink=False)
+                save_checkpoint(runner, out_dir, 'latest_model.pth', save_optimizer, None, writer)
 
     return init_metric
@@ -70,6 +70,10 @@ tmp_dict = dict()
 out_dir = '/path/to/save/'
 out_file = 'IC15_pred_track_result.json'
 
+# instances of consecutive frames fed to the recommender at once, and data loader workers to decode and crop them
+instances_per_batch = 256
+workers_per_gpu = 4
+
 feat_sim_thresh = 0.9
 feat_sim_with_loc_thresh = 0.85
 max_exist_duration = 8
@@ -0,0 +1,37 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    test_cropped_masks.py
+# Abstract       :    Tests of CroppedBitmapMasks against the full-size BitmapMasks
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import numpy as np
+from mmdet.core import BitmapMasks
+
+from davarocr.davar_common.datasets import CroppedBitmapMasks
+
+
+def test_crop_and_resize_equals_bitmap_masks():
+    rng = np.random.RandomState(0)
+    for _ in range(20):
+        height, width = rng.randint(5, 40, size=2)
+        num = rng.randint(1, 4)
+        masks = (rng.rand(num, height, width) > 0.5).astype(np.uint8)
+        # Instances touching the right and bottom borders, and away from the left and top ones
+        masks[:, :, -1], masks[:, -1] = 1, 1
+        masks[:, :, :2], masks[:, :2] = 0, 0
+
+        # RoIs inside the image, across its borders and out of it
+        num_rois = 8
+        x_1 = rng.uniform(-6, width + 2, num_rois)
+        y_1 = rng.uniform(-6, height + 2, num_rois)
+        bboxes = np.stack([x_1, y_1, x_1 + rng.uniform(0.5, width, num_rois),
+                           y_1 + rng.uniform(0.5, height, num_rois)], axis=1).astype(np.float32)
+        inds = rng.randint(0, num, num_rois)
+
+        expected = BitmapMasks(masks, height, width).crop_and_resize(bboxes, (7, 7), inds)
+        results = CroppedBitmapMasks.from_bitmaps(masks).crop_and_resize(bboxes, (7, 7), inds)
+        assert np.array_equal(results.masks, expected.masks)
@@ -0,0 +1,74 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    test_eval_subset.py
+# Abstract       :    Tests of the validation subsets used by DavarEvalHook
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import numpy as np
+from torch.utils.data import Dataset
+
+from davarocr.davar_common.core.evaluation.eval_subset import EvalSubset
+
+
+class ToyDataset(Dataset):
+    """ Dataset whose evaluation reads the annotations by index, like CTUNetDataset and WildReceiptDataset """
+
+    def __init__(self, data_infos):
+        self.data_infos = data_infos
+        self.img_ids = [info['id'] for info in data_infos]
+
+    def __len__(self):
+        return len(self.data_infos)
+
+    def __getitem__(self, idx):
+        return self.data_infos[idx]
+
+    def get_ann_info(self, idx):
+        return self.data_infos[idx]['ann']
+
+    def process_anns(self, idx):
+        return np.array(self.data_infos[idx]['ann']['labels'])
+
+    @staticmethod
+    def count(labels):
+        return len(labels)
+
+    def evaluate(self, results, **kwargs):
+        annotations = [self.process_anns(i) for i in range(len(self))]
+        assert len(annotations) == len(results)
+        correct = sum(int((np.array(result) == ann).sum()) for result, ann in zip(results, annotations))
+        total = sum(self.count(ann) for ann in annotations)
+        return dict(acc=correct / total, ids=list(self.img_ids),
+                    anns=[self.get_ann_info(i)['labels'] for i in range(len(self))])
+
+
+def _toy_dataset(num=12, seed=0):
+    rng = np.random.RandomState(seed)
+    return ToyDataset([dict(id=100 + idx, ann=dict(labels=rng.randint(0, 3, size=rng.randint(1, 6)).tolist()))
+                       for idx in range(num)])
+
+
+def _predictions(dataset, seed=1):
+    rng = np.random.RandomState(seed)
+    return [rng.randint(0, 3, size=len(info['ann']['labels'])).tolist() for info in dataset.data_infos]
+
+
+def test_eval_subset_equals_full_evaluation():
+    dataset = _toy_dataset()
+    results = _predictions(dataset)
+    subset = EvalSubset(dataset, np.arange(len(dataset)))
+    assert subset.evaluate(results) == dataset.evaluate(results)
+
+
+def test_eval_subset_reads_samples_through_indices():
+    dataset = _toy_dataset()
+    results = _predictions(dataset)
+    for indices in (np.arange(len(dataset))[::-1], [1, 4, 5, 10]):
+        subset = EvalSubset(dataset, indices)
+        expected = ToyDataset([dataset.data_infos[idx] for idx in indices])
+        assert subset.evaluate([results[idx] for idx in indices]) == \
+            expected.evaluate([results[idx] for idx in indices])
@@ -0,0 +1,42 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    test_reduced_loading.py
+# Abstract       :    Tests of the image meta of images decoded at a reduced resolution by DavarLoadImageFromFile
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import os.path as osp
+
+import cv2
+import numpy as np
+import pytest
+from mmdet.datasets.pipelines import Compose
+
+import davarocr.davar_common.datasets  # noqa: F401, register the pipelines
+
+
+@pytest.mark.parametrize('resize_type', ['Resize', 'DavarResize'])
+def test_reduced_loading_scale_factor(tmp_path, resize_type):
+    filename = osp.join(str(tmp_path), 'img.jpg')
+    cv2.imwrite(filename, np.random.RandomState(0).randint(0, 255, (1200, 1600, 3), dtype=np.uint8))
+
+    # The image is decoded at 1/8 (200 x 150), and resized to 300 x 225 by the test-time augmentation
+    pipeline = Compose([
+        dict(type='DavarLoadImageFromFile', target_scale=(200, 150)),
+        dict(type='MultiScaleFlipAug', img_scale=(300, 225), flip=False, transforms=[
+            dict(type=resize_type, keep_ratio=True),
+            dict(type='DavarCollect', keys=['img']),
+        ])
+    ])
+    data = pipeline(dict(img_info=dict(filename=filename, height=1200, width=1600)))
+    img_meta = data['img_metas'][0].data
+
+    assert img_meta['ori_shape'][:2] == (1200, 1600)
+    assert img_meta['img_shape'][:2] == (225, 300)
+
+    # `scale_factor` maps the original image to the resized one, so that `rescale=True` results are in the original
+    # image coordinates
+    assert np.allclose(img_meta['scale_factor'], 300 / 1600)
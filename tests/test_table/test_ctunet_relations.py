@@ -0,0 +1,122 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    test_ctunet_relations.py
+# Abstract       :    Tests of the sparse relation linking candidates and the relation decoding of CTUNet
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import numpy as np
+import torch
+
+from davarocr.davar_table.core import cell_relation_candidates
+from davarocr.davar_table.models.understanding_detectors import CTUNet
+
+
+def _dense_candidates(cells, direction):
+    """ Candidate pairs of the dense relation masks, which were used before the sparse candidates """
+    cells = np.array(cells)
+    masks = np.zeros((len(cells), len(cells)), dtype=bool)
+    for i, rowcol in enumerate(cells):
+        indexc = np.where((cells[:, 3] >= rowcol[1]) & (cells[:, 1] <= rowcol[3]))[0]
+        masks[indexc, i], masks[i, indexc] = True, True
+        if direction == 'row':
+            indexr = np.where((cells[:, 2] >= rowcol[0]) & (cells[:, 0] <= rowcol[2]))[0]
+            masks[indexr, i], masks[i, indexr] = True, True
+    return masks
+
+
+def test_cell_relation_candidates():
+    rng = np.random.RandomState(0)
+    for num in (0, 1, 2, 17, 60):
+        starts = rng.randint(0, 8, size=(num, 2))
+        cells = np.concatenate([starts, starts + rng.randint(0, 3, size=(num, 2))], axis=1)
+        for direction in ('row', 'col'):
+            first, second = cell_relation_candidates(cells.tolist(), direction)
+            masks = np.zeros((num, num), dtype=bool)
+            masks[first, second] = True
+            assert len(first) == masks.sum(), 'duplicated candidate pairs'
+            assert np.array_equal(masks, _dense_candidates(cells, direction))
+
+
+class _RoIExtractor:
+    num_inputs = 1
+
+    def __call__(self, feats, rois):
+        return rois.new_zeros((rois.size(0), 4))
+
+
+class _ContextModule:
+    """ Context of which each node feature is the one-hot code of its image and of its index in the image """
+
+    def __init__(self, batch_size, length):
+        self.context = torch.zeros(batch_size, length, batch_size + length)
+        for img_idx in range(batch_size):
+            self.context[img_idx, :, img_idx] = 1
+            self.context[img_idx, :, batch_size:] = torch.eye(length)
+
+    def __call__(self, info_feat_list, **kwargs):
+        return self.context, None, None, None
+
+
+class _RelationHead:
+    """ Relation head returning the given logits of each pair, decoded from the one-hot node features """
+
+    def __init__(self, batch_size, edge_logits):
+        self.batch_size = batch_size
+        self.edge_logits = edge_logits
+
+    def __call__(self, pair_context):
+        node_context = pair_context.view(pair_context.size(0), 2, -1)
+        img_inds = node_context[:, 0, :self.batch_size].argmax(-1)
+        first, second = node_context[:, :, self.batch_size:].argmax(-1).unbind(-1)
+        return self.edge_logits[img_inds, first, second]
+
+
+def _build_ctunet(batch_size, length, node_logits, row_logits, col_logits):
+    """ CTUNet whose fusion stages are replaced, so that the heads output the given logits """
+    model = CTUNet.__new__(CTUNet)
+    torch.nn.Module.__init__(model)
+    model.extract_feat = lambda img: [img]
+    model.infor_roi_extractor = _RoIExtractor()
+    model.raw_text_embedding = lambda texts: texts.new_zeros((texts.size(0), 4), dtype=torch.float32)
+    model.infor_context_module = _ContextModule(batch_size, length)
+    model.infor_node_cls_head = lambda context: node_logits
+    model.infor_row_relation_head = _RelationHead(batch_size, row_logits)
+    model.infor_col_relation_head = _RelationHead(batch_size, col_logits)
+    return model
+
+
+def test_ctunet_simple_test_relations():
+    rng = np.random.RandomState(0)
+    cells = [[[0, 0, 0, 0], [0, 1, 0, 2], [1, 0, 1, 0], [1, 1, 1, 1], [1, 2, 2, 2]],
+             [[0, 0, 0, 1], [1, 0, 1, 0], [1, 1, 1, 1]]]
+    num_cells = [len(per_img_cells) for per_img_cells in cells]
+    batch_size, length = len(cells), max(num_cells)
+    node_logits = torch.from_numpy(rng.randn(batch_size, length, 3)).float()
+    row_logits = torch.from_numpy(rng.randn(batch_size, length, length, 2)).float()
+    col_logits = torch.from_numpy(rng.randn(batch_size, length, length, 2)).float()
+    model = _build_ctunet(batch_size, length, node_logits, row_logits, col_logits)
+
+    gt_bboxes = [[torch.rand(num, 4) for num in num_cells]]
+    array_gt_texts = [[np.ones((num, 2), dtype=np.int64) for num in num_cells]]
+    results = model.simple_test(torch.zeros(batch_size, 3, 8, 8), [dict()] * batch_size, gt_bboxes=gt_bboxes,
+                                gt_texts=[[['a'] * num for num in num_cells]], gt_rowcols=[cells],
+                                array_gt_texts=array_gt_texts)
+
+    assert len(results) == batch_size
+    for img_idx, (result, num) in enumerate(zip(results, num_cells)):
+        assert np.allclose(result['bboxes_labels_pred'], torch.softmax(node_logits[img_idx, :num], -1).numpy())
+        for direction, logits in (('row', row_logits), ('col', col_logits)):
+            edges_pred = result['bboxes_edges_pred_' + direction]
+            assert edges_pred.shape == (num, num, 2)
+
+            # the candidate pairs are linked as the head predicts, and the others are never linked
+            candidates = _dense_candidates(cells[img_idx], direction)
+            linked = candidates & (logits[img_idx, :num, :num, 1] > logits[img_idx, :num, :num, 0]).numpy()
+            assert np.array_equal(edges_pred[..., 1] > 0.5, linked)
+            probs = torch.softmax(logits[img_idx, :num, :num], -1).numpy()
+            assert np.allclose(edges_pred[candidates], probs[candidates])
+            assert np.allclose(edges_pred[~candidates], [1, 0])
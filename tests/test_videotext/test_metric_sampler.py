@@ -0,0 +1,59 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    test_metric_sampler.py
+# Abstract       :    Tests of the anchor, positive and negative sampling of MetricSampler
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import numpy as np
+from torch.utils.data import ConcatDataset, Dataset
+
+from davarocr.davar_videotext.datasets.samplers import MetricSampler
+
+
+class FilteredTrackDataset(Dataset):
+    """ Dataset indexed through `filtered_index_list` like YORORCGDataset, where the long texts are filtered and only
+    `used_ratio` of the samples are used
+    """
+
+    def __init__(self, track_ids, texts, batch_max_length=3, used_ratio=1.0):
+        self.img_infos = [dict(ann=dict(trackID=track_id, text=text)) for track_id, text in zip(track_ids, texts)]
+        self.filtered_index_list = list()
+        for index, info in enumerate(self.img_infos):
+            if len(info['ann']['text']) > batch_max_length:
+                continue
+            self.filtered_index_list.append(index)
+            if len(self.filtered_index_list) == int(len(self.img_infos) * used_ratio):
+                break
+
+    def __len__(self):
+        return len(self.filtered_index_list)
+
+    def __getitem__(self, index):
+        return self.img_infos[self.filtered_index_list[index]]['ann']['trackID']
+
+
+def test_metric_sampler_filtered_dataset():
+    rng = np.random.RandomState(0)
+    datasets = []
+    for video_ids, used_ratio in ((('a', 'b'), 1.0), (('b', 'c'), 0.8)):
+        track_ids = ['{}-{}'.format(video_ids[idx % 2], idx % 3) for idx in range(40)]
+        texts = ['x' * length for length in rng.randint(1, 6, size=len(track_ids))]
+        datasets.append(FilteredTrackDataset(track_ids, texts, used_ratio=used_ratio))
+    dataset = ConcatDataset(datasets)
+    assert len(dataset) < sum(len(per_dataset.img_infos) for per_dataset in datasets)
+
+    sampler = MetricSampler(dataset, samples_per_gpu=6, num_replicas=1, rank=0)
+    indices = list(sampler)
+    assert len(indices) == len(sampler)
+    assert all(0 <= idx < len(dataset) for idx in indices)
+
+    # Each group of anchors is followed by the positives of the same track and the negatives of other tracks
+    for start in range(0, len(indices), 6):
+        anchors, positives, negatives = [[dataset[idx] for idx in indices[start + part:start + part + 2]]
+                                         for part in (0, 2, 4)]
+        assert anchors == positives
+        assert all(anchor != negative for anchor, negative in zip(anchors, negatives))
@@ -0,0 +1,127 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    benchmark_cpu_inference.py
+# Abstract       :    CPU throughput benchmark of a CRNN, an attention recognizer and an EAST detector
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import argparse
+import time
+
+import torch
+from mmcv import DictAction
+
+from davarocr.davar_common.apis import init_model
+
+
+def parse_args():
+    """
+
+    Returns:
+        args parameter of the benchmark
+
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the CPU inference throughput')
+    parser.add_argument('--crnn-config', default='demo/text_recognition/__base__/res32_bilstm_ctc.py',
+                        help='config file of the CTC recognizer')
+    parser.add_argument('--attn-config', default='demo/text_recognition/__base__/res32_bilstm_attn.py',
+                        help='config file of the attention recognizer')
+    parser.add_argument('--east-config', default='demo/text_detection/east/config/east_r50_rbox.py',
+                        help='config file of the EAST detector')
+    parser.add_argument('--models', nargs='+', default=['crnn', 'attn', 'east'], choices=['crnn', 'attn', 'east'],
+                        help='models to benchmark')
+    parser.add_argument('--device', default='cpu', help='device of the models')
+    parser.add_argument('--threads', type=int, nargs='+', default=[None],
+                        help='intra-op thread numbers to benchmark, default to the torch default')
+    parser.add_argument('--interop-threads', type=int, default=None, help='inter-op thread number')
+    parser.add_argument('--channels-last', action='store_true', help='also benchmark the channels-last format')
+    parser.add_argument('--no-inference-mode', action='store_true', help='use torch.no_grad instead')
+    parser.add_argument('--rcg-batch-size', type=int, default=32, help='batch size of the recognizers')
+    parser.add_argument('--rcg-size', type=int, nargs=2, default=[100, 32], help='(w, h) of recognition inputs')
+    parser.add_argument('--det-size', type=int, default=512, help='size of detection inputs')
+    parser.add_argument('--warmup', type=int, default=3, help='number of warm-up iterations')
+    parser.add_argument('--iters', type=int, default=10, help='number of timed iterations')
+    parser.add_argument('--cfg-options', nargs='+', action=DictAction,
+                        help='override some settings of all the used configs')
+    args_ = parser.parse_args()
+    return args_
+
+
+def build_inputs(name, model, args):
+    """ Synthetic inputs of a model
+
+    Args:
+        name (str): model name, in range of ['crnn', 'attn', 'east']
+        model (nn.Module): the model
+        args (argparse.Namespace): benchmark arguments
+
+    Returns:
+        dict: keyword arguments of `model.simple_test`
+    Returns:
+        int: number of images in the inputs
+    """
+    device = next(model.parameters()).device
+    if name == 'east':
+        size = args.det_size
+        img = torch.rand(1, 3, size, size, device=device)
+        img_meta = [dict(img_shape=(size, size, 3), ori_shape=(size, size, 3), pad_shape=(size, size, 3),
+                         scale_factor=[1., 1., 1., 1.])]
+        inputs = dict(img=img, img_meta=img_meta)
+    else:
+        width, height = args.rcg_size
+        channel = model.cfg.model.backbone.get('input_channel', 1)
+        img = torch.rand(args.rcg_batch_size, channel, height, width, device=device)
+        inputs = dict(imgs=img)
+    if getattr(model, 'channels_last', False):
+        key = 'img' if 'img' in inputs else 'imgs'
+        inputs[key] = inputs[key].contiguous(memory_format=torch.channels_last)
+    return inputs, inputs.get('img', inputs.get('imgs')).size(0)
+
+
+def benchmark(name, config, args, num_threads, channels_last):
+    """ Time the forward inference and the post-processing of a model
+
+    Args:
+        name (str): model name, in range of ['crnn', 'attn', 'east']
+        config (str): config file of the model
+        args (argparse.Namespace): benchmark arguments
+        num_threads (int | None): intra-op thread number
+        channels_last (bool): whether to use the channels-last memory format
+    """
+    model = init_model(config, device=args.device, cfg_options=args.cfg_options, num_threads=num_threads,
+                       num_interop_threads=args.interop_threads, channels_last=channels_last)
+    inputs, num_imgs = build_inputs(name, model, args)
+    if not args.no_inference_mode and hasattr(torch, 'inference_mode'):
+        grad_context = torch.inference_mode
+    else:
+        grad_context = torch.no_grad
+
+    with grad_context():
+        for _ in range(args.warmup):
+            model.simple_test(**inputs)
+        start = time.perf_counter()
+        for _ in range(args.iters):
+            model.simple_test(**inputs)
+        elapsed = time.perf_counter() - start
+
+    print('{:<5s} threads={:<3d} channels_last={:<5s} {:9.2f} ms/batch  {:9.1f} imgs/s'.format(
+        name, torch.get_num_threads(), str(channels_last), elapsed / args.iters * 1000,
+        num_imgs * args.iters / elapsed))
+
+
+def main():
+    """ Main entry of the benchmark """
+    args = parse_args()
+    configs = dict(crnn=args.crnn_config, attn=args.attn_config, east=args.east_config)
+    memory_formats = [False, True] if args.channels_last else [False]
+    for name in args.models:
+        for num_threads in args.threads:
+            for channels_last in memory_formats:
+                benchmark(name, configs[name], args, num_threads, channels_last)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    benchmark_target_encoding.py
+# Abstract       :    Micro-benchmark of the EAST / Text Perceptron / GPMA ground-truth encoders
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from davarocr.davar_det.datasets.pipelines import EASTDataGeneration, TPDataGeneration
+from davarocr.davar_table.datasets.pipelines import GPMADataGeneration
+
+
+def parse_args():
+    """
+
+    Returns:
+        args parameter of the benchmark
+
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the ground-truth encoders')
+    parser.add_argument('--encoders', nargs='+', default=['east', 'tp', 'gpma'], choices=['east', 'tp', 'gpma'],
+                        help='encoders to benchmark')
+    parser.add_argument('--size', type=int, default=1024, help='padded image size')
+    parser.add_argument('--num-boxes', type=int, default=50, help='number of boxes (cells) per sample')
+    parser.add_argument('--num-samples', type=int, default=20, help='number of distinct samples')
+    parser.add_argument('--repeat', type=int, default=5, help='number of passes over the samples')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args_ = parser.parse_args()
+    return args_
+
+
+def random_quads(rng, size, num):
+    """ Random rotated rectangles inside the image, [[x0, y0, ..., x3, y3], ...] """
+    centers = rng.uniform(0.2 * size, 0.8 * size, (num, 2))
+    half_sizes = np.stack([rng.uniform(20, 0.15 * size, num), rng.uniform(5, 30, num)], axis=1)
+    angles = rng.uniform(-np.pi / 6, np.pi / 6, num)
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float64)
+    rotation = np.stack([np.stack([np.cos(angles), -np.sin(angles)], axis=1),
+                         np.stack([np.sin(angles), np.cos(angles)], axis=1)], axis=1)
+    points = np.einsum('nij,nkj->nki', rotation, corners[np.newaxis] * half_sizes[:, np.newaxis])
+    return (points + centers[:, np.newaxis]).reshape(num, 8).tolist()
+
+
+def random_polygons(rng, size, num, points_per_side=7):
+    """ Random polygons with `2 * points_per_side` points, sampled along the long sides of random quads """
+    polys = []
+    for quad in random_quads(rng, size, num):
+        quad = np.array(quad).reshape(4, 2)
+        ratios = np.linspace(0, 1, points_per_side)[:, np.newaxis]
+        top = quad[0] + (quad[1] - quad[0]) * ratios
+        bottom = quad[2] + (quad[3] - quad[2]) * ratios
+        polys.append(np.concatenate([top, bottom]).reshape(-1).tolist())
+    return polys
+
+
+def random_table(rng, size, num):
+    """ Random grid of table cells with text regions inside, some of which are empty """
+    cols = max(int(np.sqrt(num)), 1)
+    rows = max(num // cols, 1)
+    xs = np.sort(rng.choice(np.arange(1, size - 1), cols + 1, replace=False))
+    ys = np.sort(rng.choice(np.arange(1, size - 1), rows + 1, replace=False))
+    cells = [[xs[j], ys[i], xs[j + 1], ys[i + 1]] for i in range(rows) for j in range(cols)]
+    empty = rng.uniform(size=len(cells)) < 0.2
+    bboxes = [cell for cell, is_empty in zip(cells, empty) if not is_empty]
+    contents = [[x1 + (x2 - x1) * 0.1, y1 + (y2 - y1) * 0.2, x2 - (x2 - x1) * 0.1, y2 - (y2 - y1) * 0.2]
+                for x1, y1, x2, y2 in bboxes]
+    empty_bboxes = [cell for cell, is_empty in zip(cells, empty) if is_empty]
+    return bboxes, contents, empty_bboxes
+
+
+def build_samples(name, rng, size, num_boxes, num_samples):
+    """ Build synthetic input data flows of an encoder """
+    samples = []
+    for _ in range(num_samples):
+        results = dict(pad_shape=(size, size, 3))
+        if name == 'east':
+            results['gt_poly_bboxes'] = random_quads(rng, size, num_boxes)
+            results['gt_poly_bboxes_ignore'] = random_quads(rng, size, max(num_boxes // 10, 1))
+        elif name == 'tp':
+            results['gt_poly_bboxes'] = random_polygons(rng, size, num_boxes)
+            results['gt_poly_bboxes_ignore'] = random_polygons(rng, size, max(num_boxes // 10, 1))
+        else:
+            bboxes, contents, empty_bboxes = random_table(rng, size, num_boxes)
+            results.update(gt_bboxes=bboxes, gt_content_bboxes=contents, gt_empty_bboxes=empty_bboxes)
+        samples.append(results)
+    return samples
+
+
+def build_encoder(name, target_dtype):
+    """ Build an encoder with its default settings """
+    if name == 'east':
+        return EASTDataGeneration(target_dtype=target_dtype)
+    if name == 'tp':
+        return TPDataGeneration(target_dtype=target_dtype)
+    return GPMADataGeneration(target_dtype=target_dtype)
+
+
+def benchmark(name, samples, repeat):
+    """ Time the encoder in each target dtype, and report the per-sample latency and the size of the pickled targets
+    (what a dataloader worker transfers to the main process) """
+    key = 'gt_semantic_seg' if name == 'gpma' else 'gt_masks'
+    reference = None
+    for target_dtype in ['float32', 'float16']:
+        encoder = build_encoder(name, target_dtype)
+
+        # Warm up the reusable buffers
+        encoder(dict(samples[0]))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for results in samples:
+                targets = encoder(dict(results))[key]
+        latency = (time.perf_counter() - start) / (repeat * len(samples)) * 1000
+        ipc_size = len(pickle.dumps(targets, protocol=-1))
+
+        # Compare with the float32 targets, except channel 1 whose background pixels are randomly sampled
+        targets = np.delete(encoder(dict(samples[-1]))[key].astype(np.float32), 1, axis=0)
+        if reference is None:
+            reference = targets
+        diff = float(np.abs(targets - reference).max())
+
+        print('{:<5s} {:<8s} {:8.2f} ms/sample  {:8.1f} KB/sample  max abs diff={:.4f}'.format(
+            name, target_dtype, latency, ipc_size / 1024, diff))
+
+
+def main():
+    """ Main entry of the benchmark """
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    for name in args.encoders:
+        samples = build_samples(name, rng, args.size, args.num_boxes, args.num_samples)
+        benchmark(name, samples, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    convert_datalist.py
+# Abstract       :    Convert davar datalists into memory-mapped annotation stores, used by `ann_store`
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import argparse
+import os.path as osp
+import time
+
+from davarocr.davar_common.datasets.ann_store import AnnotationStore, convert_datalist
+
+
+def parse_args():
+    """
+
+    Returns:
+        args parameter of the conversion
+
+    """
+    parser = argparse.ArgumentParser(description='Convert datalists into annotation stores')
+    parser.add_argument('ann_files', nargs='+', help='paths to the datalists')
+    parser.add_argument('--out-dir', default=None,
+                        help='directory of the stores, default to the store `ann_file + ".store"` next to each datalist')
+    args_ = parser.parse_args()
+    return args_
+
+
+def main():
+    """ Main entry of the conversion """
+    args = parse_args()
+    for ann_file in args.ann_files:
+        if args.out_dir is None:
+            store_dir = ann_file + '.store'
+        else:
+            store_dir = osp.join(args.out_dir, osp.basename(ann_file) + '.store')
+        if osp.exists(store_dir):
+            print('{} exists, skipped'.format(store_dir))
+            continue
+        start = time.perf_counter()
+        convert_datalist(ann_file, store_dir)
+        print('{} -> {}: {} images in {:.1f}s'.format(ann_file, store_dir, len(AnnotationStore(store_dir)),
+                                                     time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+##################################################################################################
+# Copyright Info :    Copyright (c) Davar Lab @ Hikvision Research Institute. All rights reserved.
+# Filename       :    pack_layout_records.py
+# Abstract       :    Pack the per-image annotation files of layout datalists into sharded records, used by
+#                     `MMLayoutDataset` (DocBank, PubLayNet)
+
+# Current Version:    1.0.0
+# Date           :    2026-10-19
+##################################################################################################
+"""
+import argparse
+import os.path as osp
+import time
+
+from davarocr.davar_layout.datasets.layout_records import LayoutRecords, pack_layout_records
+
+
+def parse_args():
+    """
+
+    Returns:
+        args parameter of the packing
+
+    """
+    parser = argparse.ArgumentParser(description='Pack layout annotation files into sharded records')
+    parser.add_argument('ann_file', help='path to the datalist')
+    parser.add_argument('ann_prefix', help='annotation prefix path of the per-image annotation files')
+    parser.add_argument('--out-dir', default=None,
+                        help='directory of the records, default to `ann_file + ".records"` next to the datalist')
+    parser.add_argument('--vocab', default=None,
+                        help='vocabulary of CharTokenize, to store the "ctexts" as character ids')
+    parser.add_argument('--no-space', action='store_true', help='same as CharTokenize(add_space=False)')
+    parser.add_argument('--shard-size', type=int, default=1024, help='maximum size of a shard, in MB')
+    parser.add_argument('--workers', type=int, default=8, help='number of processes parsing the annotation files')
+    args_ = parser.parse_args()
+    return args_
+
+
+def main():
+    """ Main entry of the packing """
+    args = parse_args()
+    record_dir = args.ann_file + '.records' if args.out_dir is None else args.out_dir
+    if osp.exists(record_dir):
+        print('{} exists, skipped'.format(record_dir))
+        return
+    start = time.perf_counter()
+    pack_layout_records(args.ann_file, args.ann_prefix, record_dir, vocab=args.vocab, add_space=not args.no_space,
+                        shard_size=args.shard_size << 20, num_workers=args.workers)
+    records = LayoutRecords(record_dir)
+    print('{} -> {}: {} records in {} shards, {:.1f}s'.format(args.ann_file, record_dir, len(records),
+                                                              records.num_shards, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
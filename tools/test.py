@@ -23,7 +23,7 @@ from mmcv.runner import (get_dist_info, init_dist, load_checkpoint,
 from davarocr.davar_common.apis import single_gpu_test, multi_gpu_test
 from mmdet.datasets import replace_ImageToTensor
 from davarocr.davar_common.datasets import build_dataset, build_dataloader
-from davarocr.davar_common.datasets.builder import davar_build_dataset
+from davarocr.davar_common.datasets.builder import davar_build_dataset, davar_build_dataloader
 
 from davarocr.davar_common.models import build_model
 
@@ -184,12 +184,22 @@ def main():
     else:
         raise NotImplementedError
 
-    data_loader = build_dataloader(
-        dataset,
-        samples_per_gpu=samples_per_gpu,
-        workers_per_gpu=cfg.data.workers_per_gpu,
-        dist=distributed,
-        shuffle=False)
+    if cfg.data.get('cfg_collate', None) is not None:
+        # Customized collate function, e.g. padding the token sequences of each batch
+        data_loader = davar_build_dataloader(
+            dataset,
+            samples_per_gpu=samples_per_gpu,
+            workers_per_gpu=cfg.data.workers_per_gpu,
+            dist=distributed,
+            shuffle=False,
+            cfg_collate=cfg.data.cfg_collate)
+    else:
+        data_loader = build_dataloader(
+            dataset,
+            samples_per_gpu=samples_per_gpu,
+            workers_per_gpu=cfg.data.workers_per_gpu,
+            dist=distributed,
+            shuffle=False)
 
     # build the model and load checkpoint
     cfg.model.train_cfg = None